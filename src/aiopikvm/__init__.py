@@ -1,152 +1,197 @@
-"""aiopikvm — async Python client for PiKVM API."""
+"""aiopikvm — async Python client for PiKVM API.
+
+Everything in ``__all__`` is loaded on first use rather than on import. The
+package spans an HTTP client, three WebSocket clients and some two hundred
+pydantic models, and a script that opens one client to press one ATX button
+needs a fraction of that: ``import aiopikvm`` costs nothing, and
+``from aiopikvm import PiKVM`` brings in httpx and no more until a resource,
+a socket or a model is asked for.
+"""
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from aiopikvm._client import PiKVM
+    from aiopikvm._constants import (
+        AuthMode,
+        BufferingMode,
+        FrameSource,
+        PathCurve,
+        ValidationMode,
+    )
+    from aiopikvm._exceptions import (
+        APIError,
+        AuthError,
+        BusyError,
+        ConfigurationError,
+        ConnectError,
+        ConnectionTimeoutError,
+        PiKVMError,
+        RedirectError,
+        ResponseError,
+        UnavailableError,
+        WebRTCError,
+        WebSocketError,
+    )
+    from aiopikvm._fleet import DeviceEvent, FleetEvents
+    from aiopikvm._hub import EventHub, Subscription
+    from aiopikvm._input import HIDInput
+    from aiopikvm._journal import EventJournal, JournalReader
+    from aiopikvm._latency import (
+        Health,
+        LatencyHistogram,
+        LatencyMonitor,
+        LatencyStats,
+    )
+    from aiopikvm._match import ImageMatch, ImageMatcher
+    from aiopikvm._media_ws import MediaWebSocket
+    from aiopikvm._metrics import ClientMetrics
+    from aiopikvm._ocr import LocalOCR, OCRCache, OCRCacheStats
+    from aiopikvm._sessions import FileSessionStore, MemorySessionStore, SessionStore
+    from aiopikvm._snapshot_feed import SnapshotFeed
+    from aiopikvm._timeouts import AdaptiveTimeout
+    from aiopikvm._tls import CertTypes, VerifyTypes, clear_ssl_contexts
+    from aiopikvm._totp import TOTP
+    from aiopikvm._tracing import (
+        FrameTrace,
+        JanusTrace,
+        LoginTrace,
+        OpenTelemetryTracer,
+        RequestTrace,
+        TracedSocket,
+        Tracer,
+    )
+    from aiopikvm._wall import SnapshotWall, WallTile
+    from aiopikvm._webrtc import WebRTCSession
+    from aiopikvm._ws import DeviceState, KvmdVersion, PiKVMWebSocket
+    from aiopikvm.models.atx import ATXActs, ATXLeds, ATXState
+    from aiopikvm.models.gpio import (
+        GPIOChannel,
+        GPIOHardware,
+        GPIOInput,
+        GPIOInputScheme,
+        GPIOIOState,
+        GPIOModel,
+        GPIOOutputScheme,
+        GPIOPulse,
+        GPIOScheme,
+        GPIOState,
+        GPIOView,
+        GPIOViewHeader,
+    )
+    from aiopikvm.models.hid import (
+        HIDJiggler,
+        HIDKeyboard,
+        HIDKeyboardLeds,
+        HIDKeymaps,
+        HIDMouse,
+        HIDOutputs,
+        HIDState,
+    )
+    from aiopikvm.models.info import (
+        InfoAuth,
+        InfoCPU,
+        InfoExtra,
+        InfoFan,
+        InfoHealth,
+        InfoKernel,
+        InfoKvmd,
+        InfoMem,
+        InfoNode,
+        InfoPlatform,
+        InfoState,
+        InfoStreamer,
+        InfoSystem,
+        InfoTemp,
+        InfoThrottling,
+        InfoThrottlingFlag,
+        InfoThrottlingFlags,
+        InfoUptime,
+        InfoUptimeParts,
+    )
+    from aiopikvm.models.media import (
+        MediaFrame,
+        MediaH264,
+        MediaJPEG,
+        MediaState,
+        MediaVideoFormats,
+    )
+    from aiopikvm.models.msd import (
+        MSDDownload,
+        MSDDrive,
+        MSDDriveImage,
+        MSDImage,
+        MSDPart,
+        MSDState,
+        MSDStorage,
+        MSDUpload,
+    )
+    from aiopikvm.models.streamer import (
+        MJPEGFrame,
+        OCRInfo,
+        OCRLangs,
+        Resolution,
+        SavedSnapshot,
+        SnapshotImage,
+        Streamer,
+        StreamerClientStat,
+        StreamerEncoder,
+        StreamerFeatures,
+        StreamerH264,
+        StreamerLimitRange,
+        StreamerLimits,
+        StreamerParams,
+        StreamerSinkInfo,
+        StreamerSinks,
+        StreamerSnapshot,
+        StreamerSource,
+        StreamerState,
+        StreamerStream,
+    )
+    from aiopikvm.models.switch import (
+        EDID,
+        EDIDInfo,
+        SwitchAtx,
+        SwitchAtxClickDelayLimit,
+        SwitchAtxClickDelayLimits,
+        SwitchAtxClickDelays,
+        SwitchAtxLeds,
+        SwitchAtxLimits,
+        SwitchBeacons,
+        SwitchColor,
+        SwitchColors,
+        SwitchEdids,
+        SwitchFirmware,
+        SwitchLimits,
+        SwitchLinks,
+        SwitchModel,
+        SwitchPort,
+        SwitchPortAtx,
+        SwitchPortVideo,
+        SwitchState,
+        SwitchSummary,
+        SwitchUnit,
+        SwitchUnitFirmware,
+    )
+    from aiopikvm.models.webrtc import (
+        WebRTCEvent,
+        WebRTCFeatures,
+        WebRTCICE,
+        WebRTCJSEP,
+        WebRTCPluginData,
+        WebRTCPluginEvent,
+        WebRTCResult,
+    )
+    from aiopikvm.resources.hid import (
+        KEY_NAMES,
+        KeyboardOutput,
+        MouseButton,
+        MouseOutput,
+    )
+    from aiopikvm.resources.redfish import RESET_TYPES, ResetType
+    from aiopikvm.resources.system import InfoField
 
-from aiopikvm._client import PiKVM
-from aiopikvm._constants import AuthMode
-from aiopikvm._exceptions import (
-    APIError,
-    AuthError,
-    BusyError,
-    ConfigurationError,
-    ConnectError,
-    ConnectionTimeoutError,
-    PiKVMError,
-    RedirectError,
-    ResponseError,
-    UnavailableError,
-    WebRTCError,
-    WebSocketError,
-)
-from aiopikvm._media_ws import MediaWebSocket
-from aiopikvm._tls import CertTypes, VerifyTypes
-from aiopikvm._totp import TOTP
-from aiopikvm._webrtc import WebRTCSession
-from aiopikvm._ws import DeviceState, KvmdVersion, PiKVMWebSocket
-from aiopikvm.models.atx import ATXActs, ATXLeds, ATXState
-from aiopikvm.models.gpio import (
-    GPIOChannel,
-    GPIOHardware,
-    GPIOInput,
-    GPIOInputScheme,
-    GPIOIOState,
-    GPIOModel,
-    GPIOOutputScheme,
-    GPIOPulse,
-    GPIOScheme,
-    GPIOState,
-    GPIOView,
-    GPIOViewHeader,
-)
-from aiopikvm.models.hid import (
-    HIDJiggler,
-    HIDKeyboard,
-    HIDKeyboardLeds,
-    HIDKeymaps,
-    HIDMouse,
-    HIDOutputs,
-    HIDState,
-)
-from aiopikvm.models.info import (
-    InfoAuth,
-    InfoCPU,
-    InfoExtra,
-    InfoFan,
-    InfoHealth,
-    InfoKernel,
-    InfoKvmd,
-    InfoMem,
-    InfoNode,
-    InfoPlatform,
-    InfoState,
-    InfoStreamer,
-    InfoSystem,
-    InfoTemp,
-    InfoThrottling,
-    InfoThrottlingFlag,
-    InfoThrottlingFlags,
-    InfoUptime,
-    InfoUptimeParts,
-)
-from aiopikvm.models.media import (
-    MediaFrame,
-    MediaH264,
-    MediaJPEG,
-    MediaState,
-    MediaVideoFormats,
-)
-from aiopikvm.models.msd import (
-    MSDDownload,
-    MSDDrive,
-    MSDDriveImage,
-    MSDImage,
-    MSDPart,
-    MSDState,
-    MSDStorage,
-    MSDUpload,
-)
-from aiopikvm.models.streamer import (
-    MJPEGFrame,
-    OCRInfo,
-    OCRLangs,
-    Resolution,
-    SavedSnapshot,
-    SnapshotImage,
-    Streamer,
-    StreamerClientStat,
-    StreamerEncoder,
-    StreamerFeatures,
-    StreamerH264,
-    StreamerLimitRange,
-    StreamerLimits,
-    StreamerParams,
-    StreamerSinkInfo,
-    StreamerSinks,
-    StreamerSnapshot,
-    StreamerSource,
-    StreamerState,
-    StreamerStream,
-)
-from aiopikvm.models.switch import (
-    EDID,
-    EDIDInfo,
-    SwitchAtx,
-    SwitchAtxClickDelayLimit,
-    SwitchAtxClickDelayLimits,
-    SwitchAtxClickDelays,
-    SwitchAtxLeds,
-    SwitchAtxLimits,
-    SwitchBeacons,
-    SwitchColor,
-    SwitchColors,
-    SwitchEdids,
-    SwitchFirmware,
-    SwitchLimits,
-    SwitchLinks,
-    SwitchModel,
-    SwitchPort,
-    SwitchPortAtx,
-    SwitchPortVideo,
-    SwitchState,
-    SwitchSummary,
-    SwitchUnit,
-    SwitchUnitFirmware,
-)
-from aiopikvm.models.webrtc import (
-    WebRTCEvent,
-    WebRTCFeatures,
-    WebRTCICE,
-    WebRTCJSEP,
-    WebRTCPluginData,
-    WebRTCPluginEvent,
-    WebRTCResult,
-)
-from aiopikvm.resources.hid import (
-    KEY_NAMES,
-    KeyboardOutput,
-    MouseButton,
-    MouseOutput,
-)
-from aiopikvm.resources.redfish import RESET_TYPES, ResetType
-from aiopikvm.resources.system import InfoField
 
 __version__ = "0.2.1"
 
@@ -159,15 +204,25 @@ __all__ = [
     "ATXActs",
     "ATXLeds",
     "ATXState",
+    "AdaptiveTimeout",
     "AuthError",
     "AuthMode",
+    "BufferingMode",
     "BusyError",
     "CertTypes",
+    "ClientMetrics",
     "ConfigurationError",
     "ConnectError",
     "ConnectionTimeoutError",
+    "DeviceEvent",
     "DeviceState",
     "EDIDInfo",
+    "EventHub",
+    "EventJournal",
+    "FileSessionStore",
+    "FleetEvents",
+    "FrameSource",
+    "FrameTrace",
     "GPIOChannel",
     "GPIOHardware",
     "GPIOIOState",
@@ -180,6 +235,7 @@ __all__ = [
     "GPIOState",
     "GPIOView",
     "GPIOViewHeader",
+    "HIDInput",
     "HIDJiggler",
     "HIDKeyboard",
     "HIDKeyboardLeds",
@@ -187,6 +243,9 @@ __all__ = [
     "HIDMouse",
     "HIDOutputs",
     "HIDState",
+    "Health",
+    "ImageMatch",
+    "ImageMatcher",
     "InfoAuth",
     "InfoCPU",
     "InfoExtra",
@@ -207,8 +266,15 @@ __all__ = [
     "InfoThrottlingFlags",
     "InfoUptime",
     "InfoUptimeParts",
+    "JanusTrace",
+    "JournalReader",
     "KeyboardOutput",
     "KvmdVersion",
+    "LatencyHistogram",
+    "LatencyMonitor",
+    "LatencyStats",
+    "LocalOCR",
+    "LoginTrace",
     "MJPEGFrame",
     "MSDDownload",
     "MSDDrive",
@@ -224,19 +290,28 @@ __all__ = [
     "MediaState",
     "MediaVideoFormats",
     "MediaWebSocket",
+    "MemorySessionStore",
     "MouseButton",
     "MouseOutput",
+    "OCRCache",
+    "OCRCacheStats",
     "OCRInfo",
     "OCRLangs",
+    "OpenTelemetryTracer",
+    "PathCurve",
     "PiKVM",
     "PiKVMError",
     "PiKVMWebSocket",
     "RedirectError",
+    "RequestTrace",
     "ResetType",
     "Resolution",
     "ResponseError",
     "SavedSnapshot",
+    "SessionStore",
+    "SnapshotFeed",
     "SnapshotImage",
+    "SnapshotWall",
     "Streamer",
     "StreamerClientStat",
     "StreamerEncoder",
@@ -251,6 +326,7 @@ __all__ = [
     "StreamerSource",
     "StreamerState",
     "StreamerStream",
+    "Subscription",
     "SwitchAtx",
     "SwitchAtxClickDelayLimit",
     "SwitchAtxClickDelayLimits",
@@ -272,8 +348,12 @@ __all__ = [
     "SwitchSummary",
     "SwitchUnit",
     "SwitchUnitFirmware",
+    "TracedSocket",
+    "Tracer",
     "UnavailableError",
+    "ValidationMode",
     "VerifyTypes",
+    "WallTile",
     "WebRTCError",
     "WebRTCEvent",
     "WebRTCFeatures",
@@ -285,4 +365,236 @@ __all__ = [
     "WebRTCSession",
     "WebSocketError",
     "__version__",
+    "clear_ssl_contexts",
 ]
+
+_EXPORTS: dict[str, tuple[str, ...]] = {
+    "aiopikvm._client": ("PiKVM",),
+    "aiopikvm._constants": (
+        "AuthMode",
+        "BufferingMode",
+        "FrameSource",
+        "PathCurve",
+        "ValidationMode",
+    ),
+    "aiopikvm._exceptions": (
+        "APIError",
+        "AuthError",
+        "BusyError",
+        "ConfigurationError",
+        "ConnectError",
+        "ConnectionTimeoutError",
+        "PiKVMError",
+        "RedirectError",
+        "ResponseError",
+        "UnavailableError",
+        "WebRTCError",
+        "WebSocketError",
+    ),
+    "aiopikvm._fleet": ("DeviceEvent", "FleetEvents"),
+    "aiopikvm._hub": ("EventHub", "Subscription"),
+    "aiopikvm._input": ("HIDInput",),
+    "aiopikvm._journal": ("EventJournal", "JournalReader"),
+    "aiopikvm._latency": (
+        "Health",
+        "LatencyHistogram",
+        "LatencyMonitor",
+        "LatencyStats",
+    ),
+    "aiopikvm._match": ("ImageMatch", "ImageMatcher"),
+    "aiopikvm._media_ws": ("MediaWebSocket",),
+    "aiopikvm._metrics": ("ClientMetrics",),
+    "aiopikvm._ocr": ("LocalOCR", "OCRCache", "OCRCacheStats"),
+    "aiopikvm._sessions": ("FileSessionStore", "MemorySessionStore", "SessionStore"),
+    "aiopikvm._snapshot_feed": ("SnapshotFeed",),
+    "aiopikvm._timeouts": ("AdaptiveTimeout",),
+    "aiopikvm._tls": (
+        "CertTypes",
+        "VerifyTypes",
+        "clear_ssl_contexts",
+    ),
+    "aiopikvm._totp": ("TOTP",),
+    "aiopikvm._tracing": (
+        "FrameTrace",
+        "JanusTrace",
+        "LoginTrace",
+        "OpenTelemetryTracer",
+        "RequestTrace",
+        "TracedSocket",
+        "Tracer",
+    ),
+    "aiopikvm._wall": ("SnapshotWall", "WallTile"),
+    "aiopikvm._webrtc": ("WebRTCSession",),
+    "aiopikvm._ws": (
+        "DeviceState",
+        "KvmdVersion",
+        "PiKVMWebSocket",
+    ),
+    "aiopikvm.models.atx": (
+        "ATXActs",
+        "ATXLeds",
+        "ATXState",
+    ),
+    "aiopikvm.models.gpio": (
+        "GPIOChannel",
+        "GPIOHardware",
+        "GPIOInput",
+        "GPIOInputScheme",
+        "GPIOIOState",
+        "GPIOModel",
+        "GPIOOutputScheme",
+        "GPIOPulse",
+        "GPIOScheme",
+        "GPIOState",
+        "GPIOView",
+        "GPIOViewHeader",
+    ),
+    "aiopikvm.models.hid": (
+        "HIDJiggler",
+        "HIDKeyboard",
+        "HIDKeyboardLeds",
+        "HIDKeymaps",
+        "HIDMouse",
+        "HIDOutputs",
+        "HIDState",
+    ),
+    "aiopikvm.models.info": (
+        "InfoAuth",
+        "InfoCPU",
+        "InfoExtra",
+        "InfoFan",
+        "InfoHealth",
+        "InfoKernel",
+        "InfoKvmd",
+        "InfoMem",
+        "InfoNode",
+        "InfoPlatform",
+        "InfoState",
+        "InfoStreamer",
+        "InfoSystem",
+        "InfoTemp",
+        "InfoThrottling",
+        "InfoThrottlingFlag",
+        "InfoThrottlingFlags",
+        "InfoUptime",
+        "InfoUptimeParts",
+    ),
+    "aiopikvm.models.media": (
+        "MediaFrame",
+        "MediaH264",
+        "MediaJPEG",
+        "MediaState",
+        "MediaVideoFormats",
+    ),
+    "aiopikvm.models.msd": (
+        "MSDDownload",
+        "MSDDrive",
+        "MSDDriveImage",
+        "MSDImage",
+        "MSDPart",
+        "MSDState",
+        "MSDStorage",
+        "MSDUpload",
+    ),
+    "aiopikvm.models.streamer": (
+        "MJPEGFrame",
+        "OCRInfo",
+        "OCRLangs",
+        "Resolution",
+        "SavedSnapshot",
+        "SnapshotImage",
+        "Streamer",
+        "StreamerClientStat",
+        "StreamerEncoder",
+        "StreamerFeatures",
+        "StreamerH264",
+        "StreamerLimitRange",
+        "StreamerLimits",
+        "StreamerParams",
+        "StreamerSinkInfo",
+        "StreamerSinks",
+        "StreamerSnapshot",
+        "StreamerSource",
+        "StreamerState",
+        "StreamerStream",
+    ),
+    "aiopikvm.models.switch": (
+        "EDID",
+        "EDIDInfo",
+        "SwitchAtx",
+        "SwitchAtxClickDelayLimit",
+        "SwitchAtxClickDelayLimits",
+        "SwitchAtxClickDelays",
+        "SwitchAtxLeds",
+        "SwitchAtxLimits",
+        "SwitchBeacons",
+        "SwitchColor",
+        "SwitchColors",
+        "SwitchEdids",
+        "SwitchFirmware",
+        "SwitchLimits",
+        "SwitchLinks",
+        "SwitchModel",
+        "SwitchPort",
+        "SwitchPortAtx",
+        "SwitchPortVideo",
+        "SwitchState",
+        "SwitchSummary",
+        "SwitchUnit",
+        "SwitchUnitFirmware",
+    ),
+    "aiopikvm.models.webrtc": (
+        "WebRTCEvent",
+        "WebRTCFeatures",
+        "WebRTCICE",
+        "WebRTCJSEP",
+        "WebRTCPluginData",
+        "WebRTCPluginEvent",
+        "WebRTCResult",
+    ),
+    "aiopikvm.resources.hid": (
+        "KEY_NAMES",
+        "KeyboardOutput",
+        "MouseButton",
+        "MouseOutput",
+    ),
+    "aiopikvm.resources.redfish": (
+        "RESET_TYPES",
+        "ResetType",
+    ),
+    "aiopikvm.resources.system": ("InfoField",),
+}
+"""Where each name in ``__all__`` is defined, grouped by module.
+
+It has to agree with the imports under ``TYPE_CHECKING`` above, which are
+what a type checker and the reference site read instead;
+``tests/test_public_api.py`` holds the two together.
+"""
+
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+
+def __getattr__(name: str) -> Any:
+    """Import a public name the first time it is asked for.
+
+    Args:
+        name: Attribute looked up on the package.
+
+    Returns:
+        The object, which is also stored on the package so that the next
+        lookup never gets here.
+
+    Raises:
+        AttributeError: *name* is not part of the public API.
+    """
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    """List the public API alongside what has been loaded already."""
+    return sorted({*globals(), *__all__})
@@ -8,6 +8,7 @@ import httpx
 from pydantic import BaseModel, ValidationError
 
 from aiopikvm._exceptions import APIError, ResponseError
+from aiopikvm._validation import validate_model
 
 if TYPE_CHECKING:
     from aiopikvm._client import PiKVM
@@ -112,10 +113,12 @@ class BaseResource:
 
         return body.get("result")
 
-    @staticmethod
-    def _validate[M: BaseModel](model: type[M], data: Any, path: str) -> M:
+    def _validate[M: BaseModel](self, model: type[M], data: Any, path: str) -> M:
         """Validate a payload against a response model.
 
+        As much as the client's *validation* mode says; see
+        [`ValidationMode`][aiopikvm.ValidationMode].
+
         Args:
             model: Model describing the payload.
             data: Payload to validate.
@@ -130,7 +133,7 @@ class BaseResource:
                 hierarchy and would escape ``except PiKVMError``.
         """
         try:
-            return model.model_validate(data)
+            return validate_model(model, data, self._client._validation)
         except ValidationError as exc:
             raise ResponseError(
                 f"{path} returned a payload {model.__name__} cannot parse. "
@@ -4,20 +4,45 @@ from __future__ import annotations
 
 import asyncio
 import base64
-from collections.abc import AsyncIterator, Callable, Iterator, Sequence
-from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+import logging
+import time
+from collections.abc import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    Sequence,
+)
+from contextlib import (
+    AbstractAsyncContextManager,
+    AsyncExitStack,
+    asynccontextmanager,
+    contextmanager,
+    suppress,
+)
 from functools import cached_property
 from typing import TYPE_CHECKING, Any, Self
 
 import httpx
 
 from aiopikvm._constants import (
+    _WS_MAX_QUEUE,
+    _WS_MAX_SIZE,
+    _WS_PING_INTERVAL,
+    _WS_PING_TIMEOUT,
+    _WS_RECONNECT_DELAY,
+    _WS_RECONNECT_MAX_DELAY,
     DEFAULT_AUTH,
     DEFAULT_FOLLOW_REDIRECTS,
     DEFAULT_TIMEOUT,
+    DEFAULT_VALIDATION,
     DEFAULT_VERIFY_SSL,
     AuthMode,
+    BufferingMode,
+    ValidationMode,
 )
+from aiopikvm._deadline import _deadline, _remaining, _within
 from aiopikvm._exceptions import (
     AuthError,
     ConfigurationError,
@@ -29,20 +54,22 @@ from aiopikvm._exceptions import (
     _error_fields,
     _status_error,
 )
-from aiopikvm._media_ws import MediaWebSocket
+from aiopikvm._metrics import ClientMetrics
+from aiopikvm._sessions import SessionStore
+from aiopikvm._timeouts import AdaptiveTimeout, _LatencyWindows
 from aiopikvm._tls import CertTypes, VerifyTypes, build_ssl_context
-from aiopikvm._webrtc import WebRTCSession
-from aiopikvm._ws import (
-    _WS_MAX_QUEUE,
-    _WS_MAX_SIZE,
-    _WS_PING_INTERVAL,
-    _WS_PING_TIMEOUT,
-    PiKVMWebSocket,
-)
+from aiopikvm._tracing import LoginTrace, RequestTrace, _finish, _notify, _server
+from aiopikvm._uds import _LOCAL_URL, _split_unix_url, _UnixTransport
 
 if TYPE_CHECKING:
     from types import TracebackType
 
+    from aiopikvm._hub import EventHub
+    from aiopikvm._input import HIDInput
+    from aiopikvm._media_ws import MediaWebSocket
+    from aiopikvm._tracing import Tracer
+    from aiopikvm._webrtc import WebRTCSession
+    from aiopikvm._ws import PiKVMWebSocket
     from aiopikvm.resources.atx import ATXResource
     from aiopikvm.resources.auth import AuthResource
     from aiopikvm.resources.gpio import GPIOResource
@@ -55,9 +82,33 @@ if TYPE_CHECKING:
     from aiopikvm.resources.switch import SwitchResource
     from aiopikvm.resources.system import SystemResource
 
+logger = logging.getLogger(__name__)
+
 _COOKIE = "auth_token"
 """Name of the cookie kvmd stores its session token in."""
 
+_PREWARM_CONNECTIONS = 2
+"""Connections ``prewarm=True`` opens: one for a call, one for a poll beside it."""
+
+_KEEP_WARM_INTERVAL = 20.0
+"""Seconds a prewarmed client may sit idle before its connections are used."""
+
+_PREWARM_TIMEOUT = 3.0
+"""Seconds one round of prewarming may take before it is given up on.
+
+Far less than a request's timeout: entering the client waits for the first
+round, and a device that is not there should not hold up the ``async with``
+for longer than a TLS handshake on a Pi could need.
+"""
+
+_KEEPALIVE_EXPIRY = 60.0
+"""How long a prewarmed client keeps an idle connection, in seconds.
+
+httpx's own default is five, which would close the connections long before
+the keep-warm task came back to them. kvmd's nginx keeps an idle connection
+for 75 seconds; this stays under that, so it is the client that lets go.
+"""
+
 
 @contextmanager
 def _httpx_errors_translated() -> Iterator[None]:
@@ -109,6 +160,42 @@ def _httpx_errors_translated() -> Iterator[None]:
         raise ConnectError(str(exc)) from exc
 
 
+class _DeadlineStream(httpx.AsyncByteStream):
+    """Response body that stops at the deadline its stream was opened under.
+
+    The read timeout bounds one wait for the next chunk, not the whole body,
+    so a stream that keeps sending — the progress lines of
+    ``upload_remote()``, a followed log — would read past the deadline for
+    as long as the device kept it going. Each chunk here is waited for only
+    as long as the deadline still allows. The timeout is scoped to that one
+    wait, so it is safe inside the async generators that read these bodies.
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, at: float) -> None:
+        self._stream = stream
+        self._at = at
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        chunks = aiter(self._stream)
+        while True:
+            remaining = self._at - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise TimeoutError
+                async with asyncio.timeout(remaining):
+                    chunk = await anext(chunks)
+            except StopAsyncIteration:
+                return
+            except TimeoutError as exc:
+                raise ConnectionTimeoutError(
+                    "The deadline passed while the stream was being read"
+                ) from exc
+            yield chunk
+
+    async def aclose(self) -> None:
+        await self._stream.aclose()
+
+
 _RESOURCE_NAMES = (
     "auth",
     "atx",
@@ -157,18 +244,25 @@ class PiKVM:
         totp: str | Callable[[], str] | None = None,
         auth: AuthMode = DEFAULT_AUTH,
         session_expire: int = 0,
+        session_store: SessionStore | None = None,
         verify_ssl: VerifyTypes = DEFAULT_VERIFY_SSL,
         cert: CertTypes | None = None,
         proxy: str | None = None,
         trust_env: bool = True,
-        timeout: float = DEFAULT_TIMEOUT,
+        uds: str | None = None,
+        timeout: float | AdaptiveTimeout = DEFAULT_TIMEOUT,
+        prewarm: bool | int = False,
         follow_redirects: bool = DEFAULT_FOLLOW_REDIRECTS,
+        validation: ValidationMode = DEFAULT_VALIDATION,
+        tracer: Tracer | None = None,
         http_client: httpx.AsyncClient | None = None,
     ) -> None:
         """Create a client.
 
         Args:
-            url: PiKVM base URL, including the scheme.
+            url: PiKVM base URL, including the scheme — or, for a program
+                running on the device, ``unix:///run/kvmd/kvmd.sock`` to
+                talk to kvmd through its socket instead of through nginx.
             user: kvmd user name.
             passwd: kvmd password.
             totp: TOTP code, appended to the password. A string is used
@@ -185,6 +279,14 @@ class PiKVM:
                 that session outlives the client: kvmd has no way to end one
                 session, only every session a user has. Give this a value if
                 the client is short-lived, so an abandoned session lapses.
+            session_store: Where ``auth="cookie"`` looks for a session
+                before opening one, and files the one it opens; see
+                [`SessionStore`][aiopikvm.SessionStore]. Tokens are kept per
+                *url* and *user*, so clients of the same device and user —
+                in this process or, with a
+                [`FileSessionStore`][aiopikvm.FileSessionStore], in others —
+                share one session instead of each logging in. ``None``, the
+                default, keeps the token in this client alone.
             verify_ssl: What to trust; see
                 [`VerifyTypes`][aiopikvm.VerifyTypes]. Off by default
                 because PiKVM ships a self-signed certificate. Pass the path
@@ -199,13 +301,46 @@ class PiKVM:
             trust_env: Read proxy settings and the certificate bundle from
                 the environment. ``False`` ignores ``HTTPS_PROXY`` and the
                 rest, for a client that must reach the device directly.
-            timeout: Default per-request timeout in seconds.
+            uds: kvmd's unix socket, the same as a ``unix://`` *url*, for
+                a client that keeps a network URL as its name — it is what
+                a [`session_store`][aiopikvm.SessionStore] files tokens
+                under. Requests skip TLS and nginx: ``/api/...`` goes to
+                kvmd and ``/streamer/...`` to ustreamer's socket beside it,
+                the way nginx would route them, and
+                [`ws()`][aiopikvm.PiKVM.ws] connects the same way. The TLS
+                and proxy arguments do not apply, and
+                [`media_ws()`][aiopikvm.PiKVM.media_ws] and
+                [`webrtc()`][aiopikvm.PiKVM.webrtc] are refused: their
+                daemons are not behind kvmd's socket.
+            timeout: Default per-request timeout in seconds, or an
+                [`AdaptiveTimeout`][aiopikvm.AdaptiveTimeout] to learn one
+                for each kind of call from its observed latency. A
+                *timeout* passed to a call always takes precedence.
+            prewarm: Open connections to the device as the client opens,
+                rather than on the first call: ``True`` for two, or how many.
+                The TCP and TLS handshakes are most of what a first request
+                to a PiKVM costs. While it is on, a background task uses the
+                connections again whenever the client has been idle for 20
+                seconds, so they are still open when the next call comes.
+                Prewarming sends ``HEAD /``, which needs no credentials and
+                is neither traced nor counted in [`metrics`][aiopikvm.PiKVM.metrics];
+                a device that cannot be reached is logged, not raised.
             follow_redirects: Follow HTTP redirects instead of raising
                 [`RedirectError`][aiopikvm.RedirectError]. Off by default: a
                 redirect resends the credential headers to whatever it points
                 at, and the usual cause — an ``http://`` base URL that nginx
                 redirects to ``https://`` — has already exposed the password
                 in cleartext by then.
+            validation: How much checking a response model gets before it is
+                returned; see [`ValidationMode`][aiopikvm.ValidationMode].
+                Covers what the resources return and what
+                [`ws()`][aiopikvm.PiKVM.ws] builds in
+                [`states()`][aiopikvm.PiKVMWebSocket.states].
+            tracer: Told about every request, every login the client makes
+                by itself, and every frame and Janus transaction of the
+                sockets it opens; see [`Tracer`][aiopikvm.Tracer]. ``None``,
+                the default, traces nothing. An external *http_client* is
+                traced too, since the hooks sit above it.
             http_client: Pre-built httpx client. When given, this client
                 does not close it and the arguments above are ignored.
         """
@@ -215,12 +350,25 @@ class PiKVM:
         self._totp = totp
         self._auth = auth
         self._session_expire = session_expire
+        self._session_store = session_store
         self._verify_ssl = verify_ssl
         self._cert = cert
         self._proxy = proxy
         self._trust_env = trust_env
+        self._uds = _split_unix_url(self._url, uds)
+        self._latency: _LatencyWindows | None = None
+        if isinstance(timeout, AdaptiveTimeout):
+            self._latency = _LatencyWindows(timeout)
+            timeout = timeout.initial
         self._timeout = timeout
+        self._prewarm = _PREWARM_CONNECTIONS if prewarm is True else int(prewarm)
+        self._keep_warm: asyncio.Task[None] | None = None
+        self._last_used = 0.0
         self._follow_redirects = follow_redirects
+        self._validation = validation
+        self._tracer = tracer
+        self._server = _server(self._url)
+        self._metrics = ClientMetrics()
         self._external_client = http_client is not None
         self._client: httpx.AsyncClient | None = http_client
         self._entered = False
@@ -350,6 +498,27 @@ class PiKVM:
         """
         return self._ensure_client().base_url
 
+    @property
+    def metrics(self) -> ClientMetrics:
+        """Counters this client keeps about its own traffic.
+
+        Filled from the moment the client is built, and readable after it
+        closes. [`ClientMetrics.render()`][aiopikvm.ClientMetrics.render]
+        gives them in the format
+        [`PrometheusResource.get_metrics()`][aiopikvm.resources.prometheus.PrometheusResource.get_metrics]
+        gives the device's own in, so the two can be served together:
+
+            device = await kvm.prometheus.get_metrics()
+            body = device + "\n" + kvm.metrics.render()
+
+        The sockets [`ws()`][aiopikvm.PiKVM.ws] and
+        [`webrtc()`][aiopikvm.PiKVM.webrtc] open count into it as well.
+
+        Returns:
+            The registry, the same object for the life of this client.
+        """
+        return self._metrics
+
     @property
     def cookies(self) -> httpx.Cookies:
         """Cookies the underlying HTTP client carries.
@@ -388,6 +557,41 @@ class PiKVM:
         """
         return self._ensure_client().cookies
 
+    def deadline(self, seconds: float) -> AbstractAsyncContextManager[None]:
+        """Bound everything inside the block to one budget of *seconds*.
+
+        Every request inside it gets whatever is left of the budget, if that
+        is less than its own timeout. So do the logins and retries a request
+        makes for itself, each stream from opening to its last chunk, and
+        each socket handshake, frame sent and ping. Once the budget is spent,
+        the next one fails before it sends anything, and a stream still being
+        read fails at its next chunk:
+
+            async with kvm.deadline(30):
+                await kvm.atx.power_off(wait=True)
+                await kvm.atx.power_on(wait=True)
+
+        The deadline belongs to the task, not to this client. Tasks started
+        inside the block inherit it, and so does every other client they
+        call. Nested blocks keep the earlier deadline. The block itself is
+        not cancelled: time spent outside this package's calls is not
+        interrupted, only taken from the budget. Put the block in
+        `asyncio.timeout()` as well for that.
+
+        Args:
+            seconds: The budget.
+
+        Returns:
+            An async context manager, entered with ``async with``.
+
+        Raises:
+            ConnectionTimeoutError: From a request, login or stream inside the
+                block that the budget ran out on.
+            WebSocketError: From a socket handshake, send or ping inside the
+                block that the budget ran out on.
+        """
+        return _within(seconds)
+
     async def request(
         self,
         method: str,
@@ -454,6 +658,9 @@ class PiKVM:
                     # hand the refusal back — the session is open now, and the
                     # caller's own retry starts from a fresh body.
                     raise
+            return await self._send(
+                method, path, params, json, data, content, headers, timeout, attempt=2
+            )
         return await self._send(
             method, path, params, json, data, content, headers, timeout
         )
@@ -502,12 +709,83 @@ class PiKVM:
                 # Drop the refused token before asking for a new one, so the
                 # login itself does not carry it.
                 self._ensure_client().cookies.delete(_COOKIE)
-            await self.auth.login(
-                self._user,
-                self._passwd,
-                self._totp_code(),
-                expire=self._session_expire,
+            if self._session_store is not None and await self._restore_session(
+                self._session_store, refused
+            ):
+                return
+            trace = None
+            if self._tracer is not None:
+                host, port = self._server
+                trace = LoginTrace(refused is not None, host=host, port=port)
+                _notify(self._tracer.login_start, trace)
+            error: BaseException | None = None
+            try:
+                token = await self.auth.login(
+                    self._user,
+                    self._passwd,
+                    self._totp_code(),
+                    expire=self._session_expire,
+                )
+            except BaseException as exc:
+                error = exc
+                raise
+            finally:
+                if self._tracer is not None and trace is not None:
+                    _finish(trace, error)
+                    _notify(self._tracer.login_end, trace)
+            if self._session_store is not None and token:
+                await self._consult_store(
+                    "save",
+                    self._session_store.save(
+                        self._url, self._user, token, expire=self._session_expire
+                    ),
+                )
+
+    async def _restore_session(self, store: SessionStore, refused: str | None) -> bool:
+        """Put a session from the store in the jar, if it has a usable one.
+
+        Args:
+            store: The client's *session_store*.
+            refused: The token kvmd has just refused, if any. The store may
+                still hold it — it is where the token came from, quite
+                possibly — and it is then discarded rather than reused. A
+                different one was saved since, by another client that has
+                already logged in again, and is worth a try.
+
+        Returns:
+            ``True`` when a token was restored and no login is needed.
+        """
+        saved = await self._consult_store("load", store.load(self._url, self._user))
+        if saved and saved != refused:
+            self.auth._store_token(saved, self._ensure_client().base_url.host)
+            return True
+        if refused is not None:
+            await self._consult_store(
+                "discard", store.discard(self._url, self._user, refused)
             )
+        return False
+
+    async def _consult_store[T](self, what: str, call: Awaitable[T]) -> T | None:
+        """Await a session store call, logging instead of raising if it fails.
+
+        The store only saves logins. One that cannot be read or written —
+        a full disk, a backend that is down — leaves the client logging in
+        the way it would without a store, rather than failing the request.
+
+        Args:
+            what: The method called, for the log.
+            call: Its coroutine.
+
+        Returns:
+            What it returned, or ``None`` when it raised.
+        """
+        try:
+            return await call
+        except Exception:
+            logger.warning(
+                "Session store %s() failed; ignoring it", what, exc_info=True
+            )
+            return None
 
     def _session_token(self) -> str:
         """Return the session token in the jar, if any.
@@ -536,6 +814,8 @@ class PiKVM:
         content: bytes | httpx.AsyncByteStream | None,
         headers: dict[str, str] | None,
         timeout: float | httpx.Timeout | None,
+        *,
+        attempt: int = 1,
     ) -> httpx.Response:
         """Send one request and translate httpx's failures into this
         package's.
@@ -549,6 +829,8 @@ class PiKVM:
             content: Raw body.
             headers: Extra headers.
             timeout: Per-request timeout.
+            attempt: ``2`` for the resend after a refreshed session, which
+                the tracer is told about before it starts.
 
         Returns:
             The response, once its status has been checked.
@@ -563,20 +845,152 @@ class PiKVM:
             APIError: Any other error status, and its subclasses.
         """
         client = self._ensure_client()
-        with _httpx_errors_translated():
-            response = await client.request(
-                method,
-                path,
-                params=params,
-                json=json,
-                data=data,
-                content=content,
-                headers=self._outgoing_headers(headers),
-                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+        if timeout is None and self._latency is not None:
+            timeout = self._latency.timeout(method, path, params)
+        (timeout, clipped) = self._within_deadline(timeout)
+        started = self._last_used = time.monotonic()
+        trace = self._request_started(method, path, attempt)
+        response: httpx.Response | None = None
+        try:
+            with _httpx_errors_translated():
+                response = await client.request(
+                    method,
+                    path,
+                    params=params,
+                    json=json,
+                    data=data,
+                    content=content,
+                    headers=self._outgoing_headers(headers),
+                    timeout=(
+                        timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+                    ),
+                )
+            self._raise_for_status(response)
+        except BaseException as exc:
+            self._metrics._request(method, path, started, exc)
+            if response is not None:
+                self._learn_latency(method, path, params, started)
+            elif (
+                isinstance(exc, ConnectionTimeoutError)
+                and isinstance(exc.__cause__, (httpx.ReadTimeout, httpx.WriteTimeout))
+                and not clipped
+            ):
+                # Waiting on the endpoint itself, not on the connection. A
+                # timeout the deadline cut short says nothing about how long
+                # the call would have taken.
+                self._learn_latency(method, path, params, started, timed_out=True)
+            self._request_ended(trace, response, exc)
+            raise
+        self._metrics._request(method, path, started, None)
+        self._learn_latency(method, path, params, started)
+        self._request_ended(trace, response, None)
+        return response
+
+    def _within_deadline(
+        self, timeout: float | httpx.Timeout | None
+    ) -> tuple[float | httpx.Timeout | None, bool]:
+        """Cut a request's timeout down to what the current deadline leaves.
+
+        Args:
+            timeout: The timeout the request would otherwise get, ``None``
+                for the client's own.
+
+        Returns:
+            The timeout to use, and whether the deadline shortened it.
+
+        Raises:
+            ConnectionTimeoutError: The deadline has already passed.
+        """
+        remaining = _remaining()
+        if remaining is None:
+            return (timeout, False)
+        if remaining <= 0:
+            raise ConnectionTimeoutError("The deadline passed before the request")
+        if timeout is None:
+            timeout = self._ensure_client().timeout
+        elif not isinstance(timeout, httpx.Timeout):
+            timeout = httpx.Timeout(timeout)
+        bounds = (timeout.connect, timeout.read, timeout.write, timeout.pool)
+        if all(bound is not None and bound <= remaining for bound in bounds):
+            return (timeout, False)
+        (connect, read, write, pool) = (
+            remaining if bound is None else min(bound, remaining) for bound in bounds
+        )
+        return (httpx.Timeout(connect=connect, read=read, write=write, pool=pool), True)
+
+    def _learn_latency(
+        self,
+        method: str,
+        path: str,
+        params: dict[str, Any] | None,
+        started: float,
+        *,
+        timed_out: bool = False,
+    ) -> None:
+        """Feed one answered or timed-out call to the adaptive timeouts.
+
+        Args:
+            method: HTTP method.
+            path: URL path relative to the base URL.
+            params: Query parameters, whose names tell calls of one path
+                apart.
+            started: `time.monotonic()` when the call was sent.
+            timed_out: The call timed out waiting for its answer.
+        """
+        if self._latency is not None:
+            self._latency.record(
+                method, path, params, time.monotonic() - started, timed_out=timed_out
             )
 
-        self._raise_for_status(response)
-        return response
+    def _request_started(
+        self, method: str, path: str, attempt: int, *, streaming: bool = False
+    ) -> RequestTrace | None:
+        """Open the tracer's record of one request, if there is a tracer.
+
+        Args:
+            method: HTTP method.
+            path: URL path relative to the base URL.
+            attempt: ``1``, or ``2`` for the resend after a refreshed session.
+            streaming: The request is being opened by
+                [`stream()`][aiopikvm.PiKVM.stream].
+
+        Returns:
+            The record, already handed to the start hook, or ``None`` when
+            nothing is tracing.
+        """
+        if self._tracer is None:
+            return None
+        host, port = self._server
+        trace = RequestTrace(
+            method, path, streaming=streaming, attempt=attempt, host=host, port=port
+        )
+        if attempt > 1:
+            _notify(self._tracer.request_retry, trace)
+        _notify(self._tracer.request_start, trace)
+        return trace
+
+    def _request_ended(
+        self,
+        trace: RequestTrace | None,
+        response: httpx.Response | None,
+        error: BaseException | None,
+    ) -> None:
+        """Close the tracer's record of one request.
+
+        Args:
+            trace: The record `_request_started` returned.
+            response: The response, when one arrived — an error status
+                arrives with one.
+            error: What the request failed with, ``None`` if it did not.
+        """
+        if self._tracer is None or trace is None:
+            return
+        if response is not None:
+            trace.status = response.status_code
+            trace.bytes_sent = int(response.request.headers.get("content-length", 0))
+            trace.bytes_received = response.num_bytes_downloaded
+        _finish(trace, error)
+        _notify(self._tracer.request_end, trace)
 
     @classmethod
     def _raise_for_status(cls, response: httpx.Response) -> None:
@@ -693,7 +1107,7 @@ class PiKVM:
                     # good.
                     await self._ensure_session(refused=carried)
                     stack, response = await self._open_stream(
-                        method, path, params, headers, timeout
+                        method, path, params, headers, timeout, attempt=2
                     )
             else:
                 stack, response = await self._open_stream(
@@ -709,6 +1123,8 @@ class PiKVM:
         params: dict[str, Any] | None,
         headers: dict[str, str] | None,
         timeout: float | httpx.Timeout | None,
+        *,
+        attempt: int = 1,
     ) -> tuple[AsyncExitStack, httpx.Response]:
         """Connect once, and hand the open connection to its caller.
 
@@ -725,9 +1141,12 @@ class PiKVM:
             params: Query parameters.
             headers: Extra HTTP headers.
             timeout: Override the client-level timeout for this request.
+            attempt: ``2`` for the reconnect after a refreshed session.
 
         Returns:
-            The stack that owns the open connection, and the response.
+            The stack that owns the open connection, and the response. The
+            tracer's record of the request ends when the stack closes, so it
+            covers reading the body.
 
         Raises:
             AuthError: Authentication failed (401/403).
@@ -737,7 +1156,11 @@ class PiKVM:
                 client was not created with ``follow_redirects=True``.
             APIError: Server returned any other error status (>= 400).
         """
+        (timeout, _) = self._within_deadline(timeout)
         stack = AsyncExitStack()
+        started = self._last_used = time.monotonic()
+        trace = self._request_started(method, path, attempt, streaming=True)
+        response: httpx.Response | None = None
         try:
             response = await stack.enter_async_context(
                 self._ensure_client().stream(
@@ -756,9 +1179,22 @@ class PiKVM:
                 # response.text from raising httpx.ResponseNotRead.
                 await response.aread()
             self._raise_for_status(response)
-        except BaseException:
+        except BaseException as exc:
+            self._metrics._request(method, path, started, exc)
+            self._request_ended(trace, response, exc)
             await stack.aclose()
             raise
+        self._metrics._request(method, path, started, None)
+        at = _deadline.get()
+        if at is not None and isinstance(response.stream, httpx.AsyncByteStream):
+            response.stream = _DeadlineStream(response.stream, at)
+        if trace is not None:
+            opened = response
+
+            def ended(_type: object, exc: BaseException | None, _tb: object) -> None:
+                self._request_ended(trace, opened, exc)
+
+            stack.push(ended)
         return stack, response
 
     # --- Resources (lazy) ----------------------------------------------
@@ -884,18 +1320,40 @@ class PiKVM:
                 raise ConfigurationError(
                     f"PiKVM credentials travel in HTTP headers and must be ASCII: {exc}"
                 ) from exc
-            try:
-                self._client = httpx.AsyncClient(
-                    base_url=self._url,
-                    # One context for both halves of the client, and the
-                    # only spelling httpx 0.28 does not deprecate: `cert=`
-                    # and `verify=<path>` both tell you to build this.
-                    verify=build_ssl_context(self._verify_ssl, self._cert),
-                    proxy=self._proxy,
-                    trust_env=self._trust_env,
-                    timeout=self._timeout,
-                    follow_redirects=self._follow_redirects,
+            limits = (
+                httpx.Limits(
+                    max_keepalive_connections=max(20, self._prewarm),
+                    keepalive_expiry=_KEEPALIVE_EXPIRY,
                 )
+                if self._prewarm
+                else httpx.Limits()
+            )
+            try:
+                if self._uds is not None:
+                    # No proxy can sit on a socket, and with trust_env on
+                    # httpx would mount one from the environment over the
+                    # transport.
+                    self._client = httpx.AsyncClient(
+                        base_url=_LOCAL_URL,
+                        transport=_UnixTransport(self._uds, limits=limits),
+                        trust_env=False,
+                        timeout=self._timeout,
+                        follow_redirects=self._follow_redirects,
+                    )
+                else:
+                    self._client = httpx.AsyncClient(
+                        base_url=self._url,
+                        # One context for both halves of the client, and the
+                        # only spelling httpx 0.28 does not deprecate:
+                        # `cert=` and `verify=<path>` both tell you to build
+                        # this.
+                        verify=build_ssl_context(self._verify_ssl, self._cert),
+                        proxy=self._proxy,
+                        trust_env=self._trust_env,
+                        timeout=self._timeout,
+                        follow_redirects=self._follow_redirects,
+                        limits=limits,
+                    )
             except (httpx.InvalidURL, ValueError) as exc:
                 # httpx.InvalidURL is not a ValueError, and a proxy URL it
                 # cannot read is a plain one. With trust_env left on, that
@@ -908,8 +1366,65 @@ class PiKVM:
                     "environment; pass trust_env=False to ignore those."
                 ) from exc
         self._entered = True
+        if self._prewarm:
+            await self._warm()
+            self._keep_warm = asyncio.create_task(
+                self._keep_warm_loop(), name=f"aiopikvm keep-warm {self._url}"
+            )
         return self
 
+    async def _warm(self) -> None:
+        """Open *prewarm* connections, or use them again if they are open.
+
+        The requests go out together, so the pool has to find a connection
+        for each at once: the idle ones it holds are used, and the rest are
+        opened. Whatever the device answers is beside the point — the
+        connection is the thing wanted — and a failure only means the first
+        real call will connect for itself. The round is given
+        ``_PREWARM_TIMEOUT`` rather than the client's timeout, so an
+        unreachable device delays entering the client by that much at most.
+        """
+        client = self._ensure_client()
+
+        async def touch() -> None:
+            try:
+                await client.head("/")
+            except httpx.HTTPError as exc:
+                logger.debug("Could not prewarm a connection to %s: %s", self._url, exc)
+
+        try:
+            async with asyncio.timeout(_PREWARM_TIMEOUT):
+                await asyncio.gather(*(touch() for _ in range(self._prewarm)))
+        except TimeoutError:
+            logger.debug(
+                "Prewarming %s took longer than %s s; leaving it to the first call",
+                self._url,
+                _PREWARM_TIMEOUT,
+            )
+
+    async def _keep_warm_loop(self) -> None:
+        """Keep the prewarmed connections open while the client sits idle.
+
+        Nothing a round of warming raises ends the loop: it is logged, and
+        the next round tries again. A task that died here would do so
+        silently, and take the client's
+        [`aclose()`][aiopikvm.PiKVM.aclose] down with it when that awaited
+        it.
+        """
+        while True:
+            await asyncio.sleep(_KEEP_WARM_INTERVAL)
+            if time.monotonic() - self._last_used >= _KEEP_WARM_INTERVAL:
+                try:
+                    await self._warm()
+                except Exception:
+                    logger.warning(
+                        "Keeping the connections to %s warm failed; trying "
+                        "again in %s s",
+                        self._url,
+                        _KEEP_WARM_INTERVAL,
+                        exc_info=True,
+                    )
+
     async def aclose(self) -> None:
         """Close the client and release resources.
 
@@ -924,6 +1439,16 @@ class PiKVM:
         for name in _RESOURCE_NAMES:
             self.__dict__.pop(name, None)
 
+        hub = self.__dict__.pop("hub", None)
+        if hub is not None:
+            await hub.aclose()
+
+        if self._keep_warm is not None:
+            self._keep_warm.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._keep_warm
+            self._keep_warm = None
+
         if not self._external_client and self._client is not None:
             await self._client.aclose()
 
@@ -946,12 +1471,18 @@ class PiKVM:
         *,
         stream: bool = True,
         binary: bool = False,
+        types: Iterable[str] | None = None,
+        send_queue: int | None = None,
+        buffering: BufferingMode = "queue",
         open_timeout: float | None = None,
         close_timeout: float | None = None,
         max_size: int | None = _WS_MAX_SIZE,
         max_queue: int = _WS_MAX_QUEUE,
         ping_interval: float | None = _WS_PING_INTERVAL,
         ping_timeout: float | None = _WS_PING_TIMEOUT,
+        reconnect: bool = False,
+        reconnect_delay: float = _WS_RECONNECT_DELAY,
+        reconnect_max_delay: float = _WS_RECONNECT_MAX_DELAY,
     ) -> PiKVMWebSocket:
         """Create a WebSocket connection.
 
@@ -974,6 +1505,21 @@ class PiKVM:
                 JSON events, the way kvmd's own web UI does. Both reach the
                 same handlers; see
                 [`PiKVMWebSocket`][aiopikvm.PiKVMWebSocket].
+            types: Hand on only these event types — ``{"atx"}`` — and drop
+                the rest unparsed, or ``None`` for all of them. A watcher
+                that only wants power state then spends nothing on the
+                ``streamer`` and ``info`` broadcasts.
+            send_queue: Send input through a queue of up to this many frames,
+                in priority order — pings, then keys ahead of queued pointer
+                moves — with a run of absolute moves folded into the last
+                one, so a key release is not stuck behind a pointer's worth
+                of moves. ``None`` sends in call order; see
+                [`PiKVMWebSocket`][aiopikvm.PiKVMWebSocket].
+            buffering: ``"latest"`` keeps only the newest event of each type
+                waiting, merged the way
+                [`states()`][aiopikvm.PiKVMWebSocket.states] merges it, so a
+                slow consumer holds a dozen events instead of a thousand; see
+                [`BufferingMode`][aiopikvm.BufferingMode].
             open_timeout: Timeout for opening the connection (defaults to
                 the client *timeout*).
             close_timeout: Timeout for closing the connection (defaults to
@@ -989,6 +1535,14 @@ class PiKVM:
                 [`PiKVMWebSocket.ping()`][aiopikvm.PiKVMWebSocket.ping].
             ping_timeout: Seconds to wait for a keepalive pong before the
                 connection is failed, or ``None`` to wait forever.
+            reconnect: Open the connection again whenever it ends, with a
+                ``resynced`` event between the two, instead of ending
+                [`events()`][aiopikvm.PiKVMWebSocket.events]. Under
+                ``auth="cookie"`` the socket keeps the token it was built
+                with, and a kvmd restart that forgets it ends the retries.
+            reconnect_delay: Seconds the first reconnect waits at most; the
+                cap doubles with every failed attempt.
+            reconnect_max_delay: The largest that cap grows to.
 
         Returns:
             A *PiKVMWebSocket* async context manager. It inherits this
@@ -997,10 +1551,53 @@ class PiKVM:
             this constructor, since it does not go through httpx at all.
 
         Raises:
-            ConfigurationError: If this client has been closed, or the URL it
-                was built with has no usable scheme.
+            ConfigurationError: If this client has been closed, the URL it
+                was built with has no usable scheme, *types* is a single
+                string, or *send_queue* is less than one.
         """
-        token = self._ws_token("ws()")
+        return self._kvmd_socket(
+            self._ws_token("ws()"),
+            stream=stream,
+            binary=binary,
+            types=types,
+            send_queue=send_queue,
+            buffering=buffering,
+            open_timeout=open_timeout,
+            close_timeout=close_timeout,
+            max_size=max_size,
+            max_queue=max_queue,
+            ping_interval=ping_interval,
+            ping_timeout=ping_timeout,
+            reconnect=reconnect,
+            reconnect_delay=reconnect_delay,
+            reconnect_max_delay=reconnect_max_delay,
+        )
+
+    def _kvmd_socket(
+        self,
+        token: str | Callable[[], str],
+        *,
+        open_timeout: float | None = None,
+        close_timeout: float | None = None,
+        **options: Any,
+    ) -> PiKVMWebSocket:
+        """Build a kvmd socket with this client's URL, credentials and settings.
+
+        Args:
+            token: Session token for ``auth="cookie"``, or a callable that
+                finds it when the handshake is made.
+            open_timeout: Timeout for opening the connection, ``None`` for
+                the client's.
+            close_timeout: Timeout for closing it, ``None`` for the
+                client's.
+            **options: The rest of [`ws()`][aiopikvm.PiKVM.ws]'s arguments;
+                one left out takes the same default there.
+
+        Returns:
+            The socket, not yet connected.
+        """
+        from aiopikvm._ws import PiKVMWebSocket
+
         return PiKVMWebSocket(
             url=self._url,
             user=self._user,
@@ -1012,17 +1609,75 @@ class PiKVM:
             cert=self._cert,
             proxy=self._proxy,
             trust_env=self._trust_env,
-            stream=stream,
-            binary=binary,
+            uds=self._uds,
             follow_redirects=self._follow_redirects,
             open_timeout=open_timeout if open_timeout is not None else self._timeout,
             close_timeout=close_timeout if close_timeout is not None else self._timeout,
-            max_size=max_size,
-            max_queue=max_queue,
-            ping_interval=ping_interval,
-            ping_timeout=ping_timeout,
+            validation=self._validation,
+            tracer=self._tracer,
+            metrics=self._metrics,
+            **options,
         )
 
+    @cached_property
+    def hub(self) -> EventHub:
+        """The event hub: one reconnecting socket, shared by every listener.
+
+        Components that each want the device's events subscribe here rather
+        than opening a [`ws()`][aiopikvm.PiKVM.ws] apiece, and kvmd serves one
+        session instead of one per component. The socket opens with the
+        first subscriber and closes after the last one; it is built with
+        ``reconnect=True`` and ``binary=True`` — so that
+        [`input`][aiopikvm.PiKVM.input] can send over it at the binary
+        channel's cost — and the rest of [`ws()`][aiopikvm.PiKVM.ws]'s
+        defaults. Closing this client closes it too.
+
+        Reading this property opens nothing and needs no session, so a
+        component can take the hub before the client has logged in. Under
+        ``auth="cookie"`` the socket looks the session token up each time it
+        connects: when the first subscriber enters, and again on every
+        reconnect, so a session the client renewed in between is the one it
+        carries. Entering without a session raises
+        [`ConfigurationError`][aiopikvm.ConfigurationError] there, as
+        [`ws()`][aiopikvm.PiKVM.ws] does when it is called.
+
+        Usage:
+
+            async with kvm.hub.subscribe({"atx", "msd"}) as events:
+                async for event in events:
+                    print(event["event_type"])
+
+        Raises:
+            ConfigurationError: If this client has been closed.
+        """
+        from aiopikvm._hub import EventHub
+
+        self._ws_opening()
+        return EventHub(
+            self._kvmd_socket(
+                lambda: self._ws_token("kvm.hub"), reconnect=True, binary=True
+            )
+        )
+
+    @cached_property
+    def input(self) -> HIDInput:
+        """Keyboard and mouse input over the hub socket, or REST without it.
+
+        The same calls as [`hid`][aiopikvm.PiKVM.hid]'s ``send_*`` methods,
+        sent as binary frames on [`hub`][aiopikvm.PiKVM.hub]'s socket while it
+        is open and as REST requests while it is not. Names are checked
+        against [`KEY_NAMES`][aiopikvm.resources.hid.KEY_NAMES] first, since
+        the socket gives no answer to a wrong one.
+
+        Usage:
+
+            async with kvm.hub:
+                await kvm.input.send_key("KeyA")
+        """
+        from aiopikvm._input import HIDInput
+
+        return HIDInput(self)
+
     def media_ws(
         self,
         *,
@@ -1080,9 +1735,13 @@ class PiKVM:
             client's *verify_ssl*, proxy configuration and *follow_redirects*.
 
         Raises:
-            ConfigurationError: If this client has been closed, or the URL it
-                was built with has no usable scheme.
+            ConfigurationError: If this client has been closed, the URL it
+                was built with has no usable scheme, or it talks to kvmd's
+                unix socket, which kvmd-media is not behind.
         """
+        from aiopikvm._media_ws import MediaWebSocket
+
+        self._refuse_uds("media_ws()", "kvmd-media")
         token = self._ws_token("media_ws()")
         return MediaWebSocket(
             url=self._url,
@@ -1103,6 +1762,7 @@ class PiKVM:
             max_queue=max_queue,
             ping_interval=ping_interval,
             ping_timeout=ping_timeout,
+            tracer=self._tracer,
         )
 
     def webrtc(
@@ -1171,11 +1831,15 @@ class PiKVM:
             *verify_ssl*, proxy configuration and *follow_redirects*.
 
         Raises:
-            ConfigurationError: If this client has been closed, or the URL it
-                was built with has no usable scheme. The missing ``webrtc``
+            ConfigurationError: If this client has been closed, the URL it
+                was built with has no usable scheme, or it talks to kvmd's
+                unix socket, which Janus is not behind. The missing ``webrtc``
                 extra is reported here too, but only once the session is
                 entered.
         """
+        from aiopikvm._webrtc import WebRTCSession
+
+        self._refuse_uds("webrtc()", "Janus")
         token = self._ws_token("webrtc()")
         return WebRTCSession(
             url=self._url,
@@ -1199,8 +1863,39 @@ class PiKVM:
             negotiate_timeout=negotiate_timeout,
             ping_interval=ping_interval,
             ping_timeout=ping_timeout,
+            tracer=self._tracer,
+            metrics=self._metrics,
         )
 
+    def _refuse_uds(self, what: str, daemon: str) -> None:
+        """Refuse a socket kvmd's unix socket does not lead to.
+
+        Args:
+            what: Name of the method asking, for the error message.
+            daemon: The daemon it would have to reach.
+
+        Raises:
+            ConfigurationError: If this client talks to kvmd's socket.
+        """
+        if self._uds is not None:
+            raise ConfigurationError(
+                f"{what} needs {daemon}, which is not behind kvmd's socket "
+                f"{self._uds!r}. Use a client built with the device's https:// "
+                "URL for it."
+            )
+
+    def _ws_opening(self) -> None:
+        """Refuse to build a WebSocket on a client that has been closed.
+
+        Raises:
+            ConfigurationError: This client has been closed.
+        """
+        if self._closed:
+            raise ConfigurationError(
+                "This PiKVM client has been closed; it cannot open a new "
+                "WebSocket. Build a new client."
+            )
+
     def _ws_token(self, what: str) -> str:
         """Find the session token a WebSocket handshake needs, if it needs one.
 
@@ -1214,11 +1909,7 @@ class PiKVM:
             ConfigurationError: This client has been closed, or it is using
                 cookie auth and has no session token yet.
         """
-        if self._closed:
-            raise ConfigurationError(
-                "This PiKVM client has been closed; it cannot open a new "
-                "WebSocket. Build a new client."
-            )
+        self._ws_opening()
         if self._auth != "cookie":
             return ""
         token = self._session_token()
@@ -6,6 +6,30 @@ DEFAULT_TIMEOUT = 10.0
 DEFAULT_VERIFY_SSL = False
 DEFAULT_FOLLOW_REDIRECTS = False
 
+_WS_MAX_SIZE = 2**20
+_WS_MAX_QUEUE = 16
+_WS_PING_INTERVAL = 20.0
+_WS_PING_TIMEOUT = 20.0
+"""*websockets*' own defaults, spelled out so that overriding one is a choice.
+
+They are named rather than left implicit because the media socket overrides
+them: a video frame is bigger than a control event, and a consumer that falls
+behind on video is a normal thing that must not be mistaken for a dead link.
+They live here rather than beside the socket so that
+[`PiKVM.ws()`][aiopikvm.PiKVM.ws] can put them in its signature without
+importing *websockets* before anyone opens one.
+"""
+
+_WS_RECONNECT_DELAY = 0.5
+_WS_RECONNECT_MAX_DELAY = 30.0
+"""Backoff between reconnect attempts: the first cap, and the largest.
+
+Each attempt waits a random time up to a cap that doubles per failure. A
+fleet whose devices all dropped at once — a switch rebooting, the controller
+losing its network — spreads its reconnects out instead of reaching every
+kvmd in the same instant, and again on every retry after that.
+"""
+
 type AuthMode = Literal["headers", "basic", "cookie"]
 """Which credential [`PiKVM`][aiopikvm.PiKVM] sends.
 
@@ -34,3 +58,87 @@ picks the earlier one and hides the rest.
 """
 
 DEFAULT_AUTH: Literal["headers"] = "headers"
+
+type ValidationMode = Literal["full", "lazy", "trusted"]
+"""How much checking [`PiKVM`][aiopikvm.PiKVM] gives a response model.
+
+The choice covers every model a resource returns and every subsystem
+[`PiKVMWebSocket.states()`][aiopikvm.PiKVMWebSocket.states] builds. What a
+caller gets back is the same class either way, and reads the same.
+
+``"full"``
+    pydantic validates the whole payload before the call returns, so a
+    payload that does not match the model fails there. The default.
+
+``"lazy"``
+    The top level is validated before the call returns, and each submodel —
+    ``StreamerState.source``, every image in ``MSDState.storage`` — only when
+    it is first read, one level at a time. A submodel nobody reads is never
+    built, which is most of them for a caller that polls one flag out of
+    ``InfoState`` or reads ``states()`` for one subsystem. A submodel that
+    does not match raises [`ResponseError`][aiopikvm.ResponseError] from the
+    attribute read, not from the call.
+
+``"trusted"``
+    Nothing is checked: the payload's values are taken as they came, and the
+    submodels are put together as they are reached. For a fleet of devices
+    whose payloads are known to match, where even the top-level check is
+    wasted. A value of the wrong type stays the wrong type. A payload that is
+    not even shaped like the model — not an object, or missing a required
+    field — is validated in full instead, so it still fails the way
+    ``"full"`` would.
+"""
+
+DEFAULT_VALIDATION: Literal["full"] = "full"
+
+type BufferingMode = Literal["queue", "latest"]
+"""What a [`PiKVMWebSocket`][aiopikvm.PiKVMWebSocket] keeps of the events nobody
+has taken yet.
+
+``"queue"``
+    Every event, in the order it arrived, up to 1024; past that the oldest
+    are folded into the next of their kind. The default, and the only mode in
+    which [`events()`][aiopikvm.PiKVMWebSocket.events] hands out each event
+    kvmd sent.
+
+``"latest"``
+    One event per type: an event whose type is already waiting is merged into
+    the one waiting, the way
+    [`states()`][aiopikvm.PiKVMWebSocket.states] merges it, and keeps that
+    one's place. A consumer that falls behind then holds a dozen events, not a
+    thousand, and one that catches up gets each subsystem's state as it
+    stands, which is what ``states()`` would have made of all of them. What it
+    does not get is each step in between. A ``resynced`` marker is never
+    merged across: what arrived before it and what arrived after wait apart.
+"""
+
+type PathCurve = Literal["linear", "bezier"]
+"""How [`HIDInput.move_along()`][aiopikvm.HIDInput.move_along] joins its
+waypoints.
+
+``"linear"``
+    Straight lines from each waypoint to the next, walked at an even speed
+    over the whole length, so a long leg takes longer than a short one. The
+    pointer passes through every waypoint.
+
+``"bezier"``
+    One Bézier curve with the waypoints as its control points: it starts at
+    the first, ends at the last, and bends towards the ones in between
+    without passing through them. Three or four waypoints give the gentle arc
+    a hand makes on its way to a target.
+"""
+
+type FrameSource = Literal["mjpeg", "snapshot"]
+"""Where [`ImageMatcher.wait_for_image()`][aiopikvm.ImageMatcher.wait_for_image]
+gets the frames it searches.
+
+``"mjpeg"``
+    The MJPEG stream, every frame as ustreamer sends it; the matcher takes
+    the newest whenever it is ready for one and lets the rest go. The stream
+    runs only while a session asks kvmd for video.
+
+``"snapshot"``
+    One snapshot after another, each asked for once the last has been
+    searched. Slower to notice a change, but it works whenever ``snapshot()``
+    does and asks nothing of the streamer between frames.
+"""
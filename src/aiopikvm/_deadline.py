@@ -0,0 +1,61 @@
+"""One time budget for a whole sequence of calls.
+
+Every call has its own timeout, and a sequence of calls adds them up. Here
+are three: a power cycle made of an ATX press, a wait and another press; an
+[`upload_remote()`][aiopikvm.resources.msd.MSDResource.upload_remote] that
+streams for as long as the download runs; and a request whose session is
+refused, logs in again and is sent a second time. Each one can take several
+times the client's timeout before it fails. A controller that has thirty
+seconds for the lot has no way to say so through per-call timeouts.
+
+[`PiKVM.deadline()`][aiopikvm.PiKVM.deadline] sets the budget once. Inside
+it, every request and login, every stream from opening to its last chunk,
+and every socket handshake, frame sent and
+[`ping()`][aiopikvm.PiKVMWebSocket.ping] cuts its own timeout down to the
+time that is left. After the deadline they fail without sending anything,
+and a stream still being read fails at its next chunk.
+
+The deadline belongs to the running task, not to a client. It sits in a
+context variable, so the tasks the block starts inherit it, and so do the
+other clients they call. A fleet operation under one deadline is bounded
+across every device it touches. Nested deadlines keep the earlier of the
+two.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import time
+from collections.abc import AsyncIterator
+from contextvars import ContextVar
+
+_deadline: ContextVar[float | None] = ContextVar("aiopikvm_deadline", default=None)
+"""`time.monotonic()` at which the current deadline runs out, if there is one."""
+
+
+@contextlib.asynccontextmanager
+async def _within(seconds: float) -> AsyncIterator[None]:
+    """Set a deadline *seconds* from now for the block.
+
+    Args:
+        seconds: The budget. An enclosing deadline that runs out sooner
+            stays in force.
+    """
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(outer, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _remaining() -> float | None:
+    """Seconds left before the current deadline.
+
+    Returns:
+        ``None`` outside any deadline. Inside one, the time left, which is
+        zero or negative once it has passed.
+    """
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
@@ -0,0 +1,366 @@
+"""The events of many devices, as one stream.
+
+Watching a fleet through its sockets one by one means an
+[`events()`][aiopikvm.PiKVMWebSocket.events] generator per device and an
+``asyncio.wait`` over all of them for every event taken: a thousand pending
+``__anext__`` tasks, rebuilt each time, and whichever device answers first
+wins. A chatty device — one whose ``streamer`` and ``info`` broadcasts never
+stop — then takes the consumer's attention from the quiet one whose power just
+went off.
+
+[`FleetEvents`][aiopikvm.FleetEvents] reads none of the generators. Every
+socket already drains itself into a bounded buffer, from a task of its own;
+this keeps a queue of the devices whose buffers have something in them and
+takes one event from each in turn. A device that has used up its rate waits
+out its turn with its events left in its buffer, where kvmd's partial updates
+are folded together once it fills, instead of in a second queue here.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import heapq
+import logging
+import time
+from collections import deque
+from collections.abc import Mapping
+from types import TracebackType
+from typing import Any, NamedTuple, Self
+
+from aiopikvm._exceptions import ConfigurationError, PiKVMError
+from aiopikvm._ws import PiKVMWebSocket
+
+logger = logging.getLogger(__name__)
+
+_CLOSED = "closed"
+"""``event_type`` of the event that says a device's socket has ended.
+
+kvmd has no event of that name; like ``resynced``, it is this client's own.
+"""
+
+_OPEN_CONCURRENCY = 32
+"""How many sockets a fleet opens at once by default."""
+
+
+class DeviceEvent(NamedTuple):
+    """One event, and the device it came from.
+
+    Attributes:
+        device: The name the device's socket was added under.
+        event: The event, as [`events()`][aiopikvm.PiKVMWebSocket.events]
+            yields it.
+    """
+
+    device: str
+    event: dict[str, Any]
+
+
+class _Bucket:
+    """A token bucket: *rate* events a second, up to *burst* at once."""
+
+    __slots__ = ("_burst", "_rate", "_stamp", "_tokens")
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self._rate = rate
+        self._burst = float(burst)
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+
+    def take(self, now: float) -> float:
+        """Take a token if there is one.
+
+        Args:
+            now: ``time.monotonic()``.
+
+        Returns:
+            Zero when a token was taken, otherwise how many seconds until
+            there is one.
+        """
+        self._tokens = min(self._burst, self._tokens + (now - self._stamp) * self._rate)
+        self._stamp = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self._rate
+
+
+class FleetEvents:
+    """Events from many sockets, tagged with their device, taken in turn.
+
+    Each socket added under a name is opened as the fleet is entered —
+    unless it is open already — and read for as long as the fleet is. The
+    iteration hands out one [`DeviceEvent`][aiopikvm.DeviceEvent] at a time,
+    going round the devices that have events waiting, one event each. A
+    device that sends a hundred events while another sends one gets no more
+    turns than the other; it falls behind in its own buffer.
+
+    With *rate*, no device gets more than *rate* events a second, after a
+    first *burst*. Its turns are skipped until it may have another, and its
+    events wait in its socket's buffer. That buffer holds 1024 events and then
+    folds the oldest into the next of their kind, so a throttled device costs
+    bounded memory, and [`states()`][aiopikvm.PiKVMWebSocket.states]-style
+    merging of what is handed out still adds up.
+
+    A socket that ends — a clean close, a broken connection, a reconnect
+    that gave up, or one that could not be opened at all — does not end the
+    iteration. Its device gets one last event,
+    ``{"event_type": "closed", "event": {"error": ...}}``, with the error as a
+    string or ``None`` for a clean close, and drops out. The iteration ends
+    when every device has. Sockets built with ``reconnect=True`` only end
+    when they have to.
+
+    Usage:
+
+        sockets = {name: kvm.ws(stream=False, reconnect=True) for name, kvm in kvms}
+        async with FleetEvents(sockets, rate=20) as fleet:
+            async for device, event in fleet:
+                print(device, event["event_type"])
+    """
+
+    def __init__(
+        self,
+        sockets: Mapping[str, PiKVMWebSocket] | None = None,
+        *,
+        rate: float | None = None,
+        burst: int = 10,
+        open_concurrency: int = _OPEN_CONCURRENCY,
+    ) -> None:
+        """Prepare a fleet; nothing is opened until it is entered.
+
+        Args:
+            sockets: The sockets, by device name. More can be given to
+                [`add()`][aiopikvm.FleetEvents.add] before the fleet is
+                entered.
+            rate: The most events a second any one device is handed out at,
+                or ``None`` for no limit.
+            burst: How many events a device may have handed out at once
+                before *rate* applies.
+            open_concurrency: How many sockets are opened at a time, so that
+                entering a fleet of a thousand does not start a thousand
+                handshakes at once.
+
+        Raises:
+            ConfigurationError: *rate*, *burst* or *open_concurrency* is not
+                positive.
+        """
+        if rate is not None and rate <= 0:
+            raise ConfigurationError(f"rate must be positive, not {rate}")
+        if burst < 1 or open_concurrency < 1:
+            raise ConfigurationError("burst and open_concurrency must be at least 1")
+        self._rate = rate
+        self._burst = burst
+        self._open_concurrency = open_concurrency
+        self._sockets: dict[str, PiKVMWebSocket] = {}
+        self._opened: set[str] = set()
+        self._buckets: dict[str, _Bucket] = {}
+        self._delivered: dict[str, int] = {}
+        # Devices with something in their buffer, in the order they get their
+        # turn, and the same as a set to keep each in the queue once.
+        self._ready: deque[str] = deque()
+        self._queued: set[str] = set()
+        # Devices waiting out their rate, by the time they may go again, and
+        # the same as a set: a throttled device is not queued as it reads.
+        self._throttled: list[tuple[float, str]] = []
+        self._held: set[str] = set()
+        # Devices whose socket ended, and their last word.
+        self._closing: dict[str, str | None] = {}
+        self._live: set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._entered = False
+        for name, ws in (sockets or {}).items():
+            self.add(name, ws)
+
+    def add(self, device: str, ws: PiKVMWebSocket) -> None:
+        """Add a device's socket.
+
+        Args:
+            device: The name its events are tagged with.
+            ws: Its socket. One that is open already is read as it is, and
+                left open when the fleet exits.
+
+        Raises:
+            ConfigurationError: The fleet has been entered, or the name is
+                taken.
+        """
+        if self._entered:
+            raise ConfigurationError("Sockets are added before the fleet is entered")
+        if device in self._sockets:
+            raise ConfigurationError(f"Device {device!r} has been added already")
+        self._sockets[device] = ws
+
+    @property
+    def devices(self) -> list[str]:
+        """The devices whose sockets are still being read."""
+        return [name for name in self._sockets if name in self._live]
+
+    @property
+    def backlog(self) -> int:
+        """Events waiting across every device."""
+        return sum(len(ws._pending) for ws in self._sockets.values())
+
+    @property
+    def backlogs(self) -> dict[str, int]:
+        """Events waiting, by device, for the devices that have any."""
+        return {
+            name: len(ws._pending) for name, ws in self._sockets.items() if ws._pending
+        }
+
+    @property
+    def delivered(self) -> dict[str, int]:
+        """Events handed out so far, by device."""
+        return self._delivered.copy()
+
+    @property
+    def throttled(self) -> int:
+        """Devices with events waiting that are held back by *rate*."""
+        return len(self._throttled)
+
+    async def __aenter__(self) -> Self:
+        """Open every socket that is not open yet, and start reading them all.
+
+        A socket that cannot be opened does not stop the others: its device
+        starts with its ``closed`` event.
+
+        Returns:
+            This fleet, to iterate over.
+        """
+        self._entered = True
+        gate = asyncio.Semaphore(self._open_concurrency)
+
+        async def open_one(name: str, ws: PiKVMWebSocket) -> None:
+            async with gate:
+                try:
+                    await ws.__aenter__()
+                except PiKVMError as exc:
+                    logger.warning("Could not open the socket of %s: %s", name, exc)
+                    self._close(name, str(exc))
+                    return
+            self._opened.add(name)
+            self._watch(name, ws)
+
+        opening = []
+        for name, ws in self._sockets.items():
+            self._live.add(name)
+            if self._rate is not None:
+                self._buckets[name] = _Bucket(self._rate, self._burst)
+            if ws._connection is None:
+                opening.append(open_one(name, ws))
+            else:
+                self._watch(name, ws)
+        await asyncio.gather(*opening)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Close the sockets this fleet opened; leave the others open.
+
+        Args:
+            exc_type: Type of the exception the block raised, if any.
+            exc_val: The exception the block raised, if any.
+            exc_tb: Traceback of that exception, if any.
+        """
+        for ws in self._sockets.values():
+            ws._listener = None
+
+        async def close_one(ws: PiKVMWebSocket) -> None:
+            # Every failure has been handed out as a `closed` event already.
+            with contextlib.suppress(PiKVMError):
+                await ws.__aexit__(None, None, None)
+
+        await asyncio.gather(*(close_one(self._sockets[name]) for name in self._opened))
+        self._opened.clear()
+        self._live.clear()
+
+    def __aiter__(self) -> Self:
+        """Iterate over the events of every device."""
+        return self
+
+    async def __anext__(self) -> DeviceEvent:
+        """Wait for the next device whose turn it is, and take one event.
+
+        Returns:
+            The event, tagged with its device.
+
+        Raises:
+            StopAsyncIteration: Every device's socket has ended.
+        """
+        while True:
+            now = time.monotonic()
+            while self._throttled and self._throttled[0][0] <= now:
+                (_, name) = heapq.heappop(self._throttled)
+                self._held.discard(name)
+                self._mark(name)
+            while self._ready:
+                name = self._ready.popleft()
+                self._queued.discard(name)
+                event = self._take(name, now)
+                if event is not None:
+                    return event
+            if not self._live:
+                raise StopAsyncIteration
+            self._wakeup.clear()
+            timeout = self._throttled[0][0] - now if self._throttled else None
+            with contextlib.suppress(TimeoutError):
+                async with asyncio.timeout(timeout):
+                    await self._wakeup.wait()
+
+    def _take(self, name: str, now: float) -> DeviceEvent | None:
+        """Take one event of a device whose turn has come, if it may have one.
+
+        Args:
+            name: The device.
+            now: ``time.monotonic()``.
+
+        Returns:
+            The event, or ``None`` when the device has nothing to hand out
+            now: its buffer is empty, or it has to wait for its rate.
+        """
+        ws = self._sockets[name]
+        if ws._pending:
+            bucket = self._buckets.get(name)
+            wait = bucket.take(now) if bucket is not None else 0.0
+            if wait:
+                heapq.heappush(self._throttled, (now + wait, name))
+                self._held.add(name)
+                return None
+            event = ws._next_event()
+            self._delivered[name] = self._delivered.get(name, 0) + 1
+            # Another turn for what is left, or for the `closed` event of a
+            # socket that will not signal again.
+            if ws._pending or ws._reader is None or ws._reader.done():
+                self._mark(name)
+            return DeviceEvent(name, event)
+        if name in self._closing:
+            error = self._closing.pop(name)
+            self._live.discard(name)
+            return DeviceEvent(name, {"event_type": _CLOSED, "event": {"error": error}})
+        reader = ws._reader
+        if name in self._live and (reader is None or reader.done()):
+            failure = ws._failure
+            if failure is not None:
+                ws._reported = True
+            self._close(name, None if failure is None else str(failure))
+        return None
+
+    def _watch(self, name: str, ws: PiKVMWebSocket) -> None:
+        """Start taking turns for a device whose socket is open."""
+        ws._listener = lambda: self._mark(name)
+        ws._start_reader()
+        self._mark(name)
+
+    def _close(self, name: str, error: str | None) -> None:
+        """Give a device its ``closed`` event at its next turn."""
+        self._closing[name] = error
+        self._mark(name)
+
+    def _mark(self, name: str) -> None:
+        """Queue a device for a turn, unless it has one coming."""
+        if name not in self._queued and name not in self._held:
+            self._queued.add(name)
+            self._ready.append(name)
+        self._wakeup.set()
@@ -0,0 +1,522 @@
+"""One kvmd socket per device, shared by everything that listens to it.
+
+Every [`ws()`][aiopikvm.PiKVM.ws] socket is a session of its own on the
+device. kvmd sends each one the full state of every subsystem when it opens,
+broadcasts every change to each of them, and counts it in ``clients``. A
+program where five components each want events — a power monitor, an MSD
+watcher, a dashboard — opens five sockets for one stream that kvmd then
+serializes and sends five times.
+
+[`EventHub`][aiopikvm.EventHub] opens one socket and hands its events out.
+Each [`Subscription`][aiopikvm.Subscription] names the event types it cares
+about and has its own bounded queue, so a slow subscriber falls behind on its
+own and does not hold up the others. The hub also runs the single
+[`states()`][aiopikvm.PiKVMWebSocket.states] merge they all share, rather
+than one merge per listener.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from collections import deque
+from collections.abc import Iterable
+from types import TracebackType
+from typing import Any, NamedTuple, Self
+
+from aiopikvm._exceptions import ConfigurationError, ResponseError, WebSocketError
+from aiopikvm._ws import _RESYNCED, DeviceState, PiKVMWebSocket, _merge, _StateMerger
+
+logger = logging.getLogger(__name__)
+
+_EVENTS_MAXSIZE = 256
+"""Default queue length of an event subscription."""
+
+_STATES_MAXSIZE = 16
+"""Default queue length of a state subscription.
+
+Each snapshot is the whole device, so an old one left in the queue is worth
+nothing once a newer one is behind it.
+"""
+
+
+class _Failed(NamedTuple):
+    """An error queued for a subscriber in its place among the items."""
+
+    error: BaseException
+
+
+class Subscription[T]:
+    """One listener on an [`EventHub`][aiopikvm.EventHub].
+
+    Made by [`EventHub.subscribe()`][aiopikvm.EventHub.subscribe] or
+    [`EventHub.subscribe_states()`][aiopikvm.EventHub.subscribe_states], and
+    live only inside its ``async with`` block: entering it joins the hub,
+    which opens the socket if nobody else has, and leaving it lets go.
+
+    Usage:
+
+        async with kvm.hub.subscribe({"atx"}) as atx:
+            async for event in atx:
+                print(event["event"])
+    """
+
+    def __init__(
+        self,
+        hub: EventHub,
+        types: frozenset[str] | None,
+        maxsize: int,
+        *,
+        states: bool = False,
+    ) -> None:
+        """Prepare a subscription; nothing happens until it is entered.
+
+        Args:
+            hub: The hub to listen to.
+            types: Event types to keep, or ``None`` for all of them.
+            maxsize: How many items may wait before the oldest is dropped.
+            states: Listen to the merged state rather than the raw events.
+        """
+        self._hub = hub
+        self._states = states
+        self._types = types
+        self._maxsize = maxsize
+        self._pending: deque[T | _Failed] = deque()
+        self._carry: dict[str, dict[str, Any]] = {}
+        self._wakeup = asyncio.Event()
+        self._session: int | None = None
+        self._finished = False
+        self._failure: BaseException | None = None
+        self._dropped = 0
+
+    @property
+    def types(self) -> frozenset[str] | None:
+        """The event types this subscription keeps, ``None`` for all."""
+        return self._types
+
+    @property
+    def dropped(self) -> int:
+        """Items dropped from this subscription's full queue so far."""
+        return self._dropped
+
+    async def __aenter__(self) -> Self:
+        """Join the hub, opening its socket if this is the first listener.
+
+        Returns:
+            This subscription, to iterate over.
+
+        Raises:
+            WebSocketError: The subscription is already active, or the socket
+                could not be opened.
+            AuthError: The credentials were refused.
+        """
+        if self._session is not None:
+            raise WebSocketError("This subscription is already active")
+        self._pending.clear()
+        self._carry.clear()
+        self._finished = False
+        self._failure = None
+        await self._hub._attach(self)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Leave the hub, closing its socket if this was the last listener.
+
+        Args:
+            exc_type: Type of the exception the block raised, if any.
+            exc_val: The exception the block raised, if any.
+            exc_tb: Traceback of that exception, if any.
+        """
+        await self._hub._detach(self)
+
+    def __aiter__(self) -> Self:
+        """Iterate over what the hub hands this subscription."""
+        return self
+
+    async def __anext__(self) -> T:
+        """Wait for the next item.
+
+        Returns:
+            The oldest item in the queue.
+
+        Raises:
+            StopAsyncIteration: The socket closed cleanly, or the hub was
+                closed.
+            WebSocketError: The subscription is not active, or the connection
+                broke.
+            ResponseError: A state subscription's merged payload did not
+                match its model. The subscription stays open: iterating
+                again goes on with the next snapshot.
+            Exception: Whatever else stopped the hub's reading task. The
+                subscription has ended.
+        """
+        if self._session is None:
+            raise WebSocketError("Subscriptions are used inside `async with`")
+        while not self._pending:
+            if self._finished:
+                if self._failure is not None:
+                    raise self._failure
+                raise StopAsyncIteration
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        return self._take()
+
+    def _take(self) -> T:
+        """Take the oldest item, with anything dropped of its kind folded in."""
+        item = self._pending.popleft()
+        if isinstance(item, _Failed):
+            raise item.error
+        if not self._carry or not isinstance(item, dict):
+            return item
+        carried = self._carry.pop(_kind_of(item) or "", None)
+        if carried is None:
+            return item
+        payload = item.get("event")
+        merged = _merge(carried, payload) if isinstance(payload, dict) else carried
+        return {**item, "event": merged}  # type: ignore[return-value]
+
+    def _offer(self, kind: str | None, item: T | _Failed) -> None:
+        """Queue an item, if this subscription keeps its kind.
+
+        A full queue drops its oldest item. A dropped event is folded into
+        the next of its type, the way the socket's own buffer does it, so
+        that a subscriber merging partial updates itself loses nothing it
+        needs; a dropped snapshot is simply gone, since the next one holds
+        everything it did, and so is a dropped error. A ``resynced`` marker
+        is never dropped.
+
+        Args:
+            kind: The item's event type.
+            item: The event or the snapshot, or an error to raise in its
+                place.
+        """
+        if self._finished:
+            return
+        if self._types is not None and kind not in self._types and kind != _RESYNCED:
+            return
+        if len(self._pending) >= self._maxsize:
+            if not self._dropped:
+                logger.warning(
+                    "Dropping events from a hub subscription: %d are queued "
+                    "and nothing is reading them",
+                    self._maxsize,
+                )
+            self._dropped += 1
+            dropped = self._pending.popleft()
+            if _kind_of(dropped) == _RESYNCED and self._pending:
+                (dropped, marker) = (self._pending.popleft(), dropped)
+                self._pending.appendleft(marker)
+            if isinstance(dropped, dict):
+                event_type = dropped.get("event_type")
+                payload = dropped.get("event")
+                if isinstance(event_type, str) and isinstance(payload, dict):
+                    self._carry[event_type] = _merge(
+                        self._carry.get(event_type, {}), payload
+                    )
+        self._pending.append(item)
+        self._wakeup.set()
+
+    def _end(self, failure: BaseException | None) -> None:
+        """Stop taking items; what is queued is still handed out first.
+
+        Args:
+            failure: What to raise once the queue is empty, ``None`` to end
+                the iteration quietly.
+        """
+        if not self._finished:
+            self._finished = True
+            self._failure = failure
+            self._wakeup.set()
+
+
+class EventHub:
+    """One kvmd socket, shared by any number of subscribers.
+
+    The socket opens when the first subscriber enters and closes when the
+    last one leaves, so a hub costs nothing while nobody listens. Its events
+    are read by one task and copied to every
+    [`Subscription`][aiopikvm.Subscription] whose filter takes them; the
+    ``resynced`` marker of a reconnecting socket goes to every subscription
+    whatever its filter, since it concerns every subsystem.
+
+    The same task merges the events into one
+    [`DeviceState`][aiopikvm.DeviceState], on
+    [`state`][aiopikvm.EventHub.state] and handed to state subscriptions.
+    That merge starts over each time the socket opens.
+
+    [`PiKVM.hub`][aiopikvm.PiKVM.hub] is a hub over ``ws(reconnect=True)``.
+    For a socket opened otherwise — with ``stream=False``, say — build one
+    around it. The socket is the hub's from then on, and is not to be entered
+    or read by anything else.
+
+    Usage:
+
+        hub = EventHub(kvm.ws(stream=False, reconnect=True))
+        async with hub.subscribe_states({"atx"}) as power:
+            async for state in power:
+                print(state.atx)
+    """
+
+    def __init__(self, ws: PiKVMWebSocket) -> None:
+        """Wrap a socket that has not been opened.
+
+        Args:
+            ws: The socket to share, as [`PiKVM.ws()`][aiopikvm.PiKVM.ws]
+                returns it.
+        """
+        self._ws = ws
+        self._lock = asyncio.Lock()
+        self._subscribers: set[Subscription[Any]] = set()
+        self._event_subs: set[Subscription[dict[str, Any]]] = set()
+        self._state_subs: set[Subscription[DeviceState]] = set()
+        self._holds: list[int] = []
+        self._holders = 0
+        self._session = 0
+        self._merger = _StateMerger(ws._validation)
+        self._pump_task: asyncio.Task[None] | None = None
+        self._ended = False
+        self._failure: BaseException | None = None
+
+    @property
+    def ws(self) -> PiKVMWebSocket:
+        """The shared socket.
+
+        Only connected while the hub is held open, by a subscriber or by
+        ``async with hub``. Sending HID input through it is fine; reading
+        its [`events()`][aiopikvm.PiKVMWebSocket.events] is the hub's job.
+        """
+        return self._ws
+
+    @property
+    def state(self) -> DeviceState:
+        """The device as the events of the open socket add up to."""
+        return self._merger.state
+
+    @property
+    def subscribers(self) -> int:
+        """How many subscriptions are active."""
+        return len(self._subscribers)
+
+    def subscribe(
+        self, types: Iterable[str] | None = None, *, maxsize: int = _EVENTS_MAXSIZE
+    ) -> Subscription[dict[str, Any]]:
+        """Listen to raw events.
+
+        Args:
+            types: Event types to keep — ``{"atx", "msd"}`` — or ``None`` for
+                all of them, ``loop`` included.
+            maxsize: How many events may wait before the oldest is dropped.
+
+        Returns:
+            A subscription, to enter with ``async with`` and iterate over.
+            Each item is an event as
+            [`events()`][aiopikvm.PiKVMWebSocket.events] yields it. Events
+            that arrived before the subscription joined are not replayed.
+
+        Raises:
+            ConfigurationError: *types* is a single string, or *maxsize* is
+                less than one.
+        """
+        return Subscription(self, _types(types), _queue_size(maxsize))
+
+    def subscribe_states(
+        self, types: Iterable[str] | None = None, *, maxsize: int = _STATES_MAXSIZE
+    ) -> Subscription[DeviceState]:
+        """Listen to the shared device state.
+
+        Args:
+            types: Keep only the snapshots whose
+                [`updated`][aiopikvm.DeviceState] is one of these, or ``None``
+                for all of them.
+            maxsize: How many snapshots may wait before the oldest is
+                dropped.
+
+        Returns:
+            A subscription, to enter with ``async with`` and iterate over. A
+            subscription that joins an open socket starts with the state as
+            it stands, whatever its filter, and goes on with a snapshot per
+            event, as [`states()`][aiopikvm.PiKVMWebSocket.states] does.
+
+        Raises:
+            ConfigurationError: *types* is a single string, or *maxsize* is
+                less than one.
+        """
+        return Subscription(self, _types(types), _queue_size(maxsize), states=True)
+
+    async def __aenter__(self) -> Self:
+        """Hold the socket open without subscribing, e.g. to send input.
+
+        Returns:
+            This hub.
+
+        Raises:
+            WebSocketError: The socket could not be opened.
+            AuthError: The credentials were refused.
+            ConfigurationError: The client uses ``auth="cookie"`` and has no
+                session yet.
+        """
+        await self._attach(None)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Let go of the socket, closing it if nothing else holds it.
+
+        Args:
+            exc_type: Type of the exception the block raised, if any.
+            exc_val: The exception the block raised, if any.
+            exc_tb: Traceback of that exception, if any.
+        """
+        await self._detach(None)
+
+    async def aclose(self) -> None:
+        """Close the socket now, ending every subscription.
+
+        Each active subscription hands out what it has queued and then ends
+        its iteration. Leaving their blocks afterwards does nothing, and the
+        hub opens again for the next subscriber.
+        """
+        async with self._lock:
+            if self._holders:
+                await self._shut()
+            for subscription in self._subscribers:
+                subscription._end(None)
+            self._subscribers.clear()
+            self._event_subs.clear()
+            self._state_subs.clear()
+            self._holds.clear()
+            self._holders = 0
+
+    async def _attach(self, subscription: Subscription[Any] | None) -> None:
+        """Take a hold on the socket, opening it for the first holder.
+
+        Args:
+            subscription: The subscriber, or ``None`` for ``async with hub``.
+        """
+        async with self._lock:
+            if not self._holders:
+                await self._ws.__aenter__()
+                self._session += 1
+                self._merger = _StateMerger(self._ws._validation)
+                self._ended = False
+                self._failure = None
+                self._pump_task = asyncio.create_task(self._pump())
+            self._holders += 1
+            if subscription is None:
+                self._holds.append(self._session)
+                return
+            subscription._session = self._session
+            self._subscribers.add(subscription)
+            if subscription._states:
+                self._state_subs.add(subscription)
+                if self._merger.state.updated:
+                    # The state as it stands, whatever the filter: without it
+                    # a subscriber to "atx" knows nothing until power changes.
+                    subscription._pending.append(self._merger.state)
+            else:
+                self._event_subs.add(subscription)
+            if self._ended:
+                subscription._end(self._failure)
+
+    async def _detach(self, subscription: Subscription[Any] | None) -> None:
+        """Give up a hold, closing the socket after the last one.
+
+        Args:
+            subscription: The subscriber, or ``None`` for ``async with hub``.
+        """
+        async with self._lock:
+            if subscription is None:
+                if self._session not in self._holds:
+                    return
+                self._holds.remove(self._session)
+            else:
+                session = subscription._session
+                subscription._session = None
+                if session != self._session or subscription not in self._subscribers:
+                    return
+                self._subscribers.discard(subscription)
+                self._event_subs.discard(subscription)
+                self._state_subs.discard(subscription)
+            self._holders -= 1
+            if not self._holders:
+                await self._shut()
+
+    async def _shut(self) -> None:
+        """Stop the reading task and close the socket."""
+        pump = self._pump_task
+        self._pump_task = None
+        if pump is not None:
+            pump.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await pump
+        # A failure the pump met has reached the subscribers already.
+        with contextlib.suppress(WebSocketError):
+            await self._ws.__aexit__(None, None, None)
+
+    async def _pump(self) -> None:
+        """Read the socket and hand each event to whoever wants it."""
+        failure: BaseException | None = None
+        try:
+            async for event in self._ws.events():
+                kind = _kind_of(event)
+                for events in self._event_subs:
+                    events._offer(kind, event)
+                try:
+                    state = self._merger.feed(event)
+                except ResponseError as exc:
+                    # The merge kept its last good state, so later snapshots
+                    # may yet validate. The state subscribers who would have
+                    # had this one get the error in its place and stay open;
+                    # the event subscribers never notice.
+                    for states in self._state_subs:
+                        states._offer(kind, _Failed(exc))
+                    continue
+                if state is not None:
+                    for states in self._state_subs:
+                        states._offer(state.updated, state)
+        except Exception as exc:
+            # A broken connection, or anything else: the subscribers are
+            # waiting on this task, and must hear that it has stopped.
+            failure = exc
+        self._ended = True
+        self._failure = failure
+        for subscription in self._subscribers:
+            subscription._end(failure)
+
+
+def _kind_of(item: object) -> str | None:
+    """The event type of an event or a snapshot."""
+    if isinstance(item, DeviceState):
+        return item.updated
+    if isinstance(item, dict):
+        event_type = item.get("event_type")
+        return event_type if isinstance(event_type, str) else None
+    return None
+
+
+def _types(types: Iterable[str] | None) -> frozenset[str] | None:
+    """Check and freeze a subscription's filter."""
+    if types is None:
+        return None
+    if isinstance(types, str):
+        raise ConfigurationError(
+            f"types takes a collection of event types, not the string {types!r}"
+        )
+    return frozenset(types)
+
+
+def _queue_size(maxsize: int) -> int:
+    """Check a subscription's queue length."""
+    if maxsize < 1:
+        raise ConfigurationError(f"maxsize must be at least 1, not {maxsize}")
+    return maxsize
@@ -0,0 +1,396 @@
+"""Keyboard and mouse input, over whichever transport is cheapest right now.
+
+[`HIDResource`][aiopikvm.resources.hid.HIDResource] sends every event as an
+HTTPS request: a TLS record each way, nginx, kvmd's auth check, a handler,
+a JSON envelope back. The same event on an open kvmd socket's binary channel
+is a frame of a few bytes that kvmd hands straight to the HID backend. Code
+written against one has so far had to be rewritten to use the other.
+
+[`HIDInput`][aiopikvm.HIDInput], on [`PiKVM.input`][aiopikvm.PiKVM.input],
+takes the calls [`HIDResource`][aiopikvm.resources.hid.HIDResource] takes and
+sends each one over the client's [`hub`][aiopikvm.PiKVM.hub] socket while
+that is open, and over REST while it is not. A frame the socket cannot send —
+it is reconnecting, say — goes over REST instead.
+
+The two transports do not report mistakes alike. REST answers a key kvmd does
+not know with HTTP 400, and the socket drops it without a word. So every name
+is checked here first, against
+[`KEY_NAMES`][aiopikvm.resources.hid.KEY_NAMES] and
+[`MouseButton`][aiopikvm.resources.hid.MouseButton], and a wrong one raises
+the same way whichever transport would have carried it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Sequence
+from typing import TYPE_CHECKING, Literal, get_args
+
+from aiopikvm._constants import PathCurve
+from aiopikvm._exceptions import ConfigurationError, WebSocketError
+from aiopikvm._path import _plan, _Step
+from aiopikvm.resources.hid import KEY_NAMES, MouseButton
+
+if TYPE_CHECKING:
+    from aiopikvm._client import PiKVM
+    from aiopikvm._ws import PiKVMWebSocket
+
+logger = logging.getLogger(__name__)
+
+_BUTTONS = frozenset(get_args(MouseButton.__value__))
+"""Every name [`MouseButton`][aiopikvm.resources.hid.MouseButton] allows."""
+
+_SHORTCUT_DELAY = 0.05
+"""Seconds between the events of a shortcut, as kvmd spaces them over REST."""
+
+_PATH_RATE = 60.0
+"""Default moves per second of a path: one per frame of a 60 Hz screen."""
+
+
+class HIDInput:
+    """Send keyboard and mouse input over the hub socket, or REST without it.
+
+    The methods are the ones of
+    [`HIDResource`][aiopikvm.resources.hid.HIDResource], with the same
+    arguments and meanings, so code that calls ``kvm.hid.send_key(...)``
+    works unchanged as ``kvm.input.send_key(...)``. What differs is only
+    the wire: while [`PiKVM.hub`][aiopikvm.PiKVM.hub] is open — it has a
+    subscriber, or something holds it with ``async with kvm.hub`` — each call
+    is a binary frame on its socket; otherwise it is a REST request.
+
+    A shortcut and a click are a single request over REST and several frames
+    over the socket: the keys pressed in order and released in reverse, 50 ms
+    apart as kvmd spaces them, and a button pressed and released.
+
+    On top of those, [`move_along()`][aiopikvm.HIDInput.move_along] and
+    [`drag()`][aiopikvm.HIDInput.drag] take a path in pixels and send it as
+    a timed run of absolute moves.
+
+    Usage:
+
+        async with kvm.hub:
+            await kvm.input.send_shortcut("ControlLeft", "KeyC")
+            await kvm.input.send_mouse_move(0, 0)
+    """
+
+    def __init__(self, client: PiKVM) -> None:
+        """Bind the facade to a client.
+
+        Args:
+            client: The client whose hub socket and REST resource carry the
+                input.
+        """
+        self._client = client
+
+    @property
+    def transport(self) -> Literal["ws", "rest"]:
+        """What the next call would go over: ``"ws"`` or ``"rest"``."""
+        return "rest" if self._socket() is None else "ws"
+
+    async def send_key(
+        self, key: str, *, state: bool | None = None, finish: bool | None = None
+    ) -> None:
+        """Send a single key event.
+
+        Args:
+            key: Key name, one of
+                [`KEY_NAMES`][aiopikvm.resources.hid.KEY_NAMES].
+            state: ``True`` to press, ``False`` to release, ``None`` to
+                press with *finish*, as
+                [`HIDResource.send_key()`][aiopikvm.resources.hid.HIDResource.send_key]
+                describes.
+            finish: Ask kvmd to release the key in the event that pressed it.
+
+        Raises:
+            ConfigurationError: kvmd has no key by that name.
+            APIError: REST carried the event and kvmd refused it.
+        """
+        _check_key(key)
+        ws = self._socket()
+        if ws is not None:
+            # Over REST, an event with no state is a press kvmd finishes.
+            press = state is None or state
+            finishing = state is None or bool(finish)
+            if await _over(ws.send_key(key, state=press, finish=finishing)):
+                return
+        await self._client.hid.send_key(key, state=state, finish=finish)
+
+    async def send_shortcut(self, *keys: str) -> None:
+        """Press keys in order, then release them in reverse.
+
+        Args:
+            *keys: Key names, each one of
+                [`KEY_NAMES`][aiopikvm.resources.hid.KEY_NAMES].
+
+        Raises:
+            ConfigurationError: No keys are given, or one is not a key kvmd
+                has; nothing is sent then.
+            APIError: REST carried the shortcut and kvmd refused it.
+        """
+        if not keys:
+            raise ConfigurationError("send_shortcut() requires at least one key")
+        for key in keys:
+            _check_key(key)
+        if self._socket() is None:
+            await self._client.hid.send_shortcut(*keys)
+            return
+        events = [(key, True) for key in keys] + [(key, False) for key in keys[::-1]]
+        for index, (key, state) in enumerate(events):
+            if index:
+                await asyncio.sleep(_SHORTCUT_DELAY)
+            await self._key_event(key, state)
+
+    async def send_mouse_button(
+        self, button: MouseButton, *, state: bool | None = None
+    ) -> None:
+        """Send a mouse button event.
+
+        Args:
+            button: Button name, one of
+                [`MouseButton`][aiopikvm.resources.hid.MouseButton].
+            state: ``True`` to press, ``False`` to release, ``None`` to click.
+
+        Raises:
+            ConfigurationError: kvmd has no button by that name.
+            APIError: REST carried the event and kvmd refused it.
+        """
+        _check_button(button)
+        if self._socket() is None:
+            await self._client.hid.send_mouse_button(button, state=state)
+            return
+        for pressed in (True, False) if state is None else (state,):
+            await self._button_event(button, pressed)
+
+    async def send_mouse_move(self, to_x: int, to_y: int) -> None:
+        """Move the mouse to an absolute position, -32768 to 32767 each way.
+
+        Args:
+            to_x: Horizontal position.
+            to_y: Vertical position.
+
+        Raises:
+            APIError: REST carried the event and kvmd refused it.
+        """
+        await self._routed(
+            lambda ws: ws.send_mouse_move(to_x, to_y),
+            lambda: self._client.hid.send_mouse_move(to_x, to_y),
+        )
+
+    async def send_mouse_relative(self, delta_x: int, delta_y: int) -> None:
+        """Move the mouse by a step, -127 to 127 each way.
+
+        Args:
+            delta_x: Horizontal step.
+            delta_y: Vertical step.
+
+        Raises:
+            APIError: REST carried the event and kvmd refused it.
+        """
+        await self._routed(
+            lambda ws: ws.send_mouse_relative(delta_x, delta_y),
+            lambda: self._client.hid.send_mouse_relative(delta_x, delta_y),
+        )
+
+    async def send_mouse_wheel(self, delta_x: int, delta_y: int) -> None:
+        """Send a wheel step, -127 to 127 each way; negative *delta_y* is down.
+
+        Args:
+            delta_x: Horizontal step.
+            delta_y: Vertical step.
+
+        Raises:
+            APIError: REST carried the event and kvmd refused it.
+        """
+        await self._routed(
+            lambda ws: ws.send_mouse_wheel(delta_x, delta_y),
+            lambda: self._client.hid.send_mouse_wheel(delta_x, delta_y),
+        )
+
+    async def move_along(
+        self,
+        waypoints: Sequence[tuple[float, float]],
+        *,
+        duration: float = 0.5,
+        rate: float = _PATH_RATE,
+        curve: PathCurve = "linear",
+        resolution: tuple[int, int] | None = None,
+    ) -> None:
+        """Move the pointer along a path given in pixels.
+
+        The whole path is worked out before the first move goes: the points
+        along it, each in kvmd's coordinate space and, for the socket, packed
+        into its binary frame. Then the moves go out on a fixed schedule —
+        the *n*-th one *n* / *rate* seconds after the first, measured from
+        the start rather than from the move before, so a slow send delays one
+        move and not every move after it. A point that rounds to where the
+        pointer already is is not sent again.
+
+        The pixels are mapped onto the screen the host is sending, whose
+        size comes from the hub's state, as the ``streamer`` event last
+        reported it, or from ``GET /api/streamer`` without an open hub. Pass
+        *resolution* to skip the lookup, or when the streamer is not running
+        to report one.
+
+        Args:
+            waypoints: ``(x, y)`` pixel positions, 0 at the left or top edge.
+                A single one is a single move.
+            duration: Seconds from the first move to the last.
+            rate: Moves per second.
+            curve: How the waypoints are joined, as
+                [`PathCurve`][aiopikvm.PathCurve] describes.
+            resolution: ``(width, height)`` of the host's screen in pixels.
+
+        Raises:
+            ConfigurationError: No waypoints, an unknown curve, a duration or
+                rate that cannot be, or no resolution to map pixels with —
+                the streamer is not running and none was passed.
+            APIError: REST carried a move and kvmd refused it.
+        """
+        await self._follow(
+            _plan(
+                waypoints,
+                resolution or await self._resolution(),
+                duration=duration,
+                rate=rate,
+                curve=curve,
+            )
+        )
+
+    async def drag(
+        self,
+        waypoints: Sequence[tuple[float, float]],
+        *,
+        button: MouseButton = "left",
+        duration: float = 0.5,
+        rate: float = _PATH_RATE,
+        curve: PathCurve = "linear",
+        resolution: tuple[int, int] | None = None,
+    ) -> None:
+        """Press a button at the first waypoint, move along, release at the last.
+
+        The pointer goes to the first waypoint, the button goes down, the
+        rest is [`move_along()`][aiopikvm.HIDInput.move_along], and the
+        button comes up at the end — released even if the move fails, so a
+        broken drag does not leave the host with a button held.
+
+        Args:
+            waypoints: ``(x, y)`` pixel positions, at least a start and an
+                end.
+            button: The button held down, one of
+                [`MouseButton`][aiopikvm.resources.hid.MouseButton].
+            duration: Seconds from the press to the last move.
+            rate: Moves per second.
+            curve: How the waypoints are joined.
+            resolution: ``(width, height)`` of the host's screen in pixels.
+
+        Raises:
+            ConfigurationError: Fewer than two waypoints, an unknown button,
+                or anything [`move_along()`][aiopikvm.HIDInput.move_along]
+                refuses.
+            APIError: REST carried an event and kvmd refused it.
+        """
+        if len(waypoints) < 2:
+            raise ConfigurationError("A drag needs a start and an end waypoint")
+        _check_button(button)
+        steps = _plan(
+            waypoints,
+            resolution or await self._resolution(),
+            duration=duration,
+            rate=rate,
+            curve=curve,
+        )
+        await self._follow(steps[:1])
+        await self.send_mouse_button(button, state=True)
+        try:
+            await self._follow(steps[1:])
+        finally:
+            await self.send_mouse_button(button, state=False)
+
+    async def _follow(self, steps: Sequence[_Step]) -> None:
+        """Send the moves of a path, each its ``at`` seconds from now."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for step in steps:
+            delay = start + step.at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            ws = self._socket()
+            if ws is not None and ws._binary:
+                sent = await _over(ws._send_frame(step.frame, "mouse_move"))
+            elif ws is not None:
+                sent = await _over(ws.send_mouse_move(step.x, step.y))
+            else:
+                sent = False
+            if not sent:
+                await self._client.hid.send_mouse_move(step.x, step.y)
+
+    async def _resolution(self) -> tuple[int, int]:
+        """The size of the host's screen, from the hub's state or from REST."""
+        state = self._client.hub.state.streamer if self._socket() is not None else None
+        if state is None or state.streamer is None:
+            state = await self._client.streamer.get_state()
+        if state.streamer is None:
+            raise ConfigurationError(
+                "The screen resolution is unknown: the streamer is not running. "
+                "Open kvm.hub to start it, or pass resolution="
+            )
+        size = state.streamer.source.resolution
+        return (size.width, size.height)
+
+    async def _key_event(self, key: str, state: bool) -> None:
+        """Press or release one key, on whichever transport will take it."""
+        await self._routed(
+            lambda ws: ws.send_key(key, state=state),
+            lambda: self._client.hid.send_key(key, state=state),
+        )
+
+    async def _button_event(self, button: MouseButton, state: bool) -> None:
+        """Press or release one button, on whichever transport will take it."""
+        await self._routed(
+            lambda ws: ws.send_mouse_button(button, state),
+            lambda: self._client.hid.send_mouse_button(button, state=state),
+        )
+
+    async def _routed(
+        self,
+        over_ws: Callable[[PiKVMWebSocket], Awaitable[None]],
+        over_rest: Callable[[], Awaitable[None]],
+    ) -> None:
+        """Send one event over the socket if it is open, and REST if not."""
+        ws = self._socket()
+        if ws is not None and await _over(over_ws(ws)):
+            return
+        await over_rest()
+
+    def _socket(self) -> PiKVMWebSocket | None:
+        """The hub's socket, if it has been made and is open."""
+        hub = self._client.__dict__.get("hub")
+        if hub is None or hub.ws._connection is None:
+            return None
+        ws: PiKVMWebSocket = hub.ws
+        return ws
+
+
+async def _over(send: Awaitable[None]) -> bool:
+    """Send a frame, and say whether it went; REST takes one that did not."""
+    try:
+        await send
+    except WebSocketError as exc:
+        logger.debug("Sending input over REST instead: %s", exc)
+        return False
+    return True
+
+
+def _check_key(key: str) -> None:
+    """Refuse a key name kvmd does not have."""
+    if key not in KEY_NAMES:
+        raise ConfigurationError(f"kvmd has no key {key!r}; see KEY_NAMES")
+
+
+def _check_button(button: str) -> None:
+    """Refuse a mouse button name kvmd does not have."""
+    if button not in _BUTTONS:
+        raise ConfigurationError(
+            f"kvmd has no mouse button {button!r}; see MouseButton"
+        )
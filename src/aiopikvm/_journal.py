@@ -0,0 +1,575 @@
+"""An append-only record of every event, and the device state at any moment.
+
+JSON lines of [`events()`][aiopikvm.PiKVMWebSocket.events] are easy to write
+and expensive to ask anything of. Each one repeats its field names, and kvmd
+only sends what changed. So the state of one device at one moment can only be
+worked out by reading and merging that device's whole history up to it.
+
+An [`EventJournal`][aiopikvm.EventJournal] writes a compact binary file
+instead. Every record is a fixed header followed by its payload:
+
+| Bytes | Field                                                         |
+|-------|---------------------------------------------------------------|
+| 1     | kind: ``0`` names a device, ``1`` is an event, ``2`` a checkpoint |
+| 4     | device number, little-endian                                  |
+| 8     | wall-clock time, seconds since the epoch, a double            |
+| 4     | payload length                                                |
+
+A device is named once, in the record that gives it its number. An event is
+its JSON without whitespace. Every *checkpoint_every* events of a device, a
+checkpoint record holds the zlib-compressed merge
+[`states()`][aiopikvm.PiKVMWebSocket.states] would have built by then.
+
+[`JournalReader`][aiopikvm.JournalReader] reads only the headers when it
+opens, skipping over the payloads, and keeps the time of every record by
+device. The state at a moment is then a binary search for the last event at
+or before it, the checkpoint before that, and at most *checkpoint_every*
+events merged on top. How long ago the device started does not matter.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import dataclasses
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections.abc import AsyncIterator
+from datetime import datetime
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Any, Self
+
+from aiopikvm._constants import DEFAULT_VALIDATION, ValidationMode
+from aiopikvm._exceptions import ConfigurationError
+from aiopikvm._ws import DeviceState, PiKVMWebSocket, _StateMerger
+
+_MAGIC = b"PKVMJRNL\x01\x00"
+"""The first bytes of a journal: a name, and format version 1."""
+
+_HEADER = struct.Struct("<BIdI")
+"""kind, device number, time, payload length."""
+
+_DEVICE = 0
+_EVENT = 1
+_CHECKPOINT = 2
+
+_CHECKPOINT_EVENTS = 1000
+"""Events of one device between two of its checkpoints, by default."""
+
+_FLUSH_BYTES = 64 * 1024
+"""How much a writer collects before it hands the bytes to the file."""
+
+
+class _Index:
+    """Where one device's records are, in the order they were written."""
+
+    __slots__ = ("checkpoints", "counts", "offsets", "times")
+
+    def __init__(self) -> None:
+        self.times: list[float] = []
+        self.offsets: list[int] = []
+        # For each checkpoint, how many of the device's events it covers,
+        # and where it is.
+        self.counts: list[int] = []
+        self.checkpoints: list[int] = []
+
+
+def _scan(
+    file: IO[bytes],
+) -> tuple[dict[str, int], dict[int, _Index], int]:
+    """Read a journal's headers and index its records.
+
+    Args:
+        file: The journal, positioned anywhere.
+
+    Returns:
+        The device numbers by name, the index by device number, and the
+        offset the last complete record ends at. Anything after it is a
+        record whose writing was cut short.
+
+    Raises:
+        ConfigurationError: The file is not a journal.
+    """
+    file.seek(0)
+    if file.read(len(_MAGIC)) != _MAGIC:
+        raise ConfigurationError(f"{file.name} is not an aiopikvm event journal")
+    devices: dict[str, int] = {}
+    indexes: dict[int, _Index] = {}
+    end = file.seek(0, os.SEEK_END)
+    offset = len(_MAGIC)
+    while offset + _HEADER.size <= end:
+        file.seek(offset)
+        (kind, number, at, size) = _HEADER.unpack(file.read(_HEADER.size))
+        if offset + _HEADER.size + size > end:
+            break
+        if kind == _DEVICE:
+            devices[file.read(size).decode()] = number
+            indexes[number] = _Index()
+        elif kind == _EVENT:
+            index = indexes[number]
+            # The lookups bisect the times. A writer keeps them in order, but
+            # one from before it did could have let the clock step back.
+            index.times.append(max(at, index.times[-1]) if index.times else at)
+            index.offsets.append(offset)
+        elif kind == _CHECKPOINT:
+            index = indexes[number]
+            index.counts.append(len(index.times))
+            index.checkpoints.append(offset)
+        offset += _HEADER.size + size
+    return (devices, indexes, offset)
+
+
+def _payload(file: IO[bytes], offset: int, lock: threading.Lock) -> Any:
+    """Read the payload of the record at *offset*, decoded.
+
+    The seek and the reads share the file's position, so they hold *lock*:
+    lookups run in worker threads, several at once over one file.
+    """
+    with lock:
+        file.seek(offset)
+        (kind, _, _, size) = _HEADER.unpack(file.read(_HEADER.size))
+        data = file.read(size)
+    if kind == _CHECKPOINT:
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+
+def _merger_at(
+    file: IO[bytes],
+    lock: threading.Lock,
+    index: _Index,
+    count: int,
+    validation: ValidationMode,
+    *,
+    typed: bool,
+) -> _StateMerger:
+    """Build a device's merge as of its first *count* events.
+
+    The nearest checkpoint at or before that point is the start, and the
+    events after it are merged on top.
+    """
+    position = bisect.bisect_right(index.counts, count) - 1
+    if position < 0:
+        merger = _StateMerger(validation)
+        start = 0
+    else:
+        merger = _StateMerger.restored(
+            _payload(file, index.checkpoints[position], lock),
+            validation,
+            typed=typed,
+        )
+        start = index.counts[position]
+    for offset in index.offsets[start:count]:
+        event = _payload(file, offset, lock)
+        if typed:
+            merger.feed(event)
+        else:
+            merger.absorb(event)
+    return merger
+
+
+class EventJournal:
+    """Write the events of any number of devices to one journal file.
+
+    Opening a journal that exists carries on from where it ends: the devices
+    keep their numbers, and each device's merge is rebuilt from its last
+    checkpoint so that the next checkpoint is whole. A record cut short by a
+    crash is cut off first.
+
+    Writing is buffered. Records collect in memory and reach the file, in a
+    worker thread, once 64 KiB have collected, on
+    [`flush()`][aiopikvm.EventJournal.flush] and on exit.
+
+    Usage:
+
+        async with EventJournal("fleet.journal") as journal:
+            async with FleetEvents(sockets) as fleet:
+                async for device, event in fleet:
+                    await journal.write(device, event)
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        checkpoint_every: int = _CHECKPOINT_EVENTS,
+    ) -> None:
+        """Prepare a journal; nothing is opened until it is entered.
+
+        Args:
+            path: The journal file, created if it does not exist.
+            checkpoint_every: Events of one device between two of its
+                checkpoints. Fewer make a lookup faster and the file larger.
+
+        Raises:
+            ConfigurationError: *checkpoint_every* is less than one.
+        """
+        if checkpoint_every < 1:
+            raise ConfigurationError(
+                f"checkpoint_every must be at least 1, not {checkpoint_every}"
+            )
+        self._path = Path(path)
+        self._checkpoint_every = checkpoint_every
+        self._file: IO[bytes] | None = None
+        self._buffer = bytearray()
+        self._devices: dict[str, int] = {}
+        self._mergers: dict[int, _StateMerger] = {}
+        self._since: dict[int, int] = {}
+        self._last: dict[int, float] = {}
+
+    @property
+    def path(self) -> Path:
+        """The journal file."""
+        return self._path
+
+    async def __aenter__(self) -> Self:
+        """Open the file, and pick up where it ends if it exists.
+
+        Returns:
+            This journal.
+
+        Raises:
+            ConfigurationError: The file exists and is not a journal.
+        """
+        await asyncio.to_thread(self._open)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Write what is buffered and close the file.
+
+        Args:
+            exc_type: Type of the exception the block raised, if any.
+            exc_val: The exception the block raised, if any.
+            exc_tb: Traceback of that exception, if any.
+        """
+        file = self._file
+        if file is None:
+            return
+        self._file = None
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        await asyncio.to_thread(_write_and_close, file, data)
+
+    async def write(
+        self, device: str, event: dict[str, Any], *, at: float | None = None
+    ) -> None:
+        """Add one event.
+
+        Args:
+            device: The device it came from.
+            event: The event, as [`events()`][aiopikvm.PiKVMWebSocket.events]
+                yields it.
+            at: When it arrived, in seconds since the epoch; now by default.
+                A device's events are kept in time order, which is what
+                lets a lookup bisect them, so *at* may not be earlier than
+                the device's last event. The default is held at that time
+                when the clock steps back.
+
+        Raises:
+            ConfigurationError: The journal is not open, or *at* is earlier
+                than the device's last event.
+        """
+        if self._file is None:
+            raise ConfigurationError("The journal is written inside `async with`")
+        number = self._devices.get(device)
+        last = None if number is None else self._last.get(number)
+        if at is None:
+            when = time.time() if last is None else max(time.time(), last)
+        elif last is not None and at < last:
+            raise ConfigurationError(
+                f"An event of {device!r} at {at} is earlier than its last, "
+                f"at {last}; a device's events are written in time order"
+            )
+        else:
+            when = at
+        if number is None:
+            number = self._devices[device] = len(self._devices)
+            self._mergers[number] = _StateMerger(DEFAULT_VALIDATION)
+            self._since[number] = 0
+            self._append(_DEVICE, number, when, device.encode())
+        self._append(
+            _EVENT, number, when, json.dumps(event, separators=(",", ":")).encode()
+        )
+        self._last[number] = when
+        merger = self._mergers[number]
+        merger.absorb(event)
+        self._since[number] += 1
+        if self._since[number] >= self._checkpoint_every:
+            self._since[number] = 0
+            checkpoint = json.dumps(merger.checkpoint(), separators=(",", ":"))
+            self._append(_CHECKPOINT, number, when, zlib.compress(checkpoint.encode()))
+        if len(self._buffer) >= _FLUSH_BYTES:
+            await self.flush()
+
+    async def record(self, device: str, ws: PiKVMWebSocket) -> None:
+        """Write every event of an open socket until it ends.
+
+        Args:
+            device: The name to write its events under.
+            ws: The socket, entered already.
+
+        Raises:
+            WebSocketError: The connection broke, as
+                [`events()`][aiopikvm.PiKVMWebSocket.events] raises it.
+        """
+        async for event in ws.events():
+            await self.write(device, event)
+
+    async def flush(self) -> None:
+        """Hand what is buffered to the file."""
+        if self._file is None or not self._buffer:
+            return
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        await asyncio.to_thread(_write, self._file, data)
+
+    def _append(self, kind: int, number: int, at: float, payload: bytes) -> None:
+        """Buffer one record."""
+        self._buffer += _HEADER.pack(kind, number, at, len(payload))
+        self._buffer += payload
+
+    def _open(self) -> None:
+        """Open the file, and rebuild the devices and merges it holds."""
+        file = self._path.open("a+b")
+        try:
+            if file.seek(0, os.SEEK_END) == 0:
+                file.write(_MAGIC)
+                file.flush()
+                self._file = file
+                return
+            (devices, indexes, end) = _scan(file)
+            file.truncate(end)
+            lock = threading.Lock()
+            for number in devices.values():
+                index = indexes[number]
+                count = len(index.times)
+                self._mergers[number] = _merger_at(
+                    file, lock, index, count, DEFAULT_VALIDATION, typed=False
+                )
+                self._since[number] = count - (index.counts or [0])[-1]
+                if index.times:
+                    self._last[number] = index.times[-1]
+            self._devices = devices
+            self._file = file
+        except BaseException:
+            file.close()
+            raise
+
+
+class JournalReader:
+    """Ask a journal what a device looked like at a given moment.
+
+    The headers are read as the reader is entered, which costs one pass over
+    the file's headers and none over its payloads. After that,
+    [`state_at()`][aiopikvm.JournalReader.state_at] is a binary search and at
+    most *checkpoint_every* events merged, whatever the file's length. The
+    file is read in worker threads, so lookups of many devices can be
+    gathered at once.
+
+    Usage:
+
+        async with JournalReader("fleet.journal") as journal:
+            state = await journal.state_at("rack-317", datetime(2026, 3, 1, 3, 12))
+            print(state.atx)
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        validation: ValidationMode = DEFAULT_VALIDATION,
+    ) -> None:
+        """Prepare a reader; nothing is read until it is entered.
+
+        Args:
+            path: The journal file.
+            validation: How much checking the models
+                [`state_at()`][aiopikvm.JournalReader.state_at] builds get;
+                see [`ValidationMode`][aiopikvm.ValidationMode].
+        """
+        self._path = Path(path)
+        self._validation = validation
+        self._file: IO[bytes] | None = None
+        self._lock = threading.Lock()
+        self._devices: dict[str, int] = {}
+        self._indexes: dict[int, _Index] = {}
+
+    async def __aenter__(self) -> Self:
+        """Open the file and index it.
+
+        Returns:
+            This reader.
+
+        Raises:
+            ConfigurationError: The file is not a journal.
+            FileNotFoundError: There is no such file.
+        """
+        await asyncio.to_thread(self._open)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Close the file.
+
+        Args:
+            exc_type: Type of the exception the block raised, if any.
+            exc_val: The exception the block raised, if any.
+            exc_tb: Traceback of that exception, if any.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def devices(self) -> list[str]:
+        """The devices the journal has events of."""
+        return list(self._devices)
+
+    def span(self, device: str) -> tuple[float, float] | None:
+        """When a device's first and last events were written.
+
+        Args:
+            device: The device.
+
+        Returns:
+            The two times, in seconds since the epoch, or ``None`` for a
+            device with no events.
+        """
+        times = self._index(device).times
+        return (times[0], times[-1]) if times else None
+
+    async def state_at(self, device: str, at: float | datetime) -> DeviceState | None:
+        """The device as its events up to a moment add up to.
+
+        Args:
+            device: The device.
+            at: The moment: seconds since the epoch, or a datetime. A naive
+                datetime is local time, as ``datetime.timestamp()`` takes it.
+
+        Returns:
+            The state after the last event at or before *at*, with
+            ``updated`` set to that event's type. ``None`` before the
+            device's first event.
+
+        Raises:
+            ConfigurationError: The reader is not open, or the journal has no
+                such device.
+            ResponseError: A merged payload did not match its model.
+        """
+        index = self._index(device)
+        moment = at.timestamp() if isinstance(at, datetime) else at
+        count = bisect.bisect_right(index.times, moment)
+        if not count:
+            return None
+        return await asyncio.to_thread(self._state, index, count)
+
+    async def replay(
+        self,
+        device: str,
+        *,
+        since: float | datetime | None = None,
+        until: float | datetime | None = None,
+    ) -> AsyncIterator[tuple[float, dict[str, Any]]]:
+        """Iterate over a device's events in a span of time.
+
+        Args:
+            device: The device.
+            since: The earliest moment to include; the start by default.
+            until: The latest moment to include; the end by default.
+
+        Yields:
+            Each event with the time it was written.
+
+        Raises:
+            ConfigurationError: The reader is not open, or the journal has no
+                such device.
+        """
+        index = self._index(device)
+        first = 0 if since is None else bisect.bisect_left(index.times, _seconds(since))
+        last = (
+            len(index.times)
+            if until is None
+            else bisect.bisect_right(index.times, _seconds(until))
+        )
+        for start in range(first, last, _CHECKPOINT_EVENTS):
+            stop = min(start + _CHECKPOINT_EVENTS, last)
+            chunk = await asyncio.to_thread(self._events, index, start, stop)
+            for item in chunk:
+                yield item
+
+    def _index(self, device: str) -> _Index:
+        """The index of a device's records."""
+        if self._file is None:
+            raise ConfigurationError("The journal is read inside `async with`")
+        number = self._devices.get(device)
+        if number is None:
+            raise ConfigurationError(f"The journal has no device {device!r}")
+        return self._indexes[number]
+
+    def _open(self) -> None:
+        """Open the file and index it."""
+        file = self._path.open("rb")
+        try:
+            (self._devices, self._indexes, _) = _scan(file)
+        except BaseException:
+            file.close()
+            raise
+        self._file = file
+
+    def _state(self, index: _Index, count: int) -> DeviceState:
+        """Build the state after a device's first *count* events."""
+        assert self._file is not None
+        merger = _merger_at(
+            self._file, self._lock, index, count, self._validation, typed=True
+        )
+        last = _payload(self._file, index.offsets[count - 1], self._lock)
+        updated = last.get("event_type") if isinstance(last, dict) else None
+        if not isinstance(updated, str):
+            return merger.state
+        return dataclasses.replace(merger.state, updated=updated)
+
+    def _events(
+        self, index: _Index, start: int, stop: int
+    ) -> list[tuple[float, dict[str, Any]]]:
+        """Read a run of a device's events."""
+        assert self._file is not None
+        return [
+            (
+                index.times[position],
+                _payload(self._file, index.offsets[position], self._lock),
+            )
+            for position in range(start, stop)
+        ]
+
+
+def _seconds(moment: float | datetime) -> float:
+    """A moment as seconds since the epoch."""
+    return moment.timestamp() if isinstance(moment, datetime) else moment
+
+
+def _write(file: IO[bytes], data: bytes) -> None:
+    """Append and flush, so a reader sees the records."""
+    file.write(data)
+    file.flush()
+
+
+def _write_and_close(file: IO[bytes], data: bytes) -> None:
+    """Write the last of the buffer, then close."""
+    try:
+        _write(file, data)
+    finally:
+        file.close()
@@ -0,0 +1,406 @@
+"""Round trips through kvmd's event loop, sampled for as long as a socket is open.
+
+[`ping()`][aiopikvm.PiKVMWebSocket.ping] answers one question once: is the
+loop that dispatches HID input and broadcasts state running, and how long did
+it take to say so. Deciding whether a device is fit to type on needs the same
+question asked all the time, and the answers kept in a form that a p99 can be
+read from without keeping them all.
+
+[`LatencyMonitor`][aiopikvm.LatencyMonitor] pings on a schedule, in a task of
+its own, and files each round trip in a
+[`LatencyHistogram`][aiopikvm.LatencyHistogram]: log-linear buckets in the
+manner of HdrHistogram, a fixed relative error at every scale, and memory that
+grows with the range of the values rather than their number. The most recent
+pings are also kept one by one, for jitter, loss and a
+[`Health`][aiopikvm.Health] verdict about now rather than about the life of
+the socket.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dataclasses
+import logging
+import math
+from collections import deque
+from collections.abc import Callable
+from types import TracebackType
+from typing import Literal, Self
+
+from aiopikvm._exceptions import ConfigurationError, WebSocketError
+from aiopikvm._ws import PiKVMWebSocket
+
+logger = logging.getLogger(__name__)
+
+type Health = Literal["unknown", "healthy", "degraded", "stalled", "down"]
+"""What the recent pings say about a device's kvmd loop.
+
+- ``"unknown"``: nothing has been sampled yet.
+- ``"healthy"``: every recent ping came back, and the p99 is under the
+  *degraded* threshold.
+- ``"degraded"``: the p99 has reached *degraded*, or a ping went unanswered.
+- ``"stalled"``: the p99 has reached *stalled*, or *max_loss* of the pings
+  went unanswered.
+- ``"down"``: the last *down_after* pings all went unanswered.
+"""
+
+_SUB_BITS = 8
+"""Buckets per doubling, as a power of two: 128, for under 1 % error."""
+
+_HALF = 1 << (_SUB_BITS - 1)
+
+_RESOLUTION = 1e-6
+"""The smallest round trip told apart from zero, in seconds."""
+
+_JITTER_GAIN = 1 / 16
+"""How much of each new difference the jitter estimate takes in (RFC 3550)."""
+
+
+class LatencyHistogram:
+    """Round trips counted in log-linear buckets.
+
+    Each value is counted, in microseconds, in a bucket no wider than
+    1/128 of its lower edge. Reading a percentile therefore costs a walk over
+    at most a few thousand counters, and is off by under 1 %, whatever the
+    number of values recorded.
+    """
+
+    __slots__ = ("_count", "_counts", "_max", "_min", "_total")
+
+    def __init__(self) -> None:
+        """Start empty."""
+        self._counts: list[int] = []
+        self._count = 0
+        self._total = 0.0
+        self._min = math.inf
+        self._max = 0.0
+
+    @property
+    def count(self) -> int:
+        """Values recorded."""
+        return self._count
+
+    @property
+    def min(self) -> float | None:
+        """The smallest value recorded, exactly, or ``None`` if there is none."""
+        return self._min if self._count else None
+
+    @property
+    def max(self) -> float | None:
+        """The largest value recorded, exactly, or ``None`` if there is none."""
+        return self._max if self._count else None
+
+    @property
+    def mean(self) -> float | None:
+        """The mean of the values recorded, or ``None`` if there is none."""
+        return self._total / self._count if self._count else None
+
+    def record(self, seconds: float) -> None:
+        """Count one value.
+
+        Args:
+            seconds: A round trip. A negative one is counted as zero.
+        """
+        seconds = max(seconds, 0.0)
+        index = _bucket(round(seconds / _RESOLUTION))
+        if index >= len(self._counts):
+            self._counts.extend([0] * (index + 1 - len(self._counts)))
+        self._counts[index] += 1
+        self._count += 1
+        self._total += seconds
+        self._min = min(self._min, seconds)
+        self._max = max(self._max, seconds)
+
+    def percentile(self, percent: float) -> float | None:
+        """The value that *percent* of the values recorded are at or under.
+
+        Args:
+            percent: From 0 to 100; ``99`` for the p99.
+
+        Returns:
+            The upper edge of the bucket the percentile falls in, kept within
+            the smallest and largest values recorded. ``None`` if nothing has
+            been recorded.
+
+        Raises:
+            ConfigurationError: *percent* is outside 0 to 100.
+        """
+        if not 0 <= percent <= 100:
+            raise ConfigurationError(f"percent must be from 0 to 100, not {percent}")
+        if not self._count:
+            return None
+        rank = max(1, math.ceil(self._count * percent / 100))
+        running = 0
+        for index, count in enumerate(self._counts):
+            running += count
+            if running >= rank:
+                value = _upper(index) * _RESOLUTION
+                return min(max(value, self._min), self._max)
+        return self._max
+
+    def clear(self) -> None:
+        """Forget every value."""
+        self._counts.clear()
+        self._count = 0
+        self._total = 0.0
+        self._min = math.inf
+        self._max = 0.0
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class LatencyStats:
+    """What a [`LatencyMonitor`][aiopikvm.LatencyMonitor] makes of its recent pings.
+
+    Every time is in seconds, and ``None`` when no ping in the window was
+    answered.
+
+    Attributes:
+        health: The verdict.
+        sent: Pings in the window.
+        lost: Pings in the window that were not answered.
+        loss: *lost* as a fraction of *sent*; zero for an empty window.
+        last: The latest answered round trip.
+        p50: The median round trip in the window.
+        p99: The 99th percentile round trip in the window.
+        jitter: How much one round trip differs from the one before, smoothed
+            the way RFC 3550 smooths packet jitter.
+    """
+
+    health: Health
+    sent: int
+    lost: int
+    loss: float
+    last: float | None
+    p50: float | None
+    p99: float | None
+    jitter: float | None
+
+
+class LatencyMonitor:
+    """Ping a socket on a schedule, and keep what the answers say.
+
+    The monitor runs while it is entered, against a socket that is open. A
+    ping that is not answered within *timeout* counts as lost, and so does
+    one that cannot be sent because the connection is down — a socket built
+    with ``reconnect=True`` goes on being pinged while it reconnects, and
+    recovers its verdict once it is back. Nothing a ping raises reaches the
+    socket's own ``async with``: a broken connection is still the socket's to
+    report.
+
+    Usage:
+
+        async with kvm.ws() as ws, LatencyMonitor(ws) as latency:
+            ...
+            if latency.health in ("stalled", "down"):
+                route_elsewhere()
+            print(latency.stats().p99)
+    """
+
+    def __init__(
+        self,
+        ws: PiKVMWebSocket,
+        *,
+        interval: float = 1.0,
+        timeout: float = 2.0,
+        window: int = 60,
+        degraded: float = 0.25,
+        stalled: float = 1.0,
+        max_loss: float = 0.2,
+        down_after: int = 3,
+        on_change: Callable[[LatencyStats], object] | None = None,
+    ) -> None:
+        """Prepare a monitor; nothing is sent until it is entered.
+
+        Args:
+            ws: The socket to ping.
+            interval: Seconds from the start of one ping to the start of the
+                next. A ping that takes longer delays the next one.
+            timeout: Seconds a ping may take before it counts as lost.
+            window: Pings the verdict, the percentiles, the loss and the
+                jitter are worked out over.
+            degraded: A p99, in seconds, that makes the device
+                ``"degraded"``.
+            stalled: A p99, in seconds, that makes it ``"stalled"``.
+            max_loss: The fraction of lost pings that makes it ``"stalled"``.
+            down_after: How many pings in a row have to be lost for it to be
+                ``"down"``.
+            on_change: Called with the new [`LatencyStats`][aiopikvm.LatencyStats]
+                whenever the verdict changes. What it raises is logged and
+                ignored.
+
+        Raises:
+            ConfigurationError: A setting cannot produce a verdict.
+        """
+        if min(interval, timeout, degraded) <= 0:
+            raise ConfigurationError("interval, timeout and degraded must be positive")
+        if stalled < degraded:
+            raise ConfigurationError(
+                f"stalled {stalled} is less than degraded {degraded}"
+            )
+        if not 0 < max_loss <= 1:
+            raise ConfigurationError(f"max_loss must be in (0, 1], not {max_loss}")
+        if not 1 <= down_after <= window:
+            raise ConfigurationError("down_after must be between 1 and window")
+        self._ws = ws
+        self._interval = interval
+        self._timeout = timeout
+        self._degraded = degraded
+        self._stalled = stalled
+        self._max_loss = max_loss
+        self._down_after = down_after
+        self._on_change = on_change
+        self._histogram = LatencyHistogram()
+        # The latest pings, oldest first; ``None`` for one that was lost.
+        self._window: deque[float | None] = deque(maxlen=window)
+        self._jitter: float | None = None
+        self._previous: float | None = None
+        self._health: Health = "unknown"
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def histogram(self) -> LatencyHistogram:
+        """Every answered round trip since the monitor was made."""
+        return self._histogram
+
+    @property
+    def health(self) -> Health:
+        """The verdict as of the latest ping."""
+        return self._health
+
+    def stats(self) -> LatencyStats:
+        """Work out the figures for the pings in the window.
+
+        Returns:
+            The verdict and the numbers behind it.
+        """
+        answered = sorted(rtt for rtt in self._window if rtt is not None)
+        sent = len(self._window)
+        lost = sent - len(answered)
+        return LatencyStats(
+            health=self._health,
+            sent=sent,
+            lost=lost,
+            loss=lost / sent if sent else 0.0,
+            last=self._previous,
+            p50=_nearest_rank(answered, 50),
+            p99=_nearest_rank(answered, 99),
+            jitter=self._jitter,
+        )
+
+    async def __aenter__(self) -> Self:
+        """Start pinging.
+
+        Returns:
+            This monitor.
+
+        Raises:
+            ConfigurationError: The monitor is running already.
+        """
+        if self._task is not None:
+            raise ConfigurationError("The monitor is running already")
+        self._task = asyncio.get_running_loop().create_task(
+            self._run(), name="aiopikvm-latency"
+        )
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Stop pinging; the figures stay readable.
+
+        Args:
+            exc_type: Type of the exception the block raised, if any.
+            exc_val: The exception the block raised, if any.
+            exc_tb: Traceback of that exception, if any.
+        """
+        task = self._task
+        self._task = None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    async def _run(self) -> None:
+        """Ping every *interval* until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await self._sample()
+            await asyncio.sleep(max(0.0, started + self._interval - loop.time()))
+
+    async def _sample(self) -> None:
+        """Send one ping and file its answer, or its loss."""
+        reported = self._ws._reported
+        try:
+            rtt = await self._ws.ping(timeout=self._timeout)
+        except WebSocketError as exc:
+            # Whether the connection broke is the socket's to report, to
+            # whoever holds it open; a ping made on the side does not count.
+            self._ws._reported = reported
+            logger.debug("Latency ping lost: %s", exc)
+            self._observe(None)
+        else:
+            self._observe(rtt)
+
+    def _observe(self, rtt: float | None) -> None:
+        """File one ping, and tell *on_change* if the verdict moved."""
+        self._window.append(rtt)
+        if rtt is not None:
+            self._histogram.record(rtt)
+            if self._previous is not None:
+                difference = abs(rtt - self._previous)
+                jitter = self._jitter or 0.0
+                self._jitter = jitter + (difference - jitter) * _JITTER_GAIN
+            self._previous = rtt
+        stats = self.stats()
+        health = self._verdict(stats)
+        if health == self._health:
+            return
+        logger.info("kvmd loop is %s (was %s)", health, self._health)
+        self._health = health
+        if self._on_change is not None:
+            try:
+                self._on_change(dataclasses.replace(stats, health=health))
+            except Exception:
+                logger.exception("on_change raised; ignoring it")
+
+    def _verdict(self, stats: LatencyStats) -> Health:
+        """Judge the window."""
+        recent = list(self._window)[-self._down_after :]
+        if len(recent) == self._down_after and all(rtt is None for rtt in recent):
+            return "down"
+        if not stats.sent:
+            return "unknown"
+        p99 = stats.p99 or 0.0
+        if p99 >= self._stalled or stats.loss >= self._max_loss:
+            return "stalled"
+        if p99 >= self._degraded or stats.lost:
+            return "degraded"
+        return "healthy"
+
+
+def _bucket(value: int) -> int:
+    """The bucket of a value in microseconds."""
+    shift = max(0, value.bit_length() - _SUB_BITS)
+    if not shift:
+        return value
+    return shift * _HALF + (value >> shift)
+
+
+def _upper(index: int) -> int:
+    """The largest value, in microseconds, that falls in a bucket."""
+    if index < 2 * _HALF:
+        return index
+    shift = index // _HALF - 1
+    return ((index - shift * _HALF + 1) << shift) - 1
+
+
+def _nearest_rank(ordered: list[float], percent: float) -> float | None:
+    """A percentile of sorted values, by the nearest-rank method."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(len(ordered) * percent / 100) - 1)]
@@ -0,0 +1,569 @@
+"""Waiting for a picture to appear on the screen.
+
+"Wait until this dialog is up" comes down to looking at frame after frame for
+a small reference picture, wherever on the screen it lands.
+[`ImageMatcher`][aiopikvm.ImageMatcher] does the looking with normalised
+cross-correlation, which scores every position from -1 to 1 by how closely
+the pixels there follow the template's, whatever the brightness and contrast.
+A score near 1 is the template.
+
+Scoring a whole 1080p frame against a template at every pixel would take
+seconds, so three things cut it down. Frames are decoded at a reduced
+*scale*, which a JPEG decoder does almost for free by skipping the finer
+coefficients. Only the *region* asked about is searched. And the search runs
+over a pyramid: the frame and the template halved a few times over, every
+position scored at the coarsest level, where there are few, and only the best
+few followed back up to full detail. The correlation itself is an FFT and a
+pair of summed-area tables in NumPy, in a worker process, so the event loop
+carries on.
+
+Frames arrive faster than they can be searched. The matcher never queues
+them: whenever it is ready it takes the newest and drops what came before, so
+it is never looking at a screen older than the last search took.
+
+This needs NumPy and Pillow: ``pip install 'aiopikvm[vision]'``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import contextlib
+import dataclasses
+import io
+import math
+import os
+from collections.abc import AsyncGenerator, AsyncIterator, Mapping
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from aiopikvm._constants import FrameSource
+from aiopikvm._deadline import _remaining
+from aiopikvm._exceptions import ConfigurationError
+from aiopikvm._pool import _PoolOwner
+from aiopikvm.models.streamer import SnapshotImage
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+    from aiopikvm._client import PiKVM
+
+_KEY = "aiopikvm-image-matcher"
+"""The name the matcher's MJPEG stream goes by in ustreamer's ``clients_stat``."""
+
+_MIN_SIDE = 8
+"""The smallest a template may get at the top of its pyramid, in pixels.
+
+Below this a template is a smudge that correlates with anything.
+"""
+
+_CANDIDATES = 8
+"""How many places found at the coarsest level are followed down the pyramid."""
+
+_SLACK = 0.2
+"""How far below the threshold a coarse score may be and still be followed.
+
+Halving blurs, and a true match scores lower at the top of the pyramid than
+at its base; without slack the coarse pass would throw it away.
+"""
+
+_REACH = 2
+"""Pixels either side of a doubled position searched at each finer level."""
+
+type _Region = tuple[int, int, int, int]
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ImageMatch:
+    """Where a template was found on the screen.
+
+    Attributes:
+        template: The name the template was given.
+        score: Normalised cross-correlation at the match, up to 1.0.
+        left: Left edge of the match, in screen pixels.
+        top: Top edge of the match, in screen pixels.
+        width: Width of the template, in screen pixels.
+        height: Height of the template, in screen pixels.
+    """
+
+    template: str
+    score: float
+    left: int
+    top: int
+    width: int
+    height: int
+
+    @property
+    def center(self) -> tuple[int, int]:
+        """The middle of the match, in screen pixels, to point the mouse at."""
+        return (self.left + self.width // 2, self.top + self.height // 2)
+
+
+class _Template(NamedTuple):
+    """A template ready to search for."""
+
+    name: str
+    size: tuple[int, int]
+    """Width and height on the screen, before scaling."""
+    pyramid: list[NDArray[Any]]
+    """The template at *scale*, then halved, as many times as it stays usable."""
+
+
+class ImageMatcher(_PoolOwner):
+    """Look for reference pictures on a device's screen.
+
+    The templates are pictures cut from the screen at its own resolution —
+    a crop of a snapshot is the surest source. They are decoded, scaled and
+    prepared once, here; each frame is then searched for all of them, and the
+    best score above *threshold* wins.
+
+    [`wait_for_image()`][aiopikvm.ImageMatcher.wait_for_image] searches
+    frames until one matches, [`find()`][aiopikvm.ImageMatcher.find] searches
+    one picture already in hand. The search runs in a process pool of one,
+    since frames are searched one at a time; pass *executor* to share a pool.
+
+    Usage:
+
+        async with ImageMatcher({"ok": Path("ok-button.png")}) as matcher:
+            found = await matcher.wait_for_image(kvm, timeout=60)
+            if found is not None:
+                await kvm.input.move_along([found.center])
+    """
+
+    def __init__(
+        self,
+        templates: Mapping[str, bytes | str | os.PathLike[str]],
+        *,
+        threshold: float = 0.9,
+        scale: float = 0.5,
+        levels: int = 3,
+        region: tuple[int, int, int, int] | None = None,
+        executor: concurrent.futures.Executor | None = None,
+    ) -> None:
+        """Prepare the templates.
+
+        Args:
+            templates: Pictures to look for, by the name a match reports:
+                the encoded image, or a path to it, in any format Pillow
+                reads.
+            threshold: The score a match must reach, up to 1.0. Lower finds
+                a template drawn slightly differently, and more that is not
+                it.
+            scale: What frames and templates are scaled to before searching,
+                above 0 and at most 1. Half is four times less work than
+                full size and loses little but the finest detail.
+            levels: How many levels the pyramid has at most, the scaled
+                picture included; 1 searches every position at *scale*.
+            region: ``(left, top, right, bottom)`` of the part of the screen
+                to search, in screen pixels; ``None`` for all of it. The
+                part outside a frame is left out, and a frame the region
+                lies wholly outside of, after the host has changed to a
+                lower resolution, has no match.
+            executor: Where searches run; ``None`` starts a process pool of
+                the matcher's own.
+
+        Raises:
+            ConfigurationError: NumPy or Pillow is not installed, there are
+                no templates, one cannot be read, or a setting is out of
+                range.
+        """
+        _numpy()
+        if not templates:
+            raise ConfigurationError("An ImageMatcher needs at least one template")
+        if not 0 < threshold <= 1:
+            raise ConfigurationError(
+                f"threshold must be above 0 and at most 1, not {threshold}"
+            )
+        if not 0 < scale <= 1:
+            raise ConfigurationError(
+                f"scale must be above 0 and at most 1, not {scale}"
+            )
+        if levels < 1:
+            raise ConfigurationError(f"levels must be at least 1, not {levels}")
+        if region is not None and not (
+            0 <= region[0] < region[2] and 0 <= region[1] < region[3]
+        ):
+            raise ConfigurationError(
+                f"region must be (left, top, right, bottom) with something "
+                f"inside it, not {region}"
+            )
+        self._threshold = threshold
+        self._scale = scale
+        self._region = region
+        self._templates = [
+            _prepare(name, source, scale, levels) for name, source in templates.items()
+        ]
+        # One process: frames are searched one at a time.
+        self._use_pool(executor, 1)
+        self.frames = 0
+        """Frames that have arrived, searched or not."""
+        self.searched = 0
+        """Frames that were searched; the rest were dropped as stale."""
+
+    async def find(self, image: SnapshotImage | bytes) -> ImageMatch | None:
+        """Search one picture for the templates.
+
+        Args:
+            image: A snapshot or frame, or the encoded bytes of one.
+
+        Returns:
+            The best match at or above the threshold, or ``None``.
+        """
+        data = image.data if isinstance(image, SnapshotImage) else image
+        loop = asyncio.get_running_loop()
+        self.searched += 1
+        return await loop.run_in_executor(
+            self._pool(),
+            _find,
+            data,
+            self._templates,
+            self._scale,
+            self._region,
+            self._threshold,
+        )
+
+    async def wait_for_image(
+        self,
+        client: PiKVM,
+        *,
+        timeout: float = 30.0,
+        source: FrameSource = "mjpeg",
+    ) -> ImageMatch | None:
+        """Search frame after frame until a template turns up.
+
+        With the ``"mjpeg"`` source, keep a [`hub`][aiopikvm.PiKVM.hub] or
+        [`ws()`][aiopikvm.PiKVM.ws] open around the call: kvmd runs the
+        streamer only while a session asks for video. Inside a
+        [`deadline()`][aiopikvm.PiKVM.deadline], the wait ends at whichever
+        comes first.
+
+        Args:
+            client: The device whose screen is watched.
+            timeout: Seconds to wait for a match.
+            source: Where frames come from; see
+                [`FrameSource`][aiopikvm.FrameSource].
+
+        Returns:
+            The first match, or ``None`` if none came in time.
+
+        Raises:
+            ConfigurationError: *source* is not one this method knows.
+            PiKVMError: The stream or a snapshot failed.
+        """
+        frames: AsyncGenerator[bytes]
+        if source == "mjpeg":
+            frames = self._newest(
+                frame.data async for frame in client.streamer.mjpeg(key=_KEY)
+            )
+        elif source == "snapshot":
+            frames = self._snapshots(client)
+        else:
+            raise ConfigurationError(
+                f"Unknown frame source {source!r}; use 'mjpeg' or 'snapshot'"
+            )
+        remaining = _remaining()
+        budget = timeout if remaining is None else min(timeout, max(remaining, 0))
+        try:
+            async with contextlib.aclosing(frames), asyncio.timeout(budget):
+                async for data in frames:
+                    found = await self.find(data)
+                    if found is not None:
+                        return found
+        except TimeoutError:
+            return None
+        return None
+
+    async def _newest(self, source: AsyncIterator[bytes]) -> AsyncGenerator[bytes]:
+        """Hand out only the newest frame each time one is asked for.
+
+        The source is read in a task of its own as fast as it delivers, each
+        frame replacing the one before, so a slow consumer skips frames
+        rather than falling behind. An error that ends the source is raised
+        once the frame before it has been handed out.
+        """
+        newest: list[bytes] = []
+        arrived = asyncio.Event()
+
+        async def read() -> None:
+            try:
+                async for data in source:
+                    self.frames += 1
+                    newest[:] = [data]
+                    arrived.set()
+            finally:
+                arrived.set()
+
+        reader = asyncio.get_running_loop().create_task(
+            read(), name="aiopikvm-image-frames"
+        )
+        try:
+            while True:
+                if not newest and not reader.done():
+                    arrived.clear()
+                    await arrived.wait()
+                if newest:
+                    yield newest.pop()
+                elif reader.done():
+                    reader.result()
+                    return
+        finally:
+            reader.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await reader
+
+    async def _snapshots(self, client: PiKVM) -> AsyncGenerator[bytes]:
+        """Take a snapshot each time one is asked for."""
+        while True:
+            image = await client.streamer.snapshot(allow_offline=True)
+            self.frames += 1
+            yield image.data
+
+
+def _numpy() -> None:
+    """Make sure NumPy and Pillow can be imported, before anything is read.
+
+    Raises:
+        ConfigurationError: Either is not installed.
+    """
+    try:
+        import numpy  # noqa: F401
+        import PIL.Image  # noqa: F401
+    except ImportError as exc:
+        raise ConfigurationError(
+            "ImageMatcher needs NumPy and Pillow, which aiopikvm does not "
+            f"install by default: pip install 'aiopikvm[vision]'. ({exc})"
+        ) from exc
+
+
+def _prepare(
+    name: str, source: bytes | str | os.PathLike[str], scale: float, levels: int
+) -> _Template:
+    """Decode a template, scale it and build its pyramid.
+
+    Raises:
+        ConfigurationError: The template cannot be read, or is too small to
+            search for at *scale*.
+    """
+    import numpy as np
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(
+            io.BytesIO(source) if isinstance(source, bytes) else source
+        ) as image:
+            size = image.size
+            scaled = image.convert("L").resize(
+                _scaled(size, scale), Image.Resampling.BOX
+            )
+    except (OSError, UnidentifiedImageError) as exc:
+        raise ConfigurationError(f"Cannot read template {name!r}: {exc}") from exc
+    pyramid = [_soften(np.asarray(scaled, dtype=np.float64))]
+    if min(pyramid[0].shape) < _MIN_SIDE:
+        raise ConfigurationError(
+            f"Template {name!r} is {size[0]}x{size[1]}, which is under "
+            f"{_MIN_SIDE} pixels a side at scale {scale}"
+        )
+    while len(pyramid) < levels and min(pyramid[-1].shape) >= 2 * _MIN_SIDE:
+        pyramid.append(_halve(pyramid[-1]))
+    return _Template(name, size, pyramid)
+
+
+def _scaled(size: tuple[int, int], scale: float) -> tuple[int, int]:
+    """A width and height multiplied by *scale*, at least a pixel each."""
+    return (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+
+
+def _soften(image: NDArray[Any]) -> NDArray[Any]:
+    """Blur a picture by a pixel, with a 1-2-1 kernel each way.
+
+    Scaling by half puts a template that lands on an odd screen pixel half a
+    pixel off the grid it was scaled on. A one-pixel line then scores well
+    short of a match however exact the copy; blurring frame and template
+    alike brings it back above the threshold, while text that differs still
+    scores well below it.
+    """
+    import numpy as np
+
+    padded = np.pad(image, 1, mode="edge")
+    rows = (padded[:-2] + 2 * padded[1:-1] + padded[2:]) / 4
+    softened: NDArray[Any] = (rows[:, :-2] + 2 * rows[:, 1:-1] + rows[:, 2:]) / 4
+    return softened
+
+
+def _halve(image: NDArray[Any]) -> NDArray[Any]:
+    """Average each 2x2 block into a pixel, dropping an odd row or column."""
+    (height, width) = (image.shape[0] // 2, image.shape[1] // 2)
+    blocks = image[: height * 2, : width * 2].reshape(height, 2, width, 2)
+    halved: NDArray[Any] = blocks.mean(axis=(1, 3))
+    return halved
+
+
+def _ncc(image: NDArray[Any], template: NDArray[Any]) -> NDArray[Any]:
+    """Score every position of *template* over *image*.
+
+    The correlation with the zero-mean template is one FFT product; the
+    image's window sums, which normalise it, come from summed-area tables.
+
+    Returns:
+        Scores from -1 to 1, one per position where the template fits
+        whole: ``image.shape - template.shape + 1`` of them. A window or a
+        template with no contrast at all scores 0.
+    """
+    import numpy as np
+
+    (height, width) = image.shape
+    (h, w) = template.shape
+    if height < h or width < w:
+        return np.empty((0, 0))
+    shape = (height - h + 1, width - w + 1)
+    zero_mean = template - template.mean()
+    norm = math.sqrt(float((zero_mean * zero_mean).sum()))
+    if norm < 1e-6:
+        return np.zeros(shape)
+    spectrum = np.fft.rfft2(image) * np.conj(np.fft.rfft2(zero_mean, s=image.shape))
+    # Circular correlation, but no window that fits whole wraps around.
+    correlation = np.fft.irfft2(spectrum, s=image.shape)[: shape[0], : shape[1]]
+    count = h * w
+    sums = _window_sums(image, h, w)
+    squares = _window_sums(image * image, h, w)
+    variance = np.maximum(squares - sums * sums / count, 0.0)
+    deviation = np.sqrt(variance)
+    # Windows flatter than a hundredth of a grey level are noise in the sums.
+    flat = deviation < 0.01 * math.sqrt(count)
+    scores = correlation / np.where(flat, 1.0, deviation * norm)
+    scores[flat] = 0.0
+    clipped: NDArray[Any] = np.clip(scores, -1.0, 1.0)
+    return clipped
+
+
+def _window_sums(image: NDArray[Any], h: int, w: int) -> NDArray[Any]:
+    """The sum of every *h* by *w* window, from a summed-area table."""
+    import numpy as np
+
+    table = np.zeros((image.shape[0] + 1, image.shape[1] + 1))
+    table[1:, 1:] = image.cumsum(axis=0).cumsum(axis=1)
+    sums: NDArray[Any] = (
+        table[h:, w:] - table[:-h, w:] - table[h:, :-w] + table[:-h, :-w]
+    )
+    return sums
+
+
+def _search(
+    pyramid: list[NDArray[Any]], template: _Template, floor: float
+) -> tuple[float, int, int] | None:
+    """Find a template in a frame's pyramid, coarsest level first.
+
+    Args:
+        pyramid: The frame at each level, the scaled frame first.
+        template: What to look for.
+        floor: The score the match must reach at the finest level.
+
+    Returns:
+        ``(score, x, y)`` of the best match at the finest level, or ``None``
+        if nothing reached *floor*.
+    """
+    import numpy as np
+
+    top = min(len(template.pyramid), len(pyramid)) - 1
+    scores = _ncc(pyramid[top], template.pyramid[top])
+    if scores.size == 0:
+        return None
+    flat = scores.ravel()
+    order = np.argsort(flat)[::-1]
+    coarse_floor = floor - _SLACK if top else floor
+    (h, w) = template.pyramid[top].shape
+    candidates: list[tuple[int, int]] = []
+    for index in order:
+        if flat[index] < coarse_floor or len(candidates) == _CANDIDATES:
+            break
+        (y, x) = divmod(int(index), scores.shape[1])
+        # Neighbours of a peak are the same place, not another candidate.
+        if all(abs(y - cy) >= h // 2 or abs(x - cx) >= w // 2 for cy, cx in candidates):
+            candidates.append((y, x))
+    best: tuple[float, int, int] | None = None
+    for y, x in candidates:
+        score = float(scores[y, x])
+        for level in range(top - 1, -1, -1):
+            (score, y, x) = _refine(
+                pyramid[level], template.pyramid[level], y * 2, x * 2
+            )
+        if score >= floor and (best is None or score > best[0]):
+            best = (score, x, y)
+    return best
+
+
+def _refine(
+    image: NDArray[Any], template: NDArray[Any], y: int, x: int
+) -> tuple[float, int, int]:
+    """The best position within ``_REACH`` pixels of ``(x, y)``, and its score."""
+    import numpy as np
+
+    (h, w) = template.shape
+    top = max(0, y - _REACH)
+    left = max(0, x - _REACH)
+    bottom = min(image.shape[0] - h, y + _REACH)
+    right = min(image.shape[1] - w, x + _REACH)
+    if bottom < top or right < left:
+        return (-1.0, y, x)
+    scores = _ncc(image[top : bottom + h, left : right + w], template)
+    (dy, dx) = np.unravel_index(int(np.argmax(scores)), scores.shape)
+    return (float(scores[dy, dx]), top + int(dy), left + int(dx))
+
+
+def _find(
+    data: bytes,
+    templates: list[_Template],
+    scale: float,
+    region: _Region | None,
+    threshold: float,
+) -> ImageMatch | None:
+    """Decode a frame at *scale* and search it for each template.
+
+    Runs in a worker process. JPEG frames are decoded at the nearest size the
+    decoder can reach by itself, which is most of the saving, then brought to
+    *scale* exactly.
+
+    Returns:
+        The best match at or above *threshold*, in screen pixels, or
+        ``None``. Also ``None`` when *region* lies wholly outside the frame.
+    """
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        size = image.size
+        target = _scaled(size, scale)
+        image.draft("L", target)
+        frame = image.convert("L")
+        if frame.size != target:
+            frame = frame.resize(target, Image.Resampling.BOX)
+    pixels = np.asarray(frame, dtype=np.float64)
+    (left, top) = (0, 0)
+    if region is not None:
+        # The region is in the pixels of the screen it was written for. The
+        # host may have changed resolution since, so bound it to this frame.
+        (height, width) = pixels.shape
+        (left, top, right, bottom) = (round(edge * scale) for edge in region)
+        (left, right) = (min(left, width), min(right, width))
+        (top, bottom) = (min(top, height), min(bottom, height))
+        if left >= right or top >= bottom:
+            return None
+        pixels = pixels[top:bottom, left:right]
+    pixels = _soften(pixels)
+    levels = max(len(template.pyramid) for template in templates)
+    pyramid = [pixels]
+    while len(pyramid) < levels and min(pyramid[-1].shape) >= 2:
+        pyramid.append(_halve(pyramid[-1]))
+    best: ImageMatch | None = None
+    for template in templates:
+        found = _search(pyramid, template, threshold)
+        if found is None or (best is not None and found[0] <= best.score):
+            continue
+        (score, x, y) = found
+        best = ImageMatch(
+            template.name,
+            score,
+            round((left + x) / scale),
+            round((top + y) / scale),
+            *template.size,
+        )
+    return best
@@ -37,6 +37,7 @@ from aiopikvm._exceptions import (
     WebSocketError,
 )
 from aiopikvm._tls import CertTypes, VerifyTypes, build_ssl_context
+from aiopikvm._tracing import Tracer, _server, _trace_frame
 from aiopikvm._ws import _Connector, _credential_headers, _handshake_error, _ws_url
 from aiopikvm.models.media import MediaFrame, MediaState
 
@@ -105,6 +106,7 @@ class MediaWebSocket:
         max_queue: int | None = None,
         ping_interval: float | None = 20.0,
         ping_timeout: float | None = 20.0,
+        tracer: Tracer | None = None,
     ) -> None:
         """Prepare a connection.
 
@@ -150,6 +152,8 @@ class MediaWebSocket:
                 ``None`` to send none.
             ping_timeout: Seconds to wait for a keepalive pong before
                 declaring the link dead, ``None`` to wait forever.
+            tracer: Told about every frame sent and read, as socket
+                ``"media"``; see [`Tracer.ws_frame()`][aiopikvm.Tracer.ws_frame].
 
         Raises:
             ConfigurationError: If the URL scheme is not ``https`` or ``http``.
@@ -174,6 +178,8 @@ class MediaWebSocket:
         self._max_queue = _MEDIA_MAX_QUEUE if max_queue is None else max_queue
         self._ping_interval = ping_interval
         self._ping_timeout = ping_timeout
+        self._tracer = tracer
+        self._server = _server(url)
         self._connection: websockets.asyncio.client.ClientConnection | None = None
         self._media: MediaState | None = None
 
@@ -454,13 +460,16 @@ class MediaWebSocket:
         if self._connection is None:
             raise WebSocketError("Not connected")
         try:
-            return await self._connection.recv()
+            message = await self._connection.recv()
         except websockets.exceptions.ConnectionClosedOK as exc:
             raise _Closed from exc
         except websockets.exceptions.ConnectionClosed as exc:
             raise WebSocketError(f"Connection lost while reading video: {exc}") from exc
         except websockets.exceptions.WebSocketException as exc:
             raise WebSocketError(f"Failed to read from the socket: {exc}") from exc
+        if self._tracer is not None:
+            _trace_frame(self._tracer, self._server, "media", "in", message)
+        return message
 
     async def _send(self, frame: str | bytes, what: str) -> None:
         """Send one frame, whichever encoding it is in.
@@ -479,6 +488,8 @@ class MediaWebSocket:
             await self._connection.send(frame)
         except websockets.exceptions.WebSocketException as exc:
             raise WebSocketError(f"Failed to send {what}: {exc}") from exc
+        if self._tracer is not None:
+            _trace_frame(self._tracer, self._server, "media", "out", frame, what)
 
     def _route(self, message: str | bytes) -> MediaFrame | None:
         """Turn one message into a frame, or consume it.
@@ -0,0 +1,295 @@
+"""Counters the client keeps about itself, in Prometheus's text format.
+
+Every [`PiKVM`][aiopikvm.PiKVM] has a
+[`ClientMetrics`][aiopikvm.ClientMetrics] on
+[`metrics`][aiopikvm.PiKVM.metrics], filled whether or not anything reads it.
+[`render()`][aiopikvm.ClientMetrics.render] turns it into the same exposition
+format that
+[`get_metrics()`][aiopikvm.resources.prometheus.PrometheusResource.get_metrics]
+returns for the device, so a controller can serve the two side by side: what
+the PiKVM says about itself, and what talking to it has been like.
+
+It is a handful of dicts and lists of integers, written only from the event
+loop the client runs on. There are no locks because there is nothing to race:
+one thread writes, and every write is a single step between two awaits. A
+reader on another thread — an exporter's HTTP server, say — gets a consistent
+enough picture as well, since each table is copied in one call that the GIL
+does not interrupt; a scrape can land between two updates of one request, and
+Prometheus tolerates that by design.
+
+Unlike a [`Tracer`][aiopikvm.Tracer] this is always on, so it keeps only
+what costs an addition to keep: no records, no per-frame work on the media
+socket.
+"""
+
+from __future__ import annotations
+
+import bisect
+import re
+import time
+
+from aiopikvm._exceptions import PiKVMError
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""Upper bounds of the latency histogram, in seconds.
+
+Prometheus's own client defaults. A state call to a PiKVM on the same network
+lands in the first few; the top end is the client's default timeout.
+"""
+
+_TEMPLATES = (
+    (
+        re.compile(r"/api/redfish/v1/Systems/[^/]+"),
+        "/api/redfish/v1/Systems/{system_id}",
+    ),
+    (
+        re.compile(r"/api/redfish/v1/Systems/[^/]+/Actions/ComputerSystem\.Reset"),
+        "/api/redfish/v1/Systems/{system_id}/Actions/ComputerSystem.Reset",
+    ),
+)
+"""Paths with an identifier in them, and the route each is counted under."""
+
+_ROUTE = re.compile(r"/(?:api|streamer)(?:/[a-z_]+)*/?|/api/redfish/v1(?:/[A-Za-z]+)*")
+"""What a route of kvmd, ustreamer or kvmd's Redfish looks like.
+
+kvmd and ustreamer name theirs in lower-case words, Redfish in letters; an
+identifier has digits, dots or dashes in it, or sits under a prefix the
+client never calls. A path that matches is its own label.
+"""
+
+_OTHER = "other"
+"""The label every path that is not a known route is counted under."""
+
+type _Histogram = list[float]
+"""One histogram: a count per bucket, then ``+Inf``, then the sum."""
+
+
+class ClientMetrics:
+    """What this client has seen, kept as counters and histograms.
+
+    Families, as [`render()`][aiopikvm.ClientMetrics.render] names them:
+
+    - ``aiopikvm_request_duration_seconds``: histogram of request latency by
+      ``method`` and ``endpoint``, the route the path belongs to: the path
+      without its query string, a Redfish system id replaced by
+      ``{system_id}``, and anything that is not a kvmd, ustreamer or Redfish
+      route counted as ``other``, so that no path can add series without
+      bound. A streaming request is timed to its response headers; the rest
+      of the stream is in the byte counter below.
+    - ``aiopikvm_request_errors_total``: failed requests by ``error``, the
+      name of the [`PiKVMError`][aiopikvm.PiKVMError] subclass raised.
+    - ``aiopikvm_stream_bytes_total``: body bytes moved by ``stream``:
+      ``mjpeg`` and ``download`` as they are read, ``upload`` once kvmd has
+      accepted the image.
+    - ``aiopikvm_ws_events_total``: events read off
+      [`ws()`][aiopikvm.PiKVM.ws] sockets, by ``event_type``.
+    - ``aiopikvm_ws_dropped_events_total``: events the socket's buffer let go
+      of because nothing was reading
+      [`events()`][aiopikvm.PiKVMWebSocket.events].
+    - ``aiopikvm_webrtc_dropped_frames_total``: decoded frames a
+      [`WebRTCSession`][aiopikvm.WebRTCSession] let go of, by ``kind``.
+
+    The counters only grow, for the life of the client; they are not reset
+    when it closes, so the last scrape after a shutdown still adds up.
+    """
+
+    def __init__(self) -> None:
+        """Start every counter at zero."""
+        self._latency: dict[tuple[str, str], _Histogram] = {}
+        self._errors: dict[str, int] = {}
+        self._stream_bytes: dict[str, int] = {}
+        self._events: dict[str, int] = {}
+        self._dropped_events = 0
+        self._dropped_frames: dict[str, int] = {}
+
+    # --- Reading ---------------------------------------------------------
+
+    @property
+    def errors(self) -> dict[str, int]:
+        """Failed requests so far, by exception class name."""
+        return self._errors.copy()
+
+    @property
+    def stream_bytes(self) -> dict[str, int]:
+        """Body bytes moved so far, by ``"mjpeg"``, ``"download"`` and ``"upload"``."""
+        return self._stream_bytes.copy()
+
+    @property
+    def events(self) -> dict[str, int]:
+        """WebSocket events read so far, by ``event_type``."""
+        return self._events.copy()
+
+    @property
+    def dropped_events(self) -> int:
+        """WebSocket events dropped from a full buffer so far."""
+        return self._dropped_events
+
+    @property
+    def dropped_frames(self) -> dict[str, int]:
+        """WebRTC frames dropped so far, by ``"video"`` and ``"audio"``."""
+        return self._dropped_frames.copy()
+
+    def requests(self, method: str, endpoint: str) -> int:
+        """How many requests to one endpoint have been timed.
+
+        Args:
+            method: HTTP method, upper case.
+            endpoint: URL path, as passed to the client, or the route it is
+                counted under.
+
+        Returns:
+            The count for the route the path belongs to, ``0`` for one never
+            called.
+        """
+        histogram = self._latency.get((method, _endpoint(endpoint)))
+        return 0 if histogram is None else int(sum(histogram[:-1]))
+
+    def render(self) -> str:
+        """Render everything in Prometheus's text exposition format.
+
+        Returns:
+            The exposition, ``# HELP`` and ``# TYPE`` lines included and a
+            family left out until it has something in it.
+        """
+        lines: list[str] = []
+        latency = self._latency.copy()
+        if latency:
+            lines += _family(
+                "aiopikvm_request_duration_seconds",
+                "histogram",
+                "Latency of requests to PiKVM.",
+            )
+            for (method, endpoint), histogram in sorted(latency.items()):
+                lines += _histogram(
+                    "aiopikvm_request_duration_seconds",
+                    f'method="{_escape(method)}",endpoint="{_escape(endpoint)}"',
+                    list(histogram),
+                )
+        lines += _counter(
+            "aiopikvm_request_errors_total",
+            "Failed requests, by exception class.",
+            "error",
+            self._errors.copy(),
+        )
+        lines += _counter(
+            "aiopikvm_stream_bytes_total",
+            "Body bytes streamed, by operation.",
+            "stream",
+            self._stream_bytes.copy(),
+        )
+        lines += _counter(
+            "aiopikvm_ws_events_total",
+            "WebSocket events received, by event type.",
+            "event_type",
+            self._events.copy(),
+        )
+        if self._dropped_events:
+            lines += _family(
+                "aiopikvm_ws_dropped_events_total",
+                "counter",
+                "WebSocket events dropped from a full buffer.",
+            )
+            lines.append(f"aiopikvm_ws_dropped_events_total {self._dropped_events}")
+        lines += _counter(
+            "aiopikvm_webrtc_dropped_frames_total",
+            "Decoded WebRTC frames dropped from a full buffer, by kind.",
+            "kind",
+            self._dropped_frames.copy(),
+        )
+        return "".join(f"{line}\n" for line in lines)
+
+    # --- Recording -------------------------------------------------------
+
+    def _request(
+        self, method: str, endpoint: str, started: float, error: BaseException | None
+    ) -> None:
+        """Time one request and count it if it failed.
+
+        Args:
+            method: HTTP method.
+            endpoint: URL path; it is counted under its route.
+            started: `time.monotonic()` when it was sent.
+            error: What it failed with, ``None`` if it did not. Anything but a
+                [`PiKVMError`][aiopikvm.PiKVMError] — a cancellation — is
+                neither timed nor counted: it says nothing about the device.
+        """
+        if error is not None:
+            if not isinstance(error, PiKVMError):
+                return
+            name = type(error).__name__
+            self._errors[name] = self._errors.get(name, 0) + 1
+        elapsed = time.monotonic() - started
+        key = (method, _endpoint(endpoint))
+        histogram = self._latency.get(key)
+        if histogram is None:
+            histogram = self._latency[key] = [0.0] * (len(_BUCKETS) + 2)
+        histogram[bisect.bisect_left(_BUCKETS, elapsed)] += 1
+        histogram[-1] += elapsed
+
+    def _bytes(self, stream: str, size: int) -> None:
+        """Count body bytes moved by one streaming operation."""
+        self._stream_bytes[stream] = self._stream_bytes.get(stream, 0) + size
+
+    def _event(self, event_type: object) -> None:
+        """Count one WebSocket event; one with no string type is not counted."""
+        if isinstance(event_type, str):
+            self._events[event_type] = self._events.get(event_type, 0) + 1
+
+    def _dropped_event(self) -> None:
+        """Count one event dropped from a full WebSocket buffer."""
+        self._dropped_events += 1
+
+    def _dropped_frame(self, kind: str) -> None:
+        """Count one decoded frame dropped from a full WebRTC buffer."""
+        self._dropped_frames[kind] = self._dropped_frames.get(kind, 0) + 1
+
+
+def _endpoint(path: str) -> str:
+    """The route a request path is counted under.
+
+    Args:
+        path: URL path, as passed to the client, perhaps with a query.
+
+    Returns:
+        The path without its query when it is a route, its template when it
+        names a Redfish system, and ``"other"`` for anything else.
+    """
+    path = path.partition("?")[0]
+    for pattern, template in _TEMPLATES:
+        if pattern.fullmatch(path):
+            return template
+    return path if _ROUTE.fullmatch(path) else _OTHER
+
+
+def _family(name: str, kind: str, help_text: str) -> list[str]:
+    """The two comment lines that open a metric family."""
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+def _counter(
+    name: str, help_text: str, label: str, values: dict[str, int]
+) -> list[str]:
+    """A labelled counter family, or nothing when it has no samples yet."""
+    if not values:
+        return []
+    return _family(name, "counter", help_text) + [
+        f'{name}{{{label}="{_escape(key)}"}} {value}'
+        for key, value in sorted(values.items())
+    ]
+
+
+def _histogram(name: str, labels: str, histogram: _Histogram) -> list[str]:
+    """One histogram's series: cumulative buckets, then sum and count."""
+    lines = []
+    running = 0
+    for bound, count in zip((*_BUCKETS, "+Inf"), histogram[:-1], strict=True):
+        running += int(count)
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {running}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram[-1]}")
+    lines.append(f"{name}_count{{{labels}}} {running}")
+    return lines
+
+
+def _escape(value: str) -> str:
+    """Escape a label value the way the exposition format requires."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
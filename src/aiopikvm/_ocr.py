@@ -0,0 +1,505 @@
+"""OCR on the client's machine, off the device's CPU.
+
+[`ocr()`][aiopikvm.resources.streamer.StreamerResource.ocr] runs Tesseract on
+the PiKVM itself: 10-20 seconds for a full screen on an ARM core that is also
+encoding the video, and one recognition at a time however many scripts ask.
+[`LocalOCR`][aiopikvm.LocalOCR] takes the same arguments and returns the same
+text, but fetches a snapshot — a few hundred milliseconds — and hands it to a
+process pool on this machine, where a desktop core reads it an order of
+magnitude faster and several can read at once.
+
+Recognition needs Tesseract installed on this machine, and the ``pytesseract``
+and Pillow packages: ``pip install 'aiopikvm[ocr]'``.
+
+Either way, reading a screen that has not changed since the last read is
+Tesseract's time wasted. [`OCRCache`][aiopikvm.OCRCache] fingerprints the
+screen with a small preview, a fraction of the cost of any recognition, and
+answers from memory when the same picture is read again with the same region
+and languages.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import concurrent.futures
+import dataclasses
+import hashlib
+import io
+import os
+from typing import TYPE_CHECKING, Any
+
+from aiopikvm._exceptions import ConfigurationError, PiKVMError
+from aiopikvm._pool import _PoolOwner
+from aiopikvm.models.streamer import SnapshotImage
+
+if TYPE_CHECKING:
+    from aiopikvm._client import PiKVM
+
+_LANGS = ("eng",)
+"""What Tesseract reads when no languages are given, as kvmd does by default."""
+
+_CACHE_SIZE = 256
+"""Texts an [`OCRCache`][aiopikvm.OCRCache] keeps by default."""
+
+type _Box = tuple[int, int, int, int]
+type _Edges = tuple[int | None, int | None, int | None, int | None]
+type _Key = tuple[bytes, _Edges, tuple[str, ...] | None]
+"""Fingerprint of the picture, region as given, languages as given."""
+
+
+class LocalOCR(_PoolOwner):
+    """Read text off a device's screen with Tesseract on this machine.
+
+    [`ocr()`][aiopikvm.LocalOCR.ocr] takes the arguments
+    [`StreamerResource.ocr()`][aiopikvm.resources.streamer.StreamerResource.ocr]
+    does and returns a string as it does, so either can be handed to code
+    that reads the screen. The snapshot is fetched from the device; cropping
+    and recognition run in a process pool, so the event loop carries on and
+    several screens are read at once.
+
+    Usage:
+
+        async with LocalOCR(kvm) as reader:
+            text = await reader.ocr(left=100, top=50, right=800, bottom=200)
+    """
+
+    def __init__(
+        self,
+        client: PiKVM,
+        *,
+        langs: list[str] | None = None,
+        workers: int | None = None,
+        executor: concurrent.futures.Executor | None = None,
+    ) -> None:
+        """Prepare a reader; its process pool starts on the first read.
+
+        Args:
+            client: The device whose screen is read.
+            langs: Tesseract language codes read when a call names none;
+                ``None`` for English. Each must be installed on this machine,
+                not on the device.
+            workers: How many processes the reader's own pool has; ``None``
+                for one per CPU.
+            executor: Where recognition runs; ``None`` starts a process pool
+                of the reader's own.
+
+        Raises:
+            ConfigurationError: *workers* is less than one, or *langs* is
+                empty.
+        """
+        if workers is not None and workers < 1:
+            raise ConfigurationError(f"workers must be at least 1, not {workers}")
+        if langs is not None and not langs:
+            raise ConfigurationError("langs must name at least one language")
+        self._client = client
+        self._langs = tuple(langs or _LANGS)
+        self._use_pool(executor, workers or os.process_cpu_count() or 1)
+
+    async def ocr(
+        self,
+        *,
+        langs: list[str] | None = None,
+        left: int | None = None,
+        top: int | None = None,
+        right: int | None = None,
+        bottom: int | None = None,
+        allow_offline: bool = False,
+        timeout: float = 30.0,
+    ) -> str:
+        """Fetch a snapshot of the current screen and read its text.
+
+        Args:
+            langs: Tesseract language codes (e.g. ``["eng", "rus"]``); when
+                omitted the reader's own are used.
+            left: Left edge of the region to read, in pixels.
+            top: Top edge of the region to read.
+            right: Right edge of the region to read.
+            bottom: Bottom edge of the region to read.
+            allow_offline: When ``True``, read the "NO LIVE VIDEO" placeholder
+                if the video source is offline; otherwise the snapshot fails
+                with [`UnavailableError`][aiopikvm.UnavailableError].
+            timeout: Seconds the snapshot may take, and separately the
+                recognition.
+
+        Returns:
+            Recognized text.
+
+        Raises:
+            ConfigurationError: pytesseract or Pillow is not installed, or the
+                ``tesseract`` program cannot be found.
+            PiKVMError: The snapshot failed, or Tesseract did or ran out of
+                time.
+        """
+        _tesseract()
+        image = await self._client.streamer.snapshot(
+            allow_offline=allow_offline, timeout=timeout
+        )
+        return await self.recognize(
+            image,
+            langs=langs,
+            left=left,
+            top=top,
+            right=right,
+            bottom=bottom,
+            timeout=timeout,
+        )
+
+    async def recognize(
+        self,
+        image: SnapshotImage | bytes,
+        *,
+        langs: list[str] | None = None,
+        left: int | None = None,
+        top: int | None = None,
+        right: int | None = None,
+        bottom: int | None = None,
+        timeout: float = 30.0,
+    ) -> str:
+        """Read the text of a snapshot already taken.
+
+        The region is bounded as kvmd bounds it: an edge left out is the
+        image's own, an edge past the image is pulled back onto it, and a
+        region with nothing inside it reads the whole image.
+
+        Args:
+            image: The snapshot, or the JPEG bytes of one.
+            langs: Tesseract language codes; when omitted the reader's own
+                are used.
+            left: Left edge of the region to read, in pixels.
+            top: Top edge of the region to read.
+            right: Right edge of the region to read.
+            bottom: Bottom edge of the region to read.
+            timeout: Seconds Tesseract may take.
+
+        Returns:
+            Recognized text.
+
+        Raises:
+            ConfigurationError: pytesseract or Pillow is not installed, or the
+                ``tesseract`` program cannot be found.
+            PiKVMError: Tesseract failed or ran out of time.
+        """
+        _tesseract()
+        data = image.data if isinstance(image, SnapshotImage) else image
+        lang = "+".join(langs or self._langs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._pool(), _recognize, data, (left, top, right, bottom), lang, timeout
+        )
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class OCRCacheStats:
+    """How an [`OCRCache`][aiopikvm.OCRCache] has done so far.
+
+    Attributes:
+        hits: Reads answered without running OCR, from a stored text or by
+            waiting on the same read already running.
+        misses: Reads that ran OCR.
+        evictions: Texts dropped to stay within the cache's size.
+        size: Texts stored now.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of reads that were hits, 0.0 before the first read."""
+        reads = self.hits + self.misses
+        return self.hits / reads if reads else 0.0
+
+
+class OCRCache:
+    """Remember what a screen said, and skip OCR while it still says it.
+
+    Each [`ocr()`][aiopikvm.OCRCache.ocr] first fingerprints the screen:
+    with a *local* reader, the hash of the snapshot it is about to read
+    anyway; otherwise the hash of a preview, which kvmd scales and encodes in
+    a few milliseconds. The same fingerprint, region and languages as a
+    stored read return the stored text; anything else runs OCR and stores
+    the result, dropping the least recently used text beyond *size*. Reads
+    that arrive while the same one is running wait for it rather than
+    starting another.
+
+    The device's OCR takes its own picture, which can be newer than the
+    fingerprint; the cache takes a second preview afterwards and stores the
+    text only if the screen is still the one it fingerprinted.
+
+    Usage:
+
+        cache = OCRCache(kvm)
+        text = await cache.ocr(left=100, top=50, right=800, bottom=200)
+        print(cache.stats.hit_rate)
+    """
+
+    def __init__(
+        self,
+        client: PiKVM,
+        *,
+        local: LocalOCR | None = None,
+        size: int = _CACHE_SIZE,
+        preview_max_width: int | None = None,
+        preview_max_height: int | None = None,
+        preview_quality: int | None = None,
+    ) -> None:
+        """Prepare an empty cache.
+
+        Args:
+            client: The device whose screen is read.
+            local: Read on this machine with this reader rather than on the
+                device; the snapshot it reads is then the fingerprint too.
+            size: How many texts to keep.
+            preview_max_width: Width bound for the fingerprint preview. With
+                neither bound kvmd scales to a fifth of the source; a larger
+                preview tells apart screens that differ by less, at the cost
+                of a slower fingerprint.
+            preview_max_height: Height bound for the fingerprint preview.
+            preview_quality: JPEG quality of the fingerprint preview, 1 to
+                100.
+
+        Raises:
+            ConfigurationError: *size* is less than one.
+        """
+        if size < 1:
+            raise ConfigurationError(f"size must be at least 1, not {size}")
+        self._client = client
+        self._local = local
+        self._size = size
+        self._preview: dict[str, Any] = {
+            "preview": True,
+            "preview_max_width": preview_max_width,
+            "preview_max_height": preview_max_height,
+            "preview_quality": preview_quality,
+        }
+        self._texts: collections.OrderedDict[_Key, str] = collections.OrderedDict()
+        self._running: dict[_Key, asyncio.Future[str]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def stats(self) -> OCRCacheStats:
+        """Hits, misses and evictions so far, and the texts stored now."""
+        return OCRCacheStats(
+            self._hits, self._misses, self._evictions, len(self._texts)
+        )
+
+    def clear(self) -> None:
+        """Forget every stored text; the counters carry on."""
+        self._texts.clear()
+
+    async def ocr(
+        self,
+        *,
+        langs: list[str] | None = None,
+        left: int | None = None,
+        top: int | None = None,
+        right: int | None = None,
+        bottom: int | None = None,
+        allow_offline: bool = False,
+        timeout: float = 30.0,
+    ) -> str:
+        """Read text from the current screen, from memory if it is unchanged.
+
+        Takes the arguments
+        [`StreamerResource.ocr()`][aiopikvm.resources.streamer.StreamerResource.ocr]
+        does. *langs* is part of the key as given: ``None`` and the
+        languages it stands for are stored apart.
+
+        Args:
+            langs: Tesseract language codes; when omitted the reader's
+                default is used.
+            left: Left edge of the region to read, in pixels.
+            top: Top edge of the region to read.
+            right: Right edge of the region to read.
+            bottom: Bottom edge of the region to read.
+            allow_offline: When ``True``, read the "NO LIVE VIDEO" placeholder
+                if the video source is offline.
+            timeout: Seconds the OCR may take.
+
+        Returns:
+            Recognized text.
+
+        Raises:
+            PiKVMError: The fingerprint or the OCR failed; nothing is stored.
+        """
+        options: dict[str, Any] = {
+            "langs": langs,
+            "left": left,
+            "top": top,
+            "right": right,
+            "bottom": bottom,
+            "timeout": timeout,
+        }
+        image: SnapshotImage | None = None
+        if self._local is not None:
+            image = await self._client.streamer.snapshot(
+                allow_offline=allow_offline, timeout=timeout
+            )
+            seen = _fingerprint(image)
+        else:
+            seen = await self._fingerprint(allow_offline)
+        key: _Key = (
+            seen,
+            (left, top, right, bottom),
+            tuple(langs) if langs is not None else None,
+        )
+        text = self._texts.get(key)
+        if text is not None:
+            self._texts.move_to_end(key)
+            self._hits += 1
+            return text
+        task = self._running.get(key)
+        if task is not None:
+            self._hits += 1
+        else:
+            self._misses += 1
+            task = asyncio.ensure_future(self._read(key, image, allow_offline, options))
+            self._running[key] = task
+        # A caller that gives up leaves the read to finish for the others,
+        # and for the cache.
+        return await asyncio.shield(task)
+
+    async def _fingerprint(self, allow_offline: bool) -> bytes:
+        """Hash a preview of the screen as it is now."""
+        preview = await self._client.streamer.snapshot(
+            allow_offline=allow_offline, **self._preview
+        )
+        return _fingerprint(preview)
+
+    async def _read(
+        self,
+        key: _Key,
+        image: SnapshotImage | None,
+        allow_offline: bool,
+        options: dict[str, Any],
+    ) -> str:
+        """Run OCR for a miss, and store the text if it is the key's."""
+        try:
+            if self._local is not None and image is not None:
+                text = await self._local.recognize(image, **options)
+            else:
+                text = await self._client.streamer.ocr(
+                    allow_offline=allow_offline, **options
+                )
+                # The device read a picture of its own, which may be newer
+                # than the fingerprint.
+                try:
+                    unchanged = await self._fingerprint(allow_offline) == key[0]
+                except PiKVMError:
+                    unchanged = False
+                if not unchanged:
+                    return text
+            self._store(key, text)
+            return text
+        finally:
+            self._running.pop(key, None)
+
+    def _store(self, key: _Key, text: str) -> None:
+        """Keep a text, dropping the least recently used beyond the size."""
+        self._texts[key] = text
+        self._texts.move_to_end(key)
+        while len(self._texts) > self._size:
+            self._texts.popitem(last=False)
+            self._evictions += 1
+
+
+def _fingerprint(image: SnapshotImage) -> bytes:
+    """A digest of a snapshot's JPEG, as long as a cache key needs."""
+    return hashlib.blake2b(image.data, digest_size=16).digest()
+
+
+def _tesseract() -> None:
+    """Make sure pytesseract and Pillow can be imported, before any fetch.
+
+    Raises:
+        ConfigurationError: Either is not installed.
+    """
+    try:
+        import PIL.Image  # noqa: F401
+        import pytesseract  # noqa: F401
+    except ImportError as exc:
+        raise ConfigurationError(
+            "LocalOCR needs pytesseract and Pillow, which aiopikvm does not "
+            "install by default: pip install 'aiopikvm[ocr]', and Tesseract "
+            f"itself from the system's packages. ({exc})"
+        ) from exc
+
+
+def _box(
+    edges: tuple[int | None, int | None, int | None, int | None],
+    size: tuple[int, int],
+) -> _Box | None:
+    """Work out the region to read from the edges a caller gave.
+
+    Args:
+        edges: ``(left, top, right, bottom)``, any of them ``None``.
+        size: Width and height of the image.
+
+    Returns:
+        The region clamped onto the image, or ``None`` to read all of it.
+    """
+    (left, top, right, bottom) = edges
+    (width, height) = size
+    if left is None and top is None and right is None and bottom is None:
+        return None
+    box = (
+        0 if left is None else min(max(left, 0), width),
+        0 if top is None else min(max(top, 0), height),
+        width if right is None else min(max(right, 0), width),
+        height if bottom is None else min(max(bottom, 0), height),
+    )
+    if box[0] >= box[2] or box[1] >= box[3]:
+        return None
+    return box
+
+
+def _recognize(
+    data: bytes,
+    edges: tuple[int | None, int | None, int | None, int | None],
+    lang: str,
+    timeout: float,
+) -> str:
+    """Crop a snapshot and read its text, in a worker process.
+
+    The region is upscaled twice and sharpened first: screen text is small
+    and anti-aliased, and Tesseract reads it far better at print sizes.
+
+    Args:
+        data: The snapshot's JPEG.
+        edges: ``(left, top, right, bottom)`` of the region, any ``None``.
+        lang: Tesseract's ``-l`` argument, languages joined with ``+``.
+        timeout: Seconds Tesseract may take.
+
+    Returns:
+        Recognized text.
+
+    Raises:
+        ConfigurationError: The ``tesseract`` program cannot be found.
+        PiKVMError: Tesseract failed or ran out of time.
+    """
+    import pytesseract
+    from PIL import Image, ImageFilter
+
+    with Image.open(io.BytesIO(data)) as image:
+        box = _box(edges, image.size)
+        region = image.crop(box) if box is not None else image
+        region = region.convert("L")
+        region = region.resize(
+            (region.width * 2, region.height * 2), Image.Resampling.BICUBIC
+        ).filter(ImageFilter.SHARPEN)
+    try:
+        text: str = pytesseract.image_to_string(region, lang=lang, timeout=timeout)
+    except pytesseract.TesseractNotFoundError as exc:
+        raise ConfigurationError(
+            "LocalOCR could not run the tesseract program; install Tesseract "
+            "on this machine or put it on PATH"
+        ) from exc
+    except (pytesseract.TesseractError, RuntimeError) as exc:
+        # pytesseract reports its own timeout as a bare RuntimeError.
+        raise PiKVMError(f"Tesseract could not read the snapshot: {exc}") from exc
+    return text
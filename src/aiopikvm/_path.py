@@ -0,0 +1,176 @@
+"""Pointer paths, from pixels on the screen to kvmd's move frames.
+
+A drag or a movement meant to look like a hand is dozens of
+[`send_mouse_move()`][aiopikvm.PiKVMWebSocket.send_mouse_move] calls, each in
+kvmd's resolution-independent space rather than in pixels. This module turns
+a few pixel waypoints into the whole path at once: the points along it, each
+converted with ``round(x / (width - 1) * 65535) - 32768`` and packed as the
+binary frame kvmd reads, before the first one is sent. Sending is then only a
+matter of handing over prepared bytes on a fixed schedule.
+
+The arithmetic is plain Python: a path is a few hundred points at most, which
+the interpreter computes in well under a millisecond, and a numeric library
+would cost more to import than it saves.
+"""
+
+from __future__ import annotations
+
+import bisect
+import itertools
+import math
+from collections.abc import Callable, Sequence
+from typing import NamedTuple
+
+from aiopikvm._constants import PathCurve
+from aiopikvm._exceptions import ConfigurationError
+from aiopikvm._ws import _MOVE_MAX, _MOVE_MIN, _OP_MOUSE_MOVE, _clamp, _pack_move
+
+type _Point = tuple[float, float]
+
+_SPAN = _MOVE_MAX - _MOVE_MIN
+"""Width of kvmd's pointer space, 65535: the last pixel maps to its far edge."""
+
+
+class _Step(NamedTuple):
+    """One point of a path, ready to send."""
+
+    at: float
+    """Seconds after the first point that this one is due."""
+    x: int
+    y: int
+    frame: bytes
+    """The binary move frame, operation byte included."""
+
+
+def _to_kvmd(value: float, size: int) -> int:
+    """Convert one pixel coordinate into kvmd's pointer space.
+
+    Args:
+        value: Pixel coordinate, 0 at the left or top edge.
+        size: The screen's width or height in pixels.
+
+    Returns:
+        The position from -32768 to 32767, clamped if the pixel was off
+        screen.
+    """
+    return _clamp(round(value / (size - 1) * _SPAN) + _MOVE_MIN, _MOVE_MIN, _MOVE_MAX)
+
+
+def _linear(waypoints: Sequence[_Point], count: int) -> list[_Point]:
+    """Spread *count* points evenly by distance over a polyline.
+
+    Args:
+        waypoints: Corners of the polyline, in order.
+        count: Points to return, the first and last waypoints included.
+
+    Returns:
+        The points, from the first waypoint to the last.
+    """
+    lengths = [0.0]
+    for (x0, y0), (x1, y1) in itertools.pairwise(waypoints):
+        lengths.append(lengths[-1] + math.hypot(x1 - x0, y1 - y0))
+    total = lengths[-1]
+    if total == 0:
+        return [waypoints[-1]] * count
+    points = []
+    for index in range(count):
+        distance = total * index / (count - 1)
+        # The leg the distance falls on; only a zero-length last leg has no
+        # span, and the point is then its end.
+        leg = min(bisect.bisect_right(lengths, distance), len(lengths) - 1)
+        start, span = lengths[leg - 1], lengths[leg] - lengths[leg - 1]
+        t = (distance - start) / span if span else 1.0
+        (x0, y0), (x1, y1) = waypoints[leg - 1], waypoints[leg]
+        points.append((x0 + (x1 - x0) * t, y0 + (y1 - y0) * t))
+    return points
+
+
+def _bezier(controls: Sequence[_Point], count: int) -> list[_Point]:
+    """Sample a Bézier curve at *count* evenly spaced parameter values.
+
+    Args:
+        controls: The curve's control points, in order.
+        count: Points to return, the first and last controls included.
+
+    Returns:
+        The points, from the first control point to the last.
+    """
+    if count == 1:
+        return [controls[-1]]
+    degree = len(controls) - 1
+    weights = [math.comb(degree, k) for k in range(degree + 1)]
+    points = []
+    for index in range(count):
+        t = index / (count - 1)
+        x = y = 0.0
+        for k, (cx, cy) in enumerate(controls):
+            basis = weights[k] * t**k * (1 - t) ** (degree - k)
+            x += basis * cx
+            y += basis * cy
+        points.append((x, y))
+    return points
+
+
+_CURVES: dict[str, Callable[[Sequence[_Point], int], list[_Point]]] = {
+    "linear": _linear,
+    "bezier": _bezier,
+}
+"""How each [`PathCurve`][aiopikvm.PathCurve] samples its waypoints."""
+
+
+def _plan(
+    waypoints: Sequence[_Point],
+    resolution: tuple[int, int],
+    *,
+    duration: float,
+    rate: float,
+    curve: PathCurve,
+) -> list[_Step]:
+    """Work out every move of a path, and when each one is due.
+
+    Consecutive points that round to the same kvmd position are sent once:
+    the host would not see the pointer move for the others.
+
+    Args:
+        waypoints: Pixel positions the path is made of.
+        resolution: Width and height of the screen, in pixels.
+        duration: Seconds from the first move to the last.
+        rate: Moves per second, which the duration is divided into.
+        curve: How the waypoints are joined.
+
+    Returns:
+        The moves, in the order they go out.
+
+    Raises:
+        ConfigurationError: No waypoints, a curve this module does not know,
+            a screen narrower than two pixels, or a duration or rate that is
+            negative, zero where it cannot be, or not a number.
+    """
+    if not waypoints:
+        raise ConfigurationError("A mouse path needs at least one waypoint")
+    (width, height) = resolution
+    if width < 2 or height < 2:
+        raise ConfigurationError(
+            f"Cannot map pixels onto a {width}x{height} screen; "
+            "it needs at least two pixels each way"
+        )
+    if not (rate > 0 and math.isfinite(rate)):
+        raise ConfigurationError(f"rate must be a positive number, got {rate!r}")
+    if not (duration >= 0 and math.isfinite(duration)):
+        raise ConfigurationError(
+            f"duration must be zero or a positive number, got {duration!r}"
+        )
+    sample = _CURVES.get(curve)
+    if sample is None:
+        raise ConfigurationError(f"Unknown curve {curve!r}; use 'linear' or 'bezier'")
+    # A single waypoint is a single move; otherwise one move per tick of
+    # *rate*, and always at least the two ends.
+    intervals = max(1, round(duration * rate)) if len(waypoints) > 1 else 0
+    steps: list[_Step] = []
+    for index, (x, y) in enumerate(sample(waypoints, intervals + 1)):
+        to_x, to_y = _to_kvmd(x, width), _to_kvmd(y, height)
+        if steps and (steps[-1].x, steps[-1].y) == (to_x, to_y):
+            continue
+        frame = bytes([_OP_MOUSE_MOVE]) + _pack_move(to_x, to_y)
+        steps.append(_Step(duration * index / (intervals or 1), to_x, to_y, frame))
+    return steps
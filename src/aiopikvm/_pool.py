@@ -0,0 +1,94 @@
+"""The process pool the screen helpers hand their pixel work to.
+
+Decoding JPEGs, tiling a mosaic, running Tesseract and searching a frame for
+a template all hold the CPU for longer than an event loop can spare, and all
+but Tesseract hold the GIL while they do. [`SnapshotWall`][aiopikvm.SnapshotWall],
+[`LocalOCR`][aiopikvm.LocalOCR] and [`ImageMatcher`][aiopikvm.ImageMatcher]
+send that work to a process pool instead, and share how they get one:
+
+- An *executor* the caller passes is the caller's. It is used as it is and
+  left running when the helper closes, so several helpers — or the
+  application's own work — can share one pool.
+- Without one, the helper starts a `ProcessPoolExecutor` of its own, on the
+  first piece of work rather than when it is built or entered, so a helper
+  that never gets that far never forks. Closing the helper shuts that pool
+  down.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+from types import TracebackType
+from typing import Self
+
+
+class _PoolOwner:
+    """Runs work in the caller's executor, or in a process pool of its own.
+
+    A subclass calls `_use_pool` from its constructor and `_pool` for each
+    piece of work; this supplies the ``async with`` and
+    [`aclose()`][aiopikvm.LocalOCR.aclose] that shut its own pool down.
+    """
+
+    _executor: concurrent.futures.Executor | None
+    _own_executor: concurrent.futures.ProcessPoolExecutor | None
+    _workers: int
+
+    def _use_pool(
+        self, executor: concurrent.futures.Executor | None, workers: int
+    ) -> None:
+        """Say where the work runs.
+
+        Args:
+            executor: The caller's executor, or ``None`` for a pool of this
+                object's own.
+            workers: How many processes that pool has.
+        """
+        self._executor = executor
+        self._own_executor = None
+        self._workers = workers
+
+    def _pool(self) -> concurrent.futures.Executor:
+        """The executor work runs in, starting this object's own if needed."""
+        if self._executor is not None:
+            return self._executor
+        if self._own_executor is None:
+            self._own_executor = concurrent.futures.ProcessPoolExecutor(self._workers)
+        return self._own_executor
+
+    async def aclose(self) -> None:
+        """Shut down the process pool this object started, if it started one.
+
+        An *executor* the caller passed is theirs, and is left running. The
+        shutdown waits for work already handed to the pool, in a thread, so
+        the event loop carries on meanwhile. Using the object again
+        afterwards starts a new pool.
+        """
+        pool = self._own_executor
+        self._own_executor = None
+        if pool is not None:
+            await asyncio.to_thread(pool.shutdown)
+
+    async def __aenter__(self) -> Self:
+        """Use the object; its process pool starts on the first piece of work.
+
+        Returns:
+            This object.
+        """
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Shut down the object's own process pool.
+
+        Args:
+            exc_type: Type of the exception the block raised, if any.
+            exc_val: The exception the block raised, if any.
+            exc_tb: Traceback of that exception, if any.
+        """
+        await self.aclose()
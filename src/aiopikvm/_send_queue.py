@@ -0,0 +1,216 @@
+"""The order HID input leaves a socket in, when it cannot all leave at once.
+
+Sent straight through, every frame waits behind the ones called before it. A
+pointer tracked at a screen's refresh rate queues moves faster than a slow
+link drains them. A key release called after that queue waits for the whole
+of it, while the host holds the key down and repeats it.
+
+[`PiKVMWebSocket`][aiopikvm.PiKVMWebSocket], built with *send_queue*, hands
+its frames to a `_SendQueue` instead. One task sends them, in this order:
+
+1. Pings, ahead of everything: they are not input, and a ping held up by input
+   would measure the queue rather than kvmd.
+2. Keys, pressed or released, ahead of any pointer movement queued before
+   them. Where the pointer is has no bearing on what a key means, so the
+   overtaking changes nothing on the host but when the key lands.
+3. Everything else in the order it was called.
+
+Nothing overtakes anything it does not commute with. A release never passes a
+press: a Shift released before the press it was meant to modify turns ``A``
+into ``a``. A key never passes a button or a wheel step, which is what a
+Ctrl+click and a Ctrl+scroll are made of. A button never passes a move, or the
+click lands where the pointer was. Within those rules, an absolute move
+queued right behind another one replaces it; the host would only have
+passed through the first position on its way to the second.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import Literal
+
+from aiopikvm._deadline import _deadline, _remaining
+from aiopikvm._exceptions import WebSocketError
+
+type _Kind = Literal["ping", "key", "move", "other"]
+
+_KINDS: dict[str, _Kind] = {
+    "ping": "ping",
+    "key": "key",
+    "mouse_move": "move",
+    "mouse_relative": "move",
+}
+"""How far a frame may jump ahead, by the name its sender gives it."""
+
+_COALESCED = frozenset({"mouse_move"})
+"""Frames a later one of the same name replaces while both are queued."""
+
+
+class _Outgoing:
+    """One frame waiting to be sent, and everybody waiting on it."""
+
+    __slots__ = ("frame", "kind", "waiters", "what")
+
+    def __init__(self, frame: str | bytes, what: str) -> None:
+        self.frame = frame
+        self.what = what
+        self.kind: _Kind = _KINDS.get(what, "other")
+        self.waiters: list[asyncio.Future[None]] = []
+
+
+class _SendQueue:
+    """A bounded queue of outgoing frames, sent by one task in priority order.
+
+    The caller of `send()` waits for its own frame to be sent, and gets the
+    error it failed with, exactly as it would have sending the frame itself.
+    A caller whose move was replaced by a later one waits for that one.
+    """
+
+    def __init__(
+        self, transmit: Callable[[str | bytes, str], Awaitable[None]], maxsize: int
+    ) -> None:
+        """Start empty.
+
+        Args:
+            transmit: Sends one frame; what it raises reaches the caller.
+            maxsize: Frames queued before a sender has to wait.
+        """
+        self._transmit = transmit
+        self._maxsize = maxsize
+        self._pings: deque[_Outgoing] = deque()
+        self._frames: deque[_Outgoing] = deque()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._task: asyncio.Task[None] | None = None
+        self._current: _Outgoing | None = None
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        """Frames waiting, not counting the one going out."""
+        return len(self._pings) + len(self._frames)
+
+    async def send(self, frame: str | bytes, what: str) -> None:
+        """Queue one frame and wait until it has been sent.
+
+        Inside a [`deadline()`][aiopikvm.PiKVM.deadline], waiting for room in
+        the queue and for the frame's turn both count against it. A frame
+        whose callers have all given up — a deadline, a cancellation — is
+        skipped when its turn comes.
+
+        Args:
+            frame: The frame.
+            what: Name of the event, which decides how far it may jump ahead.
+
+        Raises:
+            WebSocketError: The frame could not be sent, the socket closed
+                first, or the deadline ran out.
+        """
+        remaining = _remaining()
+        try:
+            async with asyncio.timeout(remaining):
+                await self._wait_for_room(what)
+                waiter = self._enqueue(frame, what)
+                await waiter
+        except TimeoutError as exc:
+            raise WebSocketError(f"Sending {what!r} ran past the deadline") from exc
+
+    async def close(self, reason: str) -> None:
+        """Stop sending, and fail every frame that has not gone out.
+
+        Args:
+            reason: What the waiting callers are told.
+        """
+        task = self._task
+        self._task = None
+        current = self._current
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        failure = WebSocketError(reason)
+        unsent = [*self._pings, *self._frames]
+        if current is not None:
+            unsent.append(current)
+        self._pings.clear()
+        self._frames.clear()
+        self._space.set()
+        for item in unsent:
+            _settle(item, failure)
+
+    async def _wait_for_room(self, what: str) -> None:
+        """Wait until the queue can take one more frame of this name."""
+        while len(self) >= self._maxsize and not self._replaces_tail(what):
+            self._space.clear()
+            await self._space.wait()
+
+    def _replaces_tail(self, what: str) -> bool:
+        """Whether a frame of this name would replace the last one queued."""
+        return (
+            what in _COALESCED and bool(self._frames) and self._frames[-1].what == what
+        )
+
+    def _enqueue(self, frame: str | bytes, what: str) -> asyncio.Future[None]:
+        """Queue a frame, or fold it into the last one, and start the sender."""
+        waiter = asyncio.get_running_loop().create_future()
+        if self._replaces_tail(what):
+            tail = self._frames[-1]
+            tail.frame = frame
+            tail.waiters.append(waiter)
+            self.coalesced += 1
+        else:
+            item = _Outgoing(frame, what)
+            item.waiters.append(waiter)
+            (self._pings if item.kind == "ping" else self._frames).append(item)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(
+                self._run(), name="aiopikvm-send"
+            )
+        return waiter
+
+    def _next(self) -> _Outgoing:
+        """Take the frame whose turn it is."""
+        if self._pings:
+            return self._pings.popleft()
+        frames = self._frames
+        for index, item in enumerate(frames):
+            if item.kind == "key":
+                del frames[index]
+                return item
+            if item.kind != "move":
+                break
+        return frames.popleft()
+
+    async def _run(self) -> None:
+        """Send frames until there are none left."""
+        # The task inherits the deadline of whoever started it, which is that
+        # caller's to wait out, not every later frame's.
+        _deadline.set(None)
+        while self._pings or self._frames:
+            item = self._next()
+            self._space.set()
+            if all(waiter.done() for waiter in item.waiters):
+                # Everybody who wanted it has given up on it.
+                continue
+            self._current = item
+            try:
+                await self._transmit(item.frame, item.what)
+            except WebSocketError as exc:
+                _settle(item, exc)
+            else:
+                _settle(item, None)
+            finally:
+                self._current = None
+
+
+def _settle(item: _Outgoing, failure: WebSocketError | None) -> None:
+    """Tell everybody waiting on a frame how it went."""
+    for waiter in item.waiters:
+        if waiter.done():
+            continue
+        if failure is None:
+            waiter.set_result(None)
+        else:
+            waiter.set_exception(failure)
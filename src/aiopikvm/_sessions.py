@@ -0,0 +1,338 @@
+"""Where ``auth="cookie"`` keeps its session tokens between clients.
+
+A client that authenticates by session logs in on its first request and holds
+the token for as long as it lives. That is one ``POST /api/auth/login`` per
+client — a password check on the device, a PAM or ``htpasswd`` lookup, a new
+row in kvmd's session table — and the session outlives the client that opened
+it. A service that starts many short-lived clients against the same devices
+pays that on every start and leaves a trail of sessions nothing will use
+again.
+
+A [`SessionStore`][aiopikvm.SessionStore] passed as *session_store* breaks
+the cycle. Before a client logs in it asks the store for a token the same
+user already holds on the same device, and after it logs in it files the new
+one there. A token the device has since dropped costs one refused request:
+the client discards it from the store, logs in, and saves the replacement.
+
+[`MemorySessionStore`][aiopikvm.MemorySessionStore] shares tokens between the
+clients of one process; [`FileSessionStore`][aiopikvm.FileSessionStore]
+between processes, through a JSON file guarded by an advisory lock. Anything
+else — Redis, a secrets manager — is a subclass that overrides the three
+coroutines.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore:
+    """Somewhere to keep session tokens, keyed by device URL and user.
+
+    The base class keeps nothing: every lookup misses and every save is
+    dropped, which is what a client without a store does. Subclass it and
+    override all three coroutines for a backend of your own.
+
+    A method that raises is logged and treated as a miss — the store is there
+    to save logins, and a broken one must not stop the client from making
+    them.
+    """
+
+    async def load(self, url: str, user: str) -> str | None:
+        """Return the token saved for *user* on *url*.
+
+        Args:
+            url: Device base URL, as the client was built with it, without a
+                trailing slash.
+            user: kvmd user name.
+
+        Returns:
+            The token, or ``None`` when there is none or it has expired.
+        """
+        return None
+
+    async def save(self, url: str, user: str, token: str, *, expire: int = 0) -> None:
+        """Keep a token the client has just been given.
+
+        Args:
+            url: Device base URL.
+            user: kvmd user name.
+            token: The session token.
+            expire: Lifetime the client asked kvmd for, in seconds; ``0``
+                for an unlimited session. The device may cap it lower, and
+                a token it drops early is caught by its refusal.
+        """
+
+    async def discard(self, url: str, user: str, token: str) -> None:
+        """Forget a token the device has refused.
+
+        Only *token* is dropped. When another client has already replaced
+        it, the replacement is newer than the refusal and stays.
+
+        Args:
+            url: Device base URL.
+            user: kvmd user name.
+            token: The token that was refused.
+        """
+
+
+class MemorySessionStore(SessionStore):
+    """Tokens kept in this process, for every client handed the same store.
+
+    Useful for a program that builds a client per task or per request
+    against a few devices: the first one logs in, and the rest reuse its
+    session until the device drops it.
+    """
+
+    def __init__(self) -> None:
+        """Start empty."""
+        self._tokens: dict[tuple[str, str], tuple[str, float | None]] = {}
+
+    async def load(self, url: str, user: str) -> str | None:
+        """Return the token saved for *user* on *url*.
+
+        Args:
+            url: Device base URL.
+            user: kvmd user name.
+
+        Returns:
+            The token, or ``None`` when there is none or it has expired.
+        """
+        entry = self._tokens.get((url, user))
+        if entry is None:
+            return None
+        (token, expires) = entry
+        if expires is not None and expires <= time.time():
+            del self._tokens[(url, user)]
+            return None
+        return token
+
+    async def save(self, url: str, user: str, token: str, *, expire: int = 0) -> None:
+        """Keep a token the client has just been given.
+
+        Args:
+            url: Device base URL.
+            user: kvmd user name.
+            token: The session token.
+            expire: Session lifetime in seconds, ``0`` for unlimited.
+        """
+        self._tokens[(url, user)] = (token, _expires(expire))
+
+    async def discard(self, url: str, user: str, token: str) -> None:
+        """Forget *token*, unless it has already been replaced.
+
+        Args:
+            url: Device base URL.
+            user: kvmd user name.
+            token: The token that was refused.
+        """
+        entry = self._tokens.get((url, user))
+        if entry is not None and entry[0] == token:
+            del self._tokens[(url, user)]
+
+
+class FileSessionStore(SessionStore):
+    """Tokens kept in a JSON file, shared by every process that opens it.
+
+    Each read and each update takes an advisory lock on a ``.lock`` file next
+    to the store — ``flock`` on POSIX, ``msvcrt.locking`` on Windows — so
+    processes updating it at once never lose each other's tokens, and a
+    reader never sees half a write: the file is replaced whole, not
+    rewritten in place. The file operations run in a worker thread, since
+    waiting for the lock blocks.
+
+    A session token is as good as the password for as long as it lives, so
+    the file and its directory are created readable by their owner only. A
+    file that is not valid JSON is treated as empty and replaced on the next
+    save.
+    """
+
+    def __init__(self, path: str | os.PathLike[str] | None = None) -> None:
+        """Point the store at a file.
+
+        Args:
+            path: The JSON file. Defaults to ``aiopikvm/sessions.json`` under
+                ``$XDG_CACHE_HOME``, or under ``~/.cache`` when that is not
+                set. The directory is created on the first save.
+        """
+        if path is None:
+            cache = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+            path = Path(cache) / "aiopikvm" / "sessions.json"
+        self._path = Path(path)
+
+    @property
+    def path(self) -> Path:
+        """The JSON file the tokens live in."""
+        return self._path
+
+    async def load(self, url: str, user: str) -> str | None:
+        """Return the token saved for *user* on *url*.
+
+        Args:
+            url: Device base URL.
+            user: kvmd user name.
+
+        Returns:
+            The token, or ``None`` when there is none or it has expired.
+        """
+        return await asyncio.to_thread(self._load, url, user)
+
+    async def save(self, url: str, user: str, token: str, *, expire: int = 0) -> None:
+        """Keep a token the client has just been given.
+
+        Args:
+            url: Device base URL.
+            user: kvmd user name.
+            token: The session token.
+            expire: Session lifetime in seconds, ``0`` for unlimited.
+        """
+        entry = {"token": token, "expires": _expires(expire)}
+        await asyncio.to_thread(self._update, url, user, entry, None)
+
+    async def discard(self, url: str, user: str, token: str) -> None:
+        """Forget *token*, unless another process has already replaced it.
+
+        Args:
+            url: Device base URL.
+            user: kvmd user name.
+            token: The token that was refused.
+        """
+        await asyncio.to_thread(self._update, url, user, None, token)
+
+    def _load(self, url: str, user: str) -> str | None:
+        """Read one token under a shared lock."""
+        if not self._path.exists():
+            return None
+        with self._locked(exclusive=False):
+            entry = self._read().get(url, {}).get(user)
+        return _live_token(entry)
+
+    def _update(
+        self,
+        url: str,
+        user: str,
+        entry: dict[str, Any] | None,
+        refused: str | None,
+    ) -> None:
+        """Write one entry, or drop the refused one, under an exclusive lock.
+
+        Args:
+            url: Device base URL.
+            user: kvmd user name.
+            entry: What to store, ``None`` to drop the current entry.
+            refused: When dropping, the token that was refused; an entry
+                holding any other token is left where it is.
+        """
+        self._path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        with self._locked(exclusive=True):
+            tokens = self._read()
+            users = tokens.setdefault(url, {})
+            if entry is not None:
+                users[user] = entry
+            elif _live_token(users.get(user)) in (refused, None):
+                users.pop(user, None)
+            else:
+                return
+            # Expired entries are dropped on the way, so the file does not
+            # grow with every device a process has ever talked to.
+            for device in list(tokens):
+                for name in list(tokens[device]):
+                    if _live_token(tokens[device][name]) is None:
+                        del tokens[device][name]
+                if not tokens[device]:
+                    del tokens[device]
+            self._write(tokens)
+
+    def _read(self) -> dict[str, dict[str, Any]]:
+        """Parse the file, or return nothing when it is missing or garbled."""
+        try:
+            data = json.loads(self._path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning(
+                "Session store %s is not valid JSON; treating it as empty",
+                self._path,
+            )
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write(self, tokens: dict[str, dict[str, Any]]) -> None:
+        """Replace the file whole, so a reader sees the old one or the new."""
+        (fd, temporary) = tempfile.mkstemp(
+            dir=self._path.parent, prefix=".sessions-", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(tokens, file)
+            os.replace(temporary, self._path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(temporary)
+            raise
+
+    @contextlib.contextmanager
+    def _locked(self, *, exclusive: bool) -> Iterator[None]:
+        """Hold the advisory lock beside the store for the block.
+
+        Args:
+            exclusive: Take it for writing. A shared lock lets readers in
+                together and keeps writers out. Windows has no shared mode,
+                so there every lock is exclusive.
+        """
+        lock = self._path.with_name(f"{self._path.name}.lock")
+        fd = os.open(lock, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+def _expires(expire: int) -> float | None:
+    """Wall-clock time a session of *expire* seconds lapses at, if ever.
+
+    Wall clock rather than monotonic, because the file store compares it in
+    other processes, and after a reboot.
+    """
+    return time.time() + expire if expire > 0 else None
+
+
+def _live_token(entry: Any) -> str | None:
+    """The token in a file entry, or ``None`` if it is missing or has expired."""
+    if not isinstance(entry, dict):
+        return None
+    token = entry.get("token")
+    expires = entry.get("expires")
+    if not isinstance(token, str) or not token:
+        return None
+    if isinstance(expires, int | float) and expires <= time.time():
+        return None
+    return token
@@ -0,0 +1,290 @@
+"""Snapshots taken when the screen changes, rather than on a timer.
+
+Polling [`snapshot()`][aiopikvm.resources.streamer.StreamerResource.snapshot]
+every second pays for a JPEG every second, whether the host drew anything or
+not, and still lags up to a second behind the one that did. ustreamer already
+knows when it has a new frame: it sends one down every MJPEG stream. Opened
+with ``zero_data=True``, [`mjpeg()`][aiopikvm.resources.streamer.StreamerResource.mjpeg]
+is that news without the pictures, a few hundred bytes of part headers per
+frame.
+
+[`SnapshotFeed`][aiopikvm.SnapshotFeed] reads that feed and asks for a
+snapshot only when a frame has arrived since the last one it took. With
+``extra_headers=True`` — the default — each part also says when the frame
+was grabbed, whether the source is live, and its size, so a part that repeats
+the frame already taken, or another "NO LIVE VIDEO" placeholder after the
+first, asks for nothing. An idle screen costs the timing feed and no more; a
+busy one is fetched as often as *min_interval* allows.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Self
+
+from aiopikvm._exceptions import ConfigurationError, PiKVMError
+from aiopikvm.models.streamer import MJPEGFrame, SnapshotImage
+
+if TYPE_CHECKING:
+    from aiopikvm._client import PiKVM
+
+logger = logging.getLogger(__name__)
+
+_KEY = "aiopikvm-snapshot-feed"
+"""The name the timing feed goes by in ustreamer's ``clients_stat``."""
+
+_GRABBED = "x-ustreamer-grab-begin-time"
+"""The extra header that tells one captured frame from another, lower-cased."""
+
+
+class SnapshotFeed:
+    """Take a snapshot each time the MJPEG stream says there is a new frame.
+
+    Entering the feed opens a ``zero_data`` MJPEG stream; iterating it hands
+    out each new [`SnapshotImage`][aiopikvm.SnapshotImage]. Frames that
+    arrive while a snapshot is being taken, or within *min_interval* of the
+    last one, are folded into the next, so a consumer always gets the screen
+    as it is now, never a queue of how it was. A snapshot that fails is
+    logged and retried at the next frame; the iteration ends when the stream
+    does, raising what ended it unless the stream simply closed.
+
+    kvmd runs the streamer only while a session asks for video, and the MJPEG
+    stream does not count as one, so keep a [`ws()`][aiopikvm.PiKVM.ws] or
+    [`hub`][aiopikvm.PiKVM.hub] open around the feed.
+
+    Usage:
+
+        async with kvm.hub, SnapshotFeed(kvm, preview=True) as feed:
+            async for image in feed:
+                show(image.data)
+    """
+
+    def __init__(
+        self,
+        client: PiKVM,
+        *,
+        min_interval: float = 0.5,
+        extra_headers: bool = True,
+        key: str = _KEY,
+        allow_offline: bool = True,
+        preview: bool = False,
+        preview_max_width: int | None = None,
+        preview_max_height: int | None = None,
+        preview_quality: int | None = None,
+    ) -> None:
+        """Prepare a feed; nothing is opened until it is entered.
+
+        Args:
+            client: The device.
+            min_interval: The least time between two snapshots, in seconds.
+                Zero takes one per new frame, as fast as they come back.
+            extra_headers: Ask ustreamer to describe each frame, so that a
+                repeat of the frame already taken, or a second offline
+                placeholder, is not fetched. Without it every part of the
+                stream counts as a new frame.
+            key: What the timing feed is called in
+                [`StreamerStream.clients_stat`][aiopikvm.StreamerStream].
+            allow_offline: Take the "NO LIVE VIDEO" placeholder rather than
+                fail while the source is offline.
+            preview: Have kvmd scale each snapshot down, as
+                [`snapshot()`][aiopikvm.resources.streamer.StreamerResource.snapshot]
+                does; the bounds and quality below go with it.
+            preview_max_width: Width bound for the preview.
+            preview_max_height: Height bound for the preview.
+            preview_quality: JPEG quality of the preview, 1 to 100.
+
+        Raises:
+            ConfigurationError: *min_interval* is negative.
+        """
+        if min_interval < 0:
+            raise ConfigurationError(
+                f"min_interval must be zero or more, not {min_interval}"
+            )
+        self._client = client
+        self._min_interval = min_interval
+        self._extra_headers = extra_headers
+        self._key = key
+        self._snapshot: dict[str, Any] = {
+            "allow_offline": allow_offline,
+            "preview": preview,
+            "preview_max_width": preview_max_width,
+            "preview_max_height": preview_max_height,
+            "preview_quality": preview_quality,
+        }
+        self._tasks: list[asyncio.Task[None]] = []
+        self._wake = asyncio.Event()
+        self._fresh = asyncio.Event()
+        self._due = False
+        self._ended = False
+        self._finished = False
+        self._failure: Exception | None = None
+        self._last: tuple[Any, ...] | None = None
+        self._image: SnapshotImage | None = None
+        self._version = 0
+        self._handed = 0
+        self.frames = 0
+        """Parts the timing feed has delivered."""
+        self.fetches = 0
+        """Snapshots taken."""
+
+    @property
+    def latest(self) -> SnapshotImage | None:
+        """The last snapshot taken, or ``None`` before the first."""
+        return self._image
+
+    async def __aenter__(self) -> Self:
+        """Open the timing feed and start taking snapshots.
+
+        Returns:
+            This feed, to iterate over.
+        """
+        loop = asyncio.get_running_loop()
+        self._tasks = [
+            loop.create_task(self._watch(), name="aiopikvm-snapshot-watch"),
+            loop.create_task(self._take(), name="aiopikvm-snapshot-take"),
+        ]
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Close the timing feed and stop taking snapshots.
+
+        Args:
+            exc_type: Type of the exception the block raised, if any.
+            exc_val: The exception the block raised, if any.
+            exc_tb: Traceback of that exception, if any.
+        """
+        tasks = self._tasks
+        self._tasks = []
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    def __aiter__(self) -> Self:
+        """Iterate over the snapshots as they are taken."""
+        return self
+
+    async def __anext__(self) -> SnapshotImage:
+        """Wait for a snapshot newer than the last one handed out.
+
+        Returns:
+            The newest snapshot.
+
+        Raises:
+            StopAsyncIteration: The stream closed and every snapshot has been
+                handed out.
+            PiKVMError: The stream broke, or could not be opened.
+            Exception: Whatever else stopped the feed's own tasks, once
+                every snapshot taken before it has been handed out.
+        """
+        while True:
+            if self._image is not None and self._version != self._handed:
+                self._handed = self._version
+                return self._image
+            if self._finished:
+                if self._failure is not None:
+                    raise self._failure
+                raise StopAsyncIteration
+            if not self._tasks:
+                raise ConfigurationError("Iterate a SnapshotFeed inside 'async with'")
+            self._fresh.clear()
+            await self._fresh.wait()
+
+    async def _watch(self) -> None:
+        """Read the timing feed, and mark a snapshot due for each new frame.
+
+        However the feed ends, the snapshot task is told so: one that were
+        left waiting for a frame would leave the iteration waiting with it.
+        """
+        try:
+            async for frame in self._client.streamer.mjpeg(
+                key=self._key, extra_headers=self._extra_headers, zero_data=True
+            ):
+                self.frames += 1
+                if self._is_new(frame):
+                    self._due = True
+                    self._wake.set()
+        except PiKVMError as exc:
+            logger.warning("The MJPEG timing feed ended: %s", exc)
+            self._failure = exc
+        except Exception as exc:
+            logger.exception("The MJPEG timing feed failed")
+            self._failure = exc
+        finally:
+            self._ended = True
+            self._wake.set()
+
+    async def _take(self) -> None:
+        """Take the snapshots that fall due, no closer than *min_interval*."""
+        loop = asyncio.get_running_loop()
+        started: float | None = None
+        try:
+            while True:
+                if not self._due:
+                    if self._ended:
+                        break
+                    self._wake.clear()
+                    await self._wake.wait()
+                    continue
+                if started is not None:
+                    delay = started + self._min_interval - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                # Frames that come in from here on are for the next snapshot.
+                self._due = False
+                started = loop.time()
+                await self._fetch()
+        except Exception as exc:
+            logger.exception("Taking snapshots failed")
+            self._failure = exc
+        finally:
+            self._finished = True
+            self._fresh.set()
+
+    async def _fetch(self) -> None:
+        """Take one snapshot and hand it to whoever is waiting."""
+        try:
+            image = await self._client.streamer.snapshot(**self._snapshot)
+        except PiKVMError as exc:
+            logger.warning("Could not take a snapshot: %s", exc)
+            return
+        self.fetches += 1
+        self._image = image
+        self._version += 1
+        self._fresh.set()
+
+    def _is_new(self, frame: MJPEGFrame) -> bool:
+        """Whether a part describes a frame worth a snapshot.
+
+        Without the extra headers a part says only that there is a frame, so
+        every part is new. With them, a part that names the frame already
+        seen — same grab time, same source — is ustreamer resending it, and a
+        placeholder after a placeholder of the same size shows nothing new.
+        """
+        grabbed = next(
+            (
+                value
+                for name, value in frame.headers.items()
+                if name.lower() == _GRABBED
+            ),
+            None,
+        )
+        if grabbed is None:
+            return True
+        seen = (grabbed, frame.online, frame.width, frame.height)
+        last = self._last
+        self._last = seen
+        if last is None:
+            return True
+        if frame.online is False and last[1:] == seen[1:]:
+            return False
+        return seen != last
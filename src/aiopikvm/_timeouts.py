@@ -0,0 +1,190 @@
+"""Request timeouts learned from how long each endpoint actually takes.
+
+One timeout for every call is wrong almost everywhere. ``GET /api/atx``
+answers in milliseconds, and a dead link should be noticed in about one
+second, not ten. Meanwhile ``POST /api/hid/print`` types its whole string
+before it answers, ``POST /api/gpio/switch?wait=1`` holds the request for the
+length of the switch, and an OCR snapshot is as slow as the recognition.
+
+[`AdaptiveTimeout`][aiopikvm.AdaptiveTimeout], passed as the client's
+*timeout*, sizes each call from the latency of its own recent past. A call's
+kind is its method, its path, the names of its query parameters, and the
+values of the few that change what the device does before it answers:
+``wait``, ``ocr``, and the ATX ``button`` and ``action``. So an ATX click that
+waits and one that does not are learned apart, a long press apart from a
+short one, and a snapshot apart from its OCR. A call whose cost follows its
+input, like a long string
+typed by [`type_text()`][aiopikvm.resources.hid.HIDResource.type_text], is
+still better off passing its own *timeout*. Every per-call *timeout* wins
+over the learned one.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import math
+from collections import deque
+from collections.abc import Mapping
+from typing import Any
+
+from aiopikvm._constants import DEFAULT_TIMEOUT
+from aiopikvm._exceptions import ConfigurationError
+
+# Query parameters whose value, not just presence, sets how long a call
+# takes: kvmd holds a request with wait=1 for the whole action, and the
+# length of an ATX press depends on the button or action.
+_MODES = frozenset({"action", "button", "ocr", "wait"})
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class AdaptiveTimeout:
+    """Time each kind of call out at a multiple of its observed p99.
+
+    Until a kind has *min_samples* latencies behind it, it gets *initial*.
+    After that it gets ``multiplier * p99`` over the last *window* of them,
+    clamped between *floor* and *ceiling*. A call that timed out waiting for
+    its answer counts, but only as long as the timeout it would get now: it
+    says the answer took at least that long, not how much longer. So a dead
+    link keeps its kind on the timeout it had, instead of each timeout
+    tripling the next one up to *ceiling*. Only answers make a timeout grow,
+    and an endpoint that has become slower than its timeout needs a per-call
+    *timeout* to be learned again. A connection that timed out or was
+    refused tells nothing about the endpoint, and a cancelled call tells
+    nothing about the device, so none of them is counted.
+
+    The learning lives in each [`PiKVM`][aiopikvm.PiKVM], which talks to one
+    device. One instance can configure any number of clients.
+
+    Streaming calls — MJPEG, image downloads, log following — and the
+    sockets' open and close timeouts use *initial* as a fixed timeout. Time to
+    first byte says little about a stream that is meant to stay open.
+
+    Attributes:
+        initial: Seconds, for a kind not yet learned, and for everything the
+            client does not time adaptively.
+        multiplier: How far past the observed p99 a call may run.
+        floor: The shortest timeout given, however fast the endpoint. It
+            leaves room for a Pi busy with something else.
+        ceiling: The longest timeout given, however slow the endpoint.
+        min_samples: Latencies needed before a kind is trusted.
+        window: Latencies kept per kind. The oldest leave first, so the
+            timeout follows a device that has changed.
+    """
+
+    initial: float = DEFAULT_TIMEOUT
+    multiplier: float = 3.0
+    floor: float = 1.0
+    ceiling: float = 60.0
+    min_samples: int = 20
+    window: int = 256
+
+    def __post_init__(self) -> None:
+        """Refuse settings that cannot produce a timeout.
+
+        Raises:
+            ConfigurationError: A bound is not positive, *floor* exceeds *ceiling*,
+                or *window* is smaller than *min_samples*.
+        """
+        if min(self.initial, self.multiplier, self.floor) <= 0:
+            raise ConfigurationError("initial, multiplier and floor must be positive")
+        if self.floor > self.ceiling:
+            raise ConfigurationError(
+                f"floor {self.floor} exceeds ceiling {self.ceiling}"
+            )
+        if not 1 <= self.min_samples <= self.window:
+            raise ConfigurationError("min_samples must be between 1 and window")
+
+
+class _LatencyWindows:
+    """One client's recent latencies, by kind of call.
+
+    The p99 of a kind is computed when its timeout is next asked for, not on
+    every sample, and is kept until another sample arrives. A sort of a few
+    hundred floats costs microseconds, a fraction of a request.
+    """
+
+    def __init__(self, policy: AdaptiveTimeout) -> None:
+        """Start with nothing learned.
+
+        Args:
+            policy: The bounds to learn within.
+        """
+        self._policy = policy
+        self._samples: dict[tuple[str, str], deque[tuple[float, bool]]] = {}
+        self._timeouts: dict[tuple[str, str], float] = {}
+
+    def timeout(
+        self, method: str, path: str, params: Mapping[str, Any] | None
+    ) -> float:
+        """The timeout to give one call.
+
+        Args:
+            method: HTTP method.
+            path: URL path.
+            params: The call's query parameters. Their names count, and the
+                values of ``wait``, ``ocr``, ``button`` and ``action``.
+
+        Returns:
+            Seconds.
+        """
+        key = (method, _kind(path, params))
+        timeout = self._timeouts.get(key)
+        if timeout is None:
+            timeout = self._timeouts[key] = self._learn(key)
+        return timeout
+
+    def record(
+        self,
+        method: str,
+        path: str,
+        params: Mapping[str, Any] | None,
+        elapsed: float,
+        *,
+        timed_out: bool = False,
+    ) -> None:
+        """Add the latency of one call to its window.
+
+        Args:
+            method: HTTP method.
+            path: URL path.
+            params: The call's query parameters.
+            elapsed: Seconds from sending the call to its answer or its
+                timeout.
+            timed_out: The call timed out waiting for the answer. Its
+                latency is censored: counted at no more than the kind's
+                current timeout, which it can then not raise.
+        """
+        key = (method, _kind(path, params))
+        if timed_out:
+            elapsed = min(elapsed, self.timeout(method, path, params))
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self._policy.window)
+        samples.append((elapsed, timed_out))
+        self._timeouts.pop(key, None)
+
+    def _learn(self, key: tuple[str, str]) -> float:
+        """Work out a kind's timeout from its window."""
+        policy = self._policy
+        samples = self._samples.get(key)
+        if samples is None or len(samples) < policy.min_samples:
+            return policy.initial
+        ordered = sorted(samples)
+        (p99, censored) = ordered[math.ceil(len(ordered) * 0.99) - 1]
+        # A timed-out call only says the answer took longer than its timeout,
+        # so the p99 landing on one leaves the timeout where it was.
+        learned = p99 if censored else p99 * policy.multiplier
+        return min(max(learned, policy.floor), policy.ceiling)
+
+
+def _kind(path: str, params: Mapping[str, Any] | None) -> str:
+    """Name a kind of call: its path, its query parameters' names and modes."""
+    if not params:
+        return path
+    names = (
+        f"{name}={int(value) if isinstance(value, bool) else value}"
+        if name in _MODES
+        else name
+        for name, value in sorted(params.items())
+    )
+    return f"{path}?{'&'.join(names)}"
@@ -5,10 +5,26 @@ takes an ``ssl.SSLContext`` and nothing else, so the same settings have to
 be turned into one here — otherwise the two halves of this client could end up
 trusting different things, which is the sort of difference nobody notices until
 it matters.
+
+A context built here also remembers the TLS session each host last handed
+out, and offers it on the next handshake with that host. PiKVM's CPU makes a
+full handshake the expensive part of a new connection; a resumed one skips
+the certificate exchange and the key agreement that dominate it.
+
+The contexts are cached, too. Every client, every socket and every Janus
+connection asks for one, and building it means reading the CA bundle and the
+client certificate off disk and parsing them — for a private CA bundle, or
+the system store, that is most of a millisecond and a copy of every
+certificate in memory, per context. Clients built with the same settings get
+the same context, which also lets one client resume a session another began.
+A file that changes on disk is noticed by its modification time and reloaded;
+[`clear_ssl_contexts()`][aiopikvm.clear_ssl_contexts] drops everything for a
+change that time cannot show, such as a new system store.
 """
 
 import os
 import ssl
+from typing import Any
 
 from aiopikvm._exceptions import ConfigurationError
 
@@ -36,9 +52,91 @@ type CertTypes = str | tuple[str, str] | tuple[str, str, str]
 ``(cert, key, password)``. Mirrors httpx."""
 
 
+class _ResumingContext(ssl.SSLContext):
+    """A client context that offers each host the session it last got.
+
+    CPython only resumes a session it is handed, and neither httpx nor
+    *websockets* hands it one: every connection is a full handshake. Both
+    build their TLS layer through `wrap_bio()`, though, so that is where the
+    session goes in.
+
+    The session is read off the connection that last reached the host when
+    the next one starts rather than when its handshake ends, because nothing
+    calls back at that point — and under TLS 1.3 the ticket arrives after
+    the handshake anyway. The connection object is kept until then; one per
+    host is all that is ever held.
+
+    Contexts are built by the standard library's own constructors and moved
+    into this class afterwards, so that they are configured exactly as they
+    would have been without it.
+    """
+
+    _handshakes: dict[str | bytes, ssl.SSLObject]
+    _sessions: dict[str | bytes, ssl.SSLSession]
+
+    def wrap_bio(
+        self,
+        incoming: ssl.MemoryBIO,
+        outgoing: ssl.MemoryBIO,
+        server_side: bool = False,
+        server_hostname: str | bytes | None = None,
+        session: ssl.SSLSession | None = None,
+    ) -> ssl.SSLObject:
+        """Wrap a connection, resuming the host's last session if there is one.
+
+        Args:
+            incoming: BIO the peer's bytes are written into.
+            outgoing: BIO the bytes for the peer are read from.
+            server_side: Always ``False`` for this client.
+            server_hostname: Host the connection is to, which keys the
+                session.
+            session: A session chosen by the caller, which wins.
+
+        Returns:
+            The TLS object for the connection.
+        """
+        host = None if server_side else server_hostname
+        if host is not None:
+            handshakes = self.__dict__.setdefault("_handshakes", {})
+            sessions = self.__dict__.setdefault("_sessions", {})
+            previous = handshakes.get(host)
+            if previous is not None and previous.session is not None:
+                sessions[host] = previous.session
+            if session is None:
+                session = sessions.get(host)
+        wrapped = super().wrap_bio(
+            incoming, outgoing, server_side, server_hostname, session
+        )
+        if host is not None:
+            handshakes[host] = wrapped
+        return wrapped
+
+
+_contexts: dict[tuple[Any, ...], tuple[tuple[Any, ...], ssl.SSLContext]] = {}
+"""Built contexts, by *verify* and *cert*, with the file stamps they were built
+from."""
+
+
+def clear_ssl_contexts() -> None:
+    """Forget every TLS context built so far.
+
+    Clients opened afterwards build their contexts again, from the files as
+    they are now; clients already open keep the ones they have. A CA bundle
+    or a certificate rewritten in place is noticed without this, by its
+    modification time. Call it for what a modification time does not show: a
+    system trust store updated underneath the process, or a certificate
+    replaced within the same second on a filesystem that records no finer.
+    """
+    _contexts.clear()
+
+
 def build_ssl_context(verify: VerifyTypes, cert: CertTypes | None) -> ssl.SSLContext:
     """Turn *verify* and *cert* into the context a TLS handshake needs.
 
+    The same two arguments give the same context for as long as the files
+    behind them are unchanged, so it must not be modified: it is shared with
+    every other client built the same way.
+
     Args:
         verify: What to trust; see [`VerifyTypes`][aiopikvm.VerifyTypes].
         cert: Client certificate to present, if any.
@@ -61,8 +159,21 @@ def build_ssl_context(verify: VerifyTypes, cert: CertTypes | None) -> ssl.SSLCon
                 "pass that, rather than have this client mutate an object "
                 "it does not own."
             )
+        # The caller's own object is left as it is, session cache and all.
         return verify
 
+    key = (verify, cert if cert is None or isinstance(cert, str) else tuple(cert))
+    stamps = _stamps(verify, cert)
+    cached = _contexts.get(key)
+    if cached is not None and cached[0] == stamps:
+        return cached[1]
+    context = _build(verify, cert)
+    _contexts[key] = (stamps, context)
+    return context
+
+
+def _build(verify: bool | str, cert: CertTypes | None) -> ssl.SSLContext:
+    """Build a new context, bypassing the cache."""
     if verify is False:
         context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
         context.check_hostname = False
@@ -93,9 +204,41 @@ def build_ssl_context(verify: VerifyTypes, cert: CertTypes | None) -> ssl.SSLCon
             raise ConfigurationError(
                 f"Cannot load the client certificate {certfile!r}: {exc}"
             ) from exc
+    context.__class__ = _ResumingContext
     return context
 
 
+def _stamps(verify: bool | str, cert: CertTypes | None) -> tuple[Any, ...]:
+    """What has to be unchanged for a cached context to still be right.
+
+    Args:
+        verify: What to trust, short of a ready-made context.
+        cert: Client certificate, if any.
+
+    Returns:
+        The size and modification time of every file the context would be
+        loaded from — a directory of hashed certificates gains a new time
+        when a file is added to it — and, for the system store, the
+        variables that point OpenSSL somewhere else. A file that is missing
+        stamps as ``None``, so its appearance is a change too.
+    """
+    paths = [] if isinstance(verify, bool) else [os.fspath(verify)]
+    if cert is not None:
+        (certfile, keyfile, _) = _unpack_cert(cert)
+        paths += [certfile] if keyfile is None else [certfile, keyfile]
+    stamps: list[Any] = []
+    for path in paths:
+        try:
+            info = os.stat(path)
+        except OSError:
+            stamps.append(None)
+        else:
+            stamps.append((info.st_mtime_ns, info.st_size))
+    if verify is True:
+        stamps += [os.environ.get("SSL_CERT_FILE"), os.environ.get("SSL_CERT_DIR")]
+    return tuple(stamps)
+
+
 def _unpack_cert(cert: CertTypes) -> tuple[str, str | None, str | None]:
     """Split a certificate argument into what ``load_cert_chain`` takes.
 
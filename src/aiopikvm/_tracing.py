@@ -0,0 +1,571 @@
+"""Hooks for watching what the client does on the wire.
+
+A [`Tracer`][aiopikvm.Tracer] handed to [`PiKVM`][aiopikvm.PiKVM] is told
+about every HTTP request as it starts and as it ends, every login the client
+makes on its own under ``auth="cookie"``, every frame the WebSocket clients
+send or receive, and every Janus transaction a
+[`WebRTCSession`][aiopikvm.WebRTCSession] waits on. It is the one place to
+hang spans, metrics or a debug log off, without wrapping an httpx transport or
+a *websockets* connection that this package owns.
+
+The hooks receive small records rather than arguments. A record started by one
+hook is the same object the matching end hook receives, filled in, and it
+carries a ``context`` dict for whatever the tracer wants to keep in between —
+a span, a timer, a correlation id — so a tracer needs no table of its own to
+match the two up. Every record names the device it was about by ``host`` and
+``port``, so one tracer shared by a fleet of clients can still tell them
+apart.
+
+A hook runs inline, on the task doing the work, and should be cheap. One that
+raises is logged and otherwise ignored: a broken exporter is not a reason for
+a power button not to be pressed. Without a tracer no record is built and no
+clock is read; the client pays an ``is None`` test per operation.
+
+[`OpenTelemetryTracer`][aiopikvm.OpenTelemetryTracer] turns the hooks into
+OpenTelemetry spans and metrics. It needs the ``otel`` extra; nothing else in
+the package imports OpenTelemetry.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import logging
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any, Literal
+from urllib.parse import urlsplit
+
+from aiopikvm._exceptions import APIError, ConfigurationError
+
+if TYPE_CHECKING:
+    from opentelemetry.metrics import MeterProvider
+    from opentelemetry.trace import TracerProvider
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PORTS = {"http": 80, "https": 443, "ws": 80, "wss": 443}
+
+type TracedSocket = Literal["kvmd", "media", "janus"]
+"""Which WebSocket a frame travelled on.
+
+``"kvmd"`` is [`PiKVMWebSocket`][aiopikvm.PiKVMWebSocket], ``"media"`` is
+[`MediaWebSocket`][aiopikvm.MediaWebSocket], and ``"janus"`` is the signalling
+socket of a [`WebRTCSession`][aiopikvm.WebRTCSession].
+"""
+
+
+@dataclasses.dataclass(slots=True)
+class RequestTrace:
+    """One HTTP request, as the client sent it and as it ended.
+
+    Each attempt is its own record: a request refused under
+    ``auth="cookie"`` and sent again after a new login is two of them, the
+    second with ``attempt=2``.
+
+    Attributes:
+        method: HTTP method.
+        path: URL path, relative to the base URL, without the query string.
+        streaming: Opened through [`PiKVM.stream()`][aiopikvm.PiKVM.stream].
+            A streaming request ends when the caller's block does, not when
+            the headers arrive, so its duration covers reading the body.
+        attempt: ``1``, or ``2`` for the retry after a refreshed session.
+        started: `time.monotonic()` when the request was handed to httpx.
+        duration: Seconds from then until it ended. ``0.0`` until it has.
+        status: HTTP status of the response, ``0`` when there was none.
+        bytes_sent: Size of the request body, as its ``Content-Length``
+            declared it. ``0`` for a streamed upload, which declares none.
+        bytes_received: Bytes read off the connection for the body, before
+            any ``Content-Encoding`` was undone.
+        error: What the request failed with, ``None`` if it did not.
+        host: Host name of the device, from the URL the client was built
+            with. Empty when the URL names none, as a Unix socket's does not.
+        port: TCP port of the device, the scheme's own when the URL gives
+            none. ``0`` when there is no host.
+        context: The tracer's own, kept from the start hook to the end one.
+    """
+
+    method: str
+    path: str
+    streaming: bool = False
+    attempt: int = 1
+    started: float = dataclasses.field(default_factory=time.monotonic)
+    duration: float = 0.0
+    status: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    error: BaseException | None = None
+    host: str = ""
+    port: int = 0
+    context: dict[str, Any] = dataclasses.field(default_factory=dict)
+
+
+@dataclasses.dataclass(slots=True)
+class LoginTrace:
+    """A login the client made by itself under ``auth="cookie"``.
+
+    The ``POST /api/auth/login`` it sends is traced as a request of its own
+    as well; this record is the reason it was sent.
+
+    Attributes:
+        refresh: ``True`` when kvmd had refused the session the client held,
+            ``False`` for the first login.
+        started: `time.monotonic()` when the login began.
+        duration: Seconds the login took. A task that found another one's
+            login already done makes none, and reports none.
+        error: What it failed with, ``None`` if it did not.
+        host: Host name of the device; see
+            [`RequestTrace.host`][aiopikvm.RequestTrace].
+        port: TCP port of the device.
+        context: The tracer's own, kept from the start hook to the end one.
+    """
+
+    refresh: bool
+    started: float = dataclasses.field(default_factory=time.monotonic)
+    duration: float = 0.0
+    error: BaseException | None = None
+    host: str = ""
+    port: int = 0
+    context: dict[str, Any] = dataclasses.field(default_factory=dict)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class FrameTrace:
+    """One WebSocket frame, sent or received.
+
+    Attributes:
+        socket: Which socket it travelled on; see
+            [`TracedSocket`][aiopikvm.TracedSocket].
+        direction: ``"out"`` for a frame this client sent, ``"in"`` for one
+            it read.
+        binary: A binary frame rather than a text one.
+        size: Frame payload in bytes; a text frame is counted encoded.
+        event_type: What the frame was: kvmd's ``event_type``, the input
+            event a binary frame carried, or Janus's ``janus`` verb. ``None``
+            when a received frame did not say — raw video, a pong, or a frame
+            that did not parse.
+        host: Host name of the device the socket is open to; see
+            [`RequestTrace.host`][aiopikvm.RequestTrace].
+        port: TCP port of the device.
+    """
+
+    socket: TracedSocket
+    direction: Literal["in", "out"]
+    binary: bool
+    size: int
+    event_type: str | None = None
+    host: str = ""
+    port: int = 0
+
+
+@dataclasses.dataclass(slots=True)
+class JanusTrace:
+    """One Janus transaction, from the message going out to its answer.
+
+    Attributes:
+        janus: The verb sent, e.g. ``"create"``, ``"attach"`` or
+            ``"message"``.
+        transaction: The transaction id the answer was matched by.
+        started: `time.monotonic()` when the message was sent.
+        duration: Seconds until Janus acknowledged it — the round trip
+            through the gateway, not the plugin's own answer, which arrives
+            later as a push.
+        error: What it failed with, ``None`` if it did not.
+        host: Host name of the device whose gateway answered; see
+            [`RequestTrace.host`][aiopikvm.RequestTrace].
+        port: TCP port of the device.
+        context: The tracer's own, kept from the start hook to the end one.
+    """
+
+    janus: str
+    transaction: str
+    started: float = dataclasses.field(default_factory=time.monotonic)
+    duration: float = 0.0
+    error: BaseException | None = None
+    host: str = ""
+    port: int = 0
+    context: dict[str, Any] = dataclasses.field(default_factory=dict)
+
+
+class Tracer:
+    """Receives what the client does, one hook per kind of operation.
+
+    Every hook does nothing here. Subclass this and override the ones that
+    matter; the client calls each of them whether or not it was overridden.
+
+        class Slow(Tracer):
+            def request_end(self, request: RequestTrace) -> None:
+                if request.duration > 1.0:
+                    print(f"{request.method} {request.path}: {request.duration:.1f} s")
+
+        async with PiKVM(url, passwd=passwd, tracer=Slow()) as kvm:
+            ...
+    """
+
+    def request_start(self, request: RequestTrace) -> None:
+        """An HTTP request is about to be sent.
+
+        Args:
+            request: The request; ``duration``, ``status`` and the byte
+                counts are not filled in yet.
+        """
+
+    def request_end(self, request: RequestTrace) -> None:
+        """An HTTP request has ended, with a response or with an error.
+
+        Args:
+            request: The record [`request_start()`][aiopikvm.Tracer.request_start]
+                received, now filled in.
+        """
+
+    def request_retry(self, request: RequestTrace) -> None:
+        """A request was refused for its session and is about to be resent.
+
+        Called once the refused attempt has ended and a new session is open,
+        just before [`request_start()`][aiopikvm.Tracer.request_start] for the
+        resend.
+
+        Args:
+            request: The resend, ``attempt=2``; the same record
+                [`request_start()`][aiopikvm.Tracer.request_start] receives
+                next.
+        """
+
+    def login_start(self, login: LoginTrace) -> None:
+        """The client is about to open a session by itself.
+
+        Args:
+            login: The login; only ``refresh`` is filled in.
+        """
+
+    def login_end(self, login: LoginTrace) -> None:
+        """A login the client started has ended.
+
+        Args:
+            login: The record [`login_start()`][aiopikvm.Tracer.login_start]
+                received, now filled in.
+        """
+
+    def ws_frame(self, frame: FrameTrace) -> None:
+        """A WebSocket frame has been sent or read.
+
+        The busiest hook by far — the media socket calls it for every video
+        frame — so keep it cheapest.
+
+        Args:
+            frame: What the frame was.
+        """
+
+    def janus_start(self, transaction: JanusTrace) -> None:
+        """A Janus message is about to be sent.
+
+        Args:
+            transaction: The transaction; ``duration`` is not filled in yet.
+        """
+
+    def janus_end(self, transaction: JanusTrace) -> None:
+        """Janus has answered a message, refused it, or not answered in time.
+
+        Args:
+            transaction: The record
+                [`janus_start()`][aiopikvm.Tracer.janus_start] received, now
+                filled in.
+        """
+
+
+def _notify[T](hook: Callable[[T], object], record: T) -> None:
+    """Call one tracer hook, and keep its failure out of the client's way.
+
+    Args:
+        hook: The bound hook.
+        record: What to hand it.
+    """
+    try:
+        hook(record)
+    except Exception:
+        logger.exception("Tracer hook %s raised; ignoring it", hook.__qualname__)
+
+
+def _server(url: str) -> tuple[str, int]:
+    """Name the device a URL points at, the way the trace records do.
+
+    Args:
+        url: The URL a client or socket was built with.
+
+    Returns:
+        ``(host, port)``: the host name, and the port the URL gives or its
+        scheme's own. ``("", 0)`` for a URL without a host, or one too
+        malformed to read — the client reports that itself when it opens.
+    """
+    try:
+        parts = urlsplit(url)
+        host, port = parts.hostname or "", parts.port
+    except ValueError:
+        return "", 0
+    if not host:
+        return "", 0
+    return host, port or _DEFAULT_PORTS.get(parts.scheme, 0)
+
+
+def _trace_frame(
+    tracer: Tracer,
+    server: tuple[str, int],
+    socket: TracedSocket,
+    direction: Literal["in", "out"],
+    frame: str | bytes,
+    event_type: object = None,
+) -> None:
+    """Tell a tracer about one WebSocket frame.
+
+    Args:
+        tracer: The tracer.
+        server: ``(host, port)`` of the device, from `_server`.
+        socket: Which socket the frame travelled on.
+        direction: ``"in"`` or ``"out"``.
+        frame: The frame as sent or read; text is measured encoded.
+        event_type: What the frame said it was. Anything but a string — a
+            frame whose ``event_type`` was not one — is reported as ``None``.
+    """
+    if isinstance(frame, str):
+        binary, size = False, len(frame.encode())
+    else:
+        binary, size = True, len(frame)
+    _notify(
+        tracer.ws_frame,
+        FrameTrace(
+            socket,
+            direction,
+            binary,
+            size,
+            event_type if isinstance(event_type, str) else None,
+            *server,
+        ),
+    )
+
+
+def _finish(
+    record: RequestTrace | LoginTrace | JanusTrace, error: BaseException | None
+) -> None:
+    """Stamp the end of a timed record.
+
+    Args:
+        record: The record to complete.
+        error: What the operation failed with, ``None`` if it did not.
+    """
+    record.duration = time.monotonic() - record.started
+    record.error = error
+    if isinstance(record, RequestTrace) and isinstance(error, APIError):
+        record.status = record.status or error.status_code
+
+
+# --- OpenTelemetry -----------------------------------------------------
+
+
+class OpenTelemetryTracer(Tracer):
+    """Reports the client's operations as OpenTelemetry spans and metrics.
+
+    Each HTTP request, login and Janus transaction is a span — a client span,
+    named ``"{method} {path}"`` for a request — and is recorded in a duration
+    histogram. WebSocket frames are not spans, there are far too many; they
+    are counted, and their bytes summed, by socket, direction and event type.
+    Every span and every measurement carries ``server.address`` and
+    ``server.port``, naming the device, so one tracer can serve a fleet.
+
+    Instruments, all under the ``aiopikvm`` meter:
+
+    - ``http.client.request.duration`` (s): per request, by method, status
+      and error type, following the HTTP semantic conventions.
+    - ``aiopikvm.http.retries``: requests resent after a refreshed session.
+    - ``aiopikvm.login.duration`` (s): logins the client made by itself.
+    - ``aiopikvm.ws.frames`` and ``aiopikvm.ws.bytes`` (By): frames and their
+      payload, by ``aiopikvm.ws.socket``, ``aiopikvm.ws.direction`` and
+      ``aiopikvm.ws.event_type``.
+    - ``aiopikvm.janus.duration`` (s): Janus transaction round trips, by
+      verb.
+
+    Needs the ``otel`` extra: ``pip install 'aiopikvm[otel]'``, which is
+    OpenTelemetry's API alone. Spans and metrics go wherever the SDK the
+    application configured sends them; with none configured, the API's
+    no-op providers drop them.
+    """
+
+    def __init__(
+        self,
+        *,
+        tracer_provider: TracerProvider | None = None,
+        meter_provider: MeterProvider | None = None,
+    ) -> None:
+        """Create the tracer and its instruments.
+
+        Args:
+            tracer_provider: Where spans go. ``None`` takes the global one.
+            meter_provider: Where metrics go. ``None`` takes the global one.
+
+        Raises:
+            ConfigurationError: OpenTelemetry is not installed.
+        """
+        try:
+            from opentelemetry import metrics, trace
+        except ImportError as exc:
+            raise ConfigurationError(
+                "OpenTelemetryTracer needs opentelemetry-api, which aiopikvm "
+                "does not install by default: pip install 'aiopikvm[otel]'. "
+                f"({exc})"
+            ) from exc
+        from aiopikvm import __version__
+
+        self._trace = trace
+        self._tracer = trace.get_tracer("aiopikvm", __version__, tracer_provider)
+        meter = metrics.get_meter("aiopikvm", __version__, meter_provider)
+        self._request_duration = meter.create_histogram(
+            "http.client.request.duration",
+            unit="s",
+            description="Duration of HTTP requests to PiKVM.",
+        )
+        self._retries = meter.create_counter(
+            "aiopikvm.http.retries",
+            description="Requests resent after kvmd refused their session.",
+        )
+        self._login_duration = meter.create_histogram(
+            "aiopikvm.login.duration",
+            unit="s",
+            description="Logins the client made by itself under cookie auth.",
+        )
+        self._frames = meter.create_counter(
+            "aiopikvm.ws.frames",
+            description="WebSocket frames sent and received.",
+        )
+        self._frame_bytes = meter.create_counter(
+            "aiopikvm.ws.bytes",
+            unit="By",
+            description="WebSocket frame payload sent and received.",
+        )
+        self._janus_duration = meter.create_histogram(
+            "aiopikvm.janus.duration",
+            unit="s",
+            description="Round trip of Janus transactions.",
+        )
+
+    def _start_span(
+        self, name: str, context: dict[str, Any], **attributes: Any
+    ) -> None:
+        context["span"] = self._tracer.start_span(
+            name, kind=self._trace.SpanKind.CLIENT, attributes=attributes
+        )
+
+    def _end_span(
+        self, context: dict[str, Any], error: BaseException | None, **attributes: Any
+    ) -> None:
+        span = context.pop("span", None)
+        if span is None:
+            return
+        span.set_attributes(attributes)
+        if error is not None:
+            span.record_exception(error)
+            span.set_status(
+                self._trace.Status(self._trace.StatusCode.ERROR, str(error))
+            )
+        span.end()
+
+    @staticmethod
+    def _server_attributes(host: str, port: int) -> dict[str, Any]:
+        """The semantic-convention attributes naming a device.
+
+        Args:
+            host: Host name from the record.
+            port: Port from the record.
+
+        Returns:
+            ``server.address`` and ``server.port``, or nothing for a record
+            without a host.
+        """
+        if not host:
+            return {}
+        return {"server.address": host, "server.port": port}
+
+    def request_start(self, request: RequestTrace) -> None:
+        self._start_span(
+            f"{request.method} {request.path}",
+            request.context,
+            **self._server_attributes(request.host, request.port),
+            **{
+                "http.request.method": request.method,
+                "url.path": request.path,
+                "aiopikvm.attempt": request.attempt,
+                "aiopikvm.streaming": request.streaming,
+            },
+        )
+
+    def request_end(self, request: RequestTrace) -> None:
+        attributes: dict[str, Any] = {
+            "http.request.method": request.method,
+            **self._server_attributes(request.host, request.port),
+        }
+        if request.status:
+            attributes["http.response.status_code"] = request.status
+        if request.error is not None:
+            attributes["error.type"] = type(request.error).__name__
+        self._end_span(
+            request.context,
+            request.error,
+            **attributes,
+            **{
+                "http.request.body.size": request.bytes_sent,
+                "http.response.body.size": request.bytes_received,
+            },
+        )
+        self._request_duration.record(request.duration, attributes)
+
+    def request_retry(self, request: RequestTrace) -> None:
+        self._retries.add(
+            1,
+            {
+                "http.request.method": request.method,
+                **self._server_attributes(request.host, request.port),
+            },
+        )
+
+    def login_start(self, login: LoginTrace) -> None:
+        self._start_span(
+            "aiopikvm login",
+            login.context,
+            **self._server_attributes(login.host, login.port),
+            **{"aiopikvm.refresh": login.refresh},
+        )
+
+    def login_end(self, login: LoginTrace) -> None:
+        attributes: dict[str, Any] = {
+            "aiopikvm.refresh": login.refresh,
+            **self._server_attributes(login.host, login.port),
+        }
+        if login.error is not None:
+            attributes["error.type"] = type(login.error).__name__
+        self._end_span(login.context, login.error)
+        self._login_duration.record(login.duration, attributes)
+
+    def ws_frame(self, frame: FrameTrace) -> None:
+        attributes = {
+            "aiopikvm.ws.socket": frame.socket,
+            "aiopikvm.ws.direction": frame.direction,
+            "aiopikvm.ws.event_type": frame.event_type or "",
+            **self._server_attributes(frame.host, frame.port),
+        }
+        self._frames.add(1, attributes)
+        self._frame_bytes.add(frame.size, attributes)
+
+    def janus_start(self, transaction: JanusTrace) -> None:
+        self._start_span(
+            f"janus {transaction.janus}",
+            transaction.context,
+            **self._server_attributes(transaction.host, transaction.port),
+            **{"aiopikvm.janus.transaction": transaction.transaction},
+        )
+
+    def janus_end(self, transaction: JanusTrace) -> None:
+        attributes: dict[str, Any] = {
+            "aiopikvm.janus.verb": transaction.janus,
+            **self._server_attributes(transaction.host, transaction.port),
+        }
+        if transaction.error is not None:
+            attributes["error.type"] = type(transaction.error).__name__
+        self._end_span(transaction.context, transaction.error)
+        self._janus_duration.record(transaction.duration, attributes)
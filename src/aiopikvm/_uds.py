@@ -0,0 +1,123 @@
+"""Talking to kvmd through its unix socket, for code running on the PiKVM.
+
+Everything a client on the network sends goes through nginx: TLS, then a
+proxy hop to kvmd's socket at ``/run/kvmd/kvmd.sock``, with ``/api`` taken
+off the front of the path on the way. A program on the device itself can skip
+both and connect to that socket directly — no handshake, no second process
+copying the bytes, and on a Pi that is most of what a request costs.
+
+nginx does more than strip the prefix, though: it also sends ``/streamer/``
+to ustreamer, which listens on a socket of its own beside kvmd's. The
+transport here does the same routing, so every path the resources use works
+unchanged. kvmd-media and Janus are not routed — their sockets are not part
+of kvmd's — and the client refuses [`media_ws()`][aiopikvm.PiKVM.media_ws]
+and [`webrtc()`][aiopikvm.PiKVM.webrtc] when built this way.
+"""
+
+from __future__ import annotations
+
+import os
+
+import httpx
+
+from aiopikvm._exceptions import ConfigurationError
+
+_UNIX_SCHEME = "unix://"
+"""The prefix that makes a URL a socket path: ``unix:///run/kvmd/kvmd.sock``."""
+
+_LOCAL_URL = "http://localhost"
+"""Base URL of a client on a socket. kvmd reads no Host, but HTTP needs one."""
+
+_USTREAMER_SOCKET = "ustreamer.sock"
+"""ustreamer's socket, in the directory kvmd's is in."""
+
+
+def _split_unix_url(url: str, uds: str | None) -> str | None:
+    """Work out which socket a client is to connect to, if any.
+
+    Args:
+        url: The URL the client was built with.
+        uds: Its *uds* argument.
+
+    Returns:
+        The socket path, or ``None`` for a client that goes over the network.
+
+    Raises:
+        ConfigurationError: If a ``unix://`` URL names no path, or names a
+            different one from *uds*.
+    """
+    if not url.startswith(_UNIX_SCHEME):
+        return uds
+    path = url[len(_UNIX_SCHEME) :]
+    if not path.startswith("/"):
+        raise ConfigurationError(
+            f"A unix:// URL takes an absolute socket path, as in "
+            f"unix:///run/kvmd/kvmd.sock; got {url!r}"
+        )
+    if uds is not None and uds != path:
+        raise ConfigurationError(
+            f"The URL names the socket {path!r} and uds names {uds!r}; pass one."
+        )
+    return path
+
+
+def _kvmd_path(path: str) -> str | None:
+    """Take the ``/api`` nginx strips off a path kvmd serves.
+
+    Args:
+        path: The path as the client sends it to nginx.
+
+    Returns:
+        The path kvmd routes, or ``None`` when it is not one of kvmd's.
+    """
+    if path == "/api":
+        return "/"
+    if path.startswith("/api/"):
+        return path[len("/api") :]
+    return None
+
+
+class _UnixTransport(httpx.AsyncBaseTransport):
+    """Send each request to the socket nginx would have sent it to.
+
+    ``/api/...`` goes to kvmd, less the prefix; ``/streamer/...`` goes to
+    ustreamer, less its own. Anything else — ``HEAD /`` from a prewarm, a
+    path nginx serves from disk — goes to kvmd as it is, which answers 404
+    for what it does not know.
+    """
+
+    def __init__(self, path: str, *, limits: httpx.Limits) -> None:
+        """Open nothing yet; each socket is connected to on first use.
+
+        Args:
+            path: kvmd's socket.
+            limits: Pool limits for each of the two sockets.
+        """
+        self._kvmd = httpx.AsyncHTTPTransport(uds=path, limits=limits)
+        self._ustreamer = httpx.AsyncHTTPTransport(
+            uds=os.path.join(os.path.dirname(path), _USTREAMER_SOCKET), limits=limits
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Rewrite the path the way nginx would, and send the request on.
+
+        Args:
+            request: The request as the client built it.
+
+        Returns:
+            The response of whichever daemon serves the path.
+        """
+        path = request.url.path
+        transport = self._kvmd
+        kvmd = _kvmd_path(path)
+        if kvmd is not None:
+            request.url = request.url.copy_with(path=kvmd)
+        elif path.startswith("/streamer/"):
+            request.url = request.url.copy_with(path=path[len("/streamer") :])
+            transport = self._ustreamer
+        return await transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        """Close both pools."""
+        await self._kvmd.aclose()
+        await self._ustreamer.aclose()
@@ -0,0 +1,358 @@
+"""How much checking a response gets before a caller sees it.
+
+[`ValidationMode`][aiopikvm.ValidationMode] is the per-client switch; this
+module is what each of its three values does. ``"full"`` is pydantic's own
+``model_validate`` and nothing else. The other two build a model one level at
+a time: its own fields now, and each field holding a submodel — directly, or
+in a dict or a list — only when it is first read, through the hook on
+``_Base``.
+
+That split is where the time goes. pydantic-core validates a whole tree faster
+than any Python code can build one, so assembling every submodel up front
+without checking it buys nothing; what costs is building the submodels
+nobody reads. [`PiKVMWebSocket.states()`][aiopikvm.PiKVMWebSocket.states]
+revalidates a subsystem on every event about it, and a caller watching the
+ATX LEDs through it never looks at most of what ``streamer`` or ``info``
+carry.
+
+A model's plan — which fields hold submodels, what its shallow twin looks
+like, which fields are required — depends only on the class, so it is worked
+out once per class and kept.
+"""
+
+from __future__ import annotations
+
+import functools
+import types
+import typing
+from collections.abc import Callable
+from typing import Any, Union
+
+from pydantic import BaseModel, TypeAdapter, ValidationError, create_model
+
+from aiopikvm._constants import ValidationMode
+from aiopikvm._exceptions import ResponseError
+from aiopikvm.models._base import _Base
+
+type _Convert = Callable[[Any], Any]
+"""Turns one field's raw value into what the model holds for it."""
+
+_new = object.__new__
+_set = object.__setattr__
+
+
+def validate_model[M: BaseModel](
+    model: type[M], data: Any, mode: ValidationMode = "full"
+) -> M:
+    """Turn a payload into a model, checking it as much as *mode* says.
+
+    Args:
+        model: Model describing the payload.
+        data: Payload, as parsed from JSON.
+        mode: How much to check; see
+            [`ValidationMode`][aiopikvm.ValidationMode].
+
+    Returns:
+        The model. Under ``"lazy"`` and ``"trusted"`` its submodels are built
+        on first access, and a problem found then is raised from that access
+        as a [`ResponseError`][aiopikvm.ResponseError].
+
+    Raises:
+        ValidationError: The payload does not match the model — at the top
+            level only, under ``"lazy"``; and under ``"trusted"`` only when it
+            is not shaped like one, since that falls back to full validation.
+    """
+    if mode == "full" or not issubclass(model, _Base):
+        return model.model_validate(data)
+    if mode == "lazy":
+        return _lazy(model, data)
+    return _trusted(model, data)
+
+
+# --- Plans -------------------------------------------------------------
+
+
+class _Plan(typing.NamedTuple):
+    """What building one model class takes, worked out once.
+
+    Attributes:
+        shallow: The model with every submodel replaced by ``Any``. Validating
+            against it checks this level — scalars, required fields, the shape
+            of each container — and passes the submodels through untouched.
+        names: Every declared field.
+        required: Fields the payload has to carry.
+        nullable: Fields holding submodels that may be ``None``.
+        defaults: What each optional field holds when the payload omits it.
+        lazy: How ``"lazy"`` builds each field that holds submodels.
+        trusted: How ``"trusted"`` builds each of those fields.
+    """
+
+    shallow: type[BaseModel]
+    names: frozenset[str]
+    required: frozenset[str]
+    nullable: frozenset[str]
+    defaults: dict[str, Callable[[], Any]]
+    lazy: dict[str, _Convert]
+    trusted: dict[str, _Convert]
+
+
+@functools.cache
+def _plan(model: type[_Base]) -> _Plan:
+    """Work out how to build *model*.
+
+    Args:
+        model: Model class to plan for.
+
+    Returns:
+        The plan, cached for the life of the process.
+    """
+    shallow: dict[str, Any] = {}
+    lazy: dict[str, _Convert] = {}
+    trusted: dict[str, _Convert] = {}
+    nullable: set[str] = set()
+    for name, field in model.model_fields.items():
+        annotation = field.annotation
+        if _holds_models(annotation):
+            if type(None) in typing.get_args(annotation):
+                nullable.add(name)
+            lazy[name] = _converter(annotation, _lazy)
+            trusted[name] = _converter(annotation, _trusted)
+            annotation = _shallow(annotation)
+        shallow[name] = (annotation, field)
+    return _Plan(
+        shallow=create_model(model.__name__, __config__=model.model_config, **shallow),
+        names=frozenset(model.model_fields),
+        required=frozenset(
+            name for name, field in model.model_fields.items() if field.is_required()
+        ),
+        nullable=frozenset(nullable),
+        defaults={
+            name: functools.partial(field.get_default, call_default_factory=True)
+            for name, field in model.model_fields.items()
+            if not field.is_required()
+        },
+        lazy=lazy,
+        trusted=trusted,
+    )
+
+
+def _holds_models(annotation: Any) -> bool:
+    """Whether a field's type has one of this package's models in it."""
+    if isinstance(annotation, type):
+        return issubclass(annotation, _Base)
+    return any(_holds_models(arg) for arg in typing.get_args(annotation))
+
+
+def _shallow(annotation: Any) -> Any:
+    """Replace every model in a type with ``Any``, keeping the containers.
+
+    Args:
+        annotation: A field's type: a model, or a union, dict or list that
+            has one inside.
+
+    Returns:
+        The same type with ``Any`` where each model was, so validating
+        against it still checks that a ``dict[str, MSDImage]`` is a dict.
+    """
+    if isinstance(annotation, type) and issubclass(annotation, _Base):
+        return Any
+    origin = typing.get_origin(annotation)
+    args = tuple(_shallow(arg) for arg in typing.get_args(annotation))
+    if origin in (Union, types.UnionType):
+        return Union[args]  # noqa: UP007 - built from a tuple
+    if origin in (dict, list):
+        return types.GenericAlias(origin, args)
+    return annotation
+
+
+def _converter(annotation: Any, build: Callable[[type[Any], Any], Any]) -> _Convert:
+    """Build the function that turns a raw field value into a model tree.
+
+    Args:
+        annotation: The field's type.
+        build: `_lazy` or `_trusted`, applied to each model the value
+            holds.
+
+    Returns:
+        A function from the raw value to the built one. A value that is not
+        the container the type says — which only ``"trusted"`` can hand it —
+        is validated in full instead, the same as anything this does not
+        recognise.
+    """
+    if isinstance(annotation, type) and issubclass(annotation, _Base):
+        model = annotation
+        return lambda raw: build(model, raw)
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin in (Union, types.UnionType):
+        present = [arg for arg in args if arg is not type(None)]
+        if len(present) == 1:
+            inner = _converter(present[0], build)
+            return lambda raw: None if raw is None else inner(raw)
+    elif origin is dict:
+        item = _converter(args[1], build)
+        return lambda raw: (
+            {key: item(value) for key, value in raw.items()}
+            if isinstance(raw, dict)
+            else _adapter(annotation).validate_python(raw)
+        )
+    elif origin is list:
+        item = _converter(args[0], build)
+        return lambda raw: (
+            [item(value) for value in raw]
+            if isinstance(raw, list)
+            else _adapter(annotation).validate_python(raw)
+        )
+    return _adapter(annotation).validate_python
+
+
+@functools.cache
+def _adapter(annotation: Any) -> TypeAdapter[Any]:
+    """A validator for a type that is not a model, built once."""
+    return TypeAdapter(annotation)
+
+
+# --- Building ----------------------------------------------------------
+
+
+def _lazy[M: _Base](model: type[M], data: Any) -> M:
+    """Validate this level of *model*, and leave its submodels for later.
+
+    Args:
+        model: Model to build.
+        data: Its payload.
+
+    Returns:
+        The model, with each submodel waiting to be validated on first read.
+
+    Raises:
+        ValidationError: This level does not match: a scalar of the wrong
+            type, a required field missing, a container that is not one, a
+            submodel that is ``None`` where the model does not allow it.
+    """
+    plan = _plan(model)
+    shallow = plan.shallow.model_validate(data)
+    fields = shallow.__dict__
+    deferred: dict[str, Callable[[], Any]] = {}
+    for name, convert in plan.lazy.items():
+        raw = fields[name]
+        if raw is None:
+            if name not in plan.nullable:
+                # The shallow twin took it as ``Any``; the model does not.
+                return model.model_validate(data)
+            continue
+        del fields[name]
+        deferred[name] = _pending(model, name, convert, raw)
+    return _assemble(
+        model, fields, shallow.__pydantic_fields_set__, shallow.model_extra, deferred
+    )
+
+
+def _trusted[M: _Base](model: type[M], data: Any) -> M:
+    """Build *model* without checking it, and its submodels when first read.
+
+    A payload that is not even shaped like the model — not an object, or
+    missing a field the model requires — is not one this mode can trust, so
+    it goes through full validation instead. That either converts it or
+    reports it, the way ``"full"`` would have.
+
+    Args:
+        model: Model to build.
+        data: Its payload.
+
+    Returns:
+        The model, holding the payload's values as they came.
+
+    Raises:
+        ValidationError: The payload was not shaped like the model, and full
+            validation refused it too.
+    """
+    plan = _plan(model)
+    if not isinstance(data, dict) or not plan.required <= data.keys():
+        return model.model_validate(data)
+    keys = data.keys()
+    if keys <= plan.names:
+        fields = dict(data)
+        extra: dict[str, Any] = {}
+    else:
+        fields = {key: value for key, value in data.items() if key in plan.names}
+        extra = {key: value for key, value in data.items() if key not in plan.names}
+    fields_set = set(fields)
+    deferred: dict[str, Callable[[], Any]] = {}
+    for name, convert in plan.trusted.items():
+        if name not in fields:
+            continue
+        raw = fields[name]
+        if raw is None:
+            if name not in plan.nullable:
+                return model.model_validate(data)
+            continue
+        del fields[name]
+        deferred[name] = _pending(model, name, convert, raw)
+    if len(fields_set) != len(plan.names):
+        for name, default in plan.defaults.items():
+            if name not in fields_set:
+                fields[name] = default()
+    return _assemble(model, fields, fields_set, extra, deferred)
+
+
+def _assemble[M: _Base](
+    model: type[M],
+    fields: dict[str, Any],
+    fields_set: set[str],
+    extra: dict[str, Any] | None,
+    deferred: dict[str, Callable[[], Any]],
+) -> M:
+    """Put a model together from parts that need no further checking.
+
+    This is what ``model_construct`` does, without the per-field work it
+    repeats on every call: the parts arrive already split and defaulted.
+
+    Args:
+        model: Model class.
+        fields: Field values, minus the pending ones.
+        fields_set: Fields the payload carried.
+        extra: Keys the model does not declare.
+        deferred: Fields left to build on first read.
+
+    Returns:
+        The instance.
+    """
+    instance = _new(model)
+    _set(instance, "__dict__", fields)
+    _set(instance, "__pydantic_fields_set__", fields_set)
+    _set(instance, "__pydantic_extra__", extra)
+    _set(instance, "__pydantic_private__", None)
+    _set(instance, "_deferred", deferred)
+    return instance
+
+
+def _pending(
+    model: type[BaseModel], name: str, convert: _Convert, raw: Any
+) -> Callable[[], Any]:
+    """Wrap a field's conversion so that its failure is this package's.
+
+    The conversion runs inside an attribute read, far from the request or
+    event the payload came with, so the message names the field instead.
+
+    Args:
+        model: Model the field belongs to.
+        name: Field name.
+        convert: How to build it.
+        raw: Its raw value.
+
+    Returns:
+        A callable building the field.
+    """
+
+    def build() -> Any:
+        try:
+            return convert(raw)
+        except ValidationError as exc:
+            raise ResponseError(
+                f"{model.__name__}.{name} holds a payload that does not "
+                f"parse. This usually means a kvmd version aiopikvm does not "
+                f"know about yet:\n{exc}"
+            ) from exc
+
+    return build
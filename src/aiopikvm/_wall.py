@@ -0,0 +1,447 @@
+"""Every screen of a fleet, kept fresh and tiled into one picture.
+
+A wall of screens built by calling
+[`snapshot(preview=True)`][aiopikvm.resources.streamer.StreamerResource.snapshot]
+on each device in a loop pays every device's round trip one after another, and
+asks again for screens nothing suggests have changed. At four hundred devices
+that is a minute per refresh, most of it spent on pictures identical to the
+last ones.
+
+[`SnapshotWall`][aiopikvm.SnapshotWall] keeps one
+[`WallTile`][aiopikvm.WallTile] per device and fetches only the tiles that are
+stale: never fetched, failed last time, older than *max_age*, or marked
+changed by an event the device sent. The fetches run side by side, up to a
+bound. Decoding the previews and tiling them into one JPEG is CPU work that
+would stall the event loop, so it runs in a process pool, a band of rows per
+worker; that part needs Pillow, which the rest of the wall does not.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import dataclasses
+import io
+import logging
+import math
+import os
+import time
+from collections.abc import Iterable, Mapping
+from typing import TYPE_CHECKING, Any
+
+from aiopikvm._exceptions import ConfigurationError, PiKVMError
+from aiopikvm._pool import _PoolOwner
+from aiopikvm.models.streamer import SnapshotImage
+
+if TYPE_CHECKING:
+    from aiopikvm._client import PiKVM
+    from aiopikvm._fleet import DeviceEvent
+
+logger = logging.getLogger(__name__)
+
+_CONCURRENCY = 16
+"""How many previews a wall fetches at once by default."""
+
+_TILE = (320, 180)
+"""Default tile size in pixels: 16:9, small enough for a 20x20 wall on 4K."""
+
+_CHANGES = frozenset({"atx", "hid", "switch"})
+"""Event types that mark a device's screen as changed by default.
+
+Power going on or off, the keyboard LEDs or the HID going offline, and a KVM
+switch moving to another port all go with a different picture. ``streamer``
+is handled apart: its captured frame rate changes every few seconds, so only
+a change of the source — online or offline, or a new resolution — counts.
+"""
+
+_BACKGROUND = (16, 16, 16)
+"""Colour of a tile with no picture in it."""
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class WallTile:
+    """One device's place on a [`SnapshotWall`][aiopikvm.SnapshotWall].
+
+    Attributes:
+        device: The name the device was added under.
+        image: The latest preview, or ``None`` until one has been fetched.
+        taken: When *image* was fetched, on ``time.monotonic()``'s clock.
+        changed: Whether the device has reported a change since.
+        error: Why the last fetch failed, or ``None`` if it did not.
+    """
+
+    device: str
+    image: SnapshotImage | None = None
+    taken: float | None = None
+    changed: bool = False
+    error: str | None = None
+
+    @property
+    def age(self) -> float | None:
+        """Seconds since *image* was fetched, or ``None`` if it has not been."""
+        return None if self.taken is None else time.monotonic() - self.taken
+
+
+class SnapshotWall(_PoolOwner):
+    """Previews of many devices, refreshed where they are stale.
+
+    A tile is stale when it has no picture, when its last fetch failed, when
+    it is older than *max_age*, or when [`feed()`][aiopikvm.SnapshotWall.feed]
+    or [`invalidate()`][aiopikvm.SnapshotWall.invalidate] marked it changed.
+    [`refresh()`][aiopikvm.SnapshotWall.refresh] fetches those and no others,
+    *concurrency* at a time. A change reported while its tile is being
+    fetched leaves the tile stale for the next refresh, since the picture
+    may predate it.
+
+    [`mosaic()`][aiopikvm.SnapshotWall.mosaic] tiles the pictures into one
+    JPEG in a process pool, which the wall starts on first use and shuts
+    down on exit. That needs Pillow: ``pip install 'aiopikvm[images]'``.
+
+    Usage:
+
+        async with SnapshotWall(kvms) as wall, FleetEvents(sockets) as fleet:
+            await wall.refresh()
+            async for item in fleet:
+                wall.feed(item)
+                if wall.stale:
+                    await wall.refresh()
+                    publish(await wall.mosaic())
+    """
+
+    def __init__(
+        self,
+        clients: Mapping[str, PiKVM],
+        *,
+        tile: tuple[int, int] = _TILE,
+        quality: int | None = None,
+        concurrency: int = _CONCURRENCY,
+        max_age: float | None = 60.0,
+        changes: Iterable[str] = _CHANGES,
+        timeout: float | None = None,
+        workers: int | None = None,
+        executor: concurrent.futures.Executor | None = None,
+    ) -> None:
+        """Prepare a wall; nothing is fetched until the first refresh.
+
+        Args:
+            clients: The devices, by the name their tiles go under, in the
+                order the tiles are laid out.
+            tile: ``(width, height)`` of a tile in pixels. kvmd scales each
+                preview to fit it, and the mosaic centres it in its tile.
+            quality: JPEG quality kvmd encodes the previews at, 1 to 100, or
+                ``None`` for its default.
+            concurrency: How many previews are fetched at once.
+            max_age: Seconds after which a tile is stale whatever its device
+                says, or ``None`` to refetch only what changed. Events do not
+                describe everything that changes a screen, so this is what
+                catches the rest.
+            changes: Event types that mark a device's tile changed in
+                [`feed()`][aiopikvm.SnapshotWall.feed].
+            timeout: Per-fetch timeout in seconds, or ``None`` for each
+                client's own.
+            workers: How many bands a mosaic is split into, and how many
+                processes the wall's own pool has; ``None`` for one per CPU.
+            executor: Where [`mosaic()`][aiopikvm.SnapshotWall.mosaic]
+                decodes and tiles; ``None`` starts a process pool of the
+                wall's own on the first mosaic.
+
+        Raises:
+            ConfigurationError: *changes* is a single string, or a size,
+                quality, bound or age is out of range.
+        """
+        if isinstance(changes, str):
+            raise ConfigurationError(
+                f"changes must be a collection of event types, not the string "
+                f"{changes!r}; wrap it: {{{changes!r}}}"
+            )
+        (width, height) = tile
+        if width < 1 or height < 1:
+            raise ConfigurationError(
+                f"A tile must be at least 1x1, not {width}x{height}"
+            )
+        if quality is not None and not 1 <= quality <= 100:
+            raise ConfigurationError(f"quality must be 1 to 100, not {quality}")
+        if concurrency < 1 or (workers is not None and workers < 1):
+            raise ConfigurationError("concurrency and workers must be at least 1")
+        if max_age is not None and max_age <= 0:
+            raise ConfigurationError(f"max_age must be positive, not {max_age}")
+        self._clients = dict(clients)
+        self._tile = (width, height)
+        self._quality = quality
+        self._concurrency = concurrency
+        self._max_age = max_age
+        self._changes = frozenset(changes)
+        self._timeout = timeout
+        self._use_pool(executor, workers or os.process_cpu_count() or 1)
+        self._tiles = {name: WallTile(name) for name in self._clients}
+        # What each device's last ``streamer`` event said about its source.
+        self._sources: dict[str, tuple[Any, ...] | None] = {}
+
+    @property
+    def tiles(self) -> dict[str, WallTile]:
+        """Every tile, by device, in layout order."""
+        return self._tiles.copy()
+
+    @property
+    def stale(self) -> list[str]:
+        """The devices whose tiles the next refresh would fetch."""
+        now = time.monotonic()
+        return [name for name, tile in self._tiles.items() if self._is_stale(tile, now)]
+
+    def feed(self, item: DeviceEvent) -> bool:
+        """Mark a tile changed if its device's event says the screen has.
+
+        Meant for each item a [`FleetEvents`][aiopikvm.FleetEvents] over the
+        same devices hands out. A ``closed`` event marks the tile too: the
+        device is gone, and so may be what it showed.
+
+        Args:
+            item: A device's event, as [`DeviceEvent`][aiopikvm.DeviceEvent].
+
+        Returns:
+            Whether the tile was marked. Events of devices not on this wall
+            are ignored.
+        """
+        (device, event) = item
+        if device not in self._tiles:
+            return False
+        kind = event.get("event_type")
+        if kind == "streamer":
+            if not self._source_changed(device, event.get("event")):
+                return False
+        elif kind not in self._changes and kind != "closed":
+            return False
+        self.invalidate(device)
+        return True
+
+    def invalidate(self, device: str | None = None) -> None:
+        """Mark one tile changed, or every tile.
+
+        Args:
+            device: The device, or ``None`` for all of them.
+
+        Raises:
+            ConfigurationError: The device is not on this wall.
+        """
+        if device is not None and device not in self._tiles:
+            raise ConfigurationError(f"Device {device!r} is not on this wall")
+        for name in self._tiles if device is None else (device,):
+            self._tiles[name] = dataclasses.replace(self._tiles[name], changed=True)
+
+    async def refresh(self, *, force: bool = False) -> list[str]:
+        """Fetch the stale tiles, *concurrency* at a time.
+
+        A fetch that fails keeps the tile's last picture, records why on
+        [`WallTile.error`][aiopikvm.WallTile], and leaves it stale for the
+        next refresh; the other tiles go on.
+
+        Args:
+            force: Fetch every tile, stale or not.
+
+        Returns:
+            The devices whose tiles have a new picture.
+        """
+        now = time.monotonic()
+        names = [
+            name
+            for name, tile in self._tiles.items()
+            if force or self._is_stale(tile, now)
+        ]
+        gate = asyncio.Semaphore(self._concurrency)
+
+        async def fetch(name: str) -> bool:
+            async with gate:
+                return await self._fetch(name)
+
+        fetched = await asyncio.gather(*(fetch(name) for name in names))
+        return [name for (name, ok) in zip(names, fetched, strict=True) if ok]
+
+    async def mosaic(self, *, columns: int | None = None, quality: int = 80) -> bytes:
+        """Tile every picture into one JPEG, in the order the devices came.
+
+        Decoding and tiling run in the executor, a band of rows to a worker;
+        a tile with no picture, or one that does not decode, is left dark.
+
+        Args:
+            columns: Tiles per row, or ``None`` for a square-ish wall.
+            quality: JPEG quality of the mosaic, 1 to 100.
+
+        Returns:
+            The mosaic as a JPEG.
+
+        Raises:
+            ConfigurationError: Pillow is not installed, the wall is empty,
+                or *columns* or *quality* is out of range.
+        """
+        _pillow()
+        count = len(self._tiles)
+        if not count:
+            raise ConfigurationError("The wall has no devices to tile")
+        if columns is None:
+            columns = math.ceil(math.sqrt(count))
+        if columns < 1:
+            raise ConfigurationError("columns must be at least 1")
+        if not 1 <= quality <= 100:
+            raise ConfigurationError(f"quality must be 1 to 100, not {quality}")
+        images = [
+            None if tile.image is None else tile.image.data
+            for tile in self._tiles.values()
+        ]
+        rows = math.ceil(count / columns)
+        per_band = math.ceil(rows / min(rows, self._workers)) * columns
+        loop = asyncio.get_running_loop()
+        bands = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self._pool(),
+                    _compose_band,
+                    images[start : start + per_band],
+                    columns,
+                    self._tile,
+                )
+                for start in range(0, count, per_band)
+            )
+        )
+        return await asyncio.to_thread(_encode, bands, columns * self._tile[0], quality)
+
+    def _is_stale(self, tile: WallTile, now: float) -> bool:
+        """Whether a tile needs fetching."""
+        if tile.image is None or tile.changed or tile.error is not None:
+            return True
+        assert tile.taken is not None
+        return self._max_age is not None and now - tile.taken >= self._max_age
+
+    async def _fetch(self, name: str) -> bool:
+        """Fetch one device's preview into its tile.
+
+        Returns:
+            Whether a new picture arrived.
+        """
+        # Cleared before the request, so a change reported while it is on
+        # the wire marks the tile again.
+        self._tiles[name] = dataclasses.replace(self._tiles[name], changed=False)
+        (width, height) = self._tile
+        try:
+            image = await self._clients[name].streamer.snapshot(
+                allow_offline=True,
+                preview=True,
+                preview_max_width=width,
+                preview_max_height=height,
+                preview_quality=self._quality,
+                timeout=self._timeout,
+            )
+        except PiKVMError as exc:
+            logger.warning("Could not fetch the preview of %s: %s", name, exc)
+            self._tiles[name] = dataclasses.replace(self._tiles[name], error=str(exc))
+            return False
+        self._tiles[name] = dataclasses.replace(
+            self._tiles[name], image=image, taken=time.monotonic(), error=None
+        )
+        return True
+
+    def _source_changed(self, device: str, payload: Any) -> bool:
+        """Whether a ``streamer`` event reports a different video source.
+
+        kvmd sends the ``streamer`` block only when it changed, and ``None``
+        for it while the streamer is stopped. The first one a device sends is
+        recorded without counting as a change.
+        """
+        if not isinstance(payload, dict) or "streamer" not in payload:
+            return False
+        streamer = payload["streamer"]
+        if isinstance(streamer, dict):
+            source = streamer.get("source") or {}
+            resolution = source.get("resolution") or {}
+            signature: tuple[Any, ...] | None = (
+                source.get("online"),
+                resolution.get("width"),
+                resolution.get("height"),
+            )
+        else:
+            signature = None
+        known = device in self._sources
+        previous = self._sources.get(device)
+        self._sources[device] = signature
+        return known and signature != previous
+
+
+def _pillow() -> None:
+    """Make sure Pillow can be imported, before any work is handed out.
+
+    Raises:
+        ConfigurationError: Pillow is not installed.
+    """
+    try:
+        import PIL.Image  # noqa: F401
+    except ImportError as exc:
+        raise ConfigurationError(
+            "SnapshotWall.mosaic() needs Pillow, which aiopikvm does not install "
+            "by default: pip install 'aiopikvm[images]'. Fetching the tiles "
+            f"needs nothing extra. ({exc})"
+        ) from exc
+
+
+def _compose_band(
+    images: list[bytes | None], columns: int, tile: tuple[int, int]
+) -> bytes:
+    """Decode a band of previews and tile them, in a worker process.
+
+    Args:
+        images: The JPEGs of the band's tiles, row by row; ``None`` for one
+            without a picture.
+        columns: Tiles per row.
+        tile: ``(width, height)`` of a tile.
+
+    Returns:
+        The band as raw RGB, ``columns * width`` pixels wide.
+    """
+    from PIL import Image, ImageOps
+
+    (width, height) = tile
+    rows = math.ceil(len(images) / columns)
+    band = Image.new("RGB", (columns * width, rows * height), _BACKGROUND)
+    for index, data in enumerate(images):
+        if data is None:
+            continue
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                # A JPEG can be decoded straight at a fraction of its size,
+                # which is most of the work saved when kvmd sent it larger.
+                image.draft("RGB", tile)
+                picture = ImageOps.contain(image.convert("RGB"), tile)
+        except OSError:
+            continue
+        (row, column) = divmod(index, columns)
+        band.paste(
+            picture,
+            (
+                column * width + (width - picture.width) // 2,
+                row * height + (height - picture.height) // 2,
+            ),
+        )
+    raw: bytes = band.tobytes()
+    return raw
+
+
+def _encode(bands: list[bytes], width: int, quality: int) -> bytes:
+    """Stack the bands the workers made and encode them as one JPEG.
+
+    Args:
+        bands: Raw RGB bands, top to bottom.
+        width: Width of every band in pixels.
+        quality: JPEG quality, 1 to 100.
+
+    Returns:
+        The mosaic as a JPEG.
+    """
+    from PIL import Image
+
+    heights = [len(band) // (width * 3) for band in bands]
+    mosaic = Image.new("RGB", (width, sum(heights)), _BACKGROUND)
+    top = 0
+    for band, height in zip(bands, heights, strict=True):
+        mosaic.paste(Image.frombytes("RGB", (width, height), band), (0, top))
+        top += height
+    output = io.BytesIO()
+    mosaic.save(output, format="JPEG", quality=quality)
+    return output.getvalue()
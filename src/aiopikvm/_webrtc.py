@@ -49,7 +49,16 @@ from aiopikvm._exceptions import (
     WebRTCError,
     WebSocketError,
 )
+from aiopikvm._metrics import ClientMetrics
 from aiopikvm._tls import CertTypes, VerifyTypes, build_ssl_context
+from aiopikvm._tracing import (
+    JanusTrace,
+    Tracer,
+    _finish,
+    _notify,
+    _server,
+    _trace_frame,
+)
 from aiopikvm._ws import _Connector, _credential_headers, _handshake_error, _ws_url
 from aiopikvm.models.webrtc import WebRTCEvent, WebRTCFeatures, WebRTCPluginEvent
 
@@ -170,6 +179,8 @@ class WebRTCSession:
         negotiate_timeout: float = 30.0,
         ping_interval: float | None = 20.0,
         ping_timeout: float | None = 20.0,
+        tracer: Tracer | None = None,
+        metrics: ClientMetrics | None = None,
     ) -> None:
         """Prepare a session.
 
@@ -220,6 +231,13 @@ class WebRTCSession:
                 WebSocket protocol's keepalive, not Janus's.
             ping_timeout: Seconds to wait for a keepalive pong before
                 declaring the signalling link dead, ``None`` to wait forever.
+            tracer: Told about every signalling frame, as socket ``"janus"``,
+                and about every transaction Janus acknowledges; see
+                [`Tracer`][aiopikvm.Tracer]. The media is not traced.
+            metrics: Where to count the decoded frames dropped from a full
+                buffer; [`PiKVM.webrtc()`][aiopikvm.PiKVM.webrtc] passes the
+                client's own [`metrics`][aiopikvm.PiKVM.metrics]. ``None``
+                counts nothing.
 
         Raises:
             ConfigurationError: If the URL scheme is not ``https`` or ``http``.
@@ -244,6 +262,9 @@ class WebRTCSession:
         self._negotiate_timeout = negotiate_timeout
         self._ping_interval = ping_interval
         self._ping_timeout = ping_timeout
+        self._tracer = tracer
+        self._server = _server(url)
+        self._metrics = metrics
 
         self._connection: websockets.asyncio.client.ClientConnection | None = None
         self._reader: asyncio.Task[None] | None = None
@@ -682,6 +703,8 @@ class WebRTCSession:
                 frame = await track.recv()
                 if buffer.maxlen is not None and len(buffer) == buffer.maxlen:
                     logger.debug("Dropping the oldest buffered %s frame", kind)
+                    if self._metrics is not None:
+                        self._metrics._dropped_frame(kind)
                 buffer.append(frame)
                 wakeup.set()
         except MediaStreamError:
@@ -759,28 +782,43 @@ class WebRTCSession:
             asyncio.get_running_loop().create_future()
         )
         self._acks[transaction] = future
+        trace = None
+        if self._tracer is not None:
+            host, port = self._server
+            trace = JanusTrace(
+                str(body.get("janus")), transaction, host=host, port=port
+            )
+            _notify(self._tracer.janus_start, trace)
+        failure: BaseException | None = None
         try:
             await self._send({**body, "transaction": transaction})
             async with asyncio.timeout(self._open_timeout):
                 answer = await future
+            if answer.get("janus") == "error":
+                error = answer.get("error")
+                error = error if isinstance(error, dict) else {}
+                code = error.get("code")
+                reason = error.get("reason")
+                raise WebRTCError(
+                    f"Janus refused {body.get('janus')!r}: "
+                    f"{reason or 'no reason given'}",
+                    code if isinstance(code, int) else 0,
+                    reason=reason if isinstance(reason, str) else "",
+                )
         except TimeoutError as exc:
-            raise WebRTCError(
+            failure = WebRTCError(
                 f"Janus did not answer {body.get('janus')!r} within "
                 f"{self._open_timeout} s"
-            ) from exc
+            )
+            raise failure from exc
+        except BaseException as exc:
+            failure = exc
+            raise
         finally:
             self._acks.pop(transaction, None)
-
-        if answer.get("janus") == "error":
-            error = answer.get("error")
-            error = error if isinstance(error, dict) else {}
-            code = error.get("code")
-            reason = error.get("reason")
-            raise WebRTCError(
-                f"Janus refused {body.get('janus')!r}: {reason or 'no reason given'}",
-                code if isinstance(code, int) else 0,
-                reason=reason if isinstance(reason, str) else "",
-            )
+            if self._tracer is not None and trace is not None:
+                _finish(trace, failure)
+                _notify(self._tracer.janus_end, trace)
         return answer
 
     async def _plugin_request(
@@ -857,12 +895,17 @@ class WebRTCSession:
         """
         if self._connection is None:
             raise WebSocketError("Not connected to the Janus gateway")
+        frame = json.dumps(message)
         try:
-            await self._connection.send(json.dumps(message))
+            await self._connection.send(frame)
         except websockets.exceptions.WebSocketException as exc:
             raise WebSocketError(
                 f"Failed to send {message.get('janus')!r} to Janus: {exc}"
             ) from exc
+        if self._tracer is not None:
+            _trace_frame(
+                self._tracer, self._server, "janus", "out", frame, message.get("janus")
+            )
 
     async def _keepalive(self) -> None:
         """Keep the Janus session alive until the block ends."""
@@ -981,6 +1024,10 @@ class WebRTCSession:
         message = json.loads(raw)
         if not isinstance(message, dict):
             raise ResponseError(f"Janus sent a {type(message).__name__}, not an object")
+        if self._tracer is not None:
+            _trace_frame(
+                self._tracer, self._server, "janus", "in", raw, message.get("janus")
+            )
         return message
 
     def _route(self, message: dict[str, Any]) -> None:
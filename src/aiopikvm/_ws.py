@@ -21,8 +21,11 @@ import contextlib
 import dataclasses
 import json
 import logging
+import random
+import re
 import ssl
 import struct
+import time
 from collections import deque
 from collections.abc import AsyncIterator, Callable, Iterable, Sequence
 from types import TracebackType
@@ -35,16 +38,35 @@ import websockets.http11
 from pydantic import BaseModel, ValidationError
 from websockets.typing import Subprotocol
 
-from aiopikvm._constants import AuthMode
+from aiopikvm._constants import (
+    _WS_MAX_QUEUE,
+    _WS_MAX_SIZE,
+    _WS_PING_INTERVAL,
+    _WS_PING_TIMEOUT,
+    _WS_RECONNECT_DELAY,
+    _WS_RECONNECT_MAX_DELAY,
+    DEFAULT_VALIDATION,
+    AuthMode,
+    BufferingMode,
+    ValidationMode,
+)
+from aiopikvm._deadline import _deadline, _remaining
 from aiopikvm._exceptions import (
     APIError,
+    AuthError,
     ConfigurationError,
+    PiKVMError,
+    RedirectError,
     ResponseError,
     WebSocketError,
     _error_fields_from_bytes,
     _status_error,
 )
+from aiopikvm._metrics import ClientMetrics
+from aiopikvm._send_queue import _SendQueue
 from aiopikvm._tls import CertTypes, VerifyTypes, build_ssl_context
+from aiopikvm._tracing import Tracer, _server, _trace_frame
+from aiopikvm._validation import validate_model
 from aiopikvm.models.atx import ATXState
 from aiopikvm.models.gpio import GPIOState
 from aiopikvm.models.hid import HIDKeymaps, HIDState
@@ -79,16 +101,20 @@ _DELTA_MAX = 127
 _PENDING_LIMIT = 1024
 """How many events the reader may buffer before it starts dropping them."""
 
-_WS_MAX_SIZE = 2**20
-_WS_MAX_QUEUE = 16
-_WS_PING_INTERVAL = 20.0
-_WS_PING_TIMEOUT = 20.0
-"""*websockets*' own defaults, spelled out so that overriding one is a choice.
+_EVENT_TYPE = re.compile(r'\{\s*"event_type"\s*:\s*"([^"\\]*)"')
+"""The ``event_type`` at the head of a text frame, read without parsing it.
+
+kvmd writes each event with ``json.dumps({"event_type": ..., "event": ...})``,
+so the type comes first. A frame that starts any other way is parsed in full.
+"""
+
+_ROUTED = frozenset({"loop", "pong"})
+"""Events parsed whatever a socket's *types* say: the reader needs them."""
+
+_RESYNCED = "resynced"
+"""``event_type`` of the marker a reconnecting socket puts between connections.
 
-They are named here rather than left implicit because the media socket
-overrides them: a video frame is bigger than a control event, and a consumer
-that falls behind on video is a normal thing that must not be mistaken for a
-dead link.
+kvmd has no event of that name; the marker is this client's own.
 """
 
 
@@ -171,6 +197,153 @@ other way round — the REST endpoint wraps it in ``ocr`` and the event does not
 """
 
 
+class _StateMerger:
+    """The running merge behind [`states()`][aiopikvm.PiKVMWebSocket.states].
+
+    It is fed one event at a time and knows nothing of sockets, so that
+    [`EventHub`][aiopikvm.EventHub] can keep the one merge all of its
+    subscribers share, and an [`EventJournal`][aiopikvm.EventJournal] can
+    checkpoint the merged payloads and pick them up again.
+    """
+
+    def __init__(self, validation: ValidationMode) -> None:
+        """Start from a device nothing has been said about.
+
+        Args:
+            validation: How strictly each merged payload is validated.
+        """
+        self._validation = validation
+        self._seen: dict[str, dict[str, Any]] = {}
+        # Subsystems still waiting for their first payload on this
+        # connection. That payload is kvmd's full state, and each part it
+        # carries replaces the old one rather than being merged into it: a
+        # key the device dropped while the socket was down must not live on.
+        # Only the top level is replaced, because `info` arrives one
+        # submanager at a time and the others must stay until theirs come.
+        self._stale: set[str] = set()
+        self._clients: int | None = None
+        self.state = DeviceState()
+
+    def feed(self, event: dict[str, Any]) -> DeviceState | None:
+        """Merge one event into the state.
+
+        Args:
+            event: The event as [`events()`][aiopikvm.PiKVMWebSocket.events]
+                yields it.
+
+        Returns:
+            The new state, or ``None`` when the event says nothing about the
+            device.
+
+        Raises:
+            ResponseError: The merged payload did not match its model.
+        """
+        return self._fold(event, typed=True)
+
+    def absorb(self, event: dict[str, Any]) -> None:
+        """Merge one event into the payloads only, validating nothing.
+
+        For a caller that keeps the merge only to `checkpoint()` it and has
+        no use for the models; `state` is not kept up.
+
+        Args:
+            event: The event as [`events()`][aiopikvm.PiKVMWebSocket.events]
+                yields it.
+        """
+        self._fold(event, typed=False)
+
+    def checkpoint(self) -> dict[str, Any]:
+        """Everything the merge has to remember, as plain JSON.
+
+        Returns:
+            The merged payloads, the subsystems waiting for a full one, and
+            the ``clients`` count.
+        """
+        return {
+            "seen": self._seen,
+            "stale": sorted(self._stale),
+            "clients": self._clients,
+        }
+
+    @classmethod
+    def restored(
+        cls,
+        checkpoint: dict[str, Any],
+        validation: ValidationMode,
+        *,
+        typed: bool = True,
+    ) -> Self:
+        """Pick a merge up where a `checkpoint()` left it.
+
+        Args:
+            checkpoint: What the checkpoint returned.
+            validation: How strictly each merged payload is validated.
+            typed: Whether to build `state` from the payloads; a merge that
+                will only be `absorb()`-ed into needs none.
+
+        Returns:
+            A merge in the same place.
+
+        Raises:
+            ResponseError: A merged payload did not match its model.
+        """
+        merger = cls(validation)
+        merger._seen = {
+            event_type: payload
+            for event_type, payload in checkpoint.get("seen", {}).items()
+            if event_type in _STATE_MODELS and isinstance(payload, dict)
+        }
+        merger._stale = set(checkpoint.get("stale", ())) & set(merger._seen)
+        clients = checkpoint.get("clients")
+        merger._clients = clients if isinstance(clients, int) else None
+        if not typed:
+            return merger
+        merger.state = DeviceState(
+            clients=merger._clients,
+            **{
+                event_type: _as_state(event_type, payload, validation)
+                for event_type, payload in merger._seen.items()
+            },
+        )
+        return merger
+
+    def _fold(self, event: dict[str, Any], *, typed: bool) -> DeviceState | None:
+        """Merge one event, and type what it changed if asked to."""
+        event_type = event.get("event_type")
+        payload = event.get("event")
+        if not isinstance(event_type, str) or not isinstance(payload, dict):
+            return None
+        state = self.state
+        if event_type == _RESYNCED:
+            self._stale = set(self._seen)
+            state = dataclasses.replace(state, updated=event_type)
+        elif event_type == "clients":
+            count = payload.get("count")
+            if not isinstance(count, int):
+                return None
+            self._clients = count
+            state = dataclasses.replace(state, updated=event_type, clients=count)
+        elif event_type in _STATE_MODELS:
+            if event_type in self._stale:
+                merged = {**self._seen[event_type], **payload}
+            else:
+                merged = _merge(self._seen.get(event_type, {}), payload)
+            if typed:
+                # Validated before anything is kept, so a payload that fails
+                # leaves the merge where it was.
+                model = _as_state(event_type, merged, self._validation)
+                state = dataclasses.replace(
+                    state, updated=event_type, **{event_type: model}
+                )
+            self._stale.discard(event_type)
+            self._seen[event_type] = merged
+        else:
+            return None
+        if typed:
+            self.state = state
+        return state
+
+
 class _Finished(Exception):
     """Internal signal: the server closed the connection cleanly."""
 
@@ -199,6 +372,7 @@ class _Connector(websockets.asyncio.client.connect):
         ping_interval: float | None = _WS_PING_INTERVAL,
         ping_timeout: float | None = _WS_PING_TIMEOUT,
         subprotocols: Sequence[Subprotocol] | None = None,
+        unix_path: str | None = None,
     ) -> None:
         """Prepare the handshake.
 
@@ -223,8 +397,15 @@ class _Connector(websockets.asyncio.client.connect):
                 wait forever.
             subprotocols: Subprotocols to offer, ``None`` to offer none. Only
                 Janus needs one; kvmd's own sockets have none.
+            unix_path: Unix socket to connect to instead of the host in
+                *uri*, which then only names the request.
         """
         self._follow_redirects = follow_redirects
+        # websockets reads `unix` and `path` out of the keyword arguments it
+        # hands the event loop, so they are only passed when wanted.
+        unix: dict[str, Any] = (
+            {} if unix_path is None else {"unix": True, "path": unix_path}
+        )
         super().__init__(
             uri,
             additional_headers=additional_headers,
@@ -237,6 +418,7 @@ class _Connector(websockets.asyncio.client.connect):
             ping_interval=ping_interval,
             ping_timeout=ping_timeout,
             subprotocols=subprotocols,
+            **unix,
         )
 
     def process_redirect(self, exc: Exception) -> Exception | str:
@@ -281,13 +463,17 @@ class PiKVMWebSocket:
         user: str,
         passwd: str | Callable[[], str],
         auth: AuthMode = "headers",
-        token: str = "",
+        token: str | Callable[[], str] = "",
         verify_ssl: VerifyTypes = True,
         cert: CertTypes | None = None,
         proxy: str | None = None,
         trust_env: bool = True,
+        uds: str | None = None,
         stream: bool = True,
         binary: bool = False,
+        types: Iterable[str] | None = None,
+        send_queue: int | None = None,
+        buffering: BufferingMode = "queue",
         follow_redirects: bool = False,
         open_timeout: float = 10.0,
         close_timeout: float = 10.0,
@@ -295,6 +481,12 @@ class PiKVMWebSocket:
         max_queue: int = _WS_MAX_QUEUE,
         ping_interval: float | None = _WS_PING_INTERVAL,
         ping_timeout: float | None = _WS_PING_TIMEOUT,
+        reconnect: bool = False,
+        reconnect_delay: float = _WS_RECONNECT_DELAY,
+        reconnect_max_delay: float = _WS_RECONNECT_MAX_DELAY,
+        validation: ValidationMode = DEFAULT_VALIDATION,
+        tracer: Tracer | None = None,
+        metrics: ClientMetrics | None = None,
     ) -> None:
         """Prepare a connection.
 
@@ -309,7 +501,9 @@ class PiKVMWebSocket:
                 goes through the same chain a REST call does, so all three
                 work; ``"cookie"`` needs *token* and ignores *user* and
                 *passwd*.
-            token: Session token for ``auth="cookie"``.
+            token: Session token for ``auth="cookie"``, or a callable read
+                at each handshake, so that a reconnect carries the session
+                current then.
             verify_ssl: What to trust; see
                 [`VerifyTypes`][aiopikvm.VerifyTypes].
             cert: Client certificate to present.
@@ -318,6 +512,9 @@ class PiKVMWebSocket:
                 otherwise.
             trust_env: Read the proxy configuration from the
                 environment. ``False`` connects directly.
+            uds: kvmd's unix socket, to connect to instead of going through
+                nginx; *url* is then only a name, and the TLS and proxy
+                arguments are unused. See [`PiKVM`][aiopikvm.PiKVM].
             stream: Ask kvmd to treat this client as a video viewer. kvmd
                 counts the sessions that did and runs the streamer while that
                 count is above zero, so a client connected with ``False``
@@ -333,6 +530,29 @@ class PiKVMWebSocket:
                 since JSON is what this client has always sent and the
                 encoding a packet capture can be read in. The binary channel
                 was verified against kvmd 4.206.
+            types: The event types to hand on — ``{"atx"}`` — or ``None``
+                for all of them. The reader reads each frame's type off its
+                first bytes and drops the others unparsed, which is most of
+                the work for a client that only wants power state while kvmd
+                broadcasts ``streamer`` and ``info`` updates. ``loop`` and
+                ``pong`` are still parsed for
+                [`version`][aiopikvm.PiKVMWebSocket.version] and
+                [`ping()`][aiopikvm.PiKVMWebSocket.ping], but only handed on
+                when asked for; the ``resynced`` marker always is.
+            send_queue: Queue input frames, up to this many, and send them
+                from one task in priority order instead of in call order:
+                pings first, then keys ahead of the pointer moves queued
+                before them, and an absolute move replacing the one queued
+                right before it. A key release then waits for at most one
+                move, however many a pointer produced. Nothing overtakes a
+                frame it would change the meaning of; see
+                [`send_backlog`][aiopikvm.PiKVMWebSocket.send_backlog]. A
+                sender finding the queue full waits for room. ``None`` sends
+                each frame as it is called.
+            buffering: What to keep of the events not yet taken from
+                [`events()`][aiopikvm.PiKVMWebSocket.events]: all of them, up
+                to a bound, or only the latest of each type, merged; see
+                [`BufferingMode`][aiopikvm.BufferingMode].
             follow_redirects: Follow a redirected handshake instead of raising
                 [`RedirectError`][aiopikvm.RedirectError]. Off by default: the
                 upgrade carries the password in a header, and following the
@@ -351,13 +571,43 @@ class PiKVMWebSocket:
                 means a link that dies silently is never noticed.
             ping_timeout: Seconds to wait for a keepalive pong before failing
                 the connection, or ``None`` to wait forever.
+            reconnect: Open the connection again whenever it ends, rather
+                than ending [`events()`][aiopikvm.PiKVMWebSocket.events].
+                Each gap is marked with a ``resynced`` event; see
+                [`events()`][aiopikvm.PiKVMWebSocket.events]. Refused
+                credentials and a redirect end the retries, since trying
+                again cannot change them.
+            reconnect_delay: Seconds the first reconnect waits at most. Each
+                wait is random up to a cap, which doubles after every failed
+                attempt.
+            reconnect_max_delay: The largest that cap grows to.
+            validation: How much checking the models
+                [`states()`][aiopikvm.PiKVMWebSocket.states] builds get; see
+                [`ValidationMode`][aiopikvm.ValidationMode].
+            tracer: Told about every frame sent and read, as socket
+                ``"kvmd"``; see [`Tracer.ws_frame()`][aiopikvm.Tracer.ws_frame].
+            metrics: Where to count the events read and the ones dropped from
+                a full buffer; [`PiKVM.ws()`][aiopikvm.PiKVM.ws] passes the
+                client's own [`metrics`][aiopikvm.PiKVM.metrics]. ``None``
+                counts nothing.
 
         Raises:
-            ConfigurationError: If the URL scheme is not ``https`` or ``http``.
+            ConfigurationError: If the URL scheme is not ``https`` or ``http``,
+                *types* is a single string, or *send_queue* is less than one.
         """
+        if send_queue is not None and send_queue < 1:
+            raise ConfigurationError(
+                f"send_queue must be at least 1 or None, not {send_queue}"
+            )
+        if isinstance(types, str):
+            raise ConfigurationError(
+                f"types takes a collection of event types, not the string {types!r}"
+            )
         # kvmd reads the flag with valid_bool, which takes 1/true/yes and
         # 0/false/no and answers 400 to anything else.
-        self._url = f"{_ws_url(url)}/api/ws?stream={'1' if stream else '0'}"
+        # kvmd serves the socket as /ws; /api/ws is nginx's name for it.
+        base = "ws://localhost/ws" if uds is not None else f"{_ws_url(url)}/api/ws"
+        self._url = f"{base}?stream={'1' if stream else '0'}"
         self._user = user
         self._passwd = passwd
         self._auth = auth
@@ -366,7 +616,10 @@ class PiKVMWebSocket:
         self._cert = cert
         self._proxy = proxy
         self._trust_env = trust_env
+        self._uds = uds
         self._binary = binary
+        self._latest_only = buffering == "latest"
+        self._types = None if types is None else frozenset(types)
         self._follow_redirects = follow_redirects
         self._open_timeout = open_timeout
         self._close_timeout = close_timeout
@@ -374,6 +627,13 @@ class PiKVMWebSocket:
         self._max_queue = max_queue
         self._ping_interval = ping_interval
         self._ping_timeout = ping_timeout
+        self._reconnect = reconnect
+        self._reconnect_delay = reconnect_delay
+        self._reconnect_max_delay = reconnect_max_delay
+        self._validation = validation
+        self._tracer = tracer
+        self._server = _server(url)
+        self._metrics = metrics
         self._connection: websockets.asyncio.client.ClientConnection | None = None
         self._version: KvmdVersion | None = None
         # One task reads the socket and routes what it reads for everybody:
@@ -381,12 +641,22 @@ class PiKVMWebSocket:
         # Nothing else touches `recv`, so the transport is never left unread.
         self._reader: asyncio.Task[None] | None = None
         self._wakeup = asyncio.Event()
+        # Called alongside the wakeup, for a consumer that watches many
+        # sockets' buffers at once instead of iterating each; see _fleet.
+        self._listener: Callable[[], None] | None = None
         self._failure: WebSocketError | None = None
         self._reported = False
         self._pending: deque[dict[str, Any]] = deque()
         self._carry: dict[str, dict[str, Any]] = {}
+        # With latest-only buffering, the waiting event of each type that a
+        # newer one is merged into; emptied at a resync marker, which nothing
+        # is merged across.
+        self._latest: dict[str, dict[str, Any]] = {}
         self._overflowed = False
         self._pong_waiters: list[asyncio.Future[float]] = []
+        self._outbox = (
+            None if send_queue is None else _SendQueue(self._transmit, send_queue)
+        )
 
     async def __aenter__(self) -> Self:
         """Open the connection and start reading it.
@@ -413,6 +683,34 @@ class PiKVMWebSocket:
                 front of it answered instead.
             WebSocketError: The connection could not be established: DNS,
                 TLS, timeout, or a server that does not speak WebSocket.
+            ConfigurationError: *token* is a callable, and it found no
+                session to send.
+        """
+        self._connection = await self._connect()
+        self._version = None
+        self._pending.clear()
+        self._carry.clear()
+        self._latest.clear()
+        self._overflowed = False
+        self._failure = None
+        self._reported = False
+        self._wakeup.clear()
+        self._start_reader()
+        return self
+
+    async def _connect(self) -> websockets.asyncio.client.ClientConnection:
+        """Make the handshake.
+
+        Returns:
+            The open connection.
+
+        Raises:
+            AuthError: kvmd refused the credentials.
+            RedirectError: The upgrade was redirected and *follow_redirects*
+                is off.
+            APIError: kvmd, or a proxy in front of it, refused the upgrade
+                for another reason.
+            WebSocketError: The connection could not be established.
         """
         # `ws://` carries no TLS, so there is nothing to configure there;
         # anything the caller asked for would be silently unused.
@@ -421,20 +719,26 @@ class PiKVMWebSocket:
             ssl_context = build_ssl_context(self._verify_ssl, self._cert)
 
         headers = self._credential_headers()
+        open_timeout = _shorten(self._open_timeout, "connect")
 
         try:
-            self._connection = await _Connector(
+            return await _Connector(
                 self._url,
                 additional_headers=headers,
                 ssl_context=ssl_context,
-                proxy=(self._proxy or (True if self._trust_env else None)),
-                open_timeout=self._open_timeout,
+                proxy=(
+                    None
+                    if self._uds is not None
+                    else self._proxy or (True if self._trust_env else None)
+                ),
+                open_timeout=open_timeout,
                 close_timeout=self._close_timeout,
                 follow_redirects=self._follow_redirects,
                 max_size=self._max_size,
                 max_queue=self._max_queue,
                 ping_interval=self._ping_interval,
                 ping_timeout=self._ping_timeout,
+                unix_path=self._uds,
             )
         except websockets.exceptions.InvalidStatus as exc:
             # The upgrade never happened: kvmd answered the GET with an
@@ -450,16 +754,6 @@ class PiKVMWebSocket:
             # checked scheme.
             raise WebSocketError(f"Failed to connect: {exc}") from exc
 
-        self._version = None
-        self._pending.clear()
-        self._carry.clear()
-        self._overflowed = False
-        self._failure = None
-        self._reported = False
-        self._wakeup.clear()
-        self._start_reader()
-        return self
-
     async def __aexit__(
         self,
         exc_type: type[BaseException] | None,
@@ -491,6 +785,8 @@ class PiKVMWebSocket:
                 in it noticed.
         """
         await self._stop_reader()
+        if self._outbox is not None:
+            await self._outbox.close("The connection closed before the frame was sent")
         if self._connection is not None:
             try:
                 await self._connection.close()
@@ -528,23 +824,43 @@ class PiKVMWebSocket:
         A clean close ends this quietly. Anything else is kept and handed to
         the next caller who asks, or raised by
         [`__aexit__`][aiopikvm.PiKVMWebSocket.__aexit__] if nobody does.
+
+        With *reconnect* on, neither ends it: the connection is opened again
+        and reading carries on, until a reconnect fails for a reason that
+        retrying cannot fix.
         """
+        # Reading has no deadline. One the socket was opened under is
+        # inherited by this task, and would refuse every reconnect after it.
+        _deadline.set(None)
         try:
             while True:
-                event = await self._read_one()
-                if event is not None:
-                    self._buffer(event)
-                self._wakeup.set()
-        except _Finished:
-            pass
-        except Exception as exc:
-            self._failure = (
-                exc
-                if isinstance(exc, WebSocketError)
-                else WebSocketError(f"The socket reader stopped: {exc}")
-            )
+                try:
+                    while True:
+                        event = await self._read_one()
+                        if event is not None:
+                            self._buffer(event)
+                        self._signal()
+                except _Finished:
+                    if not self._reconnect:
+                        return
+                    reason = "kvmd closed the connection"
+                except Exception as exc:
+                    failure = (
+                        exc
+                        if isinstance(exc, WebSocketError)
+                        else WebSocketError(f"The socket reader stopped: {exc}")
+                    )
+                    if not self._reconnect:
+                        self._failure = failure
+                        return
+                    reason = str(failure)
+                self._fail_pongs(f"The connection was lost: {reason}")
+                await self._reopen(reason)
+        except PiKVMError as exc:
+            self._failure = WebSocketError(f"Reconnecting failed: {exc}")
+            self._failure.__cause__ = exc
         finally:
-            self._wakeup.set()
+            self._signal()
             # Nothing will answer a ping now, either way: a clean close is
             # still a close, and waiting out the timeout says nothing extra.
             self._fail_pongs(
@@ -553,6 +869,72 @@ class PiKVMWebSocket:
                 else "The connection closed before kvmd answered the ping"
             )
 
+    async def _reopen(self, reason: str) -> None:
+        """Connect again after the connection ended, backing off as it fails.
+
+        Args:
+            reason: Why the last connection ended, for the log and the
+                ``resynced`` marker.
+
+        Raises:
+            AuthError: The credentials are refused now.
+            RedirectError: The handshake is being redirected.
+        """
+        logger.warning("WebSocket to %s lost (%s); reconnecting", self._url, reason)
+        lost = time.monotonic()
+        with contextlib.suppress(Exception):
+            await self._ensure_connected().close()
+        attempts = 0
+        while True:
+            cap = min(self._reconnect_max_delay, self._reconnect_delay * 2**attempts)
+            await asyncio.sleep(random.uniform(0, cap))
+            attempts += 1
+            try:
+                self._connection = await self._connect()
+            except (AuthError, RedirectError):
+                raise
+            except PiKVMError as exc:
+                logger.info(
+                    "Reconnect attempt %d to %s failed: %s", attempts, self._url, exc
+                )
+                continue
+            break
+        offline = time.monotonic() - lost
+        logger.info(
+            "WebSocket to %s reconnected after %.1f s, %d attempt(s)",
+            self._url,
+            offline,
+            attempts,
+        )
+        self._resync_carry()
+        self._buffer(
+            {
+                "event_type": _RESYNCED,
+                "event": {"reason": reason, "attempts": attempts, "offline": offline},
+            }
+        )
+        self._signal()
+
+    def _signal(self) -> None:
+        """Wake whatever waits on the buffer: the event iterator, a listener."""
+        self._wakeup.set()
+        if self._listener is not None:
+            self._listener()
+
+    def _resync_carry(self) -> None:
+        """Forget what was dropped of a subsystem the new connection resends.
+
+        A carry is there to be merged into the next event of its kind. Once
+        the connection has been opened again, that next event is the full
+        state kvmd sends on open, unless one of the kind is still waiting in
+        the buffer — and merging a dropped piece of the old connection under
+        the new full state would only put back keys the device no longer has.
+        """
+        waiting = {event.get("event_type") for event in self._pending}
+        for event_type in list(self._carry):
+            if event_type not in waiting:
+                del self._carry[event_type]
+
     def _fail_pongs(self, message: str) -> None:
         """Fail every waiting [`ping()`][aiopikvm.PiKVMWebSocket.ping].
 
@@ -616,6 +998,20 @@ class PiKVMWebSocket:
         the loop finish cannot tell "kvmd has nothing more to say" from
         "the events stopped arriving".
 
+        A socket built with *types* hands on only the events it names, and
+        does not parse the others at all.
+
+        A socket built with *reconnect* does neither until it is closed. When
+        the connection ends it is opened again, with a random backoff between
+        attempts, and the iteration carries on. The events of the new
+        connection are preceded by one this client makes itself,
+        ``{"event_type": "resynced", "event": {...}}``, whose payload says
+        why the last connection ended (``reason``), how many attempts the new
+        one took (``attempts``) and how many seconds the socket was down
+        (``offline``). After it come the ``loop`` event and the full state of
+        every subsystem, as on any new connection. Refused credentials stop
+        the retries, and the iteration raises as it would have without them.
+
         Nothing is read here: the socket is drained by a task of its own from
         the moment it opens, and this hands out what that task collected. A
         consumer slower than kvmd is broadcasting therefore falls behind in
@@ -623,13 +1019,16 @@ class PiKVMWebSocket:
         1024 events are waiting, the oldest are dropped, merged into the next
         event of their kind so that no field a
         [`states()`][aiopikvm.PiKVMWebSocket.states] snapshot rests on is lost.
+        With ``buffering="latest"`` it holds one event per type instead, each
+        the merge of everything of that type since the last one taken.
 
         Yields:
             Parsed JSON event dictionaries.
 
         Raises:
             WebSocketError: The client is not connected, or the connection
-                broke instead of closing cleanly.
+                broke instead of closing cleanly — or, with *reconnect*, it
+                could not be opened again.
         """
         self._ensure_connected()
         self._start_reader()
@@ -658,6 +1057,8 @@ class PiKVMWebSocket:
         event_type = event.get("event_type")
         if not isinstance(event_type, str):
             return event
+        if self._latest.get(event_type) is event:
+            del self._latest[event_type]
         carried = self._carry.pop(event_type, None)
         if carried is None:
             return event
@@ -681,6 +1082,14 @@ class PiKVMWebSocket:
         this release does not know. The kvmd version the ``loop`` event
         carries is on [`version`][aiopikvm.PiKVMWebSocket.version].
 
+        On a socket built with *reconnect*, a ``resynced`` marker produces
+        one snapshot too: the state as it stood, with ``updated`` set to
+        ``"resynced"``. Nothing is cleared at that point. Each subsystem keeps
+        its last known state until the new connection resends it in full,
+        and each part of that payload then replaces what was known of it
+        rather than being merged into it. Anything that changed while the
+        socket was down shows up as that subsystem's next snapshot.
+
         Everything [`events()`][aiopikvm.PiKVMWebSocket.events] does about the
         connection applies here, and the two cannot be iterated over the same
         socket at once: this is [`events()`][aiopikvm.PiKVMWebSocket.events]
@@ -697,29 +1106,11 @@ class PiKVMWebSocket:
             WebSocketError: The client is not connected, or the connection
                 broke instead of closing cleanly.
         """
-        seen: dict[str, dict[str, Any]] = {}
-        state = DeviceState()
+        merger = _StateMerger(self._validation)
         async for event in self.events():
-            event_type = event.get("event_type")
-            payload = event.get("event")
-            if not isinstance(event_type, str) or not isinstance(payload, dict):
-                continue
-            if event_type == "clients":
-                count = payload.get("count")
-                if not isinstance(count, int):
-                    continue
-                state = dataclasses.replace(state, updated=event_type, clients=count)
-            elif event_type in _STATE_MODELS:
-                merged = _merge(seen.get(event_type, {}), payload)
-                seen[event_type] = merged
-                state = dataclasses.replace(
-                    state,
-                    updated=event_type,
-                    **{event_type: _as_state(event_type, merged)},
-                )
-            else:
-                continue
-            yield state
+            state = merger.feed(event)
+            if state is not None:
+                yield state
 
     async def ping(self, *, timeout: float = 10.0) -> float:
         """Ask kvmd for a pong, and wait for it.
@@ -766,6 +1157,7 @@ class PiKVMWebSocket:
                 await self._send_bin(_OP_PING, b"", "ping")
             else:
                 await self._send_event("ping", {})
+            timeout = _shorten(timeout, "wait for the pong")
             async with asyncio.timeout(timeout):
                 answered_at = await waiter
             return answered_at - sent_at
@@ -802,6 +1194,8 @@ class PiKVMWebSocket:
             event: The event to hand to the next
                 [`events()`][aiopikvm.PiKVMWebSocket.events] call.
         """
+        if self._latest_only and self._fold_latest(event):
+            return
         if len(self._pending) >= _PENDING_LIMIT:
             if not self._overflowed:
                 logger.warning(
@@ -810,9 +1204,41 @@ class PiKVMWebSocket:
                     _PENDING_LIMIT,
                 )
                 self._overflowed = True
-            self._carry_over(self._pending.popleft())
+            if self._metrics is not None:
+                self._metrics._dropped_event()
+            dropped = self._pending.popleft()
+            if dropped.get("event_type") == _RESYNCED:
+                # The marker is what tells states() to start over from the
+                # full payloads; losing it would merge them into stale state.
+                (dropped, marker) = (self._pending.popleft(), dropped)
+                self._pending.appendleft(marker)
+            self._carry_over(dropped)
         self._pending.append(event)
 
+    def _fold_latest(self, event: dict[str, Any]) -> bool:
+        """Merge an event into the waiting one of its type, if there is one.
+
+        Args:
+            event: The event the reader took off the socket.
+
+        Returns:
+            Whether it was merged. One that was not is buffered as usual, and
+            becomes the one the next of its type is merged into.
+        """
+        event_type = event.get("event_type")
+        if event_type == _RESYNCED:
+            self._latest.clear()
+            return False
+        payload = event.get("event")
+        if not isinstance(event_type, str) or not isinstance(payload, dict):
+            return False
+        waiting = self._latest.get(event_type)
+        if waiting is None:
+            self._latest[event_type] = event
+            return False
+        waiting["event"] = _merge(waiting["event"], payload)
+        return True
+
     def _carry_over(self, dropped: dict[str, Any]) -> None:
         """Keep what a dropped event said, to merge into the next of its kind.
 
@@ -821,6 +1247,8 @@ class PiKVMWebSocket:
         """
         event_type = dropped.get("event_type")
         payload = dropped.get("event")
+        if isinstance(event_type, str) and self._latest.get(event_type) is dropped:
+            del self._latest[event_type]
         if isinstance(event_type, str) and isinstance(payload, dict):
             self._carry[event_type] = _merge(self._carry.get(event_type, {}), payload)
 
@@ -848,10 +1276,42 @@ class PiKVMWebSocket:
         except websockets.exceptions.WebSocketException as exc:
             raise WebSocketError(f"Failed to read from the socket: {exc}") from exc
         if isinstance(message, str):
-            return self._route_text(message)
+            kind = self._unwanted(message)
+            event = self._route_text(message) if kind is None else None
+            if event is not None:
+                kind = event.get("event_type")
+            if self._metrics is not None and (event is not None or kind is not None):
+                self._metrics._event(kind)
+            if self._tracer is not None:
+                _trace_frame(self._tracer, self._server, "kvmd", "in", message, kind)
+            if self._types is not None and kind not in self._types:
+                return None
+            return event
         self._route_binary(message)
+        if self._tracer is not None:
+            _trace_frame(self._tracer, self._server, "kvmd", "in", message)
         return None
 
+    def _unwanted(self, message: str) -> str | None:
+        """Tell, without parsing a frame, that nobody asked for its events.
+
+        Args:
+            message: The text frame as it arrived.
+
+        Returns:
+            The frame's event type when *types* leaves it out and the reader
+            has no use for it either; ``None`` when the frame is to be parsed.
+        """
+        if self._types is None:
+            return None
+        match = _EVENT_TYPE.match(message)
+        if match is None:
+            return None
+        kind = match.group(1)
+        if kind in self._types or kind in _ROUTED:
+            return None
+        return kind
+
     def _route_text(self, message: str) -> dict[str, Any] | None:
         """Parse a JSON frame and note what it says.
 
@@ -932,25 +1392,76 @@ class PiKVMWebSocket:
             raise WebSocketError("Not connected")
         return self._connection
 
+    @property
+    def send_backlog(self) -> int:
+        """Input frames queued and not yet sent, with *send_queue* on.
+
+        Always zero without it. The queue sends, in this order: pings; keys,
+        ahead of the pointer moves queued before them but behind any button
+        or wheel step; everything else in call order. A release never passes
+        a press, a key never passes a click or a scroll it may be modifying,
+        and a click never passes the move that takes the pointer to it.
+        """
+        return 0 if self._outbox is None else len(self._outbox)
+
+    @property
+    def coalesced_moves(self) -> int:
+        """Absolute moves that a later one replaced in the send queue."""
+        return 0 if self._outbox is None else self._outbox.coalesced
+
     async def _send_frame(self, frame: str | bytes, what: str) -> None:
         """Send one frame, whichever encoding it is in.
 
+        With *send_queue*, the frame waits its turn in the queue, and this
+        returns once it has gone out.
+
         Args:
             frame: The frame to send; text if it is a string, binary if not.
+            what: Name of the event for the error message, and for the queue
+                to tell a key from a move.
+
+        Raises:
+            WebSocketError: The client is not connected, the connection
+                broke before the frame could be sent, or a
+                [`deadline()`][aiopikvm.PiKVM.deadline] ran out first.
+        """
+        if self._outbox is not None:
+            self._ensure_connected()
+            await self._outbox.send(frame, what)
+        else:
+            await self._transmit(frame, what)
+
+    async def _transmit(self, frame: str | bytes, what: str) -> None:
+        """Put one frame on the wire, within the current deadline.
+
+        Args:
+            frame: The frame to send.
             what: Name of the event for the error message.
 
         Raises:
-            WebSocketError: The client is not connected, or the connection
-                broke before the frame could be sent.
+            WebSocketError: The client is not connected, the connection
+                broke before the frame could be sent, or a
+                [`deadline()`][aiopikvm.PiKVM.deadline] ran out first.
         """
         conn = self._ensure_connected()
+        # Most sends happen outside any deadline, and a keystroke should not
+        # pay for a timer it does not need.
+        remaining = _remaining()
         try:
-            await conn.send(frame)
+            if remaining is None:
+                await conn.send(frame)
+            else:
+                async with asyncio.timeout(_shorten(remaining, f"send {what!r}")):
+                    await conn.send(frame)
+        except TimeoutError as exc:
+            raise WebSocketError(f"Sending {what!r} ran past the deadline") from exc
         except websockets.exceptions.WebSocketException as exc:
             # The caller has just been told the socket is gone, so whatever
             # the reader saw needs no second telling from __aexit__.
             self._reported = True
             raise WebSocketError(f"Failed to send {what!r}: {exc}") from exc
+        if self._tracer is not None:
+            _trace_frame(self._tracer, self._server, "kvmd", "out", frame, what)
 
     async def _send_event(self, event_type: str, event: dict[str, Any]) -> None:
         """Send one JSON event frame.
@@ -1044,12 +1555,7 @@ class PiKVMWebSocket:
                 broke before the frame could be sent.
         """
         if self._binary:
-            packed = struct.pack(
-                ">hh",
-                _clamp(to_x, _MOVE_MIN, _MOVE_MAX),
-                _clamp(to_y, _MOVE_MIN, _MOVE_MAX),
-            )
-            await self._send_bin(_OP_MOUSE_MOVE, packed, "mouse_move")
+            await self._send_bin(_OP_MOUSE_MOVE, _pack_move(to_x, to_y), "mouse_move")
         else:
             await self._send_event("mouse_move", {"to": {"x": to_x, "y": to_y}})
 
@@ -1252,6 +1758,28 @@ class PiKVMWebSocket:
             )
 
 
+def _shorten(timeout: float, what: str) -> float:
+    """Cut a socket timeout down to what the current deadline leaves.
+
+    Args:
+        timeout: The timeout the step would otherwise get.
+        what: The step, for the error message.
+
+    Returns:
+        The shorter of *timeout* and the time left. That is *timeout* outside
+        any [`deadline()`][aiopikvm.PiKVM.deadline].
+
+    Raises:
+        WebSocketError: The deadline has already passed.
+    """
+    remaining = _remaining()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise WebSocketError(f"The deadline passed before the socket could {what}")
+    return min(timeout, remaining)
+
+
 def _ws_url(url: str) -> str:
     """Turn a PiKVM base URL into the one a WebSocket connects to.
 
@@ -1278,7 +1806,7 @@ def _credential_headers(
     auth: AuthMode,
     user: str,
     passwd: str | Callable[[], str],
-    token: str,
+    token: str | Callable[[], str],
 ) -> dict[str, str]:
     """Build the credential headers a WebSocket upgrade request carries.
 
@@ -1290,7 +1818,8 @@ def _credential_headers(
         user: kvmd user name, for ``"headers"`` and ``"basic"``.
         passwd: Password, or a callable read at the moment of the handshake so
             that a rotating TOTP code is the one current then.
-        token: Session token, for ``"cookie"``.
+        token: Session token, for ``"cookie"``, or a callable read at the
+            moment of the handshake.
 
     Returns:
         The headers for that auth mode. The cookie goes in a plain ``Cookie``
@@ -1298,7 +1827,7 @@ def _credential_headers(
         no jar here to keep it in.
     """
     if auth == "cookie":
-        return {"Cookie": f"auth_token={token}"}
+        return {"Cookie": f"auth_token={token() if callable(token) else token}"}
     value = passwd() if callable(passwd) else passwd
     if auth == "basic":
         raw = f"{user}:{value}".encode()
@@ -1330,13 +1859,17 @@ def _merge(base: dict[str, Any], update: dict[str, Any]) -> dict[str, Any]:
     return merged
 
 
-def _as_state(event_type: str, merged: dict[str, Any]) -> Any:
+def _as_state(
+    event_type: str, merged: dict[str, Any], mode: ValidationMode = "full"
+) -> Any:
     """Turn a merged payload into whatever
     [`DeviceState`][aiopikvm.DeviceState] holds for it.
 
     Args:
         event_type: kvmd event name.
         merged: Everything that subsystem has sent, merged.
+        mode: How much to check it; see
+            [`ValidationMode`][aiopikvm.ValidationMode].
 
     Returns:
         The validated model.
@@ -1349,7 +1882,7 @@ def _as_state(event_type: str, merged: dict[str, Any]) -> Any:
     (model, key) = _STATE_MODELS[event_type]
     data = merged.get(key) if key else merged
     try:
-        return model.model_validate(data)
+        return validate_model(model, data, mode)
     except ValidationError as exc:
         raise ResponseError(
             f"The {event_type} WebSocket event adds up to a payload "
@@ -1358,6 +1891,23 @@ def _as_state(event_type: str, merged: dict[str, Any]) -> Any:
         ) from exc
 
 
+def _pack_move(to_x: int, to_y: int) -> bytes:
+    """Pack one absolute position the way kvmd's binary move handler unpacks it.
+
+    Args:
+        to_x: Horizontal position.
+        to_y: Vertical position.
+
+    Returns:
+        The pair as two big-endian signed shorts, clamped into kvmd's range.
+    """
+    return struct.pack(
+        ">hh",
+        _clamp(to_x, _MOVE_MIN, _MOVE_MAX),
+        _clamp(to_y, _MOVE_MIN, _MOVE_MAX),
+    )
+
+
 def _pack_delta(delta_x: int, delta_y: int) -> bytes:
     """Pack one step the way kvmd's binary delta handlers unpack it.
 
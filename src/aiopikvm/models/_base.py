@@ -1,9 +1,126 @@
 """Base model for all PiKVM API responses."""
 
+from __future__ import annotations
+
+from typing import Any
+
 from pydantic import BaseModel, ConfigDict
 
 
 class _Base(BaseModel):
-    """Base model with ``extra="allow"`` for forward-compatible parsing."""
+    """Base model with ``extra="allow"`` for forward-compatible parsing.
+
+    ``defer_build`` leaves pydantic's validator for each model unbuilt until
+    the first payload is validated against it. Building one is most of what
+    defining a model costs, and a process that never reads, say, the switch
+    state should not pay for its two dozen classes on import.
+
+    It also holds what a model built under ``validation="lazy"`` or
+    ``"trusted"`` has not built yet: a field whose value is a submodel is left
+    out of ``__dict__`` and kept here as a callable that produces it, and the
+    first read of the attribute calls it. A model validated the ordinary way
+    never sets the slot, so for it none of this runs — Python only consults
+    ``__getattr__`` after the normal lookup has failed.
+
+    Anything that reads the whole model at once — comparison, serialisation,
+    copying, pickling, ``repr`` — builds every pending field first, all the
+    way down, because pydantic reads ``__dict__`` directly and would see the
+    gaps.
+    """
+
+    model_config = ConfigDict(extra="allow", defer_build=True)
+
+    __slots__ = ("_deferred",)
+
+    def __getattr__(self, name: str) -> Any:
+        """Build a pending field on its first read.
+
+        Args:
+            name: Attribute the normal lookup did not find.
+
+        Returns:
+            The field's value, which is now in ``__dict__`` and will be found
+            there next time.
+
+        Raises:
+            AttributeError: *name* is not a pending field, and pydantic does
+                not know it either.
+        """
+        try:
+            deferred = object.__getattribute__(self, "_deferred")
+        except AttributeError:
+            deferred = None
+        if deferred and name in deferred:
+            value = deferred.pop(name)()
+            self.__dict__[name] = value
+            return value
+        return super().__getattr__(name)  # type: ignore[misc]
+
+    def _resolve(self) -> None:
+        """Build every pending field, in this model and in those under it."""
+        try:
+            deferred = object.__getattribute__(self, "_deferred")
+        except AttributeError:
+            return
+        fields = self.__dict__
+        for name, build in list(deferred.items()):
+            # A field assigned since the model was built has already won.
+            if name not in fields:
+                fields[name] = build()
+        deferred.clear()
+        # Back into declaration order, which repr and the JSON dump follow.
+        fields = {name: fields[name] for name in type(self).model_fields}
+        object.__setattr__(self, "__dict__", fields)
+        for value in fields.values():
+            _resolve_within(value)
+
+    def __eq__(self, other: object) -> bool:
+        self._resolve()
+        if isinstance(other, _Base):
+            other._resolve()
+        return super().__eq__(other)
+
+    def __iter__(self) -> Any:
+        self._resolve()
+        return super().__iter__()
+
+    def __repr_args__(self) -> Any:
+        self._resolve()
+        return super().__repr_args__()
+
+    def __copy__(self) -> Any:
+        self._resolve()
+        return super().__copy__()
+
+    def __deepcopy__(self, memo: dict[int, Any] | None = None) -> Any:
+        self._resolve()
+        return super().__deepcopy__(memo)
+
+    def __getstate__(self) -> dict[Any, Any]:
+        self._resolve()
+        return super().__getstate__()
+
+    def model_dump(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        self._resolve()
+        return super().model_dump(*args, **kwargs)
+
+    def model_dump_json(self, *args: Any, **kwargs: Any) -> str:
+        self._resolve()
+        return super().model_dump_json(*args, **kwargs)
+
+
+def _resolve_within(value: Any) -> None:
+    """Build whatever is pending in *value*, if it holds models.
 
-    model_config = ConfigDict(extra="allow")
+    Args:
+        value: A field's value: a model, or a dict or list of them, or
+            anything else, which is left alone.
+    """
+    if isinstance(value, _Base):
+        value._resolve()
+    elif isinstance(value, dict):
+        for item in value.values():
+            _resolve_within(item)
+    elif isinstance(value, list):
+        for item in value:
+            _resolve_within(item)
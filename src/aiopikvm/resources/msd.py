@@ -159,6 +159,7 @@ class MSDResource(BaseResource):
             },
             timeout=timeout,
         )
+        self._client.metrics._bytes("upload", length)
         return self._write_info(result, _WRITE_PATH)
 
     async def upload_remote(
@@ -416,7 +417,9 @@ class MSDResource(BaseResource):
                 else httpx.Timeout(self._client._timeout, read=None)
             ),
         ) as response:
+            metrics = self._client.metrics
             async for chunk in response.aiter_bytes(chunk_size):
+                metrics._bytes("download", len(chunk))
                 yield chunk
 
     async def remove(self, name: str) -> None:
@@ -165,7 +165,9 @@ class StreamerResource(BaseResource):
             ),
         ) as response:
             reader = _MultipartReader(_boundary_of(response))
+            metrics = self._client.metrics
             async for chunk in response.aiter_bytes(chunk_size):
+                metrics._bytes("mjpeg", len(chunk))
                 for headers, data in reader.feed(chunk):
                     payload: dict[str, Any] = {"data": data, "headers": headers}
                     payload.update(_meta_from_headers(headers, _FRAME_HEADERS))
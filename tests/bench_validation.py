@@ -0,0 +1,82 @@
+"""What each validation mode costs, per model, on the captured payloads.
+
+Not a test — pytest does not collect it, and a timing has no business
+failing a build on a loaded CI runner. Run it by hand when a change touches
+``_validation.py`` or a model::
+
+    python -m tests.bench_validation
+    python -m tests.bench_validation --number 20000
+
+Two columns per mode. *build* is the call a resource or ``states()`` makes;
+*read* is that call followed by reading every field, all the way down, which
+is the most ``"lazy"`` and ``"trusted"`` can ever be made to do. A caller
+pays somewhere between the two, depending on how much of the model it reads.
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import timeit
+from collections.abc import Callable
+from typing import Any
+
+from pydantic import BaseModel
+
+from aiopikvm._constants import ValidationMode
+from aiopikvm._validation import validate_model
+from tests.fixtures import load_result
+from tests.test_contract import CASES, Case
+
+MODES: tuple[ValidationMode, ...] = ("full", "lazy", "trusted")
+
+
+def _payload(case: Case) -> Any:
+    result = load_result(case.name)
+    return result if case.key is None else result[case.key]
+
+
+def _read_all(value: Any) -> None:
+    """Touch every field, building whatever a mode left pending."""
+    if isinstance(value, BaseModel):
+        for name in type(value).model_fields:
+            _read_all(getattr(value, name))
+    elif isinstance(value, dict):
+        for item in value.values():
+            _read_all(item)
+    elif isinstance(value, list):
+        for item in value:
+            _read_all(item)
+
+
+def _read_all_of(build: Callable[[], Any]) -> None:
+    _read_all(build())
+
+
+def _microseconds(statement: Callable[[], Any], number: int) -> float:
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=5000)
+    number = parser.parse_args().number
+
+    header = f"{'capture':<16} {'model':<16}"
+    for mode in MODES:
+        header += f" {mode + ' build':>14} {mode + ' read':>14}"
+    print(header)
+    for case in CASES:
+        data = _payload(case)
+        row = f"{case.name:<16} {case.model.__name__:<16}"
+        for mode in MODES:
+            build = functools.partial(validate_model, case.model, data, mode)
+            build()  # Plans are cached per class; keep that out of the timing.
+            row += f" {_microseconds(build, number):>12.1f}us"
+            read = functools.partial(_read_all_of, build)
+            row += f" {_microseconds(read, number):>12.1f}us"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
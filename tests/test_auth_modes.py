@@ -331,6 +331,22 @@ async def test_websocket_without_a_session_says_what_to_do() -> None:
             kvm.ws()
 
 
+async def test_the_hub_waits_for_a_session_until_it_is_entered(
+    mock_api: respx.MockRouter,
+) -> None:
+    _login_route(mock_api)
+    async with PiKVM(URL, user="admin", passwd="secret", auth="cookie") as kvm:
+        hub = kvm.hub
+        with pytest.raises(ConfigurationError, match="no session token"):
+            async with hub:
+                pass
+        await kvm.auth.login("admin", "secret")
+        assert hub._ws._credential_headers() == {"Cookie": f"auth_token={TOKEN}"}
+        # A renewed session is the one the next handshake carries.
+        kvm.cookies.set("auth_token", OTHER_TOKEN, domain="pikvm.local", path="/")
+        assert hub._ws._credential_headers() == {"Cookie": f"auth_token={OTHER_TOKEN}"}
+
+
 async def test_websocket_uses_the_session_token(mock_api: respx.MockRouter) -> None:
     _login_route(mock_api)
     async with PiKVM(URL, user="admin", passwd="secret", auth="cookie") as kvm:
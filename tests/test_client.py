@@ -1,6 +1,9 @@
 """PiKVM client lifecycle tests."""
 
+import asyncio
+import logging
 import sys
+import time
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 from typing import Any
@@ -320,3 +323,99 @@ async def test_a_refused_stream_closes_the_context_that_owns_it(
         with pytest.raises(RedirectError):
             [line async for line in kvm.system.stream_log()]
         assert [type(exc) for exc in exited] == [RedirectError]
+
+
+# --- prewarm ---------------------------------------------------------------
+
+
+@pytest.mark.parametrize(("prewarm", "opened"), [(True, 2), (3, 3)])
+async def test_prewarm_opens_connections_on_enter(
+    mock_api: respx.MockRouter, prewarm: bool | int, opened: int
+) -> None:
+    warm = mock_api.head("/").mock(return_value=httpx.Response(302))
+    async with PiKVM("https://pikvm.local", prewarm=prewarm):
+        assert warm.call_count == opened
+    # No credentials: the connection is the point, not the answer.
+    assert "X-KVMD-User" not in warm.calls.last.request.headers
+
+
+async def test_prewarm_is_off_by_default(mock_api: respx.MockRouter) -> None:
+    async with PiKVM("https://pikvm.local") as kvm:
+        assert kvm._keep_warm is None
+    assert not mock_api.calls
+
+
+async def test_prewarm_does_not_fail_the_open(mock_api: respx.MockRouter) -> None:
+    mock_api.head("/").mock(side_effect=httpx.ConnectError("unreachable"))
+    async with PiKVM("https://pikvm.local", prewarm=True) as kvm:
+        assert kvm._keep_warm is not None
+
+
+async def test_prewarm_gives_up_on_a_device_that_does_not_answer(
+    mock_api: respx.MockRouter, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("aiopikvm._client._PREWARM_TIMEOUT", 0.05)
+
+    async def hang(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(60)
+        raise AssertionError("unreachable")
+
+    warm = mock_api.head("/").mock(side_effect=hang)
+    started = time.monotonic()
+    async with PiKVM("https://pikvm.local", prewarm=True, timeout=30) as kvm:
+        assert time.monotonic() - started < 5
+        assert kvm._keep_warm is not None
+        # Once the device answers, the next round warms as before.
+        warm.side_effect = None
+        warm.return_value = httpx.Response(302)
+        await kvm._warm()
+    assert warm.call_count == 2
+
+
+async def test_keep_warm_survives_an_unexpected_failure(
+    mock_api: respx.MockRouter,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    monkeypatch.setattr("aiopikvm._client._KEEP_WARM_INTERVAL", 0.01)
+    warm = mock_api.head("/").mock(return_value=httpx.Response(302))
+    async with PiKVM("https://pikvm.local", prewarm=True) as kvm:
+        warm.side_effect = RuntimeError("not an httpx error")
+        with caplog.at_level(logging.WARNING, logger="aiopikvm._client"):
+            await asyncio.sleep(0.05)
+        assert kvm._keep_warm is not None
+        assert not kvm._keep_warm.done()
+        calls = warm.call_count
+        warm.side_effect = None
+        await asyncio.sleep(0.05)
+        assert warm.call_count > calls
+    assert "Keeping the connections to https://pikvm.local warm failed" in caplog.text
+
+
+async def test_keep_warm_runs_while_idle_and_stops_on_close(
+    mock_api: respx.MockRouter, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("aiopikvm._client._KEEP_WARM_INTERVAL", 0.01)
+    warm = mock_api.head("/").mock(return_value=httpx.Response(302))
+    async with PiKVM("https://pikvm.local", prewarm=True) as kvm:
+        task = kvm._keep_warm
+        await asyncio.sleep(0.05)
+        assert warm.call_count > 2
+    assert task is not None
+    assert task.cancelled()
+    assert kvm._keep_warm is None
+
+
+async def test_keep_warm_leaves_a_busy_client_alone(
+    mock_api: respx.MockRouter, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("aiopikvm._client._KEEP_WARM_INTERVAL", 0.05)
+    warm = mock_api.head("/").mock(return_value=httpx.Response(302))
+    mock_api.get("/api/info").mock(
+        return_value=httpx.Response(200, json={"ok": True, "result": {}})
+    )
+    async with PiKVM("https://pikvm.local", prewarm=True) as kvm:
+        for _ in range(10):
+            await kvm.request("GET", "/api/info")
+            await asyncio.sleep(0.01)
+    assert warm.call_count == 2
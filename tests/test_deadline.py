@@ -0,0 +1,204 @@
+"""One time budget across many calls, set with `PiKVM.deadline()`."""
+
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator
+from typing import Any
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+import respx
+
+from aiopikvm import (
+    AdaptiveTimeout,
+    ConnectionTimeoutError,
+    PiKVM,
+    PiKVMWebSocket,
+    WebSocketError,
+)
+from aiopikvm._deadline import _remaining
+from tests.test_msd import records
+
+OK = {"ok": True, "result": {}}
+
+
+def _timeouts(route: respx.Route, index: int = -1) -> dict[str, float | None]:
+    """The timeouts httpx was given for one call of a route."""
+    return route.calls[index].request.extensions["timeout"]
+
+
+async def test_a_request_gets_what_is_left_of_the_budget(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    atx = mock_api.get("/api/atx").mock(return_value=httpx.Response(200, json=OK))
+    await client.request("GET", "/api/atx")
+    async with client.deadline(2):
+        await client.request("GET", "/api/atx")
+    assert _timeouts(atx, 0)["read"] == 10.0
+    assert all(0 < value <= 2 for value in _timeouts(atx, 1).values())  # type: ignore[operator]
+
+
+async def test_a_shorter_timeout_is_left_alone(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    atx = mock_api.get("/api/atx").mock(return_value=httpx.Response(200, json=OK))
+    async with client.deadline(60):
+        await client.request("GET", "/api/atx", timeout=1.5)
+    assert _timeouts(atx)["read"] == 1.5
+
+
+async def test_nothing_is_sent_after_the_deadline(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    async with client.deadline(0):
+        with pytest.raises(ConnectionTimeoutError, match="deadline"):
+            await client.request("GET", "/api/atx")
+    assert not mock_api.calls
+    assert client.metrics.requests("GET", "/api/atx") == 0
+
+
+async def test_deadlines_nest_and_unwind(client: PiKVM) -> None:
+    assert _remaining() is None
+    async with client.deadline(5):
+        async with client.deadline(60):
+            inner = _remaining()
+            assert inner is not None
+            assert inner <= 5
+        async with client.deadline(1):
+            inner = _remaining()
+            assert inner is not None
+            assert inner <= 1
+    assert _remaining() is None
+
+
+async def test_tasks_started_inside_inherit_the_deadline(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    atx = mock_api.get("/api/atx").mock(return_value=httpx.Response(200, json=OK))
+    async with client.deadline(3):
+        await asyncio.gather(*(client.request("GET", "/api/atx") for _ in range(3)))
+    for index in range(3):
+        assert _timeouts(atx, index)["read"] <= 3  # type: ignore[operator]
+
+
+async def test_the_login_and_the_resend_share_the_budget(
+    mock_api: respx.MockRouter,
+) -> None:
+    login = mock_api.post("/api/auth/login").mock(
+        return_value=httpx.Response(
+            200, json=OK, headers={"Set-Cookie": "auth_token=t; Path=/"}
+        )
+    )
+    answers = iter([httpx.Response(403, json=OK), httpx.Response(200, json=OK)])
+    atx = mock_api.get("/api/atx").mock(side_effect=lambda request: next(answers))
+    async with PiKVM("https://pikvm.local", passwd="secret", auth="cookie") as kvm:
+        kvm.cookies.set("auth_token", "stale", domain="pikvm.local", path="/")
+        async with kvm.deadline(4):
+            await kvm.request("GET", "/api/atx")
+    assert _timeouts(login)["read"] <= 4  # type: ignore[operator]
+    assert _timeouts(atx, 0)["read"] <= 4  # type: ignore[operator]
+    assert _timeouts(atx, 1)["read"] <= 4  # type: ignore[operator]
+
+
+async def test_a_stream_opens_within_the_budget(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    log = mock_api.get("/api/log").mock(return_value=httpx.Response(200, text="x\n"))
+    async with client.deadline(2):
+        async for _ in client.system.stream_log():
+            pass
+    # The log is followed without a read timeout; the deadline gives it one.
+    assert _timeouts(log)["read"] <= 2  # type: ignore[operator]
+
+
+class _Progress(httpx.AsyncByteStream):
+    """A download that reports progress every 50 ms and never ends."""
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        line = json.dumps(records("remote_ok")[0]).encode() + b"\n"
+        while True:
+            yield line
+            await asyncio.sleep(0.05)
+
+
+async def test_a_stream_is_read_only_until_the_deadline(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    mock_api.post("/api/msd/write_remote").mock(
+        return_value=httpx.Response(
+            200,
+            headers={"content-type": "application/x-ndjson"},
+            stream=_Progress(),
+        )
+    )
+    seen = []
+    started = time.monotonic()
+    async with asyncio.timeout(5), client.deadline(0.3):
+        with pytest.raises(ConnectionTimeoutError, match="deadline"):
+            async for record in client.msd.upload_remote_progress(
+                "http://localhost:8099/slow-4m.iso"
+            ):
+                seen.append(record)
+        # upload_remote() reads the same stream to its end, so it stops too.
+        with pytest.raises(ConnectionTimeoutError, match="deadline"):
+            await client.msd.upload_remote("http://localhost:8099/slow-4m.iso")
+    # Every chunk comes well inside its read timeout; only the budget ends it.
+    assert time.monotonic() - started < 1
+    assert len(seen) > 1
+
+
+async def test_a_timeout_the_deadline_cut_short_is_not_learned(
+    mock_api: respx.MockRouter,
+) -> None:
+    mock_api.get("/api/atx").mock(side_effect=httpx.ReadTimeout("slow"))
+    async with PiKVM(
+        "https://pikvm.local", timeout=AdaptiveTimeout(min_samples=1)
+    ) as kvm:
+        async with kvm.deadline(1):
+            with pytest.raises(ConnectionTimeoutError):
+                await kvm.request("GET", "/api/atx")
+        assert kvm._latency is not None
+        assert kvm._latency._samples == {}
+
+
+# --- The socket ------------------------------------------------------------
+
+
+def _socket() -> PiKVMWebSocket:
+    ws = PiKVMWebSocket("https://pikvm.local", user="admin", passwd="admin")
+    ws._connection = AsyncMock()
+    return ws
+
+
+async def test_a_send_after_the_deadline_is_refused(client: PiKVM) -> None:
+    ws = _socket()
+    async with client.deadline(0):
+        with pytest.raises(WebSocketError, match="deadline"):
+            await ws.send_key("KeyA", state=True)
+    ws._connection.send.assert_not_called()  # type: ignore[union-attr]
+
+
+async def test_a_send_that_stalls_past_the_deadline_fails(client: PiKVM) -> None:
+    ws = _socket()
+
+    async def stall(frame: Any) -> None:
+        await asyncio.sleep(10)
+
+    ws._connection.send = stall  # type: ignore[union-attr, method-assign]
+    async with client.deadline(0.05):
+        with pytest.raises(WebSocketError, match="ran past the deadline"):
+            await ws.send_key("KeyA", state=True)
+
+
+async def test_the_handshake_gets_what_is_left_of_the_budget(client: PiKVM) -> None:
+    connect = AsyncMock(side_effect=OSError("no route"))
+    ws = PiKVMWebSocket(
+        "https://pikvm.local", user="admin", passwd="admin", open_timeout=10.0
+    )
+    with patch("aiopikvm._ws._Connector", connect):
+        async with client.deadline(2):
+            with pytest.raises(WebSocketError):
+                await ws.__aenter__()
+    assert connect.call_args.kwargs["open_timeout"] <= 2
@@ -0,0 +1,128 @@
+"""Many sockets as one stream with `FleetEvents`."""
+
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import websockets.exceptions
+
+from aiopikvm import ConfigurationError, DeviceEvent, FleetEvents, PiKVMWebSocket
+from tests.test_ws import iterating, recorded, socket
+
+
+def opened(*event_types: str, closed: BaseException | None = None) -> PiKVMWebSocket:
+    """A socket that is already open, with recorded events to read."""
+    ws = socket()
+    ws._connection = iterating(
+        *(json.dumps(recorded(name)) for name in event_types), closed=closed
+    )
+    return ws
+
+
+async def drained(fleet: FleetEvents) -> list[DeviceEvent]:
+    """Let every socket read all it has, then take everything in turn."""
+    await asyncio.sleep(0.01)
+    async with asyncio.timeout(5):
+        return [event async for event in fleet]
+
+
+def without_closed(events: list[DeviceEvent]) -> list[DeviceEvent]:
+    return [event for event in events if event.event["event_type"] != "closed"]
+
+
+async def test_devices_take_turns_one_event_each() -> None:
+    sockets = {"chatty": opened(*["streamer"] * 5), "quiet": opened("atx", "atx")}
+    async with FleetEvents(sockets) as fleet:
+        events = await drained(fleet)
+    assert [event.device for event in without_closed(events)] == [
+        "chatty",
+        "quiet",
+        "chatty",
+        "quiet",
+        "chatty",
+        "chatty",
+        "chatty",
+    ]
+    assert events[1] == DeviceEvent("quiet", recorded("atx"))
+
+
+async def test_every_device_ends_with_a_closed_event() -> None:
+    broken = websockets.exceptions.ConnectionClosedError(None, None)
+    sockets = {"ok": opened("atx"), "broken": opened("atx", closed=broken)}
+    async with FleetEvents(sockets) as fleet:
+        events = await drained(fleet)
+    closed = {
+        event.device: event.event["event"]
+        for event in events
+        if event.event["event_type"] == "closed"
+    }
+    assert closed["ok"] == {"error": None}
+    assert "Connection lost" in closed["broken"]["error"]
+    assert events[-2:] == [
+        event for event in events if event.event["event_type"] == "closed"
+    ]
+    assert fleet.devices == []
+
+
+async def test_a_device_over_its_rate_waits_its_turn() -> None:
+    sockets = {"chatty": opened(*["streamer"] * 4), "quiet": opened("atx")}
+    started = time.monotonic()
+    async with FleetEvents(sockets, rate=20, burst=2) as fleet:
+        await asyncio.sleep(0.01)
+        taken = [await anext(fleet) for _ in range(4)]
+        assert fleet.throttled == 1
+        events = taken + await drained(fleet)
+    # Two from the burst, then one every 50 ms.
+    assert time.monotonic() - started >= 0.09
+    assert [event.device for event in without_closed(events)] == [
+        "chatty",
+        "quiet",
+        "chatty",
+        "chatty",
+        "chatty",
+    ]
+
+
+async def test_the_backlog_is_reported() -> None:
+    sockets = {"a": opened("atx", "msd", "hid"), "b": opened("atx")}
+    async with FleetEvents(sockets) as fleet:
+        await asyncio.sleep(0.01)
+        assert fleet.backlog == 4
+        assert fleet.backlogs == {"a": 3, "b": 1}
+        await anext(fleet)
+        await anext(fleet)
+        assert fleet.backlog == 2
+        assert fleet.delivered == {"a": 1, "b": 1}
+
+
+async def test_sockets_it_opened_are_closed_and_the_others_left_open() -> None:
+    ready = opened("atx")
+    conn = iterating(json.dumps(recorded("msd")))
+    connect = AsyncMock(side_effect=[conn, OSError("no route to host")])
+    sockets = {"ready": ready, "fresh": socket(), "down": socket()}
+    with patch("aiopikvm._ws._Connector", connect):
+        async with FleetEvents(sockets, open_concurrency=1) as fleet:
+            events = await drained(fleet)
+    assert DeviceEvent("fresh", recorded("msd")) in events
+    down = [event.event for event in events if event.device == "down"]
+    assert down[0]["event_type"] == "closed"
+    assert "no route to host" in down[0]["event"]["error"]
+    conn.close.assert_awaited_once()
+    ready._connection.close.assert_not_awaited()  # type: ignore[union-attr]
+
+
+async def test_sockets_are_added_before_the_fleet_is_entered() -> None:
+    fleet = FleetEvents({"a": opened()})
+    with pytest.raises(ConfigurationError, match="added already"):
+        fleet.add("a", opened())
+    async with fleet:
+        with pytest.raises(ConfigurationError, match="before the fleet"):
+            fleet.add("b", opened())
+
+
+@pytest.mark.parametrize("kwargs", [{"rate": 0}, {"burst": 0}, {"open_concurrency": 0}])
+def test_limits_that_cannot_work_are_refused(kwargs: dict[str, float]) -> None:
+    with pytest.raises(ConfigurationError):
+        FleetEvents(**kwargs)  # type: ignore[arg-type]
@@ -0,0 +1,292 @@
+"""One kvmd socket shared through `EventHub`."""
+
+import asyncio
+import json
+from collections.abc import AsyncIterator, Iterator
+from contextlib import contextmanager
+from typing import Any
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import respx
+import websockets.exceptions
+
+from aiopikvm import (
+    ConfigurationError,
+    DeviceState,
+    EventHub,
+    PiKVM,
+    PiKVMWebSocket,
+    ResponseError,
+    Subscription,
+    WebSocketError,
+)
+from tests.test_ws import recorded
+
+
+class Feed:
+    """A mock connection that hands out whatever the test puts in.
+
+    Once it has been closed it stays closed, the way a real connection does:
+    every later read raises the same way.
+    """
+
+    def __init__(self) -> None:
+        self.frames: asyncio.Queue[str | BaseException] = asyncio.Queue()
+        self.closed: BaseException | None = None
+        self.conn = AsyncMock()
+        self.conn.recv = self._recv
+
+    async def _recv(self) -> str:
+        if self.closed is not None:
+            raise self.closed
+        frame = await self.frames.get()
+        if isinstance(frame, BaseException):
+            self.closed = frame
+            raise frame
+        return frame
+
+    def event(self, event_type: str, payload: dict[str, Any] | None = None) -> None:
+        """Send a recorded event, or one with the given payload."""
+        event = recorded(event_type)
+        if payload is not None:
+            event = {"event_type": event_type, "event": payload}
+        self.frames.put_nowait(json.dumps(event))
+
+    def close(self, exc: BaseException | None = None) -> None:
+        """End the connection, cleanly unless *exc* says otherwise."""
+        self.frames.put_nowait(
+            exc or websockets.exceptions.ConnectionClosedOK(None, None)
+        )
+
+
+@contextmanager
+def connecting(*feeds: Feed) -> Iterator[AsyncMock]:
+    """Hand out one feed per handshake, and count the handshakes."""
+    connect = AsyncMock(side_effect=[feed.conn for feed in feeds])
+    with patch("aiopikvm._ws._Connector", connect):
+        yield connect
+
+
+def hub() -> EventHub:
+    return EventHub(PiKVMWebSocket("https://pikvm.local", user="admin", passwd="x"))
+
+
+async def next_of[T](subscription: Subscription[T]) -> T:
+    async with asyncio.timeout(1):
+        return await anext(subscription)
+
+
+async def test_subscribers_share_one_socket_and_get_their_own_types() -> None:
+    feed = Feed()
+    events = hub()
+    with connecting(feed) as connect:
+        async with (
+            events.subscribe({"atx"}) as atx,
+            events.subscribe({"msd", "hid"}) as storage,
+            events.subscribe() as everything,
+        ):
+            assert events.subscribers == 3
+            for event_type in ("atx", "msd", "hid"):
+                feed.event(event_type)
+            assert (await next_of(atx))["event_type"] == "atx"
+            assert (await next_of(storage))["event_type"] == "msd"
+            assert (await next_of(storage))["event_type"] == "hid"
+            assert [(await next_of(everything))["event_type"] for _ in "abc"] == [
+                "atx",
+                "msd",
+                "hid",
+            ]
+    assert connect.call_count == 1
+    feed.conn.close.assert_awaited_once()
+
+
+async def test_the_socket_closes_after_the_last_subscriber_and_reopens() -> None:
+    (first, second) = (Feed(), Feed())
+    events = hub()
+    with connecting(first, second) as connect:
+        async with events.subscribe():
+            async with events.subscribe():
+                pass
+            first.conn.close.assert_not_awaited()
+        first.conn.close.assert_awaited_once()
+        async with events.subscribe() as again:
+            second.event("atx")
+            assert (await next_of(again))["event_type"] == "atx"
+    assert connect.call_count == 2
+
+
+async def test_the_state_is_merged_once_and_shared() -> None:
+    feed = Feed()
+    events = hub()
+    with connecting(feed):
+        async with events.subscribe_states({"atx"}) as power:
+            feed.event("atx")
+            feed.event("msd")
+            first = await next_of(power)
+            assert first.updated == "atx"
+            assert first.atx is not None
+            assert first.atx.busy is False
+            feed.event("atx", {"busy": True})
+            assert (await next_of(power)).atx.busy is True  # type: ignore[union-attr]
+            assert events.state.msd is not None
+            # A late subscriber starts from the state as it stands.
+            async with events.subscribe_states({"atx"}) as late:
+                joined = await next_of(late)
+                assert joined is events.state
+                assert joined.updated == "atx"
+                assert joined.msd is not None
+
+
+async def test_a_slow_subscriber_drops_its_own_oldest_only() -> None:
+    feed = Feed()
+    events = hub()
+    with connecting(feed):
+        async with (
+            events.subscribe({"atx"}, maxsize=2) as slow,
+            events.subscribe({"atx"}) as fast,
+        ):
+            feed.event("atx")
+            for busy in (True, False, True):
+                feed.event("atx", {"busy": busy})
+            received = [await next_of(fast) for _ in range(4)]
+            assert [event["event"].get("busy") for event in received] == [
+                False,
+                True,
+                False,
+                True,
+            ]
+            assert slow.dropped == 2
+            assert fast.dropped == 0
+            # What the dropped events said is folded into the next of theirs.
+            assert (await next_of(slow))["event"] == recorded("atx")["event"] | {
+                "busy": False
+            }
+            assert (await next_of(slow))["event"] == {"busy": True}
+
+
+async def test_a_broken_connection_reaches_every_subscriber() -> None:
+    feed = Feed()
+    events = hub()
+    with connecting(feed):
+        async with events.subscribe() as raw, events.subscribe_states() as states:
+            feed.close(websockets.exceptions.ConnectionClosedError(None, None))
+            with pytest.raises(WebSocketError, match="Connection lost"):
+                await next_of(raw)
+            with pytest.raises(WebSocketError, match="Connection lost"):
+                await next_of(states)
+
+
+async def test_a_state_that_does_not_validate_is_raised_in_its_place() -> None:
+    feed = Feed()
+    events = hub()
+    with connecting(feed):
+        async with (
+            events.subscribe_states({"atx"}) as power,
+            events.subscribe_states({"msd"}) as storage,
+            events.subscribe({"atx"}) as raw,
+        ):
+            feed.event("atx")
+            feed.event("msd")
+            feed.event("atx", {"busy": "sometimes"})
+            feed.event("atx", {"busy": True})
+            assert (await next_of(power)).atx.busy is False  # type: ignore[union-attr]
+            with pytest.raises(ResponseError):
+                await next_of(power)
+            # The subscription is still open, and the merge goes on from the
+            # last state that validated.
+            assert (await next_of(power)).atx.busy is True  # type: ignore[union-attr]
+            # Nobody else hears of it.
+            assert (await next_of(storage)).updated == "msd"
+            assert [(await next_of(raw))["event"].get("busy") for _ in "abc"] == [
+                False,
+                "sometimes",
+                True,
+            ]
+
+
+async def test_a_pump_that_fails_otherwise_ends_every_subscription() -> None:
+    feed = Feed()
+    events = hub()
+
+    async def broken() -> AsyncIterator[dict[str, Any]]:
+        yield recorded("atx")
+        raise RuntimeError("not a socket failure")
+
+    with connecting(feed), patch.object(events.ws, "events", broken):
+        async with events.subscribe() as raw, events.subscribe_states() as states:
+            assert (await next_of(raw))["event_type"] == "atx"
+            with pytest.raises(RuntimeError, match="not a socket failure"):
+                await next_of(raw)
+            assert (await next_of(states)).updated == "atx"
+            with pytest.raises(RuntimeError, match="not a socket failure"):
+                await next_of(states)
+
+
+async def test_a_clean_close_ends_every_subscription() -> None:
+    feed = Feed()
+    events = hub()
+    with connecting(feed):
+        async with events.subscribe() as raw:
+            feed.event("atx")
+            feed.close()
+            assert [event async for event in raw] == [recorded("atx")]
+            # Joining a hub whose socket has ended ends at once.
+            async with events.subscribe() as late:
+                assert [event async for event in late] == []
+
+
+async def test_aclose_ends_the_subscriptions_and_the_socket() -> None:
+    feed = Feed()
+    events = hub()
+    with connecting(feed):
+        async with events.subscribe() as raw:
+            await events.aclose()
+            assert [event async for event in raw] == []
+            feed.conn.close.assert_awaited_once()
+        assert events.subscribers == 0
+
+
+async def test_the_hub_can_be_held_open_without_subscribing() -> None:
+    feed = Feed()
+    events = hub()
+    with connecting(feed):
+        async with events:
+            await events.ws.send_key("KeyA", state=True)
+        feed.conn.send.assert_awaited_once()
+        feed.conn.close.assert_awaited_once()
+
+
+async def test_a_subscription_is_used_inside_its_block() -> None:
+    with pytest.raises(WebSocketError, match="async with"):
+        await anext(hub().subscribe())
+
+
+@pytest.mark.parametrize(
+    ("types", "maxsize", "match"),
+    [("atx", 8, "not the string"), (None, 0, "at least 1")],
+)
+def test_a_filter_or_a_queue_that_cannot_work_is_refused(
+    types: Any, maxsize: int, match: str
+) -> None:
+    with pytest.raises(ConfigurationError, match=match):
+        hub().subscribe(types, maxsize=maxsize)
+
+
+# --- PiKVM.hub -------------------------------------------------------------
+
+
+async def test_the_client_has_one_reconnecting_hub(mock_api: respx.MockRouter) -> None:
+    feed = Feed()
+    async with PiKVM("https://pikvm.local") as kvm:
+        assert kvm.hub is kvm.hub
+        assert kvm.hub.ws._reconnect is True
+        with connecting(feed):
+            subscription = kvm.hub.subscribe_states()
+            await subscription.__aenter__()
+            feed.event("hid")
+            state = await next_of(subscription)
+            assert isinstance(state, DeviceState)
+            assert state.hid is not None
+    feed.conn.close.assert_awaited_once()
+    assert "hub" not in kvm.__dict__
@@ -0,0 +1,87 @@
+"""What ``import aiopikvm`` costs a process that has not imported it yet.
+
+Short-lived callers — a CLI invocation, a function that runs per request —
+pay the import on every start, so it is held to a budget. Each check runs in
+a fresh interpreter, since this one has long since imported everything.
+
+Two kinds of check, because they fail differently. Which third-party packages
+an import drags in is deterministic, and is the real guard: it fails the
+moment someone moves an import back to the top of a module. The timings come
+from ``python -X importtime`` and are only a backstop, with budgets loose
+enough that a loaded CI runner does not trip them.
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+HEAVY = ("httpx", "pydantic", "websockets", "aiortc")
+
+
+def _run(statement: str) -> tuple[int, set[str]]:
+    """Run one import in a fresh interpreter.
+
+    Args:
+        statement: What to execute.
+
+    Returns:
+        What the imports cost, in microseconds, and the top-level packages
+        the process ended up holding. The cost is the sum of every module's
+        *self* time rather than the cumulative time of one — a module the
+        package's ``__getattr__`` loads through `importlib` gets no line of
+        its own, though everything it imports in turn does — and so it
+        includes the interpreter's own startup, which the ``startup`` fixture measures.
+    """
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"{statement}\nimport sys\nprint(' '.join(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    spent = 0
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "cumulative" not in line:
+            spent += int(line.removeprefix("import time:").split("|")[0])
+    loaded = {name.partition(".")[0] for name in result.stdout.split()}
+    return spent, loaded
+
+
+@pytest.fixture(scope="module")
+def startup() -> int:
+    """What a fresh interpreter spends importing before it runs anything."""
+    return _run("pass")[0]
+
+
+def test_importing_the_package_loads_nothing_heavy(startup: int) -> None:
+    spent, loaded = _run("import aiopikvm")
+    assert loaded.isdisjoint(HEAVY)
+    assert spent - startup < 50_000
+
+
+def test_the_client_needs_httpx_and_nothing_else(startup: int) -> None:
+    """No pydantic until a resource is used, no websockets until a socket is."""
+    spent, loaded = _run("from aiopikvm import PiKVM")
+    assert "httpx" in loaded
+    assert loaded.isdisjoint({"pydantic", "websockets", "aiortc"})
+    assert spent - startup < 500_000
+
+
+@pytest.mark.parametrize(
+    ("statement", "absent"),
+    [
+        ("from aiopikvm import ATXState", {"httpx", "websockets"}),
+        ("from aiopikvm import PiKVMError, TOTP", {"httpx", "pydantic"}),
+    ],
+)
+def test_a_name_loads_only_what_it_is_defined_with(
+    statement: str, absent: set[str]
+) -> None:
+    _, loaded = _run(statement)
+    assert loaded.isdisjoint(absent)
@@ -0,0 +1,254 @@
+"""HID input routed by `HIDInput` over the hub socket or REST."""
+
+import asyncio
+from typing import Any
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+import respx
+
+from aiopikvm import ConfigurationError, HIDInput, PiKVM, WebSocketError
+from aiopikvm._path import _plan
+from tests.fixtures import load_json
+from tests.test_hub import Feed, connecting
+
+OK = {"ok": True, "result": {}}
+
+
+def sent(feed: Feed) -> list[bytes]:
+    """The frames the socket was given, in order."""
+    return [call.args[0] for call in feed.conn.send.await_args_list]
+
+
+async def test_without_an_open_hub_input_goes_over_rest(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    route = mock_api.post("/api/hid/events/send_key").mock(
+        return_value=httpx.Response(200, json=OK)
+    )
+    assert isinstance(client.input, HIDInput)
+    assert client.input.transport == "rest"
+    await client.input.send_key("KeyA")
+    assert route.calls[-1].request.url.params["key"] == "KeyA"
+    # Asking for the facade does not open, or even make, the hub.
+    assert "hub" not in client.__dict__
+
+
+async def test_with_the_hub_open_input_goes_over_its_socket(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    feed = Feed()
+    with connecting(feed):
+        async with client.hub:
+            assert client.input.transport == "ws"
+            await client.input.send_key("KeyA")
+            await client.input.send_mouse_move(100, -100)
+            await client.input.send_mouse_button("left")
+    assert not mock_api.calls
+    frames = sent(feed)
+    # A press kvmd finishes, as REST would have sent it, then a click's
+    # press and release.
+    assert frames[0] == b"\x01\x03KeyA"
+    assert frames[1][0] == 3
+    assert frames[2:] == [b"\x02\x01left", b"\x02\x00left"]
+    assert client.input.transport == "rest"
+
+
+async def test_a_shortcut_is_pressed_in_order_and_released_in_reverse(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    feed = Feed()
+    with connecting(feed), patch("aiopikvm._input.asyncio.sleep") as sleep:
+        async with client.hub:
+            await client.input.send_shortcut("ControlLeft", "KeyC")
+    assert sent(feed) == [
+        b"\x01\x01ControlLeft",
+        b"\x01\x01KeyC",
+        b"\x01\x00KeyC",
+        b"\x01\x00ControlLeft",
+    ]
+    assert [call.args for call in sleep.await_args_list] == [(0.05,)] * 3
+
+
+async def test_a_frame_the_socket_cannot_send_goes_over_rest(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    route = mock_api.post("/api/hid/events/send_mouse_wheel").mock(
+        return_value=httpx.Response(200, json=OK)
+    )
+    broken = AsyncMock(side_effect=WebSocketError("The connection broke"))
+    with connecting(Feed()):
+        async with client.hub:
+            with patch.object(client.hub.ws, "_send_frame", broken):
+                await client.input.send_mouse_wheel(0, -1)
+    broken.assert_awaited_once()
+    assert route.calls[-1].request.url.params["delta_y"] == "-1"
+
+
+@pytest.mark.parametrize(
+    ("call", "match"),
+    [
+        (lambda kvm: kvm.input.send_key("KeyQ "), "no key"),
+        (lambda kvm: kvm.input.send_shortcut("ControlLeft", "Ctrl"), "no key"),
+        (lambda kvm: kvm.input.send_shortcut(), "at least one key"),
+        (lambda kvm: kvm.input.send_mouse_button("side"), "no mouse button"),
+    ],
+)
+async def test_a_wrong_name_raises_whichever_transport_is_up(
+    mock_api: respx.MockRouter, client: PiKVM, call: object, match: str
+) -> None:
+    feed = Feed()
+    with connecting(feed):
+        async with client.hub:
+            with pytest.raises(ConfigurationError, match=match):
+                await call(client)  # type: ignore[operator]
+    with pytest.raises(ConfigurationError, match=match):
+        await call(client)  # type: ignore[operator]
+    feed.conn.send.assert_not_awaited()
+    assert not mock_api.calls
+
+
+# --- Paths -----------------------------------------------------------------
+
+
+def test_a_linear_path_runs_corner_to_corner_at_an_even_pace() -> None:
+    steps = _plan(
+        [(0, 0), (1919, 1079)], (1920, 1080), duration=0.1, rate=100, curve="linear"
+    )
+    assert len(steps) == 11
+    assert (steps[0].x, steps[0].y) == (-32768, -32768)
+    assert (steps[-1].x, steps[-1].y) == (32767, 32767)
+    assert [step.at for step in steps] == pytest.approx([n / 100 for n in range(11)])
+    assert steps[0].frame == b"\x03\x80\x00\x80\x00"
+    # Halfway by distance on a straight line is the middle of the screen.
+    assert (steps[5].x, steps[5].y) == (0, 0)
+
+
+def test_a_polyline_is_walked_by_distance_not_by_leg() -> None:
+    # A 300-pixel leg, then a 100-pixel one: three quarters of the moves
+    # go to the first.
+    steps = _plan(
+        [(0, 0), (300, 0), (300, 100)],
+        (1001, 1001),
+        duration=0.04,
+        rate=100,
+        curve="linear",
+    )
+    assert [_pixels(step.x) for step in steps] == [0, 100, 200, 300, 300]
+    assert [_pixels(step.y) for step in steps] == [0, 0, 0, 0, 100]
+
+
+def test_a_bezier_path_bends_towards_its_controls() -> None:
+    steps = _plan(
+        [(0, 0), (1000, 0), (1000, 1000)],
+        (1001, 1001),
+        duration=0.02,
+        rate=100,
+        curve="bezier",
+    )
+    assert [(_pixels(step.x), _pixels(step.y)) for step in steps] == [
+        (0, 0),
+        (750, 250),
+        (1000, 1000),
+    ]
+
+
+def test_a_path_that_does_not_move_is_one_move() -> None:
+    steps = _plan([(5, 5), (5, 5)], (1920, 1080), duration=1, rate=60, curve="linear")
+    assert len(steps) == 1
+    # Off-screen pixels end up on the edge, as kvmd would clamp them.
+    (step,) = _plan([(-50, 5000)], (1920, 1080), duration=1, rate=60, curve="bezier")
+    assert (step.x, step.y) == (-32768, 32767)
+
+
+@pytest.mark.parametrize(
+    ("waypoints", "resolution", "kwargs", "match"),
+    [
+        ([], (1920, 1080), {}, "at least one waypoint"),
+        ([(0, 0)], (1, 1080), {}, "two pixels"),
+        ([(0, 0)], (1920, 1080), {"rate": 0}, "rate"),
+        ([(0, 0)], (1920, 1080), {"duration": float("nan")}, "duration"),
+        ([(0, 0)], (1920, 1080), {"curve": "spline"}, "Unknown curve"),
+    ],
+)
+def test_a_path_that_cannot_be_drawn_is_refused(
+    waypoints: list[tuple[float, float]],
+    resolution: tuple[int, int],
+    kwargs: dict[str, Any],
+    match: str,
+) -> None:
+    options = {"duration": 0.5, "rate": 60.0, "curve": "linear"} | kwargs
+    with pytest.raises(ConfigurationError, match=match):
+        _plan(waypoints, resolution, **options)
+
+
+async def test_a_path_goes_out_as_prepacked_frames_sized_by_the_hub(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    feed = Feed()
+    with connecting(feed):
+        async with client.hub:
+            # The full state first, with the streamer stopped, then the
+            # update kvmd sends once it is running.
+            feed.event("streamer")
+            feed.event("streamer", {"streamer": _streamer(1920, 1080)})
+            async with asyncio.timeout(1):
+                while (state := client.hub.state.streamer) is None or (
+                    state.streamer is None
+                ):
+                    await asyncio.sleep(0)
+            await client.input.move_along(
+                [(0, 0), (1919, 1079)], duration=0.02, rate=100
+            )
+    assert not mock_api.calls
+    planned = _plan(
+        [(0, 0), (1919, 1079)], (1920, 1080), duration=0.02, rate=100, curve="linear"
+    )
+    assert sent(feed) == [step.frame for step in planned]
+
+
+async def test_a_drag_over_rest_holds_the_button_along_the_path(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    mock_api.get("/api/streamer").mock(
+        return_value=httpx.Response(200, json=load_json("streamer"))
+    )
+    mock_api.post(url__regex=r"/api/hid/events/.*").mock(
+        return_value=httpx.Response(200, json=OK)
+    )
+    await client.input.drag([(0, 0), (1919, 1079)], duration=0.01, rate=100)
+    calls = [
+        (call.request.url.path.rsplit("/", 1)[-1], dict(call.request.url.params))
+        for call in mock_api.calls
+    ]
+    assert calls[0] == ("streamer", {})
+    assert calls[1:] == [
+        ("send_mouse_move", {"to_x": "-32768", "to_y": "-32768"}),
+        ("send_mouse_button", {"button": "left", "state": "1"}),
+        ("send_mouse_move", {"to_x": "32767", "to_y": "32767"}),
+        ("send_mouse_button", {"button": "left", "state": "0"}),
+    ]
+
+
+async def test_without_a_running_streamer_a_path_needs_a_resolution(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    body = load_json("streamer")
+    body["result"]["streamer"] = None
+    mock_api.get("/api/streamer").mock(return_value=httpx.Response(200, json=body))
+    with pytest.raises(ConfigurationError, match="resolution="):
+        await client.input.move_along([(0, 0)])
+    assert len(mock_api.calls) == 1
+
+
+def _pixels(position: int, size: int = 1001) -> int:
+    """The pixel a kvmd position came from, on a screen *size* pixels wide."""
+    return round((position + 32768) / 65535 * (size - 1))
+
+
+def _streamer(width: int, height: int) -> dict[str, Any]:
+    """The ``streamer`` block of a ``streamer`` event, at a given resolution."""
+    block: dict[str, Any] = load_json("streamer")["result"]["streamer"]
+    block["source"]["resolution"] = {"width": width, "height": height}
+    return block
@@ -0,0 +1,208 @@
+"""The binary event journal: `EventJournal` and `JournalReader`."""
+
+import asyncio
+import json
+from datetime import UTC, datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from aiopikvm import ConfigurationError, EventJournal, JournalReader
+from aiopikvm._journal import _EVENT, _HEADER, _MAGIC, _scan
+from tests.test_ws import iterating, recorded, socket
+
+
+def busy(value: bool) -> dict[str, object]:
+    return {"event_type": "atx", "event": {"busy": value}}
+
+
+async def written(path: Path, *, checkpoint_every: int = 4) -> None:
+    """Two devices: `a` toggles `atx.busy` ten times, `b` sends one `msd`."""
+    async with EventJournal(path, checkpoint_every=checkpoint_every) as journal:
+        await journal.write("a", recorded("atx"), at=100.0)
+        await journal.write("b", recorded("msd"), at=100.5)
+        for second in range(1, 11):
+            await journal.write("a", busy(second % 2 == 1), at=100.0 + second)
+
+
+async def test_the_state_at_any_moment_is_rebuilt(tmp_path: Path) -> None:
+    path = tmp_path / "fleet.journal"
+    await written(path)
+    async with JournalReader(path) as reader:
+        assert reader.devices == ["a", "b"]
+        assert reader.span("a") == (100.0, 110.0)
+        assert await reader.state_at("a", 99.0) is None
+        for second in range(1, 11):
+            state = await reader.state_at("a", 100.0 + second + 0.5)
+            assert state is not None
+            assert state.updated == "atx"
+            assert state.atx is not None
+            assert state.atx.busy is (second % 2 == 1)
+            # The rest of the first, full payload is still there.
+            assert state.atx.leds.power is False
+        msd = await reader.state_at("b", datetime.fromtimestamp(200.0, tz=UTC))
+        assert msd is not None
+        assert msd.msd is not None
+        assert msd.atx is None
+
+
+async def test_lookups_of_a_fleet_at_once_read_their_own_records(
+    tmp_path: Path,
+) -> None:
+    path = tmp_path / "fleet.journal"
+    async with EventJournal(path, checkpoint_every=50) as journal:
+        for second in range(400):
+            event = busy(second % 2 == 1) if second else recorded("atx")
+            for device in "abcd":
+                await journal.write(device, event, at=float(second))
+    async with JournalReader(path) as reader:
+        states = await asyncio.gather(
+            *(
+                reader.state_at(device, float(second))
+                for second in range(0, 400, 7)
+                for device in "abcd"
+            )
+        )
+        replays = await asyncio.gather(
+            *(_replayed(reader, device) for device in "abcd")
+        )
+    assert [state.atx.busy for state in states] == [  # type: ignore[union-attr]
+        second % 2 == 1 for second in range(0, 400, 7) for _ in "abcd"
+    ]
+    assert all(len(events) == 400 for events in replays)
+
+
+async def _replayed(reader: JournalReader, device: str) -> list[object]:
+    return [event async for _, event in reader.replay(device)]
+
+
+async def test_checkpoints_come_every_so_many_events(tmp_path: Path) -> None:
+    path = tmp_path / "fleet.journal"
+    await written(path, checkpoint_every=4)
+    with path.open("rb") as file:
+        (devices, indexes, end) = _scan(file)
+    a = indexes[devices["a"]]
+    assert len(a.times) == 11
+    assert a.counts == [4, 8]
+    assert indexes[devices["b"]].counts == []
+    assert end == path.stat().st_size
+
+
+async def test_a_device_s_events_stay_in_time_order(tmp_path: Path) -> None:
+    path = tmp_path / "fleet.journal"
+    await written(path)
+    async with EventJournal(path) as journal:
+        with pytest.raises(ConfigurationError, match="earlier than its last"):
+            await journal.write("a", busy(True), at=105.0)
+        # Another device has its own order.
+        await journal.write("b", busy(True), at=105.0)
+        # A clock that stepped back is held at the last time.
+        with patch("aiopikvm._journal.time.time", return_value=50.0):
+            await journal.write("a", busy(False))
+    async with JournalReader(path) as reader:
+        assert reader.span("a") == (100.0, 110.0)
+        state = await reader.state_at("a", 110.0)
+        assert state is not None
+        assert state.atx.busy is False  # type: ignore[union-attr]
+
+
+async def test_an_out_of_order_file_is_indexed_in_order(tmp_path: Path) -> None:
+    path = tmp_path / "fleet.journal"
+    await written(path)
+    payload = json.dumps(busy(False)).encode()
+    with path.open("ab") as file:
+        file.write(_HEADER.pack(_EVENT, 0, 90.0, len(payload)) + payload)
+    async with JournalReader(path) as reader:
+        assert reader.span("a") == (100.0, 110.0)
+        state = await reader.state_at("a", 110.0)
+        assert state is not None
+        assert state.atx.busy is False  # type: ignore[union-attr]
+
+
+async def test_replay_yields_a_span_of_events(tmp_path: Path) -> None:
+    path = tmp_path / "fleet.journal"
+    await written(path)
+    async with JournalReader(path) as reader:
+        events = [item async for item in reader.replay("a", since=103, until=105)]
+    assert events == [(103.0, busy(True)), (104.0, busy(False)), (105.0, busy(True))]
+
+
+async def test_reopening_carries_on_and_cuts_off_a_torn_record(
+    tmp_path: Path,
+) -> None:
+    path = tmp_path / "fleet.journal"
+    await written(path, checkpoint_every=4)
+    with path.open("ab") as file:
+        file.write(b"\x01\x00\x00")
+    async with EventJournal(path, checkpoint_every=4) as journal:
+        await journal.write("c", recorded("hid"), at=111.0)
+        await journal.write("a", busy(False), at=111.0)
+    with path.open("rb") as file:
+        (devices, indexes, _) = _scan(file)
+    assert devices == {"a": 0, "b": 1, "c": 2}
+    # `a` had three events since its last checkpoint; this is its fourth.
+    assert indexes[devices["a"]].counts == [4, 8, 12]
+    async with JournalReader(path) as reader:
+        state = await reader.state_at("a", 112.0)
+        assert state is not None
+        assert state.atx is not None
+        assert state.atx.busy is False
+        assert state.atx.leds.power is False
+        assert (await reader.state_at("c", 112.0)).hid is not None  # type: ignore[union-attr]
+
+
+async def test_a_resync_replaces_the_payload_across_a_checkpoint(
+    tmp_path: Path,
+) -> None:
+    path = tmp_path / "fleet.journal"
+    async with EventJournal(path, checkpoint_every=2) as journal:
+        await journal.write("a", recorded("atx"), at=1.0)
+        await journal.write("a", {"event_type": "resynced", "event": {}}, at=2.0)
+        full = recorded("atx")
+        full = {**full, "event": {**full["event"], "busy": True}}
+        await journal.write("a", full, at=3.0)
+    async with JournalReader(path) as reader:
+        state = await reader.state_at("a", 3.0)
+    assert state is not None
+    assert state.atx is not None
+    assert state.atx.busy is True
+
+
+async def test_a_socket_is_recorded_until_it_ends(tmp_path: Path) -> None:
+    path = tmp_path / "fleet.journal"
+    ws = socket()
+    ws._connection = iterating(json.dumps(recorded("atx")), json.dumps(busy(True)))
+    async with EventJournal(path) as journal:
+        await journal.record("kvm", ws)
+    async with JournalReader(path) as reader:
+        events = [event async for (_, event) in reader.replay("kvm")]
+    assert events == [recorded("atx"), busy(True)]
+
+
+async def test_what_is_not_a_journal_is_refused(tmp_path: Path) -> None:
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"hello")
+    with pytest.raises(ConfigurationError, match="not an aiopikvm event journal"):
+        async with JournalReader(path):
+            pass
+    with pytest.raises(ConfigurationError, match="not an aiopikvm event journal"):
+        async with EventJournal(path):
+            pass
+    empty = tmp_path / "empty.journal"
+    async with EventJournal(empty):
+        pass
+    assert empty.read_bytes() == _MAGIC
+
+
+async def test_a_closed_journal_or_unknown_device_is_refused(tmp_path: Path) -> None:
+    path = tmp_path / "fleet.journal"
+    journal = EventJournal(path)
+    with pytest.raises(ConfigurationError, match="async with"):
+        await journal.write("a", recorded("atx"))
+    await written(path)
+    async with JournalReader(path) as reader:
+        with pytest.raises(ConfigurationError, match="no device 'z'"):
+            await reader.state_at("z", 0)
+    with pytest.raises(ConfigurationError, match="at least 1"):
+        EventJournal(path, checkpoint_every=0)
@@ -0,0 +1,121 @@
+"""Round trips sampled in the background by `LatencyMonitor`."""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from aiopikvm import (
+    ConfigurationError,
+    LatencyHistogram,
+    LatencyMonitor,
+    LatencyStats,
+    WebSocketError,
+)
+from tests.test_ws import socket
+
+LOST = WebSocketError("kvmd did not answer the ping within 2.0 s")
+
+
+def monitored(*answers: float | BaseException, **kwargs: object) -> LatencyMonitor:
+    """A monitor whose socket answers each ping from *answers*, in order."""
+    ws = socket()
+    ws.ping = AsyncMock(side_effect=list(answers))  # type: ignore[method-assign]
+    return LatencyMonitor(ws, interval=0.001, **kwargs)  # type: ignore[arg-type]
+
+
+async def sampled(monitor: LatencyMonitor, count: int) -> None:
+    """Run the monitor until it has sent *count* pings."""
+    async with monitor:
+        async with asyncio.timeout(1):
+            while len(monitor._window) < count:
+                await asyncio.sleep(0.001)
+
+
+def test_the_histogram_is_within_one_percent_at_every_scale() -> None:
+    histogram = LatencyHistogram()
+    values = [n / 1000 for n in range(1, 10_001)]
+    for value in values:
+        histogram.record(value)
+    assert histogram.count == 10_000
+    assert histogram.min == 0.001
+    assert histogram.max == 10.0
+    assert histogram.mean == pytest.approx(5.0005)
+    for percent, exact in ((50, 5.0), (99, 9.9), (100, 10.0)):
+        assert histogram.percentile(percent) == pytest.approx(exact, rel=0.01)
+    assert histogram.percentile(0) == pytest.approx(0.001, rel=0.01)
+    # The counters follow the range of the values, not their number.
+    size = len(histogram._counts)
+    for value in values:
+        histogram.record(value)
+    assert len(histogram._counts) == size
+    histogram.clear()
+    assert histogram.percentile(50) is None
+    assert histogram.mean is None
+
+
+def test_a_percentile_outside_the_range_is_refused() -> None:
+    with pytest.raises(ConfigurationError, match="0 to 100"):
+        LatencyHistogram().percentile(101)
+
+
+async def test_a_healthy_loop_reports_its_percentiles_and_jitter() -> None:
+    monitor = monitored(*[0.010, 0.020] * 10)
+    assert monitor.health == "unknown"
+    await sampled(monitor, 20)
+    stats = monitor.stats()
+    assert stats.health == "healthy"
+    assert (stats.sent, stats.lost, stats.loss) == (20, 0, 0.0)
+    assert stats.p50 == 0.010
+    assert stats.p99 == 0.020
+    assert stats.last == 0.020
+    assert stats.jitter is not None
+    assert 0 < stats.jitter < 0.010
+    assert monitor.histogram.count == 20
+
+
+async def test_a_slow_or_lossy_loop_is_degraded_then_stalled_then_down() -> None:
+    changes: list[LatencyStats] = []
+    monitor = monitored(
+        0.01, 0.3, 0.01, 1.5, LOST, LOST, LOST, 0.01, on_change=changes.append
+    )
+    await sampled(monitor, 8)
+    assert [stats.health for stats in changes] == [
+        "healthy",
+        "degraded",
+        "stalled",
+        "down",
+        "stalled",
+    ]
+    assert changes[3].lost == 3
+    assert monitor.health == "stalled"
+
+
+async def test_a_lost_ping_does_not_take_the_sockets_report() -> None:
+    monitor = monitored(LOST, 0.01)
+    await sampled(monitor, 2)
+    assert monitor._ws._reported is False
+    assert monitor.stats().loss == 0.5
+
+
+async def test_a_failing_callback_does_not_stop_the_monitor() -> None:
+    def broken(stats: LatencyStats) -> None:
+        raise RuntimeError("alerting is down")
+
+    monitor = monitored(0.01, 0.5, 0.01, on_change=broken)
+    await sampled(monitor, 3)
+    assert monitor.health == "degraded"
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"interval": 0},
+        {"degraded": 1.0, "stalled": 0.5},
+        {"max_loss": 0},
+        {"down_after": 61},
+    ],
+)
+def test_settings_that_cannot_work_are_refused(kwargs: dict[str, float]) -> None:
+    with pytest.raises(ConfigurationError):
+        LatencyMonitor(socket(), **kwargs)  # type: ignore[arg-type]
@@ -0,0 +1,137 @@
+"""Screen text read on this machine by `LocalOCR`."""
+
+import concurrent.futures
+import io
+import shutil
+import sys
+from collections.abc import Iterator
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import pytest
+import respx
+
+from aiopikvm import ConfigurationError, LocalOCR, PiKVM
+from aiopikvm._ocr import _box
+
+JPEG = b"\xff\xd8screen"
+
+
+@pytest.fixture()
+def threads() -> Iterator[concurrent.futures.ThreadPoolExecutor]:
+    """A pool the patched recognition can run in without pickling."""
+    with concurrent.futures.ThreadPoolExecutor(1) as pool:
+        yield pool
+
+
+async def test_the_snapshot_is_fetched_and_read_in_the_pool(
+    mock_api: respx.MockRouter,
+    client: PiKVM,
+    threads: concurrent.futures.ThreadPoolExecutor,
+) -> None:
+    route = mock_api.get("/api/streamer/snapshot").mock(
+        return_value=httpx.Response(200, content=JPEG)
+    )
+    with (
+        patch("aiopikvm._ocr._tesseract"),
+        patch("aiopikvm._ocr._recognize", return_value="login:") as recognize,
+    ):
+        async with LocalOCR(client, executor=threads) as reader:
+            text = await reader.ocr(
+                langs=["eng", "rus"],
+                left=100,
+                top=50,
+                right=800,
+                bottom=200,
+                allow_offline=True,
+                timeout=5,
+            )
+            await reader.ocr()
+    assert text == "login:"
+    params = route.calls[0].request.url.params
+    assert params["allow_offline"] == "1"
+    # The device is asked for a picture, never for its own OCR.
+    assert "ocr" not in params
+    assert recognize.call_args_list[0].args == (
+        JPEG,
+        (100, 50, 800, 200),
+        "eng+rus",
+        5,
+    )
+    assert recognize.call_args_list[1].args == (
+        JPEG,
+        (None, None, None, None),
+        "eng",
+        30.0,
+    )
+
+
+async def test_a_snapshot_already_taken_is_read_in_the_readers_languages(
+    mock_api: respx.MockRouter,
+    client: PiKVM,
+    threads: concurrent.futures.ThreadPoolExecutor,
+) -> None:
+    with (
+        patch("aiopikvm._ocr._tesseract"),
+        patch("aiopikvm._ocr._recognize", return_value="") as recognize,
+    ):
+        reader = LocalOCR(client, langs=["deu"], executor=threads)
+        await reader.recognize(JPEG, top=10)
+    assert recognize.call_args.args[1:3] == ((None, 10, None, None), "deu")
+    assert not mock_api.calls
+
+
+async def test_without_pytesseract_nothing_is_fetched(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    with (
+        patch.dict(sys.modules, {"pytesseract": None}),
+        pytest.raises(ConfigurationError, match=r"aiopikvm\[ocr\]"),
+    ):
+        await LocalOCR(client).ocr()
+    assert not mock_api.calls
+
+
+@pytest.mark.parametrize(
+    ("edges", "box"),
+    [
+        ((None, None, None, None), None),
+        ((100, 50, 800, 200), (100, 50, 800, 200)),
+        ((None, 50, None, None), (0, 50, 1920, 1080)),
+        ((-10, -10, 5000, 5000), (0, 0, 1920, 1080)),
+        # Nothing inside the edges reads the whole screen, as kvmd does.
+        ((800, 50, 100, 200), None),
+        ((2000, None, None, None), None),
+    ],
+)
+def test_the_region_is_bounded_onto_the_image(
+    edges: tuple[int | None, ...], box: tuple[int, int, int, int] | None
+) -> None:
+    assert _box(edges, (1920, 1080)) == box  # type: ignore[arg-type]
+
+
+@pytest.mark.parametrize("kwargs", [{"workers": 0}, {"langs": []}])
+def test_settings_that_cannot_work_are_refused(
+    client: PiKVM, kwargs: dict[str, Any]
+) -> None:
+    with pytest.raises(ConfigurationError):
+        LocalOCR(client, **kwargs)
+
+
+@pytest.mark.skipif(shutil.which("tesseract") is None, reason="no tesseract")
+async def test_tesseract_reads_a_rendered_line(client: PiKVM) -> None:
+    pytest.importorskip("pytesseract", reason="pytesseract is not installed")
+    image_module = pytest.importorskip("PIL.Image", reason="Pillow is not installed")
+    from PIL import ImageDraw, ImageFont
+
+    image = image_module.new("RGB", (800, 120), "white")
+    draw, font = ImageDraw.Draw(image), ImageFont.load_default(40)
+    draw.text((20, 30), "PiKVM", fill="black", font=font)
+    draw.text((500, 30), "login", fill="black", font=font)
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=95)
+    async with LocalOCR(client, workers=1) as reader:
+        text = await reader.recognize(output.getvalue(), right=400)
+    assert "PiKVM" in text
+    assert "login" not in text
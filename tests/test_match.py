@@ -0,0 +1,258 @@
+"""Templates found on the screen by `ImageMatcher`."""
+
+import asyncio
+import concurrent.futures
+import io
+import sys
+import threading
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import pytest
+import respx
+
+from aiopikvm import (
+    APIError,
+    ConfigurationError,
+    ImageMatch,
+    ImageMatcher,
+    MJPEGFrame,
+    PiKVM,
+)
+from tests.test_streamer import stream_step
+
+FOUND = ImageMatch("dialog", 0.97, 1200, 700, 300, 150)
+
+
+@pytest.fixture()
+def prepared() -> Iterator[concurrent.futures.ThreadPoolExecutor]:
+    """A matcher's dependencies and search stood in for, and a pool of one.
+
+    The search itself is the numerical part, tested against real pictures
+    below when NumPy and Pillow are there; this is for what happens around
+    it, which needs neither.
+    """
+    with (
+        concurrent.futures.ThreadPoolExecutor(1) as pool,
+        patch("aiopikvm._match._numpy"),
+        patch("aiopikvm._match._prepare"),
+    ):
+        yield pool
+
+
+class Stream:
+    """An MJPEG stream that sends each frame when the test says so."""
+
+    def __init__(self) -> None:
+        self.queue: asyncio.Queue[bytes | None] = asyncio.Queue()
+
+    async def mjpeg(self, **kwargs: Any) -> AsyncIterator[MJPEGFrame]:
+        while (data := await self.queue.get()) is not None:
+            yield MJPEGFrame(data=data)
+
+    def put(self, *frames: bytes | None) -> None:
+        for data in frames:
+            self.queue.put_nowait(data)
+
+
+async def test_frames_that_arrive_during_a_search_are_dropped_but_the_newest(
+    client: PiKVM, prepared: concurrent.futures.ThreadPoolExecutor
+) -> None:
+    stream = Stream()
+    searched: list[bytes] = []
+    release = threading.Event()
+
+    def find(data: bytes, *args: Any) -> ImageMatch | None:
+        searched.append(data)
+        release.wait(1)
+        return FOUND if data == b"4" else None
+
+    matcher = ImageMatcher({"dialog": b""}, executor=prepared)
+    with (
+        patch.object(client.streamer, "mjpeg", stream.mjpeg),
+        patch("aiopikvm._match._find", side_effect=find),
+    ):
+        waiting = asyncio.ensure_future(matcher.wait_for_image(client, timeout=5))
+        stream.put(b"1")
+        async with asyncio.timeout(1):
+            while not searched:
+                await asyncio.sleep(0)
+        stream.put(b"2", b"3", b"4")
+        async with asyncio.timeout(1):
+            while matcher.frames < 4:
+                await asyncio.sleep(0)
+        release.set()
+        assert await waiting is FOUND
+    assert searched == [b"1", b"4"]
+    assert (matcher.frames, matcher.searched) == (4, 2)
+
+
+async def test_no_match_in_time_is_none(
+    client: PiKVM, prepared: concurrent.futures.ThreadPoolExecutor
+) -> None:
+    stream = Stream()
+    stream.put(b"1", b"2")
+    matcher = ImageMatcher({"dialog": b""}, executor=prepared)
+    with (
+        patch.object(client.streamer, "mjpeg", stream.mjpeg),
+        patch("aiopikvm._match._find", return_value=None),
+    ):
+        assert await matcher.wait_for_image(client, timeout=0.05) is None
+        # A deadline shorter than the timeout ends the wait first.
+        async with client.deadline(0.05):
+            async with asyncio.timeout(1):
+                assert await matcher.wait_for_image(client, timeout=60) is None
+    assert matcher.frames == 2
+    assert 1 <= matcher.searched <= 2
+
+
+async def test_snapshots_are_taken_one_search_at_a_time(
+    mock_api: respx.MockRouter,
+    client: PiKVM,
+    prepared: concurrent.futures.ThreadPoolExecutor,
+) -> None:
+    route = mock_api.get("/api/streamer/snapshot").mock(
+        side_effect=[httpx.Response(200, content=bytes([n])) for n in range(3)]
+    )
+    matcher = ImageMatcher({"dialog": b""}, executor=prepared)
+    found = {b"\x01": FOUND}
+    with patch("aiopikvm._match._find", side_effect=lambda data, *_: found.get(data)):
+        assert await matcher.wait_for_image(client, source="snapshot") is FOUND
+    assert len(route.calls) == 2
+    assert route.calls[0].request.url.params["allow_offline"] == "1"
+
+
+async def test_a_stream_that_fails_fails_the_wait(
+    mock_api: respx.MockRouter,
+    client: PiKVM,
+    prepared: concurrent.futures.ThreadPoolExecutor,
+) -> None:
+    recorded = stream_step("state_stopped")
+    mock_api.get("/streamer/stream").mock(
+        return_value=httpx.Response(recorded["status"], text=recorded["body_excerpt"])
+    )
+    matcher = ImageMatcher({"dialog": b""}, executor=prepared)
+    with pytest.raises(APIError):
+        await matcher.wait_for_image(client)
+    key = mock_api.calls.last.request.url.params["key"]
+    assert key == "aiopikvm-image-matcher"
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"threshold": 0},
+        {"threshold": 1.5},
+        {"scale": 0},
+        {"scale": 2},
+        {"levels": 0},
+        {"region": (100, 100, 50, 200)},
+    ],
+)
+def test_settings_that_cannot_work_are_refused(
+    prepared: concurrent.futures.ThreadPoolExecutor, kwargs: dict[str, Any]
+) -> None:
+    with pytest.raises(ConfigurationError):
+        ImageMatcher({"dialog": b""}, **kwargs)
+    with pytest.raises(ConfigurationError, match="at least one template"):
+        ImageMatcher({})
+
+
+async def test_an_unknown_source_is_refused(
+    client: PiKVM, prepared: concurrent.futures.ThreadPoolExecutor
+) -> None:
+    matcher = ImageMatcher({"dialog": b""})
+    with pytest.raises(ConfigurationError, match="frame source"):
+        await matcher.wait_for_image(client, source="webrtc")  # type: ignore[arg-type]
+
+
+def test_without_numpy_it_says_what_to_install() -> None:
+    with (
+        patch.dict(sys.modules, {"numpy": None}),
+        pytest.raises(ConfigurationError, match=r"aiopikvm\[vision\]"),
+    ):
+        ImageMatcher({"dialog": b""})
+
+
+# --- The search ------------------------------------------------------------
+
+
+def _dialog(text: str) -> Any:
+    """A dialog box with a line of text and a button, 300 by 150."""
+    image_module = pytest.importorskip("PIL.Image", reason="Pillow is not installed")
+    from PIL import ImageDraw, ImageFont
+
+    image = image_module.new("RGB", (300, 150), (230, 230, 230))
+    draw, font = ImageDraw.Draw(image), ImageFont.load_default(24)
+    draw.rectangle((0, 0, 299, 149), outline="black", width=3)
+    draw.text((30, 20), text, fill="black", font=font)
+    draw.rectangle((100, 90, 200, 130), fill=(80, 140, 220))
+    draw.text((130, 97), "OK", fill="white", font=font)
+    return image
+
+
+def _encoded(image: Any, kind: str = "JPEG") -> bytes:
+    output = io.BytesIO()
+    image.save(output, kind)
+    return output.getvalue()
+
+
+def _screen(
+    text: str, at: tuple[int, int], size: tuple[int, int] = (1920, 1080)
+) -> bytes:
+    """A desktop, 1080p unless *size* says otherwise, with the dialog on it."""
+    image_module = pytest.importorskip("PIL.Image", reason="Pillow is not installed")
+    screen = image_module.new("RGB", size, (40, 60, 90))
+    screen.paste(_dialog(text), at)
+    return _encoded(screen)
+
+
+@pytest.mark.parametrize("levels", [1, 3])
+@pytest.mark.parametrize("at", [(1200, 702), (1201, 703), (7, 5)])
+async def test_a_template_is_found_where_it_is(
+    levels: int, at: tuple[int, int]
+) -> None:
+    pytest.importorskip("numpy", reason="NumPy is not installed")
+    message = _dialog("Install complete").crop((20, 10, 240, 60))
+    templates = {"done": _encoded(message, "PNG")}
+    with concurrent.futures.ThreadPoolExecutor(1) as pool:
+        matcher = ImageMatcher(templates, levels=levels, executor=pool)
+        found = await matcher.find(_screen("Install complete", at))
+        other = await matcher.find(_screen("Install failed!!", at))
+    assert found is not None
+    assert found.template == "done"
+    assert found.score >= 0.9
+    # Half scale places a match to within a screen pixel.
+    assert abs(found.left - (at[0] + 20)) <= 1
+    assert abs(found.top - (at[1] + 10)) <= 1
+    assert (found.width, found.height) == (220, 50)
+    assert other is None
+
+
+async def test_only_the_region_is_searched() -> None:
+    pytest.importorskip("numpy", reason="NumPy is not installed")
+    templates = {"dialog": _encoded(_dialog("Install complete"), "PNG")}
+    screen = _screen("Install complete", (1200, 700))
+    with concurrent.futures.ThreadPoolExecutor(1) as pool:
+        inside = ImageMatcher(templates, region=(1000, 600, 1700, 1000), executor=pool)
+        outside = ImageMatcher(templates, region=(0, 0, 1000, 1080), executor=pool)
+        found = await inside.find(screen)
+        assert await outside.find(screen) is None
+    assert found is not None
+    assert found.center == (1350, 775)
+
+
+async def test_a_region_is_bounded_to_a_smaller_screen() -> None:
+    pytest.importorskip("numpy", reason="NumPy is not installed")
+    templates = {"dialog": _encoded(_dialog("Install complete"), "PNG")}
+    # The host has gone from 1080p down to 1024x768 since the regions were set.
+    screen = _screen("Install complete", (650, 500), size=(1024, 768))
+    with concurrent.futures.ThreadPoolExecutor(1) as pool:
+        beyond = ImageMatcher(templates, region=(1100, 800, 1920, 1080), executor=pool)
+        across = ImageMatcher(templates, region=(600, 450, 1920, 1080), executor=pool)
+        assert await beyond.find(screen) is None
+        found = await across.find(screen)
+    assert found is not None
+    assert found.center == (800, 575)
@@ -0,0 +1,207 @@
+"""Tests for the client-side metrics registry."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+import respx
+
+from aiopikvm import BusyError, ClientMetrics, PiKVM, PiKVMWebSocket
+from aiopikvm._ws import _PENDING_LIMIT
+
+
+def samples(text: str) -> dict[str, str]:
+    """Index an exposition by series, comment lines left out."""
+    result = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            (series, value) = line.rsplit(" ", 1)
+            result[series] = value
+    return result
+
+
+def test_a_fresh_registry_renders_nothing() -> None:
+    assert ClientMetrics().render() == ""
+
+
+async def test_requests_are_timed_per_endpoint(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    mock_api.get("/api/atx").mock(
+        return_value=httpx.Response(200, json={"ok": True, "result": {}})
+    )
+    await client.request("GET", "/api/atx", params={"x": "1"})
+    await client.request("GET", "/api/atx")
+
+    assert client.metrics.requests("GET", "/api/atx") == 2
+    assert client.metrics.requests("POST", "/api/atx") == 0
+    text = client.metrics.render()
+    assert "# TYPE aiopikvm_request_duration_seconds histogram" in text
+    series = samples(text)
+    labels = 'method="GET",endpoint="/api/atx"'
+    assert (
+        series[f'aiopikvm_request_duration_seconds_bucket{{{labels},le="+Inf"}}'] == "2"
+    )
+    assert series[f"aiopikvm_request_duration_seconds_count{{{labels}}}"] == "2"
+    assert float(series[f"aiopikvm_request_duration_seconds_sum{{{labels}}}"]) >= 0
+
+
+async def test_failures_are_counted_by_class(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    mock_api.post("/api/atx/power").mock(
+        return_value=httpx.Response(
+            409, json={"ok": False, "result": {"error": "AtxOperationError"}}
+        )
+    )
+    with pytest.raises(BusyError):
+        await client.request("POST", "/api/atx/power")
+
+    assert client.metrics.errors == {"BusyError": 1}
+    # A failed request still took time, and belongs in the histogram.
+    assert client.metrics.requests("POST", "/api/atx/power") == 1
+    assert 'aiopikvm_request_errors_total{error="BusyError"} 1' in (
+        client.metrics.render()
+    )
+
+
+def test_endpoints_are_counted_by_route() -> None:
+    # A label per path would give a series per system id, or per id a
+    # program puts in a path of its own.
+    metrics = ClientMetrics()
+    started = time.monotonic()
+    for system in ("0", "1", "host-a"):
+        metrics._request("GET", f"/api/redfish/v1/Systems/{system}", started, None)
+        metrics._request(
+            "POST",
+            f"/api/redfish/v1/Systems/{system}/Actions/ComputerSystem.Reset",
+            started,
+            None,
+        )
+    for item in range(5):
+        metrics._request("GET", f"/custom/items/{item}", started, None)
+    metrics._request("GET", "/api/msd?x=1", started, None)
+    metrics._request("GET", "/api/redfish/v1/Managers/BMC", started, None)
+
+    assert metrics.requests("GET", "/api/redfish/v1/Systems/{system_id}") == 3
+    assert metrics.requests("GET", "/api/redfish/v1/Systems/7") == 3
+    assert (
+        metrics.requests(
+            "POST", "/api/redfish/v1/Systems/{system_id}/Actions/ComputerSystem.Reset"
+        )
+        == 3
+    )
+    assert metrics.requests("GET", "other") == 5
+    assert metrics.requests("GET", "/api/msd") == 1
+    assert metrics.requests("GET", "/api/redfish/v1/Managers/BMC") == 1
+    endpoints = {
+        series.split('endpoint="')[1].split('"')[0]
+        for series in samples(metrics.render())
+        if "endpoint=" in series
+    }
+    assert endpoints == {
+        "/api/redfish/v1/Systems/{system_id}",
+        "/api/redfish/v1/Systems/{system_id}/Actions/ComputerSystem.Reset",
+        "other",
+        "/api/msd",
+        "/api/redfish/v1/Managers/BMC",
+    }
+
+
+def test_a_cancelled_request_is_not_recorded() -> None:
+    # A cancellation is the caller's doing and says nothing about the device.
+    metrics = ClientMetrics()
+    metrics._request("GET", "/api/info", time.monotonic(), asyncio.CancelledError())
+    assert metrics.requests("GET", "/api/info") == 0
+    assert metrics.errors == {}
+
+
+async def test_streamed_bytes_are_counted(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    mock_api.get("/api/msd/read").mock(
+        return_value=httpx.Response(200, content=b"x" * 5000)
+    )
+    mock_api.post("/api/msd/write").mock(
+        return_value=httpx.Response(
+            200,
+            json={
+                "ok": True,
+                "result": {"image": {"name": "a.iso", "size": 13, "written": 13}},
+            },
+        )
+    )
+    async for _ in client.msd.download("a.iso", chunk_size=1024):
+        pass
+    await client.msd.upload("a.iso", b"fake-iso-data")
+
+    assert client.metrics.stream_bytes == {"download": 5000, "upload": 13}
+    series = samples(client.metrics.render())
+    assert series['aiopikvm_stream_bytes_total{stream="download"}'] == "5000"
+    assert series['aiopikvm_stream_bytes_total{stream="upload"}'] == "13"
+
+
+async def test_websocket_events_are_counted_by_type() -> None:
+    metrics = ClientMetrics()
+    ws = PiKVMWebSocket(
+        "https://pikvm.local", user="admin", passwd="admin", metrics=metrics
+    )
+    conn = AsyncMock()
+    conn.recv = AsyncMock(
+        side_effect=[
+            json.dumps({"event_type": "atx", "event": {}}),
+            json.dumps({"event_type": "atx", "event": {}}),
+            json.dumps({"event_type": "hid", "event": {}}),
+        ]
+    )
+    ws._connection = conn
+    for _ in range(3):
+        await ws._read_one()
+    assert metrics.events == {"atx": 2, "hid": 1}
+
+
+async def test_dropped_websocket_events_are_counted() -> None:
+    metrics = ClientMetrics()
+    ws = PiKVMWebSocket(
+        "https://pikvm.local", user="admin", passwd="admin", metrics=metrics
+    )
+    for index in range(_PENDING_LIMIT + 3):
+        ws._buffer({"event_type": "info", "event": {"index": index}})
+    assert metrics.dropped_events == 3
+    assert "aiopikvm_ws_dropped_events_total 3\n" in metrics.render()
+
+
+def test_dropped_frames_render_by_kind() -> None:
+    metrics = ClientMetrics()
+    metrics._dropped_frame("video")
+    metrics._dropped_frame("video")
+    metrics._dropped_frame("audio")
+    assert metrics.dropped_frames == {"audio": 1, "video": 2}
+    text = metrics.render()
+    assert 'aiopikvm_webrtc_dropped_frames_total{kind="video"} 2' in text
+    assert 'aiopikvm_webrtc_dropped_frames_total{kind="audio"} 1' in text
+
+
+def test_label_values_are_escaped() -> None:
+    metrics = ClientMetrics()
+    metrics._event('say "hi"\\\n')
+    assert (
+        'aiopikvm_ws_events_total{event_type="say \\"hi\\"\\\\\\n"} 1'
+        in metrics.render()
+    )
+
+
+def test_every_family_has_help_and_type() -> None:
+    metrics = ClientMetrics()
+    metrics._bytes("mjpeg", 10)
+    metrics._event("atx")
+    text = metrics.render()
+    for name in ("aiopikvm_stream_bytes_total", "aiopikvm_ws_events_total"):
+        assert f"# HELP {name} " in text
+        assert f"# TYPE {name} counter" in text
+    assert text.endswith("\n")
@@ -0,0 +1,145 @@
+"""Screen text remembered by `OCRCache` while the screen stays the same."""
+
+import asyncio
+import concurrent.futures
+from unittest.mock import patch
+
+import httpx
+import pytest
+import respx
+
+from aiopikvm import ConfigurationError, LocalOCR, OCRCache, PiKVM, UnavailableError
+
+
+class Screen:
+    """The device's snapshot endpoint, for a screen the test can change."""
+
+    def __init__(self, router: respx.MockRouter) -> None:
+        self.picture = b"\xff\xd8login"
+        self.reads: list[httpx.QueryParams] = []
+        self.previews: list[httpx.QueryParams] = []
+        self.changes_while_read = False
+        router.get("/api/streamer/snapshot").mock(side_effect=self.respond)
+
+    async def respond(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        if "ocr" not in params:
+            self.previews.append(params)
+            return httpx.Response(200, content=self.picture)
+        self.reads.append(params)
+        text = self.picture[2:].decode()
+        if self.changes_while_read:
+            self.picture += b"!"
+        await asyncio.sleep(0)
+        return httpx.Response(200, text=text)
+
+
+@pytest.fixture()
+def screen(mock_api: respx.MockRouter) -> Screen:
+    return Screen(mock_api)
+
+
+async def test_the_same_screen_region_and_languages_are_read_once(
+    screen: Screen, client: PiKVM
+) -> None:
+    cache = OCRCache(client, preview_max_width=640)
+    assert await cache.ocr(left=10, langs=["eng"]) == "login"
+    assert await cache.ocr(left=10, langs=["eng"]) == "login"
+    assert len(screen.reads) == 1
+    # The fingerprint is a preview, sized as asked.
+    assert screen.previews[0]["preview"] == "1"
+    assert screen.previews[0]["preview_max_width"] == "640"
+    # Another region, other languages, another screen: each a read.
+    await cache.ocr(left=20, langs=["eng"])
+    await cache.ocr(left=10, langs=["eng", "rus"])
+    await cache.ocr(left=10)
+    screen.picture = b"\xff\xd8password"
+    assert await cache.ocr(left=10, langs=["eng"]) == "password"
+    assert len(screen.reads) == 5
+    assert screen.reads[1]["ocr_left"] == "20"
+    stats = cache.stats
+    assert (stats.hits, stats.misses, stats.size) == (1, 5, 5)
+    assert stats.hit_rate == pytest.approx(1 / 6)
+
+
+async def test_the_least_recently_used_text_goes_first(
+    screen: Screen, client: PiKVM
+) -> None:
+    cache = OCRCache(client, size=2)
+    await cache.ocr(top=1)
+    await cache.ocr(top=2)
+    await cache.ocr(top=1)
+    await cache.ocr(top=3)
+    assert cache.stats.evictions == 1
+    await cache.ocr(top=1)
+    assert len(screen.reads) == 3
+    await cache.ocr(top=2)
+    assert len(screen.reads) == 4
+    cache.clear()
+    assert cache.stats.size == 0
+    assert cache.stats.misses == 4
+
+
+async def test_a_screen_that_changed_during_the_read_is_not_stored(
+    screen: Screen, client: PiKVM
+) -> None:
+    cache = OCRCache(client)
+    screen.changes_while_read = True
+    assert await cache.ocr() == "login"
+    screen.changes_while_read = False
+    screen.picture = b"\xff\xd8login"
+    await cache.ocr()
+    assert len(screen.reads) == 2
+    assert cache.stats.size == 1
+
+
+async def test_reads_of_the_same_screen_at_once_share_one_ocr(
+    screen: Screen, client: PiKVM
+) -> None:
+    cache = OCRCache(client)
+    texts = await asyncio.gather(*(cache.ocr(langs=["eng"]) for _ in range(3)))
+    assert texts == ["login"] * 3
+    assert len(screen.reads) == 1
+    assert (cache.stats.hits, cache.stats.misses) == (2, 1)
+
+
+async def test_a_failed_read_is_not_stored(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    mock_api.get("/api/streamer/snapshot", params={"ocr": "1"}).mock(
+        return_value=httpx.Response(
+            503, json={"ok": False, "result": {"error": "UnavailableError"}}
+        )
+    )
+    mock_api.get("/api/streamer/snapshot").mock(
+        return_value=httpx.Response(200, content=b"\xff\xd8")
+    )
+    cache = OCRCache(client)
+    with pytest.raises(UnavailableError):
+        await cache.ocr()
+    assert cache.stats.size == 0
+
+
+async def test_a_local_reader_fingerprints_the_snapshot_it_reads(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    route = mock_api.get("/api/streamer/snapshot").mock(
+        return_value=httpx.Response(200, content=b"\xff\xd8login")
+    )
+    with (
+        concurrent.futures.ThreadPoolExecutor(1) as threads,
+        patch("aiopikvm._ocr._tesseract"),
+        patch("aiopikvm._ocr._recognize", return_value="login") as recognize,
+    ):
+        cache = OCRCache(client, local=LocalOCR(client, executor=threads))
+        assert await cache.ocr(right=100) == "login"
+        assert await cache.ocr(right=100) == "login"
+    recognize.assert_called_once()
+    # One full snapshot per call, no previews and no OCR on the device.
+    assert len(route.calls) == 2
+    assert all(not call.request.url.params for call in route.calls)
+
+
+def test_a_cache_must_hold_something(client: PiKVM) -> None:
+    with pytest.raises(ConfigurationError, match="size"):
+        OCRCache(client, size=0)
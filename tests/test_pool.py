@@ -0,0 +1,57 @@
+"""The process pool the screen helpers share — whose it is, and who shuts it."""
+
+import asyncio
+import concurrent.futures
+
+import pytest
+
+from aiopikvm._pool import _PoolOwner
+
+
+@pytest.fixture(autouse=True)
+def threads_for_processes(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Forking from a test run that already has threads going is asking for a
+    # deadlock, and which executor runs the work is not what is tested here.
+    monkeypatch.setattr(
+        concurrent.futures, "ProcessPoolExecutor", concurrent.futures.ThreadPoolExecutor
+    )
+
+
+class Worker(_PoolOwner):
+    def __init__(self, executor: concurrent.futures.Executor | None = None) -> None:
+        self._use_pool(executor, 1)
+
+    async def run(self, value: int) -> int:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._pool(), abs, value
+        )
+
+
+async def test_the_own_pool_starts_on_the_first_piece_of_work() -> None:
+    async with Worker() as worker:
+        assert worker._own_executor is None
+        assert await worker.run(-3) == 3
+        pool = worker._own_executor
+        assert pool is not None
+    assert worker._own_executor is None
+    with pytest.raises(RuntimeError, match="shutdown"):
+        pool.submit(abs, -1)
+
+
+async def test_the_caller_s_executor_is_left_running() -> None:
+    with concurrent.futures.ThreadPoolExecutor(1) as threads:
+        async with Worker(threads) as worker:
+            assert await worker.run(-2) == 2
+        assert worker._own_executor is None
+        assert threads.submit(abs, -1).result() == 1
+
+
+async def test_a_closed_owner_starts_a_new_pool() -> None:
+    worker = Worker()
+    assert await worker.run(-1) == 1
+    first = worker._own_executor
+    await worker.aclose()
+    await worker.aclose()
+    assert await worker.run(-1) == 1
+    assert worker._own_executor is not first
+    await worker.aclose()
@@ -4,6 +4,9 @@
 the modules the names actually live in.
 """
 
+import ast
+import pathlib
+
 import aiopikvm
 from aiopikvm.resources import hid, redfish, system
 
@@ -39,3 +42,31 @@ def test_the_exported_vocabularies_are_the_defining_objects() -> None:
     """Re-exported, not redefined: one of each, or the two drift apart."""
     for name, defined in VOCABULARIES.items():
         assert getattr(aiopikvm, name) is defined
+
+
+def test_the_lazy_table_matches_the_typed_imports() -> None:
+    """The table `__getattr__` reads and the imports a type checker reads agree.
+
+    They are two spellings of one list, and nothing but this test notices when
+    a name is added to one of them only: a name missing from the table fails
+    at runtime, one missing from the imports is invisible to mypy and to the
+    reference site.
+    """
+    tree = ast.parse(pathlib.Path(aiopikvm.__file__).read_text())
+    guarded = next(
+        node
+        for node in tree.body
+        if isinstance(node, ast.If) and ast.unparse(node.test) == "TYPE_CHECKING"
+    )
+    typed = {
+        alias.name: node.module
+        for node in guarded.body
+        if isinstance(node, ast.ImportFrom)
+        for alias in node.names
+    }
+    assert typed == aiopikvm._MODULES
+    assert set(typed) == set(aiopikvm.__all__) - {"__version__"}
+
+
+def test_a_name_outside_the_api_is_an_attribute_error() -> None:
+    assert not hasattr(aiopikvm, "NoSuchThing")
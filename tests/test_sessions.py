@@ -0,0 +1,221 @@
+"""Session tokens shared between clients through a `SessionStore`."""
+
+import json
+import logging
+import stat
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+import respx
+
+from aiopikvm import FileSessionStore, MemorySessionStore, PiKVM, SessionStore
+
+OK = {"ok": True, "result": {}}
+TOKEN = "a" * 64
+OTHER_TOKEN = "b" * 64
+URL = "https://pikvm.local"
+
+
+def _login_route(mock_api: respx.MockRouter, token: str = TOKEN) -> respx.Route:
+    """Answer `/api/auth/login` with a session cookie, the way kvmd does."""
+    return mock_api.post("/api/auth/login").mock(
+        return_value=httpx.Response(
+            200, json=OK, headers={"Set-Cookie": f"auth_token={token}; Path=/"}
+        )
+    )
+
+
+def _client(store: SessionStore | None, **kwargs: object) -> PiKVM:
+    return PiKVM(
+        URL,
+        user="admin",
+        passwd="secret",
+        auth="cookie",
+        session_store=store,
+        **kwargs,  # type: ignore[arg-type]
+    )
+
+
+# --- The client ------------------------------------------------------------
+
+
+async def test_clients_sharing_a_store_log_in_once(
+    mock_api: respx.MockRouter,
+) -> None:
+    login = _login_route(mock_api)
+    atx = mock_api.get("/api/atx").mock(return_value=httpx.Response(200, json=OK))
+    store = MemorySessionStore()
+    for _ in range(3):
+        async with _client(store) as kvm:
+            await kvm.request("GET", "/api/atx")
+    assert login.call_count == 1
+    for call in atx.calls:
+        assert f"auth_token={TOKEN}" in call.request.headers["Cookie"]
+
+
+async def test_a_refused_token_is_discarded_and_replaced(
+    mock_api: respx.MockRouter,
+) -> None:
+    # The device restarted, or a logout dropped every session of the user:
+    # the saved token is dead, and the store must not keep handing it out.
+    store = MemorySessionStore()
+    await store.save(URL, "admin", OTHER_TOKEN)
+    login = _login_route(mock_api)
+    answers = iter([httpx.Response(403, json=OK), httpx.Response(200, json=OK)])
+    atx = mock_api.get("/api/atx").mock(side_effect=lambda request: next(answers))
+    async with _client(store) as kvm:
+        await kvm.request("GET", "/api/atx")
+    assert login.call_count == 1
+    assert f"auth_token={OTHER_TOKEN}" in atx.calls[0].request.headers["Cookie"]
+    assert f"auth_token={TOKEN}" in atx.calls[1].request.headers["Cookie"]
+    assert await store.load(URL, "admin") == TOKEN
+
+
+async def test_a_token_saved_since_the_refusal_is_tried_before_a_login(
+    mock_api: respx.MockRouter,
+) -> None:
+    # Another client has already logged in again and saved its session; this
+    # one picks that up rather than opening a third.
+    store = MemorySessionStore()
+    answers = iter([httpx.Response(403, json=OK), httpx.Response(200, json=OK)])
+    atx = mock_api.get("/api/atx").mock(side_effect=lambda request: next(answers))
+    async with _client(store) as kvm:
+        kvm.cookies.set("auth_token", TOKEN, domain="pikvm.local", path="/")
+        await store.save(URL, "admin", OTHER_TOKEN)
+        await kvm.request("GET", "/api/atx")
+    # No login route is mocked: respx would refuse one.
+    assert [call.request.url.path for call in mock_api.calls] == ["/api/atx"] * 2
+    assert f"auth_token={OTHER_TOKEN}" in atx.calls[1].request.headers["Cookie"]
+
+
+async def test_the_store_is_keyed_by_user(mock_api: respx.MockRouter) -> None:
+    store = MemorySessionStore()
+    await store.save(URL, "viewer", OTHER_TOKEN)
+    login = _login_route(mock_api)
+    mock_api.get("/api/atx").mock(return_value=httpx.Response(200, json=OK))
+    async with _client(store) as kvm:
+        await kvm.request("GET", "/api/atx")
+    assert login.call_count == 1
+    assert await store.load(URL, "admin") == TOKEN
+    assert await store.load(URL, "viewer") == OTHER_TOKEN
+
+
+async def test_a_broken_store_is_logged_and_ignored(
+    mock_api: respx.MockRouter, caplog: pytest.LogCaptureFixture
+) -> None:
+    class Broken(SessionStore):
+        async def load(self, url: str, user: str) -> str | None:
+            raise OSError("disk on fire")
+
+        async def save(
+            self, url: str, user: str, token: str, *, expire: int = 0
+        ) -> None:
+            raise OSError("disk on fire")
+
+    login = _login_route(mock_api)
+    mock_api.get("/api/atx").mock(return_value=httpx.Response(200, json=OK))
+    with caplog.at_level(logging.WARNING, logger="aiopikvm._client"):
+        async with _client(Broken()) as kvm:
+            await kvm.request("GET", "/api/atx")
+    assert login.call_count == 1
+    assert "Session store load() failed" in caplog.text
+    assert "Session store save() failed" in caplog.text
+
+
+async def test_the_session_expiry_is_passed_to_the_store(
+    mock_api: respx.MockRouter, tmp_path: Path
+) -> None:
+    store = FileSessionStore(tmp_path / "sessions.json")
+    _login_route(mock_api)
+    mock_api.get("/api/atx").mock(return_value=httpx.Response(200, json=OK))
+    async with _client(store, session_expire=3600) as kvm:
+        await kvm.request("GET", "/api/atx")
+    entry = json.loads(store.path.read_text())[URL]["admin"]
+    assert entry["token"] == TOKEN
+    assert entry["expires"] is not None
+
+
+# --- The stores ------------------------------------------------------------
+
+
+async def test_memory_store_forgets_an_expired_token(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    store = MemorySessionStore()
+    await store.save(URL, "admin", TOKEN, expire=60)
+    assert await store.load(URL, "admin") == TOKEN
+    now = time.time()
+    monkeypatch.setattr("aiopikvm._sessions.time.time", lambda: now + 61)
+    assert await store.load(URL, "admin") is None
+
+
+async def test_discard_leaves_a_newer_token_alone() -> None:
+    store = MemorySessionStore()
+    await store.save(URL, "admin", OTHER_TOKEN)
+    await store.discard(URL, "admin", TOKEN)
+    assert await store.load(URL, "admin") == OTHER_TOKEN
+    await store.discard(URL, "admin", OTHER_TOKEN)
+    assert await store.load(URL, "admin") is None
+
+
+async def test_file_store_is_shared_between_instances(tmp_path: Path) -> None:
+    path = tmp_path / "cache" / "sessions.json"
+    await FileSessionStore(path).save(URL, "admin", TOKEN)
+    await FileSessionStore(path).save("https://other.local", "admin", OTHER_TOKEN)
+    reader = FileSessionStore(path)
+    assert await reader.load(URL, "admin") == TOKEN
+    assert await reader.load("https://other.local", "admin") == OTHER_TOKEN
+    assert await reader.load(URL, "viewer") is None
+
+
+async def test_file_store_discards_only_the_refused_token(tmp_path: Path) -> None:
+    store = FileSessionStore(tmp_path / "sessions.json")
+    await store.save(URL, "admin", OTHER_TOKEN)
+    await store.discard(URL, "admin", TOKEN)
+    assert await store.load(URL, "admin") == OTHER_TOKEN
+    await store.discard(URL, "admin", OTHER_TOKEN)
+    assert await store.load(URL, "admin") is None
+    assert json.loads(store.path.read_text()) == {}
+
+
+async def test_file_store_drops_expired_entries_on_write(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    store = FileSessionStore(tmp_path / "sessions.json")
+    await store.save(URL, "admin", TOKEN, expire=60)
+    now = time.time()
+    monkeypatch.setattr("aiopikvm._sessions.time.time", lambda: now + 61)
+    assert await store.load(URL, "admin") is None
+    await store.save(URL, "viewer", OTHER_TOKEN)
+    assert list(json.loads(store.path.read_text())[URL]) == ["viewer"]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX permissions")
+async def test_file_store_is_private_to_its_owner(tmp_path: Path) -> None:
+    store = FileSessionStore(tmp_path / "cache" / "sessions.json")
+    await store.save(URL, "admin", TOKEN)
+    assert stat.S_IMODE(store.path.stat().st_mode) == 0o600
+    assert stat.S_IMODE(store.path.parent.stat().st_mode) == 0o700
+
+
+async def test_file_store_treats_garbage_as_empty(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    path = tmp_path / "sessions.json"
+    path.write_text("{not json")
+    store = FileSessionStore(path)
+    with caplog.at_level(logging.WARNING, logger="aiopikvm._sessions"):
+        assert await store.load(URL, "admin") is None
+    assert "not valid JSON" in caplog.text
+    await store.save(URL, "admin", TOKEN)
+    assert await store.load(URL, "admin") == TOKEN
+
+
+def test_file_store_defaults_to_the_cache_directory(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert FileSessionStore().path == tmp_path / "aiopikvm" / "sessions.json"
@@ -0,0 +1,225 @@
+"""Snapshots taken by `SnapshotFeed` when the timing feed shows a new frame."""
+
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import pytest
+import respx
+
+from aiopikvm import APIError, ConfigurationError, MJPEGFrame, PiKVM, SnapshotFeed
+from tests.test_streamer import stream_step, streaming
+
+
+def frame(grabbed: str, *, online: bool = True, width: int = 1920) -> MJPEGFrame:
+    """A ``zero_data`` frame, as recorded, grabbed at *grabbed*."""
+    headers = stream_step("stream_zero_data")["parts"][0]["headers"]
+    return MJPEGFrame(
+        data=b"",
+        online=online,
+        width=width,
+        height=1080,
+        headers=headers | {"X-UStreamer-Grab-Begin-Time": grabbed},
+    )
+
+
+class Timing:
+    """A timing feed that yields each frame when the test says so.
+
+    respx reads a response whole before handing it over, which would deliver
+    every part at once; this stands in for ``mjpeg()`` instead.
+    """
+
+    def __init__(self) -> None:
+        self.queue: asyncio.Queue[MJPEGFrame | None] = asyncio.Queue()
+
+    async def mjpeg(self, **kwargs: Any) -> AsyncIterator[MJPEGFrame]:
+        while (next_frame := await self.queue.get()) is not None:
+            yield next_frame
+
+    def put(self, *frames: MJPEGFrame | None) -> None:
+        for each in frames:
+            self.queue.put_nowait(each)
+
+
+def screen(number: int) -> httpx.Response:
+    """The *number*-th snapshot, told apart by its bytes."""
+    return httpx.Response(200, content=b"\xff\xd8" + bytes([number]))
+
+
+async def settled(feed: SnapshotFeed, frames: int) -> None:
+    """Wait until the feed has read *frames* parts and acted on them."""
+    async with asyncio.timeout(1):
+        while feed.frames < frames:
+            await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+
+
+async def test_the_feed_asks_for_timing_only(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    stream = mock_api.get("/streamer/stream").mock(
+        return_value=streaming("stream_zero_data")
+    )
+    snapshot = mock_api.get("/api/streamer/snapshot").mock(return_value=screen(1))
+    async with SnapshotFeed(client, preview=True, preview_quality=40) as feed:
+        images = [image async for image in feed]
+    params = stream.calls.last.request.url.params
+    assert (params["zero_data"], params["extra_headers"]) == ("1", "1")
+    assert params["key"] == "aiopikvm-snapshot-feed"
+    params = snapshot.calls.last.request.url.params
+    assert (params["allow_offline"], params["preview"]) == ("1", "1")
+    assert params["preview_quality"] == "40"
+    assert feed.frames == 2
+    assert images == [feed.latest]
+
+
+async def test_only_a_new_frame_is_fetched(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    timing = Timing()
+    mock_api.get("/api/streamer/snapshot").mock(
+        side_effect=[screen(1), screen(2), screen(3)]
+    )
+    with patch.object(client.streamer, "mjpeg", timing.mjpeg):
+        async with SnapshotFeed(client, min_interval=0) as feed:
+            assert feed.latest is None
+            timing.put(frame("10.0"))
+            first = await anext(feed)
+            assert first.data == b"\xff\xd8\x01"
+            # ustreamer sending the same frame again is not a new picture.
+            timing.put(frame("10.0"))
+            await settled(feed, 2)
+            assert feed.fetches == 1
+            # The source going offline is; the placeholders after it are not.
+            timing.put(frame("11.0", online=False, width=640))
+            assert (await anext(feed)).data == b"\xff\xd8\x02"
+            timing.put(frame("12.0", online=False, width=640))
+            await settled(feed, 4)
+            timing.put(frame("13.0"), None)
+            images = [image async for image in feed]
+    assert [image.data for image in images] == [b"\xff\xd8\x03"]
+    assert feed.latest is images[0]
+    assert (feed.frames, feed.fetches) == (5, 3)
+
+
+async def test_frames_during_a_fetch_make_one_more(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    timing = Timing()
+    started, release = asyncio.Event(), asyncio.Event()
+    taken = 0
+
+    async def slow(request: httpx.Request) -> httpx.Response:
+        nonlocal taken
+        taken += 1
+        started.set()
+        await release.wait()
+        return screen(taken)
+
+    mock_api.get("/api/streamer/snapshot").mock(side_effect=slow)
+    with patch.object(client.streamer, "mjpeg", timing.mjpeg):
+        async with SnapshotFeed(client, min_interval=0) as feed:
+            timing.put(frame("1.0"))
+            await started.wait()
+            timing.put(frame("2.0"), frame("3.0"), frame("4.0"))
+            await settled(feed, 4)
+            release.set()
+            timing.put(None)
+            images = [image async for image in feed]
+    # A consumer that was busy gets the newest picture, not the backlog.
+    assert [image.data for image in images] == [b"\xff\xd8\x02"]
+    assert (feed.frames, feed.fetches) == (4, 2)
+
+
+async def test_snapshots_keep_their_distance(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    timing = Timing()
+    mock_api.get("/api/streamer/snapshot").mock(return_value=screen(1))
+    with (
+        patch.object(client.streamer, "mjpeg", timing.mjpeg),
+        patch("aiopikvm._snapshot_feed.asyncio.sleep") as sleep,
+    ):
+        async with SnapshotFeed(client, min_interval=5) as feed:
+            timing.put(frame("1.0"))
+            await anext(feed)
+            timing.put(frame("2.0"), None)
+            await anext(feed)
+    ((delay,),) = [call.args for call in sleep.await_args_list]
+    assert 4 < delay <= 5
+
+
+async def test_a_failed_snapshot_waits_for_the_next_frame(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    timing = Timing()
+    mock_api.get("/api/streamer/snapshot").mock(
+        side_effect=[
+            httpx.Response(503, json={"ok": False, "result": {"error": "Busy"}}),
+            screen(1),
+        ]
+    )
+    with patch.object(client.streamer, "mjpeg", timing.mjpeg):
+        async with SnapshotFeed(client, min_interval=0) as feed:
+            timing.put(frame("1.0"))
+            await settled(feed, 1)
+            assert feed.latest is None
+            timing.put(frame("2.0"))
+            assert (await anext(feed)).data == b"\xff\xd8\x01"
+
+
+async def test_a_stream_that_fails_ends_the_iteration_with_its_error(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    recorded = stream_step("state_stopped")
+    mock_api.get("/streamer/stream").mock(
+        return_value=httpx.Response(recorded["status"], text=recorded["body_excerpt"])
+    )
+    async with SnapshotFeed(client) as feed:
+        with pytest.raises(APIError) as caught:
+            await anext(feed)
+    assert caught.value.status_code == 502
+
+
+async def test_an_unexpected_failure_of_the_feed_is_raised_not_waited_on(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    mock_api.get("/api/streamer/snapshot").mock(return_value=screen(1))
+
+    async def broken(**kwargs: Any) -> AsyncIterator[MJPEGFrame]:
+        yield frame("1.0")
+        await asyncio.sleep(0.01)
+        raise RuntimeError("a bug, not a PiKVMError")
+
+    with patch.object(client.streamer, "mjpeg", broken):
+        async with SnapshotFeed(client, min_interval=0) as feed:
+            async with asyncio.timeout(1):
+                # What was taken before the failure is still handed out.
+                assert (await anext(feed)).data == b"\xff\xd8\x01"
+                with pytest.raises(RuntimeError, match="a bug"):
+                    await anext(feed)
+
+
+async def test_an_unexpected_failure_taking_a_snapshot_is_raised(
+    mock_api: respx.MockRouter, client: PiKVM
+) -> None:
+    timing = Timing()
+    mock_api.get("/api/streamer/snapshot").mock(side_effect=ValueError("a bug"))
+    with patch.object(client.streamer, "mjpeg", timing.mjpeg):
+        async with SnapshotFeed(client, min_interval=0) as feed:
+            timing.put(frame("1.0"))
+            async with asyncio.timeout(1):
+                with pytest.raises(ValueError, match="a bug"):
+                    await anext(feed)
+
+
+async def test_a_feed_must_be_entered_and_cannot_go_back_in_time(
+    client: PiKVM,
+) -> None:
+    with pytest.raises(ConfigurationError, match="min_interval"):
+        SnapshotFeed(client, min_interval=-1)
+    with pytest.raises(ConfigurationError, match="async with"):
+        await anext(SnapshotFeed(client))
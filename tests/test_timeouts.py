@@ -0,0 +1,214 @@
+"""Timeouts learned per kind of call with `AdaptiveTimeout`."""
+
+import httpx
+import pytest
+import respx
+
+from aiopikvm import (
+    AdaptiveTimeout,
+    ConfigurationError,
+    ConnectError,
+    ConnectionTimeoutError,
+    PiKVM,
+)
+from aiopikvm._timeouts import _LatencyWindows
+
+OK = {"ok": True, "result": {}}
+
+
+def _timeout_sent(route: respx.Route, index: int = -1) -> float:
+    """The read timeout httpx was given for one call of a route."""
+    return route.calls[index].request.extensions["timeout"]["read"]
+
+
+def _windows(**kwargs: float) -> _LatencyWindows:
+    return _LatencyWindows(AdaptiveTimeout(**kwargs))  # type: ignore[arg-type]
+
+
+# --- The windows -----------------------------------------------------------
+
+
+def test_an_unlearned_kind_gets_the_initial_timeout() -> None:
+    windows = _windows(initial=7.0, min_samples=5)
+    for _ in range(4):
+        windows.record("GET", "/api/atx", None, 0.01)
+    assert windows.timeout("GET", "/api/atx", None) == 7.0
+    windows.record("GET", "/api/atx", None, 0.01)
+    assert windows.timeout("GET", "/api/atx", None) == 1.0
+
+
+def test_the_timeout_is_a_multiple_of_the_p99() -> None:
+    windows = _windows(multiplier=3.0, floor=0.1, min_samples=100)
+    for _ in range(98):
+        windows.record("POST", "/api/hid/print", None, 0.5)
+    windows.record("POST", "/api/hid/print", None, 2.0)
+    windows.record("POST", "/api/hid/print", None, 2.0)
+    # Two slow calls in a hundred are past the 99th percentile's reach.
+    assert windows.timeout("POST", "/api/hid/print", None) == 6.0
+
+
+def test_the_timeout_is_clamped() -> None:
+    windows = _windows(floor=2.0, ceiling=30.0, min_samples=1)
+    windows.record("GET", "/api/atx", None, 0.001)
+    windows.record("POST", "/api/hid/print", None, 100.0)
+    assert windows.timeout("GET", "/api/atx", None) == 2.0
+    assert windows.timeout("POST", "/api/hid/print", None) == 30.0
+
+
+def test_old_samples_leave_the_window() -> None:
+    windows = _windows(floor=0.1, min_samples=2, window=2)
+    windows.record("GET", "/api/atx", None, 5.0)
+    windows.record("GET", "/api/atx", None, 0.1)
+    assert windows.timeout("GET", "/api/atx", None) == 15.0
+    windows.record("GET", "/api/atx", None, 0.1)
+    assert windows.timeout("GET", "/api/atx", None) == pytest.approx(0.3)
+
+
+def test_query_parameter_names_tell_kinds_apart() -> None:
+    windows = _windows(floor=0.1, min_samples=1)
+    windows.record("POST", "/api/gpio/switch", {"channel": "a", "state": 1}, 0.01)
+    windows.record(
+        "POST", "/api/gpio/switch", {"channel": "a", "state": 1, "wait": 1}, 3.0
+    )
+    assert windows.timeout(
+        "POST", "/api/gpio/switch", {"state": 0, "channel": "b"}
+    ) == pytest.approx(0.1)
+    assert windows.timeout(
+        "POST", "/api/gpio/switch", {"wait": 1, "channel": "b", "state": 0}
+    ) == pytest.approx(9.0)
+
+
+def test_atx_calls_that_wait_are_learned_apart() -> None:
+    windows = _windows(min_samples=5)
+    for _ in range(20):
+        windows.record("POST", "/api/atx/click", {"button": "power", "wait": 0}, 0.01)
+    for _ in range(5):
+        windows.record(
+            "POST", "/api/atx/click", {"button": "power_long", "wait": True}, 6.5
+        )
+    assert windows.timeout(
+        "POST", "/api/atx/click", {"button": "power", "wait": 0}
+    ) == pytest.approx(1.0)
+    assert windows.timeout(
+        "POST", "/api/atx/click", {"button": "power_long", "wait": 1}
+    ) == pytest.approx(19.5)
+    # A short press that waits, or a long one that does not, is not learned yet.
+    assert windows.timeout(
+        "POST", "/api/atx/click", {"button": "power", "wait": 1}
+    ) == pytest.approx(10.0)
+    assert windows.timeout(
+        "POST", "/api/atx/click", {"button": "power_long", "wait": 0}
+    ) == pytest.approx(10.0)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"floor": 0.0},
+        {"multiplier": -1.0},
+        {"floor": 10.0, "ceiling": 5.0},
+        {"min_samples": 0},
+        {"min_samples": 10, "window": 5},
+    ],
+)
+def test_settings_that_cannot_work_are_refused(kwargs: dict[str, float]) -> None:
+    with pytest.raises(ConfigurationError):
+        AdaptiveTimeout(**kwargs)  # type: ignore[arg-type]
+
+
+# --- The client ------------------------------------------------------------
+
+
+async def test_the_client_learns_and_applies_a_timeout(
+    mock_api: respx.MockRouter,
+) -> None:
+    atx = mock_api.get("/api/atx").mock(return_value=httpx.Response(200, json=OK))
+    policy = AdaptiveTimeout(initial=8.0, floor=0.75, min_samples=3)
+    async with PiKVM("https://pikvm.local", timeout=policy) as kvm:
+        for _ in range(4):
+            await kvm.request("GET", "/api/atx")
+        await kvm.request("GET", "/api/atx", timeout=42.0)
+    assert [_timeout_sent(atx, index) for index in range(5)] == [
+        8.0,
+        8.0,
+        8.0,
+        0.75,
+        42.0,
+    ]
+
+
+async def test_the_initial_timeout_is_the_client_default(
+    mock_api: respx.MockRouter,
+) -> None:
+    async with PiKVM("https://pikvm.local", timeout=AdaptiveTimeout(5.0)) as kvm:
+        assert kvm._timeout == 5.0
+        assert kvm._ensure_client().timeout.read == 5.0
+
+
+async def test_a_timed_out_call_is_learned(mock_api: respx.MockRouter) -> None:
+    mock_api.get("/api/atx").mock(side_effect=httpx.ReadTimeout("slow"))
+    async with PiKVM(
+        "https://pikvm.local", timeout=AdaptiveTimeout(min_samples=1)
+    ) as kvm:
+        with pytest.raises(ConnectionTimeoutError):
+            await kvm.request("GET", "/api/atx")
+        assert kvm._latency is not None
+        assert kvm._latency._samples.keys() == {("GET", "/api/atx")}
+
+
+def test_timeouts_do_not_raise_the_timeout() -> None:
+    windows = _windows(min_samples=5, window=20)
+    for _ in range(20):
+        windows.record("GET", "/api/atx", None, 0.05)
+    assert windows.timeout("GET", "/api/atx", None) == 1.0
+    # A dead link: every call runs into its timeout, and some take longer
+    # than that to be noticed.
+    for _ in range(40):
+        given = windows.timeout("GET", "/api/atx", None)
+        windows.record("GET", "/api/atx", None, given + 0.2, timed_out=True)
+        assert windows.timeout("GET", "/api/atx", None) == 1.0
+    # Answers still make it grow.
+    for _ in range(20):
+        windows.record("GET", "/api/atx", None, 2.0)
+    assert windows.timeout("GET", "/api/atx", None) == pytest.approx(6.0)
+
+
+async def test_repeated_read_timeouts_keep_the_learned_timeout(
+    mock_api: respx.MockRouter,
+) -> None:
+    route = mock_api.get("/api/atx").mock(return_value=httpx.Response(200, json=OK))
+    async with PiKVM(
+        "https://pikvm.local", timeout=AdaptiveTimeout(min_samples=5)
+    ) as kvm:
+        for _ in range(5):
+            await kvm.request("GET", "/api/atx")
+        route.mock(side_effect=httpx.ReadTimeout("dead link"))
+        for _ in range(10):
+            with pytest.raises(ConnectionTimeoutError):
+                await kvm.request("GET", "/api/atx")
+    assert _timeout_sent(route, 5) == 1.0
+    assert _timeout_sent(route) == 1.0
+
+
+async def test_a_connect_timeout_is_not_learned(mock_api: respx.MockRouter) -> None:
+    mock_api.get("/api/atx").mock(side_effect=httpx.ConnectTimeout("no route"))
+    async with PiKVM(
+        "https://pikvm.local", timeout=AdaptiveTimeout(min_samples=1)
+    ) as kvm:
+        with pytest.raises(ConnectionTimeoutError):
+            await kvm.request("GET", "/api/atx")
+        assert kvm._latency is not None
+        assert kvm._latency._samples == {}
+
+
+async def test_a_refused_connection_is_not_learned(
+    mock_api: respx.MockRouter,
+) -> None:
+    mock_api.get("/api/atx").mock(side_effect=httpx.ConnectError("refused"))
+    async with PiKVM(
+        "https://pikvm.local", timeout=AdaptiveTimeout(min_samples=1)
+    ) as kvm:
+        with pytest.raises(ConnectError):
+            await kvm.request("GET", "/api/atx")
+        assert kvm._latency is not None
+        assert kvm._latency._samples == {}
@@ -6,12 +6,15 @@ thing: httpx works an `SSLContext` out for itself from `verify`/`cert`, while
 place and both are checked here.
 """
 
+import asyncio
+import os
+import shutil
 import ssl
 from pathlib import Path
 
 import pytest
 
-from aiopikvm import CertTypes, ConfigurationError, PiKVM
+from aiopikvm import CertTypes, ConfigurationError, PiKVM, clear_ssl_contexts
 from aiopikvm._tls import build_ssl_context
 
 TLS_DIR = Path(__file__).parent / "fixtures" / "tls"
@@ -130,3 +133,88 @@ async def test_the_websocket_proxy_follows_trust_env() -> None:
         assert kvm.ws()._trust_env is False
     async with PiKVM(URL, proxy="http://proxy:3128") as kvm:
         assert kvm.ws()._proxy == "http://proxy:3128"
+
+
+async def test_a_built_context_resumes_the_hosts_last_session() -> None:
+    # A full handshake is the slow part of a new connection to a Pi. The
+    # server here is local and the certificate the throwaway one; what is
+    # checked is only whether the second and third handshakes resume.
+    server = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    server.load_cert_chain(CRT, KEY)
+
+    async def answer(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        writer.write(b"hi")
+        await writer.drain()
+        await reader.read()
+        writer.close()
+
+    clear_ssl_contexts()
+    listener = await asyncio.start_server(answer, "127.0.0.1", 0, ssl=server)
+    port = listener.sockets[0].getsockname()[1]
+    context = build_ssl_context(False, None)
+    reused = []
+    async with listener:
+        for _ in range(3):
+            (reader, writer) = await asyncio.open_connection(
+                "127.0.0.1", port, ssl=context, server_hostname="pikvm.local"
+            )
+            # Under TLS 1.3 the ticket arrives after the handshake, with the
+            # first bytes.
+            await reader.readexactly(2)
+            reused.append(writer.get_extra_info("ssl_object").session_reused)
+            writer.close()
+            await writer.wait_closed()
+    assert reused == [False, True, True]
+
+
+def test_a_given_context_is_not_taught_to_resume() -> None:
+    given = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    assert type(build_ssl_context(given, None)) is ssl.SSLContext
+
+
+# --- The context cache -----------------------------------------------------
+
+
+def test_the_same_settings_share_a_context() -> None:
+    assert build_ssl_context(CRT, (CRT, KEY)) is build_ssl_context(CRT, (CRT, KEY))
+    assert build_ssl_context(False, None) is not build_ssl_context(True, None)
+    assert build_ssl_context(CRT, None) is not build_ssl_context(CRT, (CRT, KEY))
+
+
+def test_a_rewritten_bundle_is_loaded_again(tmp_path: Path) -> None:
+    bundle = tmp_path / "ca.pem"
+    shutil.copy(CRT, bundle)
+    first = build_ssl_context(str(bundle), None)
+    stat = bundle.stat()
+    os.utime(bundle, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    second = build_ssl_context(str(bundle), None)
+    assert second is not first
+    assert build_ssl_context(str(bundle), None) is second
+
+
+def test_clearing_forgets_every_context() -> None:
+    first = build_ssl_context(False, None)
+    clear_ssl_contexts()
+    assert build_ssl_context(False, None) is not first
+
+
+def test_a_failure_is_not_cached(tmp_path: Path) -> None:
+    bundle = tmp_path / "ca.pem"
+    bundle.write_text("not a certificate")
+    with pytest.raises(ConfigurationError):
+        build_ssl_context(str(bundle), None)
+    shutil.copy(CRT, bundle)
+    assert len(build_ssl_context(str(bundle), None).get_ca_certs()) == 1
+
+
+async def test_clients_built_alike_share_one_context() -> None:
+    # What lets a second client resume the session the first one began.
+    async with PiKVM(URL, verify_ssl=CRT) as one, PiKVM(URL, verify_ssl=CRT) as two:
+        contexts = [
+            kvm._client._transport._pool._ssl_context  # type: ignore[union-attr]
+            for kvm in (one, two)
+        ]
+    assert contexts[0] is contexts[1]
+    assert contexts[0] is build_ssl_context(CRT, None)
@@ -0,0 +1,423 @@
+"""Tracer hooks — what the client reports, in what order, and with what.
+
+A tracer is only worth anything if its records are right: a duration that
+stops before the body was read, a byte count of zero, an error that was
+swallowed. The sockets are mocked at the connection, the same way
+`tests/test_ws.py` and `tests/test_media.py` do it; the HTTP side goes
+through respx.
+"""
+
+import asyncio
+import json
+import logging
+import sys
+from typing import Any
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+import respx
+import websockets.exceptions
+
+from aiopikvm import (
+    BusyError,
+    ConfigurationError,
+    ConnectError,
+    FrameTrace,
+    JanusTrace,
+    LoginTrace,
+    MediaWebSocket,
+    OpenTelemetryTracer,
+    PiKVM,
+    PiKVMWebSocket,
+    RequestTrace,
+    Tracer,
+    WebRTCError,
+    WebRTCSession,
+)
+
+URL = "https://pikvm.local"
+OK = {"ok": True, "result": {}}
+
+
+class Recorder(Tracer):
+    """Keeps every hook call, in order, as ``(hook, record)``."""
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, Any]] = []
+
+    def request_start(self, request: RequestTrace) -> None:
+        self.calls.append(("request_start", request))
+
+    def request_end(self, request: RequestTrace) -> None:
+        self.calls.append(("request_end", request))
+
+    def request_retry(self, request: RequestTrace) -> None:
+        self.calls.append(("request_retry", request))
+
+    def login_start(self, login: LoginTrace) -> None:
+        self.calls.append(("login_start", login))
+
+    def login_end(self, login: LoginTrace) -> None:
+        self.calls.append(("login_end", login))
+
+    def ws_frame(self, frame: FrameTrace) -> None:
+        self.calls.append(("ws_frame", frame))
+
+    def janus_start(self, transaction: JanusTrace) -> None:
+        self.calls.append(("janus_start", transaction))
+
+    def janus_end(self, transaction: JanusTrace) -> None:
+        self.calls.append(("janus_end", transaction))
+
+    def hooks(self) -> list[str]:
+        return [hook for hook, _ in self.calls]
+
+    def records(self, hook: str) -> list[Any]:
+        return [record for name, record in self.calls if name == hook]
+
+
+def closed_cleanly() -> websockets.exceptions.ConnectionClosedOK:
+    return websockets.exceptions.ConnectionClosedOK(None, None)
+
+
+# --- HTTP ----------------------------------------------------------------
+
+
+async def test_a_request_is_reported_from_start_to_end(
+    mock_api: respx.MockRouter,
+) -> None:
+    mock_api.post("/api/hid/print").mock(return_value=httpx.Response(200, json=OK))
+    tracer = Recorder()
+    async with PiKVM(URL, tracer=tracer) as kvm:
+        response = await kvm.request("POST", "/api/hid/print", content=b"hello")
+    assert tracer.hooks() == ["request_start", "request_end"]
+    start, end = tracer.records("request_start")[0], tracer.records("request_end")[0]
+    assert start is end
+    assert (end.method, end.path, end.attempt, end.streaming) == (
+        "POST",
+        "/api/hid/print",
+        1,
+        False,
+    )
+    assert end.status == 200
+    assert end.bytes_sent == 5
+    assert end.bytes_received == len(response.content)
+    assert end.duration > 0
+    assert end.error is None
+    assert (end.host, end.port) == ("pikvm.local", 443)
+
+
+@respx.mock
+async def test_a_record_names_the_device_by_its_url() -> None:
+    respx.get("http://10.0.0.7:8080/api/atx").mock(
+        return_value=httpx.Response(200, json=OK)
+    )
+    tracer = Recorder()
+    async with PiKVM(
+        "http://10.0.0.7:8080", user="admin", passwd="admin", tracer=tracer
+    ) as kvm:
+        await kvm.request("GET", "/api/atx")
+        ws = kvm.ws()
+    (end,) = tracer.records("request_end")
+    assert (end.host, end.port) == ("10.0.0.7", 8080)
+    ws._connection = AsyncMock()
+    await ws.send_mouse_move(0, 0)
+    (frame,) = tracer.records("ws_frame")
+    assert (frame.host, frame.port) == ("10.0.0.7", 8080)
+
+
+def test_a_unix_socket_names_no_device() -> None:
+    assert PiKVM("unix:///run/kvmd/kvmd.sock")._server == ("", 0)
+
+
+async def test_an_error_status_ends_the_record_with_the_error(
+    mock_api: respx.MockRouter,
+) -> None:
+    mock_api.post("/api/atx/power").mock(
+        return_value=httpx.Response(409, json={"ok": False, "result": {}})
+    )
+    tracer = Recorder()
+    async with PiKVM(URL, tracer=tracer) as kvm:
+        with pytest.raises(BusyError):
+            await kvm.request("POST", "/api/atx/power")
+    (end,) = tracer.records("request_end")
+    assert end.status == 409
+    assert isinstance(end.error, BusyError)
+
+
+async def test_a_failed_connection_ends_the_record_without_a_status(
+    mock_api: respx.MockRouter,
+) -> None:
+    mock_api.get("/api/atx").mock(side_effect=httpx.ConnectError("refused"))
+    tracer = Recorder()
+    async with PiKVM(URL, tracer=tracer) as kvm:
+        with pytest.raises(ConnectError):
+            await kvm.request("GET", "/api/atx")
+    (end,) = tracer.records("request_end")
+    assert end.status == 0
+    assert isinstance(end.error, ConnectError)
+
+
+async def test_a_refused_session_is_reported_as_a_login_and_a_retry(
+    mock_api: respx.MockRouter,
+) -> None:
+    mock_api.post("/api/auth/login").mock(
+        return_value=httpx.Response(
+            200, json=OK, headers={"Set-Cookie": f"auth_token={'a' * 64}; Path=/"}
+        )
+    )
+    answers = iter([httpx.Response(403, json=OK), httpx.Response(200, json=OK)])
+    mock_api.get("/api/atx").mock(side_effect=lambda request: next(answers))
+    tracer = Recorder()
+    async with PiKVM(URL, passwd="secret", auth="cookie", tracer=tracer) as kvm:
+        await kvm.request("GET", "/api/atx")
+    paths = [
+        (hook, getattr(record, "path", None), getattr(record, "attempt", None))
+        for hook, record in tracer.calls
+    ]
+    assert paths == [
+        ("login_start", None, None),
+        ("request_start", "/api/auth/login", 1),
+        ("request_end", "/api/auth/login", 1),
+        ("login_end", None, None),
+        ("request_start", "/api/atx", 1),
+        ("request_end", "/api/atx", 1),
+        ("login_start", None, None),
+        ("request_start", "/api/auth/login", 1),
+        ("request_end", "/api/auth/login", 1),
+        ("login_end", None, None),
+        ("request_retry", "/api/atx", 2),
+        ("request_start", "/api/atx", 2),
+        ("request_end", "/api/atx", 2),
+    ]
+    first, refresh = tracer.records("login_end")
+    assert (first.refresh, refresh.refresh) == (False, True)
+    assert refresh.error is None
+
+
+async def test_a_stream_ends_when_the_block_does(mock_api: respx.MockRouter) -> None:
+    body = b"--frame\r\n" * 100
+    mock_api.get("/streamer/stream").mock(
+        return_value=httpx.Response(200, content=body)
+    )
+    tracer = Recorder()
+    async with PiKVM(URL, tracer=tracer) as kvm:
+        async with kvm.stream("GET", "/streamer/stream") as response:
+            assert tracer.hooks() == ["request_start"]
+            await response.aread()
+    (end,) = tracer.records("request_end")
+    assert end.streaming is True
+    assert end.status == 200
+    assert end.bytes_received == len(body)
+
+
+async def test_a_stream_that_fails_in_the_block_ends_with_the_error(
+    mock_api: respx.MockRouter,
+) -> None:
+    mock_api.get("/streamer/stream").mock(return_value=httpx.Response(200))
+    tracer = Recorder()
+    async with PiKVM(URL, tracer=tracer) as kvm:
+        with pytest.raises(RuntimeError):
+            async with kvm.stream("GET", "/streamer/stream"):
+                raise RuntimeError("consumer gave up")
+    (end,) = tracer.records("request_end")
+    assert isinstance(end.error, RuntimeError)
+
+
+async def test_a_hook_that_raises_does_not_fail_the_request(
+    mock_api: respx.MockRouter, caplog: pytest.LogCaptureFixture
+) -> None:
+    class Broken(Tracer):
+        def request_start(self, request: RequestTrace) -> None:
+            raise ValueError("exporter is down")
+
+    mock_api.get("/api/atx").mock(return_value=httpx.Response(200, json=OK))
+    async with PiKVM(URL, tracer=Broken()) as kvm:
+        with caplog.at_level(logging.ERROR, logger="aiopikvm._tracing"):
+            response = await kvm.request("GET", "/api/atx")
+    assert response.status_code == 200
+    assert "Broken.request_start" in caplog.text
+
+
+def test_the_client_hands_its_tracer_to_the_sockets() -> None:
+    tracer = Tracer()
+    kvm = PiKVM(URL, tracer=tracer)
+    assert kvm.ws()._tracer is tracer
+    assert kvm.media_ws()._tracer is tracer
+    assert kvm.webrtc()._tracer is tracer
+
+
+# --- WebSockets ------------------------------------------------------------
+
+
+async def test_kvmd_frames_are_reported_both_ways() -> None:
+    tracer = Recorder()
+    ws = PiKVMWebSocket(URL, user="admin", passwd="admin", binary=True, tracer=tracer)
+    conn = AsyncMock()
+    conn.recv = AsyncMock(
+        side_effect=[
+            json.dumps({"event_type": "atx", "event": {}}),
+            bytes([255]),
+            closed_cleanly(),
+        ]
+    )
+    ws._connection = conn
+    await ws.send_mouse_move(0, 0)
+    assert await ws._read_one() is not None
+    assert await ws._read_one() is None
+    assert tracer.records("ws_frame") == [
+        FrameTrace("kvmd", "out", True, 5, "mouse_move", "pikvm.local", 443),
+        FrameTrace("kvmd", "in", False, 34, "atx", "pikvm.local", 443),
+        FrameTrace("kvmd", "in", True, 1, None, "pikvm.local", 443),
+    ]
+
+
+async def test_a_frame_that_did_not_go_out_is_not_reported() -> None:
+    tracer = Recorder()
+    ws = PiKVMWebSocket(URL, user="admin", passwd="admin", tracer=tracer)
+    ws._connection = AsyncMock()
+    ws._connection.send.side_effect = websockets.exceptions.ConnectionClosedError(
+        None, None
+    )
+    with pytest.raises(Exception, match="Failed to send"):
+        await ws.send_mouse_move(0, 0)
+    assert tracer.calls == []
+
+
+async def test_media_frames_are_reported_both_ways() -> None:
+    tracer = Recorder()
+    media = MediaWebSocket(URL, user="admin", passwd="admin", tracer=tracer)
+    conn = AsyncMock()
+    conn.recv = AsyncMock(side_effect=[b"\x00" * 1000, closed_cleanly()])
+    media._connection = conn
+    await media._send(b"\x00", "ping")
+    await media._recv()
+    assert tracer.records("ws_frame") == [
+        FrameTrace("media", "out", True, 1, "ping", "pikvm.local", 443),
+        FrameTrace("media", "in", True, 1000, None, "pikvm.local", 443),
+    ]
+
+
+# --- Janus -----------------------------------------------------------------
+
+
+async def _janus(tracer: Tracer, answer: dict[str, Any]) -> WebRTCSession:
+    """Build a session whose gateway acknowledges every message with *answer*."""
+    rtc = WebRTCSession(URL, user="admin", passwd="admin", tracer=tracer)
+    rtc._reader = asyncio.create_task(asyncio.sleep(60))
+
+    async def acknowledge(raw: str) -> None:
+        transaction = json.loads(raw)["transaction"]
+        rtc._acks[transaction].set_result({**answer, "transaction": transaction})
+
+    rtc._connection = AsyncMock()
+    rtc._connection.send.side_effect = acknowledge
+    return rtc
+
+
+async def test_a_janus_transaction_is_timed_to_its_acknowledgement() -> None:
+    tracer = Recorder()
+    rtc = await _janus(tracer, {"janus": "success", "data": {"id": 1}})
+    try:
+        await rtc._request(janus="create")
+    finally:
+        assert rtc._reader is not None
+        rtc._reader.cancel()
+    assert tracer.hooks() == ["janus_start", "ws_frame", "janus_end"]
+    (end,) = tracer.records("janus_end")
+    assert (end.janus, end.transaction, end.error) == ("create", "aiopikvm-1", None)
+    assert (end.host, end.port) == ("pikvm.local", 443)
+    assert end.duration > 0
+    (frame,) = tracer.records("ws_frame")
+    assert (frame.socket, frame.direction, frame.event_type) == (
+        "janus",
+        "out",
+        "create",
+    )
+
+
+async def test_a_refused_janus_transaction_ends_with_the_error() -> None:
+    tracer = Recorder()
+    rtc = await _janus(
+        tracer, {"janus": "error", "error": {"code": 458, "reason": "No such session"}}
+    )
+    try:
+        with pytest.raises(WebRTCError):
+            await rtc._request(janus="keepalive")
+    finally:
+        assert rtc._reader is not None
+        rtc._reader.cancel()
+    (end,) = tracer.records("janus_end")
+    assert isinstance(end.error, WebRTCError)
+    assert end.error.code == 458
+
+
+# --- OpenTelemetry ---------------------------------------------------------
+
+
+def test_the_missing_extra_is_named() -> None:
+    with patch.dict(sys.modules, {"opentelemetry": None}):
+        with pytest.raises(ConfigurationError, match=r"aiopikvm\[otel\]"):
+            OpenTelemetryTracer()
+
+
+async def test_opentelemetry_gets_spans_and_metrics(
+    mock_api: respx.MockRouter,
+) -> None:
+    pytest.importorskip("opentelemetry.sdk", reason="the otel SDK is not installed")
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+        InMemorySpanExporter,
+    )
+    from opentelemetry.trace import SpanKind, StatusCode
+
+    spans = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(spans))
+    reader = InMemoryMetricReader()
+    tracer = OpenTelemetryTracer(
+        tracer_provider=tracer_provider,
+        meter_provider=MeterProvider(metric_readers=[reader]),
+    )
+
+    mock_api.get("/api/atx").mock(return_value=httpx.Response(200, json=OK))
+    mock_api.post("/api/atx/power").mock(
+        return_value=httpx.Response(409, json={"ok": False, "result": {}})
+    )
+    async with PiKVM(URL, tracer=tracer) as kvm:
+        await kvm.request("GET", "/api/atx")
+        with pytest.raises(BusyError):
+            await kvm.request("POST", "/api/atx/power")
+    tracer.ws_frame(FrameTrace("kvmd", "in", False, 34, "atx", "pikvm.local", 443))
+
+    ok, busy = spans.get_finished_spans()
+    assert (ok.name, ok.kind) == ("GET /api/atx", SpanKind.CLIENT)
+    assert ok.attributes is not None
+    assert ok.attributes["http.response.status_code"] == 200
+    assert ok.attributes["server.address"] == "pikvm.local"
+    assert ok.attributes["server.port"] == 443
+    assert busy.status.status_code is StatusCode.ERROR
+    assert busy.attributes is not None
+    assert busy.attributes["error.type"] == "BusyError"
+
+    data = reader.get_metrics_data()
+    assert data is not None
+    metrics = {
+        metric.name: metric
+        for resource in data.resource_metrics
+        for scope in resource.scope_metrics
+        for metric in scope.metrics
+    }
+    durations = metrics["http.client.request.duration"].data.data_points
+    assert sorted(point.count for point in durations) == [1, 1]
+    assert {point.attributes["server.address"] for point in durations} == {
+        "pikvm.local"
+    }
+    (frames,) = metrics["aiopikvm.ws.frames"].data.data_points
+    assert frames.value == 1
+    assert frames.attributes["aiopikvm.ws.event_type"] == "atx"
+    assert frames.attributes["server.port"] == 443
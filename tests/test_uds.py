@@ -0,0 +1,133 @@
+"""Talking to kvmd through its unix socket, the way a program on the device can.
+
+The servers here are real sockets in a temporary directory: the point is what
+arrives on which socket, with which path, and that is only visible at the far
+end.
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+from collections.abc import AsyncIterator, Iterator
+from pathlib import Path
+
+import pytest
+import websockets.asyncio.server
+
+from aiopikvm import ConfigurationError, PiKVM
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="asyncio has no unix sockets on Windows"
+)
+
+OK = b'{"ok": true, "result": {"answered": "%s"}}'
+
+
+@pytest.fixture()
+def run_dir() -> Iterator[Path]:
+    """A directory short enough for a socket path; pytest's own is not."""
+    with tempfile.TemporaryDirectory(prefix="kvmd-") as path:
+        yield Path(path)
+
+
+async def _http_socket(path: Path, name: str, seen: list[str]) -> asyncio.Server:
+    """Serve one canned JSON answer per request, noting each request line."""
+
+    async def answer(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            if not head:
+                break
+            lines = head.decode().split("\r\n")
+            seen.append(f"{name} {lines[0]} {lines[1]}")
+            body = OK % name.encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                b"Content-Length: %d\r\n\r\n%s" % (len(body), body)
+            )
+            await writer.drain()
+
+    return await asyncio.start_unix_server(answer, path=str(path))
+
+
+@pytest.fixture()
+async def sockets(run_dir: Path) -> AsyncIterator[tuple[Path, list[str]]]:
+    """kvmd's and ustreamer's sockets, side by side as on a PiKVM."""
+    seen: list[str] = []
+    kvmd = await _http_socket(run_dir / "kvmd.sock", "kvmd", seen)
+    ustreamer = await _http_socket(run_dir / "ustreamer.sock", "ustreamer", seen)
+    async with kvmd, ustreamer:
+        yield (run_dir / "kvmd.sock", seen)
+
+
+async def test_api_calls_reach_kvmd_without_the_prefix(
+    sockets: tuple[Path, list[str]],
+) -> None:
+    (path, seen) = sockets
+    async with PiKVM(f"unix://{path}", passwd="secret") as kvm:
+        response = await kvm.request("GET", "/api/info", params={"fields": "hw"})
+    assert response.json()["result"]["answered"] == "kvmd"
+    assert seen == ["kvmd GET /info?fields=hw HTTP/1.1 Host: localhost"]
+
+
+async def test_streamer_paths_reach_ustreamer(
+    sockets: tuple[Path, list[str]],
+) -> None:
+    (path, seen) = sockets
+    async with PiKVM("https://pikvm.local", uds=str(path)) as kvm:
+        await kvm.request("GET", "/streamer/state")
+    assert seen == ["ustreamer GET /state HTTP/1.1 Host: localhost"]
+
+
+async def test_the_environment_proxy_is_not_used(
+    sockets: tuple[Path, list[str]], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("HTTP_PROXY", "http://proxy.invalid:3128")
+    monkeypatch.setenv("ALL_PROXY", "http://proxy.invalid:3128")
+    (path, seen) = sockets
+    async with PiKVM(f"unix://{path}") as kvm:
+        await kvm.request("GET", "/api/auth/check")
+    assert seen == ["kvmd GET /auth/check HTTP/1.1 Host: localhost"]
+
+
+async def test_the_websocket_connects_through_the_socket(run_dir: Path) -> None:
+    path = run_dir / "kvmd.sock"
+    requests = []
+
+    async def handler(connection: websockets.asyncio.server.ServerConnection) -> None:
+        assert connection.request is not None
+        requests.append(connection.request)
+        loop = {"event_type": "loop", "event": {"version": "4.206"}}
+        await connection.send(json.dumps(loop))
+        await connection.wait_closed()
+
+    async with websockets.asyncio.server.unix_serve(handler, str(path)):
+        async with PiKVM(f"unix://{path}", passwd="secret") as kvm:
+            async with kvm.ws(stream=False):
+                pass
+    assert requests[0].path == "/ws?stream=0"
+    assert requests[0].headers["X-KVMD-User"] == "admin"
+
+
+def test_media_and_webrtc_are_refused() -> None:
+    kvm = PiKVM("unix:///run/kvmd/kvmd.sock")
+    kvm._client = object()  # type: ignore[assignment]
+    with pytest.raises(ConfigurationError, match="kvmd-media"):
+        kvm.media_ws()
+    with pytest.raises(ConfigurationError, match="Janus"):
+        kvm.webrtc()
+
+
+@pytest.mark.parametrize(
+    ("url", "uds", "match"),
+    [
+        ("unix://run/kvmd/kvmd.sock", None, "absolute socket path"),
+        ("unix:///run/kvmd/kvmd.sock", "/tmp/other.sock", "pass one"),
+    ],
+)
+def test_a_socket_named_badly_is_refused(url: str, uds: str | None, match: str) -> None:
+    with pytest.raises(ConfigurationError, match=match):
+        PiKVM(url, uds=uds)
@@ -0,0 +1,184 @@
+"""Validation modes — ``"lazy"`` and ``"trusted"`` must be ``"full"`` deferred.
+
+Whatever a mode skips or postpones, the model a caller ends up reading has to
+be the one full validation would have built from the same payload. The
+captured responses are the payloads that matter, so every contract case runs
+through all three.
+"""
+
+import copy
+import pickle
+from typing import Any
+
+import httpx
+import pytest
+import respx
+from pydantic import BaseModel, ValidationError
+
+from aiopikvm import (
+    InfoState,
+    MSDState,
+    PiKVM,
+    ResponseError,
+    StreamerState,
+    SwitchState,
+    ValidationMode,
+)
+from aiopikvm._validation import validate_model
+from aiopikvm._ws import _as_state
+from tests.fixtures import load_json, load_result
+from tests.test_contract import CASES, Case
+
+MODES: tuple[ValidationMode, ...] = ("full", "lazy", "trusted")
+
+
+def _payload(case: Case) -> Any:
+    result = load_result(case.name)
+    return result if case.key is None else result[case.key]
+
+
+@pytest.mark.parametrize("mode", ["lazy", "trusted"])
+@pytest.mark.parametrize("case", CASES, ids=[case.name for case in CASES])
+def test_every_capture_builds_what_full_validation_builds(
+    case: Case, mode: ValidationMode
+) -> None:
+    full = case.model.model_validate(_payload(case))
+    built = validate_model(case.model, _payload(case), mode)
+    assert type(built) is case.model
+    assert built == full
+    assert built.model_dump() == full.model_dump()
+
+
+@pytest.mark.parametrize("case", CASES, ids=[case.name for case in CASES])
+def test_lazy_reads_the_same_as_full(case: Case) -> None:
+    """Down to the repr, which follows the order the fields are declared in.
+
+    A pending field goes back into ``__dict__`` after the others, so without
+    the reordering a model read piecemeal would print differently from one
+    that was not.
+    """
+    built = validate_model(case.model, _payload(case), "lazy")
+    for name in case.model.model_fields:
+        getattr(built, name)
+    assert repr(built) == repr(case.model.model_validate(_payload(case)))
+
+
+def test_lazy_leaves_a_submodel_unbuilt_until_it_is_read() -> None:
+    state = validate_model(StreamerState, load_result("streamer"), "lazy")
+    assert "streamer" not in state.__dict__
+    assert state.streamer is not None
+    assert "streamer" in state.__dict__
+    # One level at a time: reading `streamer` did not build its `source`.
+    assert "source" not in state.streamer.__dict__
+    assert state.streamer.source.resolution.width == 1920
+
+
+def test_lazy_checks_the_top_level_before_it_returns() -> None:
+    payload = load_result("streamer") | {"features": None}
+    with pytest.raises(ValidationError):
+        validate_model(StreamerState, payload, "lazy")
+
+
+def test_lazy_reports_a_bad_submodel_when_it_is_read() -> None:
+    payload = copy.deepcopy(load_result("streamer"))
+    payload["params"]["desired_fps"] = "fast"
+    state = validate_model(StreamerState, payload, "lazy")
+    with pytest.raises(ResponseError, match=r"StreamerState\.params"):
+        _ = state.params
+
+
+def test_lazy_checks_the_shape_of_a_container() -> None:
+    """A dict of models is still checked to be a dict, before the models are."""
+    payload = copy.deepcopy(load_result("msd_image"))
+    payload["storage"]["images"] = ["not", "a", "dict"]
+    state = validate_model(MSDState, payload, "lazy")
+    with pytest.raises(ResponseError, match=r"MSDState\.storage"):
+        _ = state.storage
+
+
+def test_trusted_takes_values_as_they_came() -> None:
+    payload = copy.deepcopy(load_result("streamer"))
+    payload["params"]["desired_fps"] = "30"
+    state = validate_model(StreamerState, payload, "trusted")
+    assert state.params.desired_fps == "30"  # type: ignore[comparison-overlap]
+
+
+def test_trusted_validates_what_is_not_shaped_like_the_model() -> None:
+    """A missing required field is not a payload to trust, so it fails anyway."""
+    payload = load_result("streamer")
+    del payload["features"]
+    with pytest.raises(ValidationError):
+        validate_model(StreamerState, payload, "trusted")
+
+
+def test_trusted_fills_the_defaults_the_payload_left_out() -> None:
+    payload = load_result("info_legacy0")
+    state = validate_model(InfoState, {"auth": payload["auth"]}, "trusted")
+    assert state.auth is not None
+    assert state.auth.enabled is True
+    assert state.system is None
+    assert state.model_fields_set == {"auth"}
+
+
+@pytest.mark.parametrize("mode", ["lazy", "trusted"])
+def test_an_assigned_field_wins_over_the_pending_one(mode: ValidationMode) -> None:
+    state = validate_model(SwitchState, load_result("switch"), mode)
+    summary = state.summary.model_copy(update={"active_port": 3})
+    state.summary = summary
+    state.model_dump()
+    assert state.summary.active_port == 3
+
+
+@pytest.mark.parametrize("mode", ["lazy", "trusted"])
+def test_a_deferred_model_copies_and_pickles_whole(mode: ValidationMode) -> None:
+    state = validate_model(StreamerState, load_result("streamer"), mode)
+    full = StreamerState.model_validate(load_result("streamer"))
+    assert copy.deepcopy(state) == full
+    assert copy.copy(state) == full
+    assert pickle.loads(pickle.dumps(state)) == full
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_a_model_outside_the_package_is_validated_in_full(
+    mode: ValidationMode,
+) -> None:
+    class Plain(BaseModel):
+        value: int
+
+    assert validate_model(Plain, {"value": "1"}, mode).value == 1
+
+
+@pytest.mark.parametrize("mode", MODES)
+async def test_the_client_mode_reaches_the_resources(
+    mock_api: respx.MockRouter, mode: ValidationMode
+) -> None:
+    mock_api.get("/api/streamer").mock(
+        return_value=httpx.Response(200, json=load_json("streamer"))
+    )
+    async with PiKVM("https://pikvm.local", validation=mode) as kvm:
+        state = await kvm.streamer.get_state()
+    assert ("params" in state.__dict__) is (mode == "full")
+    assert state == StreamerState.model_validate(load_result("streamer"))
+
+
+async def test_a_bad_submodel_from_a_resource_is_a_response_error(
+    mock_api: respx.MockRouter,
+) -> None:
+    body = copy.deepcopy(load_json("streamer"))
+    body["result"]["params"] = {"desired_fps": "fast"}
+    mock_api.get("/api/streamer").mock(return_value=httpx.Response(200, json=body))
+    async with PiKVM("https://pikvm.local", validation="lazy") as kvm:
+        state = await kvm.streamer.get_state()
+    with pytest.raises(ResponseError):
+        _ = state.params
+
+
+def test_the_websocket_states_follow_the_mode() -> None:
+    state = _as_state("streamer", load_result("streamer"), "lazy")
+    assert "streamer" not in state.__dict__
+    assert state == _as_state("streamer", load_result("streamer"))
+
+
+def test_ws_inherits_the_client_mode() -> None:
+    kvm = PiKVM("https://pikvm.local", validation="trusted")
+    assert kvm.ws()._validation == "trusted"
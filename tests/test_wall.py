@@ -0,0 +1,226 @@
+"""Fleet previews kept fresh by `SnapshotWall`."""
+
+import asyncio
+import concurrent.futures
+import io
+import sys
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+import pytest
+import respx
+
+from aiopikvm import ConfigurationError, DeviceEvent, PiKVM, SnapshotWall
+from tests.test_ws import recorded
+
+DEVICES = ("a", "b", "c", "d")
+
+
+@pytest.fixture()
+async def kvms() -> AsyncIterator[dict[str, PiKVM]]:
+    """One client per device, each on a host of its own."""
+    async with AsyncExitStack() as stack:
+        yield {
+            name: await stack.enter_async_context(PiKVM(f"https://kvm-{name}.local"))
+            for name in DEVICES
+        }
+
+
+@pytest.fixture()
+def previews() -> respx.MockRouter:
+    """Every device's snapshot endpoint, answering with its own name."""
+    with respx.mock() as router:
+        router.get(
+            url__regex=r"https://kvm-(?P<name>\w)\.local/api/streamer/snapshot"
+        ).mock(side_effect=_preview)
+        yield router
+
+
+def _preview(request: httpx.Request, name: str) -> httpx.Response:
+    return httpx.Response(
+        200, content=b"\xff\xd8" + name.encode(), headers={"X-UStreamer-Online": "true"}
+    )
+
+
+def fetched(router: respx.MockRouter) -> list[str]:
+    """The devices whose previews were asked for, sorted."""
+    return sorted(call.request.url.host[4] for call in router.calls)
+
+
+def streamer(width: int, height: int, fps: int) -> dict[str, Any]:
+    """A ``streamer`` event whose source is at that size and rate."""
+    return {
+        "event_type": "streamer",
+        "event": {
+            "streamer": {
+                "source": {
+                    "online": True,
+                    "resolution": {"width": width, "height": height},
+                    "captured_fps": fps,
+                    "desired_fps": 20,
+                }
+            }
+        },
+    }
+
+
+async def test_the_first_refresh_fetches_every_tile_within_the_bound(
+    kvms: dict[str, PiKVM], previews: respx.MockRouter
+) -> None:
+    running = peak = 0
+
+    async def slow(request: httpx.Request, name: str) -> httpx.Response:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return _preview(request, name)
+
+    previews.routes[0].side_effect = slow
+    wall = SnapshotWall(kvms, concurrency=2, tile=(160, 90), quality=50)
+    assert wall.stale == list(DEVICES)
+    assert await wall.refresh() == list(DEVICES)
+    assert peak == 2
+    params = previews.calls[0].request.url.params
+    assert (params["preview_max_width"], params["preview_max_height"]) == ("160", "90")
+    assert params["preview_quality"] == "50"
+    assert params["allow_offline"] == "1"
+    tile = wall.tiles["c"]
+    assert tile.image is not None
+    assert tile.image.data == b"\xff\xd8c"
+    assert tile.age is not None
+    assert wall.stale == []
+
+
+async def test_only_tiles_whose_device_reported_a_change_are_fetched_again(
+    kvms: dict[str, PiKVM], previews: respx.MockRouter
+) -> None:
+    wall = SnapshotWall(kvms, max_age=None)
+    await wall.refresh()
+    previews.calls.clear()
+    assert not wall.feed(DeviceEvent("a", recorded("clients")))
+    assert wall.feed(DeviceEvent("a", recorded("atx")))
+    assert not wall.feed(DeviceEvent("zz", recorded("atx")))
+    # The first source a device reports is only recorded; a frame rate that
+    # wobbles is not a change, a new resolution is.
+    assert not wall.feed(DeviceEvent("b", streamer(1920, 1080, 60)))
+    assert not wall.feed(DeviceEvent("b", streamer(1920, 1080, 59)))
+    assert wall.feed(DeviceEvent("b", streamer(1280, 720, 59)))
+    assert wall.feed(DeviceEvent("d", {"event_type": "closed", "event": {}}))
+    assert wall.stale == ["a", "b", "d"]
+    assert await wall.refresh() == ["a", "b", "d"]
+    assert fetched(previews) == ["a", "b", "d"]
+    assert await wall.refresh() == []
+    wall.invalidate("c")
+    assert wall.stale == ["c"]
+    await wall.refresh(force=True)
+    assert len(previews.calls) == 3 + 4
+
+
+async def test_a_change_during_the_fetch_leaves_the_tile_stale(
+    kvms: dict[str, PiKVM], previews: respx.MockRouter
+) -> None:
+    wall = SnapshotWall(kvms, max_age=None)
+
+    def changed_on_the_way(request: httpx.Request, name: str) -> httpx.Response:
+        if name == "a":
+            wall.invalidate("a")
+        return _preview(request, name)
+
+    previews.routes[0].side_effect = changed_on_the_way
+    await wall.refresh()
+    assert wall.tiles["a"].image is not None
+    assert wall.stale == ["a"]
+
+
+async def test_a_failed_fetch_keeps_the_last_picture_and_is_retried(
+    kvms: dict[str, PiKVM], previews: respx.MockRouter
+) -> None:
+    wall = SnapshotWall(kvms, max_age=None)
+    await wall.refresh()
+    previews.routes[0].side_effect = None
+    previews.routes[0].return_value = httpx.Response(
+        503, json={"ok": False, "result": {"error": "UnavailableError"}}
+    )
+    wall.invalidate("b")
+    assert await wall.refresh() == []
+    tile = wall.tiles["b"]
+    assert tile.image is not None
+    assert tile.image.data == b"\xff\xd8b"
+    assert tile.error is not None
+    assert wall.stale == ["b"]
+
+
+async def test_tiles_go_stale_with_age(
+    kvms: dict[str, PiKVM], previews: respx.MockRouter
+) -> None:
+    wall = SnapshotWall(kvms, max_age=30)
+    await wall.refresh()
+    last = max(tile.taken or 0 for tile in wall.tiles.values())
+    with patch("aiopikvm._wall.time.monotonic", return_value=last + 29):
+        assert wall.stale == []
+    with patch("aiopikvm._wall.time.monotonic", return_value=last + 30):
+        assert wall.stale == list(DEVICES)
+
+
+async def test_a_mosaic_without_pillow_says_what_to_install(
+    kvms: dict[str, PiKVM],
+) -> None:
+    wall = SnapshotWall(kvms)
+    with (
+        patch.dict(sys.modules, {"PIL": None, "PIL.Image": None}),
+        pytest.raises(ConfigurationError, match=r"aiopikvm\[images\]"),
+    ):
+        await wall.mosaic()
+
+
+async def test_the_mosaic_tiles_every_picture_in_order(
+    kvms: dict[str, PiKVM],
+) -> None:
+    image_module = pytest.importorskip("PIL.Image", reason="Pillow is not installed")
+    colours = {"a": (255, 0, 0), "b": (0, 255, 0), "c": (0, 0, 255)}
+
+    def jpeg(request: httpx.Request, name: str) -> httpx.Response:
+        if name not in colours:
+            return httpx.Response(503, json={"ok": False, "result": {}})
+        output = io.BytesIO()
+        image_module.new("RGB", (64, 36), colours[name]).save(output, "JPEG")
+        return httpx.Response(200, content=output.getvalue())
+
+    with (
+        respx.mock() as router,
+        concurrent.futures.ThreadPoolExecutor(2) as executor,
+    ):
+        router.get(url__regex=r"https://kvm-(?P<name>\w)\.local/.*").mock(
+            side_effect=jpeg
+        )
+        async with SnapshotWall(kvms, tile=(32, 18), executor=executor) as wall:
+            await wall.refresh()
+            data = await wall.mosaic(columns=3)
+    with image_module.open(io.BytesIO(data)) as mosaic:
+        assert mosaic.size == (96, 36)
+        for index, colour in enumerate(colours.values()):
+            pixel = mosaic.getpixel((index * 32 + 16, 9))
+            assert all(abs(a - b) < 40 for a, b in zip(pixel, colour, strict=True))
+        # The device with no picture is left dark.
+        assert max(mosaic.getpixel((16, 27))) < 40
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"tile": (0, 90)},
+        {"quality": 101},
+        {"concurrency": 0},
+        {"workers": 0},
+        {"max_age": 0},
+        {"changes": "atx"},
+    ],
+)
+def test_settings_that_cannot_work_are_refused(kwargs: dict[str, Any]) -> None:
+    with pytest.raises(ConfigurationError):
+        SnapshotWall({}, **kwargs)
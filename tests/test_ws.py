@@ -1,6 +1,7 @@
 """PiKVMWebSocket tests."""
 
 import asyncio
+import dataclasses
 import json
 import logging
 import ssl
@@ -22,6 +23,7 @@ from aiopikvm import (
     ATXState,
     AuthError,
     BusyError,
+    ClientMetrics,
     ConfigurationError,
     GPIOState,
     HIDKeymaps,
@@ -37,7 +39,8 @@ from aiopikvm import (
     UnavailableError,
     WebSocketError,
 )
-from aiopikvm._ws import _PENDING_LIMIT, _Connector, _merge
+from aiopikvm._deadline import _within
+from aiopikvm._ws import _PENDING_LIMIT, _Connector, _merge, _StateMerger
 from tests.fixtures import load_json, load_jsonl
 
 
@@ -1559,3 +1562,375 @@ async def test_aexit_none_connection() -> None:
     assert ws._connection is None
     await ws.__aexit__(None, None, None)
     assert ws._connection is None
+
+
+# --- Reconnecting ----------------------------------------------------------
+
+
+def _atx(**changes: Any) -> str:
+    """The recorded ``atx`` event, with some of its fields changed."""
+    event = recorded("atx")
+    return json.dumps({**event, "event": {**event["event"], **changes}})
+
+
+async def test_reconnect_keeps_states_continuous_across_a_restart() -> None:
+    """kvmd dying mid-stream is a marker in states(), not an exception."""
+    connections = 0
+
+    async def restart(connection: websockets.asyncio.server.ServerConnection) -> None:
+        nonlocal connections
+        connections += 1
+        await connection.send(json.dumps(recorded("loop")))
+        if connections == 1:
+            await connection.send(_atx())
+            await connection.send(
+                json.dumps({"event_type": "atx", "event": {"busy": True}})
+            )
+            await connection.close(1011, "kvmd is restarting")
+        else:
+            await connection.send(_atx(leds={"power": True, "hdd": False}))
+            await connection.wait_closed()
+
+    states = []
+    async with serving(handler=restart) as (url, _):
+        async with socket(url, reconnect=True, reconnect_delay=0.01) as ws:
+            async for state in ws.states():
+                states.append(state)
+                if len(states) == 4:
+                    break
+    (first, busy, resynced, fresh) = states
+    assert first.atx is not None and not first.atx.busy
+    assert busy.atx is not None and busy.atx.busy
+    # Nothing is forgotten at the gap: the marker carries the last state.
+    assert resynced.updated == "resynced"
+    assert resynced.atx == busy.atx
+    # The new connection's full payload replaces what the old one said.
+    assert fresh.atx is not None and not fresh.atx.busy
+    assert fresh.atx.leds.power
+    assert connections == 2
+
+
+async def test_reconnect_marks_the_gap_in_events() -> None:
+    """A clean close by kvmd is reconnected too; the caller did not close."""
+    connections = 0
+
+    async def goodbye(connection: websockets.asyncio.server.ServerConnection) -> None:
+        nonlocal connections
+        connections += 1
+        await connection.send(json.dumps(recorded("loop")))
+        if connections == 1:
+            await connection.close()
+        else:
+            await connection.wait_closed()
+
+    events = []
+    async with serving(handler=goodbye) as (url, _):
+        async with socket(url, reconnect=True, reconnect_delay=0.01) as ws:
+            async for event in ws.events():
+                events.append(event)
+                if len(events) == 3:
+                    break
+    assert [event["event_type"] for event in events] == ["loop", "resynced", "loop"]
+    marker = events[1]["event"]
+    assert marker["reason"] == "kvmd closed the connection"
+    assert marker["attempts"] == 1
+    assert marker["offline"] >= 0
+
+
+async def test_reconnect_backs_off_with_jitter() -> None:
+    ws, _ = connected(reconnect=True, reconnect_delay=1.0, reconnect_max_delay=3.0)
+    ws._connection = iterating(
+        closed=websockets.exceptions.ConnectionClosedError(None, None)
+    )
+    caps: list[float] = []
+
+    def uniform(low: float, high: float) -> float:
+        caps.append(high)
+        return 0.0
+
+    failing = [WebSocketError("refused")] * 3
+    reopened = iterating(json.dumps(recorded("loop")))
+    with (
+        patch("aiopikvm._ws.random.uniform", uniform),
+        patch.object(ws, "_connect", AsyncMock(side_effect=[*failing, reopened])),
+    ):
+        ws._start_reader()
+        events = [event async for event in _first(ws.events(), 2)]
+    assert caps[:4] == [1.0, 2.0, 3.0, 3.0]
+    assert events[0]["event"]["attempts"] == 4
+    await ws._stop_reader()
+
+
+async def _first(
+    events: AsyncIterator[dict[str, Any]], count: int
+) -> AsyncIterator[dict[str, Any]]:
+    """Hand out the first *count* events, then stop."""
+    async for event in events:
+        yield event
+        count -= 1
+        if not count:
+            return
+
+
+async def test_reconnect_gives_up_on_refused_credentials() -> None:
+    ws, _ = connected(reconnect=True, reconnect_delay=0.0)
+    ws._connection = iterating(
+        closed=websockets.exceptions.ConnectionClosedError(None, None)
+    )
+    refused = AuthError("Forbidden", 403)
+    with patch.object(ws, "_connect", AsyncMock(side_effect=[refused])):
+        with pytest.raises(WebSocketError, match="Reconnecting failed") as caught:
+            async for _ in ws.events():
+                pass
+    assert caught.value.__cause__ is refused
+
+
+async def test_a_full_buffer_never_drops_the_resync_marker() -> None:
+    ws = socket()
+    ws._buffer({"event_type": "resynced", "event": {}})
+    for index in range(_PENDING_LIMIT + 5):
+        ws._buffer({"event_type": "info", "event": {"index": index}})
+    assert ws._pending[0]["event_type"] == "resynced"
+    assert len(ws._pending) == _PENDING_LIMIT
+
+
+# --- Filtering by type -----------------------------------------------------
+
+
+async def test_only_the_types_asked_for_are_parsed_and_handed_on() -> None:
+    ws = socket(types={"atx"})
+    ws._connection = iterating(
+        *(json.dumps(recorded(name)) for name in ("loop", "streamer", "atx", "msd"))
+    )
+    with patch.object(ws, "_route_text", wraps=ws._route_text) as route:
+        assert [event async for event in ws.events()] == [recorded("atx")]
+    # loop is still read for the version; streamer and msd never reach json.
+    assert route.call_count == 2
+    assert ws.version == KvmdVersion(4, 206)
+
+
+async def test_loop_and_pong_are_handed_on_when_asked_for() -> None:
+    ws = socket(types={"loop", "pong"})
+    ws._connection = iterating(
+        *(json.dumps(recorded(name)) for name in ("loop", "atx", "pong"))
+    )
+    assert [event async for event in ws.events()] == [
+        recorded("loop"),
+        recorded("pong"),
+    ]
+
+
+async def test_a_frame_the_sniff_cannot_read_is_parsed_then_filtered() -> None:
+    ws = socket(types={"atx"})
+    ws._connection = iterating(
+        json.dumps({"event": {}, "event_type": "msd"}),
+        json.dumps(recorded("atx"), separators=(",", ":")),
+    )
+    assert [event async for event in ws.events()] == [recorded("atx")]
+
+
+async def test_skipped_events_are_still_counted() -> None:
+    metrics = ClientMetrics()
+    ws = socket(types={"atx"}, metrics=metrics)
+    ws._connection = iterating(json.dumps(recorded("streamer")))
+    assert [event async for event in ws.events()] == []
+    assert metrics.events == {"streamer": 1}
+
+
+def test_a_single_string_of_types_is_refused() -> None:
+    with pytest.raises(ConfigurationError, match="not the string"):
+        socket(types="atx")
+
+
+# --- Send queue ------------------------------------------------------------
+
+
+def held(conn: AsyncMock) -> tuple[list[str], asyncio.Event]:
+    """Make every send wait for a gate, and note each frame's type as it goes."""
+    order: list[str] = []
+    gate = asyncio.Event()
+
+    async def send(frame: str) -> None:
+        event = json.loads(frame)
+        detail = event["event"].get("to") or event["event"].get("state")
+        order.append(f"{event['event_type']}:{detail}")
+        await gate.wait()
+
+    conn.send = send
+    return (order, gate)
+
+
+async def queued(*sends: Awaitable[None]) -> list[asyncio.Task[None]]:
+    """Start each send in its own task, in order, and let them all queue."""
+    tasks = []
+    for send in sends:
+        tasks.append(asyncio.ensure_future(send))
+        await asyncio.sleep(0)
+    return tasks
+
+
+async def test_a_key_overtakes_queued_moves_and_moves_coalesce() -> None:
+    (ws, conn) = connected(send_queue=8)
+    (order, gate) = held(conn)
+    tasks = await queued(
+        ws.send_mouse_move(0, 0),
+        ws.send_mouse_move(1, 1),
+        ws.send_mouse_move(2, 2),
+        ws.send_mouse_move(3, 3),
+        ws.send_key("KeyA", state=False),
+    )
+    assert ws.send_backlog == 2
+    assert ws.coalesced_moves == 2
+    gate.set()
+    await asyncio.gather(*tasks)
+    assert order == [
+        "mouse_move:{'x': 0, 'y': 0}",
+        "key:False",
+        "mouse_move:{'x': 3, 'y': 3}",
+    ]
+    assert ws.send_backlog == 0
+
+
+async def test_nothing_overtakes_what_it_would_change_the_meaning_of() -> None:
+    (ws, conn) = connected(send_queue=8)
+    (order, gate) = held(conn)
+    tasks = await queued(
+        ws.send_key("ShiftLeft", state=True),
+        ws.send_mouse_move(5, 5),
+        ws.send_mouse_button("left", True),
+        ws.send_key("ShiftLeft", state=False),
+        ws.send_key("KeyB", state=True),
+        ws.send_key("KeyB", state=False),
+    )
+    gate.set()
+    await asyncio.gather(*tasks)
+    # The click waits for its move, and the Shift release for the click.
+    assert order == [
+        "key:True",
+        "mouse_move:{'x': 5, 'y': 5}",
+        "mouse_button:True",
+        "key:False",
+        "key:True",
+        "key:False",
+    ]
+
+
+async def test_a_ping_goes_ahead_of_queued_input() -> None:
+    (ws, conn) = connected(send_queue=8)
+    (order, gate) = held(conn)
+    tasks = await queued(
+        ws.send_mouse_wheel(0, -1),
+        ws.send_mouse_wheel(0, -2),
+        ws.send_key("KeyA", state=True),
+        ws._send_event("ping", {}),
+    )
+    gate.set()
+    await asyncio.gather(*tasks)
+    assert [entry.split(":")[0] for entry in order] == [
+        "mouse_wheel",
+        "ping",
+        "mouse_wheel",
+        "key",
+    ]
+
+
+async def test_a_full_queue_holds_the_sender_back() -> None:
+    (ws, conn) = connected(send_queue=1)
+    (order, gate) = held(conn)
+    tasks = await queued(
+        ws.send_key("KeyA", state=True),
+        ws.send_key("KeyA", state=False),
+        ws.send_key("KeyB", state=True),
+    )
+    assert ws.send_backlog == 1
+    assert not tasks[2].done()
+    gate.set()
+    await asyncio.gather(*tasks)
+    assert len(order) == 3
+
+
+async def test_closing_fails_what_has_not_gone_out() -> None:
+    (ws, conn) = connected(send_queue=8)
+    (_, _gate) = held(conn)
+    tasks = await queued(
+        ws.send_key("KeyA", state=True), ws.send_key("KeyA", state=False)
+    )
+    await ws.__aexit__(None, None, None)
+    for task in tasks:
+        with pytest.raises(WebSocketError, match="closed before the frame was sent"):
+            await task
+
+
+async def test_waiting_in_the_queue_counts_against_the_deadline() -> None:
+    (ws, conn) = connected(send_queue=8)
+    (order, gate) = held(conn)
+    (first,) = await queued(ws.send_key("KeyA", state=True))
+    async with _within(0.02):
+        with pytest.raises(WebSocketError, match="ran past the deadline"):
+            await ws.send_key("KeyA", state=False)
+    gate.set()
+    await first
+    await asyncio.sleep(0)
+    # The frame nobody waited for any more is not sent.
+    assert order == ["key:True"]
+
+
+def test_a_send_queue_of_nothing_is_refused() -> None:
+    with pytest.raises(ConfigurationError, match="send_queue"):
+        socket(send_queue=0)
+
+
+# --- Latest-only buffering -------------------------------------------------
+
+
+def buffered(**kwargs: Any) -> PiKVMWebSocket:
+    """A socket whose reader has buffered full states, then partial updates."""
+    (ws, _) = connected(**kwargs)
+    for name in ("loop", "atx", "hid", "msd"):
+        ws._buffer(json.loads(json.dumps(recorded(name))))
+    for busy in (True, False, True):
+        ws._buffer({"event_type": "atx", "event": {"busy": busy}})
+        ws._buffer({"event_type": "hid", "event": {"keyboard": {"online": busy}}})
+    return ws
+
+
+def taken(ws: PiKVMWebSocket) -> list[dict[str, Any]]:
+    """Everything buffered, as events() would hand it out."""
+    return [ws._next_event() for _ in range(len(ws._pending))]
+
+
+def test_latest_only_keeps_one_merged_event_per_type() -> None:
+    ws = buffered(buffering="latest")
+    assert len(ws._pending) == 4
+    events = taken(ws)
+    assert [event["event_type"] for event in events] == ["loop", "atx", "hid", "msd"]
+    assert events[1]["event"] == recorded("atx")["event"] | {"busy": True}
+    assert events[2]["event"]["keyboard"]["online"] is True
+
+
+def test_latest_only_adds_up_to_the_same_state() -> None:
+    final = {}
+    for mode in ("queue", "latest"):
+        merger = _StateMerger("full")
+        for event in taken(buffered(buffering=mode)):
+            merger.feed(event)
+        final[mode] = dataclasses.replace(merger.state, updated="")
+    assert final["latest"] == final["queue"]
+    assert final["latest"].atx.busy is True  # type: ignore[union-attr]
+
+
+def test_latest_only_merges_nothing_across_a_resync() -> None:
+    (ws, _) = connected(buffering="latest")
+    ws._buffer({"event_type": "atx", "event": {"busy": True}})
+    ws._buffer({"event_type": "resynced", "event": {}})
+    ws._buffer(recorded("atx"))
+    ws._buffer({"event_type": "atx", "event": {"busy": True}})
+    assert [event["event"] for event in ws._pending] == [
+        {"busy": True},
+        {},
+        recorded("atx")["event"] | {"busy": True},
+    ]
+    # A type taken from the buffer starts a new one.
+    ws._next_event()
+    ws._buffer({"event_type": "msd", "event": {"busy": False}})
+    assert len(ws._pending) == 3